@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Backfill for LPR Server v3
+สร้าง thumbnail และ preview ให้ภาพที่เก็บไว้ก่อนมีการสร้าง thumbnail ตอนรับข้อมูล
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add project src to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+# Setup absolute imports
+from core.import_helper import setup_absolute_imports
+setup_absolute_imports()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Generate missing thumbnails and previews of stored images')
+    parser.add_argument('--batch-size', type=int, default=500, help='Images per batch')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many images')
+    args = parser.parse_args()
+    
+    from src.app import create_app
+    from core.dependency_container import get_service
+    
+    app = create_app()
+    started = time.monotonic()
+    with app.app_context():
+        try:
+            results = get_service('thumbnail_service').backfill(args.batch_size, args.limit)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+    
+    print(f"✅ สร้าง thumbnail {results['images'] - results['failed']} ภาพ "
+          f"(ล้มเหลว {results['failed']}) ใน {time.monotonic() - started:.1f} วินาที")
+    return 0 if not results['failed'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
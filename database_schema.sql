@@ -5,6 +5,9 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable trigram extension for substring/fuzzy plate search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- ============================================================================
 -- TABLES
 -- ============================================================================
@@ -43,9 +46,10 @@ CREATE TABLE IF NOT EXISTS cameras (
 );
 
 -- Detections table - ข้อมูลการตรวจจับจาก AI Camera
+-- Partitioned by timestamp; keys include the partition column
 CREATE TABLE IF NOT EXISTS detections (
-    id SERIAL PRIMARY KEY,
-    detection_id UUID UNIQUE DEFAULT uuid_generate_v4(),
+    id SERIAL,
+    detection_id UUID DEFAULT uuid_generate_v4(),
     camera_id VARCHAR(50) REFERENCES cameras(camera_id),
     checkpoint_id VARCHAR(50) REFERENCES checkpoints(checkpoint_id),
     timestamp TIMESTAMP NOT NULL,
@@ -57,13 +61,16 @@ CREATE TABLE IF NOT EXISTS detections (
     confidence_score DECIMAL(5,4),
     detection_type VARCHAR(50) DEFAULT 'lpr',
     metadata JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    UNIQUE (detection_id, timestamp)
+) PARTITION BY RANGE (timestamp);
 
 -- Vehicles table - ข้อมูลรถที่ตรวจพบ
+-- Partitioned by created_at; detection_id cannot be a foreign key to partitioned detections
 CREATE TABLE IF NOT EXISTS vehicles (
-    id SERIAL PRIMARY KEY,
-    detection_id UUID REFERENCES detections(detection_id) ON DELETE CASCADE,
+    id SERIAL,
+    detection_id UUID,
     vehicle_index INTEGER,
     bbox_x1 INTEGER,
     bbox_y1 INTEGER,
@@ -77,14 +84,16 @@ CREATE TABLE IF NOT EXISTS vehicles (
     model VARCHAR(100),
     year INTEGER,
     metadata JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 -- Plates table - ข้อมูลป้ายทะเบียนที่อ่านได้
+-- Partitioned by created_at; detection_id and vehicle_id reference partitioned tables, so no foreign keys
 CREATE TABLE IF NOT EXISTS plates (
-    id SERIAL PRIMARY KEY,
-    detection_id UUID REFERENCES detections(detection_id) ON DELETE CASCADE,
-    vehicle_id INTEGER REFERENCES vehicles(id) ON DELETE CASCADE,
+    id SERIAL,
+    detection_id UUID,
+    vehicle_id INTEGER,
     plate_index INTEGER,
     plate_number VARCHAR(20) NOT NULL,
     bbox_x1 INTEGER,
@@ -101,13 +110,15 @@ CREATE TABLE IF NOT EXISTS plates (
     ocr_processed_result VARCHAR(20),
     is_valid BOOLEAN DEFAULT true,
     metadata JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 -- Health logs table - ข้อมูลสุขภาพของกล้อง
+-- Partitioned by timestamp
 CREATE TABLE IF NOT EXISTS health_logs (
-    id SERIAL PRIMARY KEY,
-    health_id UUID UNIQUE DEFAULT uuid_generate_v4(),
+    id SERIAL,
+    health_id UUID DEFAULT uuid_generate_v4(),
     camera_id VARCHAR(50) REFERENCES cameras(camera_id),
     checkpoint_id VARCHAR(50) REFERENCES checkpoints(checkpoint_id),
     timestamp TIMESTAMP NOT NULL,
@@ -120,8 +131,10 @@ CREATE TABLE IF NOT EXISTS health_logs (
     network_status VARCHAR(20),
     temperature DECIMAL(5,2),
     details JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    UNIQUE (health_id, timestamp)
+) PARTITION BY RANGE (timestamp);
 
 -- Blacklist table - รายชื่อป้ายทะเบียนที่ต้องเฝ้าระวัง
 CREATE TABLE IF NOT EXISTS blacklist (
@@ -173,23 +186,51 @@ CREATE TABLE IF NOT EXISTS system_logs (
     request_id VARCHAR(100)
 );
 
+-- ============================================================================
+-- PARTITIONS
+-- ============================================================================
+
+-- Monthly partitions for the current month and the next 3 months.
+-- The server's partition service keeps creating partitions ahead of time
+-- and applies retention by dropping old partitions.
+DO $$
+DECLARE
+    parent TEXT;
+    period_start DATE;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['detections', 'vehicles', 'plates', 'health_logs'] LOOP
+        FOR i IN 0..3 LOOP
+            period_start := (date_trunc('month', CURRENT_DATE) + make_interval(months => i))::date;
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                parent || '_p' || to_char(period_start, 'YYYYMMDD'), parent,
+                period_start, (period_start + interval '1 month')::date
+            );
+        END LOOP;
+    END LOOP;
+END $$;
+
 -- ============================================================================
 -- INDEXES
 -- ============================================================================
 
 -- Detections indexes
+-- (camera|checkpoint, timestamp) serve "filter by source, newest first" and plain source lookups
 CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections(timestamp);
-CREATE INDEX IF NOT EXISTS idx_detections_camera_id ON detections(camera_id);
-CREATE INDEX IF NOT EXISTS idx_detections_checkpoint_id ON detections(checkpoint_id);
+CREATE INDEX IF NOT EXISTS idx_detections_camera_timestamp ON detections(camera_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_detections_checkpoint_timestamp ON detections(checkpoint_id, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_detections_detection_type ON detections(detection_type);
 CREATE INDEX IF NOT EXISTS idx_detections_created_at ON detections(created_at);
+-- Containment (metadata @> '{"lighting": "night"}') for edge metadata filters
+CREATE INDEX IF NOT EXISTS idx_detections_metadata ON detections USING gin (metadata jsonb_path_ops);
 
 -- Plates indexes
-CREATE INDEX IF NOT EXISTS idx_plates_plate_number ON plates(plate_number);
+CREATE INDEX IF NOT EXISTS idx_plates_plate_number_created_at ON plates(plate_number, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_plates_detection_id ON plates(detection_id);
 CREATE INDEX IF NOT EXISTS idx_plates_confidence ON plates(confidence);
 CREATE INDEX IF NOT EXISTS idx_plates_timestamp ON plates(created_at);
 CREATE INDEX IF NOT EXISTS idx_plates_country ON plates(country);
+CREATE INDEX IF NOT EXISTS idx_plates_plate_number_trgm ON plates USING gin (plate_number gin_trgm_ops);
 
 -- Vehicles indexes
 CREATE INDEX IF NOT EXISTS idx_vehicles_detection_id ON vehicles(detection_id);
@@ -199,7 +240,7 @@ CREATE INDEX IF NOT EXISTS idx_vehicles_brand ON vehicles(brand);
 
 -- Health logs indexes
 CREATE INDEX IF NOT EXISTS idx_health_logs_timestamp ON health_logs(timestamp);
-CREATE INDEX IF NOT EXISTS idx_health_logs_camera_id ON health_logs(camera_id);
+CREATE INDEX IF NOT EXISTS idx_health_logs_camera_timestamp ON health_logs(camera_id, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_health_logs_status ON health_logs(status);
 CREATE INDEX IF NOT EXISTS idx_health_logs_component ON health_logs(component);
 
@@ -207,6 +248,7 @@ CREATE INDEX IF NOT EXISTS idx_health_logs_component ON health_logs(component);
 CREATE INDEX IF NOT EXISTS idx_analytics_date ON analytics(date);
 CREATE INDEX IF NOT EXISTS idx_analytics_checkpoint_id ON analytics(checkpoint_id);
 CREATE INDEX IF NOT EXISTS idx_analytics_camera_id ON analytics(camera_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_rollup_key ON analytics(date, (COALESCE(checkpoint_id, '')), (COALESCE(camera_id, '')));
 
 -- System logs indexes
 CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp);
@@ -216,32 +258,32 @@ CREATE INDEX IF NOT EXISTS idx_system_logs_component ON system_logs(component);
 -- Blacklist indexes
 CREATE INDEX IF NOT EXISTS idx_blacklist_plate_number ON blacklist(plate_number);
 CREATE INDEX IF NOT EXISTS idx_blacklist_is_active ON blacklist(is_active);
+CREATE INDEX IF NOT EXISTS idx_blacklist_active_plate ON blacklist(plate_number) INCLUDE (alert_level, reason) WHERE is_active = true;
 CREATE INDEX IF NOT EXISTS idx_blacklist_alert_level ON blacklist(alert_level);
+CREATE INDEX IF NOT EXISTS idx_blacklist_plate_number_trgm ON blacklist USING gin (plate_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_blacklist_reason_trgm ON blacklist USING gin (reason gin_trgm_ops);
 
 -- ============================================================================
 -- VIEWS
 -- ============================================================================
 
--- Daily statistics view
+-- Daily statistics view (reads the rollups maintained by the analytics service)
 CREATE OR REPLACE VIEW daily_statistics AS
 SELECT 
-    DATE(d.timestamp) as date,
-    c.checkpoint_id,
+    a.date,
+    a.checkpoint_id,
     c.name as checkpoint_name,
-    cam.camera_id,
+    a.camera_id,
     cam.name as camera_name,
-    COUNT(d.id) as total_detections,
-    SUM(d.vehicles_count) as total_vehicles,
-    SUM(d.plates_count) as total_plates,
-    COUNT(DISTINCT p.plate_number) as unique_plates,
-    AVG(d.processing_time_ms) as avg_processing_time,
-    COUNT(CASE WHEN b.plate_number IS NOT NULL THEN 1 END) as blacklist_hits
-FROM detections d
-LEFT JOIN checkpoints c ON d.checkpoint_id = c.checkpoint_id
-LEFT JOIN cameras cam ON d.camera_id = cam.camera_id
-LEFT JOIN plates p ON d.detection_id = p.detection_id
-LEFT JOIN blacklist b ON p.plate_number = b.plate_number AND b.is_active = true
-GROUP BY DATE(d.timestamp), c.checkpoint_id, c.name, cam.camera_id, cam.name
+    a.total_detections::bigint as total_detections,
+    a.total_vehicles::bigint as total_vehicles,
+    a.total_plates::bigint as total_plates,
+    a.unique_plates::bigint as unique_plates,
+    a.avg_processing_time_ms::numeric as avg_processing_time,
+    a.blacklist_hits::bigint as blacklist_hits
+FROM analytics a
+LEFT JOIN checkpoints c ON a.checkpoint_id = c.checkpoint_id
+LEFT JOIN cameras cam ON a.camera_id = cam.camera_id
 ORDER BY date DESC, checkpoint_id, camera_id;
 
 -- Recent detections view
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for LPR Server v3
+แนะนำ indexes ที่ขาดหายหรือไม่ได้ใช้งาน จาก pg_stat_statements และ pg_stat_user_indexes
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# Add project src to Python path for the ORM model metadata
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+SCHEMA_FILE = project_root / 'database_schema.sql'
+SCHEMA_INDEX_PATTERN = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)\b[^;]*;',
+    re.IGNORECASE
+)
+# Column references in plan filters, e.g. "(camera_id)::text = 'cam1'::text" or "timestamp >= $1"
+FILTER_COLUMN_PATTERN = re.compile(r'\(?(\w+)\)?(?:::\w+(?: \w+)?)?\s*(=|<>|<=|>=|<|>|~~\*?|IS)\s')
+RANGE_OPERATORS = {'<', '>', '<=', '>='}
+
+class IndexAdvisor:
+    def __init__(self, top=20, min_rows=10000, min_index_mb=1):
+        self.db_config = {
+            'host': os.environ.get('DB_HOST', 'localhost'),
+            'port': os.environ.get('DB_PORT', '5432'),
+            'user': os.environ.get('DB_USER', 'lpruser'),
+            'password': os.environ.get('DB_PASSWORD', ''),
+            'database': os.environ.get('DB_NAME', 'lprserver_v3')
+        }
+        self.top = top
+        self.min_rows = min_rows
+        self.min_index_mb = min_index_mb
+        self.connection = None
+        self.cursor = None
+        self.server_version = 0
+        self.results = {
+            'timestamp': datetime.now().isoformat(),
+            'missing': [],
+            'unused': [],
+            'redundant': [],
+            'seq_scan_tables': [],
+            'statements': []
+        }
+    
+    def connect(self):
+        """เชื่อมต่อฐานข้อมูล"""
+        self.connection = psycopg2.connect(**self.db_config)
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        self.connection.autocommit = True
+        self.cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+        self.cursor.execute("SHOW server_version_num")
+        self.server_version = int(self.cursor.fetchone()['server_version_num'])
+    
+    def expected_indexes(self):
+        """รวบรวม indexes ที่กำหนดไว้ใน ORM models และ database_schema.sql"""
+        expected = {}
+        
+        try:
+            from sqlalchemy.dialects import postgresql
+            from sqlalchemy.schema import CreateIndex
+            from core.models import db
+            
+            dialect = postgresql.dialect()
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+                    expected[index.name] = {'table': table.name, 'sql': ' '.join(sql.split())}
+        except ImportError as e:
+            print(f"⚠️  ข้าม ORM models: {e}")
+        
+        # Indexes too expensive to build at startup (trigram, JSONB, image paths)
+        try:
+            from core.deferred_indexes import DEFERRED_INDEXES
+            for index in DEFERRED_INDEXES:
+                expected.setdefault(index['name'], {'table': index['table'], 'sql': index['sql']})
+        except ImportError as e:
+            print(f"⚠️  ข้าม deferred indexes: {e}")
+        
+        if SCHEMA_FILE.exists():
+            for match in SCHEMA_INDEX_PATTERN.finditer(SCHEMA_FILE.read_text(encoding='utf-8')):
+                expected.setdefault(match.group(1), {
+                    'table': match.group(2),
+                    'sql': ' '.join(match.group(0).rstrip(';').split())
+                })
+        
+        return expected
+    
+    def find_missing(self):
+        """หา indexes ที่กำหนดไว้แต่ยังไม่มีในฐานข้อมูล"""
+        print("🔍 ตรวจสอบ indexes ที่ขาดหาย...")
+        
+        # An invalid index (failed CONCURRENTLY build) counts as missing and is rebuilt
+        self.cursor.execute("""
+            SELECT c.relname, i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relnamespace = current_schema()::regnamespace
+        """)
+        indexes = {row['relname']: row['indisvalid'] for row in self.cursor.fetchall()}
+        existing = {name for name, valid in indexes.items() if valid}
+        self.cursor.execute("""
+            SELECT c.relname, c.relkind FROM pg_class c
+            WHERE c.relnamespace = current_schema()::regnamespace AND c.relkind IN ('r', 'p')
+        """)
+        tables = {row['relname']: row['relkind'] for row in self.cursor.fetchall()}
+        
+        for name, index in sorted(self.expected_indexes().items()):
+            if name in existing or index['table'] not in tables:
+                continue
+            self.results['missing'].append({
+                'index': name,
+                'table': index['table'],
+                'partitioned': tables[index['table']] == 'p',
+                'invalid': name in indexes,
+                'sql': index['sql']
+            })
+        
+        print(f"   ✅ ขาดหาย {len(self.results['missing'])} indexes")
+    
+    def find_unused(self):
+        """หา indexes ที่ไม่เคยถูกใช้ตั้งแต่ reset สถิติ"""
+        print("🔍 ตรวจสอบ indexes ที่ไม่ได้ใช้งาน...")
+        
+        self.cursor.execute("""
+            SELECT s.relname AS table, s.indexrelname AS index, s.idx_scan,
+                   pg_relation_size(s.indexrelid) AS size_bytes,
+                   (SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()) AS stats_reset
+            FROM pg_stat_user_indexes s
+            JOIN pg_index i ON i.indexrelid = s.indexrelid
+            WHERE s.idx_scan = 0
+              AND NOT i.indisunique
+              AND NOT i.indisprimary
+              AND pg_relation_size(s.indexrelid) >= %s
+            ORDER BY pg_relation_size(s.indexrelid) DESC
+        """, (self.min_index_mb * 1024 * 1024,))
+        
+        for row in self.cursor.fetchall():
+            self.results['unused'].append({
+                'index': row['index'],
+                'table': row['table'],
+                'size_mb': round(row['size_bytes'] / 1024 / 1024, 2),
+                'stats_reset': row['stats_reset'].isoformat() if row['stats_reset'] else None,
+                'sql': f"DROP INDEX CONCURRENTLY IF EXISTS {row['index']}"
+            })
+        
+        print(f"   ✅ ไม่ได้ใช้งาน {len(self.results['unused'])} indexes")
+    
+    def find_redundant(self):
+        """หา indexes ที่คอลัมน์เป็น prefix ของ index อื่นบนตารางเดียวกัน"""
+        print("🔍 ตรวจสอบ indexes ที่ซ้ำซ้อน...")
+        
+        self.cursor.execute("""
+            SELECT t.relname AS table, c.relname AS index, i.indisunique, am.amname,
+                   (string_to_array(i.indkey::text, ' ')::int[])[1:i.indnkeyatts] AS keys,
+                   i.indpred IS NOT NULL AS partial, i.indexprs IS NOT NULL AS expression,
+                   pg_relation_size(i.indexrelid) AS size_bytes
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_am am ON am.oid = c.relam
+            WHERE t.relnamespace = current_schema()::regnamespace
+              AND NOT i.indisprimary
+        """)
+        indexes = [row for row in self.cursor.fetchall() if not row['partial'] and not row['expression']]
+        
+        for index in indexes:
+            if index['indisunique']:
+                continue
+            for other in indexes:
+                if other is index or other['table'] != index['table'] or other['amname'] != index['amname']:
+                    continue
+                keys, other_keys = index['keys'], other['keys']
+                is_prefix = len(keys) < len(other_keys) and other_keys[:len(keys)] == keys
+                if is_prefix or (keys == other_keys and index['index'] > other['index']):
+                    self.results['redundant'].append({
+                        'index': index['index'],
+                        'table': index['table'],
+                        'covered_by': other['index'],
+                        'size_mb': round(index['size_bytes'] / 1024 / 1024, 2),
+                        'sql': f"DROP INDEX CONCURRENTLY IF EXISTS {index['index']}"
+                    })
+                    break
+        
+        print(f"   ✅ ซ้ำซ้อน {len(self.results['redundant'])} indexes")
+    
+    def find_seq_scan_tables(self):
+        """หาตารางขนาดใหญ่ที่ถูก sequential scan บ่อย"""
+        print("🔍 ตรวจสอบตารางที่ถูก sequential scan...")
+        
+        self.cursor.execute("""
+            SELECT relname AS table, seq_scan, seq_tup_read, COALESCE(idx_scan, 0) AS idx_scan, n_live_tup
+            FROM pg_stat_user_tables
+            WHERE n_live_tup >= %s AND seq_scan > COALESCE(idx_scan, 0)
+            ORDER BY seq_tup_read DESC
+        """, (self.min_rows,))
+        self.results['seq_scan_tables'] = [dict(row) for row in self.cursor.fetchall()]
+        
+        print(f"   ✅ พบ {len(self.results['seq_scan_tables'])} ตาราง")
+    
+    def analyze_statements(self):
+        """วิเคราะห์ queries ที่ใช้เวลามากที่สุดจาก pg_stat_statements"""
+        print("🔍 วิเคราะห์ pg_stat_statements...")
+        
+        self.cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+        if not self.cursor.fetchone():
+            print("   ⚠️  ไม่พบ pg_stat_statements (เพิ่มใน shared_preload_libraries แล้วรัน CREATE EXTENSION pg_stat_statements)")
+            return
+        
+        total_column, mean_column = ('total_exec_time', 'mean_exec_time') if self.server_version >= 130000 \
+            else ('total_time', 'mean_time')
+        self.cursor.execute(f"""
+            SELECT query, calls, {total_column} AS total_ms, {mean_column} AS mean_ms, rows
+            FROM pg_stat_statements
+            WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+              AND query ~* '^\\s*(select|update|delete)'
+              AND query !~* '(pg_catalog|pg_stat|information_schema)'
+            ORDER BY {total_column} DESC
+            LIMIT %s
+        """, (self.top,))
+        statements = self.cursor.fetchall()
+        
+        large_tables = {row['table'] for row in self.results['seq_scan_tables']}
+        for statement in statements:
+            entry = {
+                'query': ' '.join(statement['query'].split())[:500],
+                'calls': statement['calls'],
+                'total_ms': round(statement['total_ms'], 2),
+                'mean_ms': round(statement['mean_ms'], 2),
+                'seq_scans': [],
+                'suggestions': []
+            }
+            plan = self.explain_generic(statement['query'])
+            if plan:
+                for scan in self.find_seq_scans(plan['Plan']):
+                    entry['seq_scans'].append(scan['table'])
+                    if scan['table'] in large_tables and scan['columns']:
+                        entry['suggestions'].append(
+                            f"CREATE INDEX CONCURRENTLY ON {scan['table']} ({', '.join(scan['columns'])})"
+                        )
+            self.results['statements'].append(entry)
+        
+        print(f"   ✅ วิเคราะห์ {len(statements)} queries")
+    
+    def explain_generic(self, query):
+        """EXPLAIN query ที่มี $n parameters (ต้องใช้ PostgreSQL 16+)"""
+        if self.server_version < 160000:
+            return None
+        try:
+            self.cursor.execute(f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {query}")
+            return self.cursor.fetchone()['QUERY PLAN'][0]
+        except psycopg2.Error:
+            return None
+    
+    def find_seq_scans(self, node, sort_key=None):
+        """หา Seq Scan nodes ที่มี filter และคอลัมน์ที่ควรทำ index"""
+        scans = []
+        if node.get('Node Type') == 'Sort':
+            sort_key = node.get('Sort Key')
+        
+        if node.get('Node Type') == 'Seq Scan' and node.get('Filter'):
+            equality, ranges = [], []
+            for column, operator in FILTER_COLUMN_PATTERN.findall(node['Filter']):
+                target = ranges if operator in RANGE_OPERATORS else equality
+                if column not in equality and column not in ranges:
+                    target.append(column)
+            columns = equality + ranges
+            # A trailing sort column lets the index also return rows in order
+            for key in sort_key or []:
+                column = key.split()[0].strip('()').split('.')[-1]
+                if re.fullmatch(r'\w+', column) and column not in columns:
+                    columns.append(column + (' DESC' if key.endswith('DESC') else ''))
+            scans.append({'table': node.get('Relation Name'), 'columns': columns})
+        
+        for child in node.get('Plans', []):
+            scans.extend(self.find_seq_scans(child, sort_key))
+        return scans
+    
+    def apply_missing(self):
+        """สร้าง indexes ที่ขาดหาย (CONCURRENTLY สำหรับตารางปกติ)"""
+        print("🔧 สร้าง indexes ที่ขาดหาย...")
+        
+        for index in self.results['missing']:
+            sql = index['sql']
+            if not index['partitioned']:
+                # Partitioned parents do not support CONCURRENTLY
+                sql = re.sub(r'^CREATE (UNIQUE )?INDEX', r'CREATE \1INDEX CONCURRENTLY', sql)
+            try:
+                if 'gin_trgm_ops' in sql:
+                    self.cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                if index['invalid']:
+                    self.cursor.execute(f"DROP INDEX {'' if index['partitioned'] else 'CONCURRENTLY '}IF EXISTS {index['index']}")
+                self.cursor.execute(sql)
+                print(f"   ✅ {index['index']}")
+            except psycopg2.Error as e:
+                print(f"   ❌ {index['index']}: {e}")
+    
+    def print_report(self):
+        """แสดงผลการวิเคราะห์"""
+        print("\n" + "="*60)
+        print("📋 INDEX ADVISOR REPORT")
+        print("="*60)
+        
+        sections = [
+            ('missing', '➕ Indexes ที่ขาดหาย'),
+            ('unused', '🗑️  Indexes ที่ไม่ได้ใช้งาน'),
+            ('redundant', '♻️  Indexes ที่ซ้ำซ้อน')
+        ]
+        for key, title in sections:
+            print(f"\n{title}:")
+            if not self.results[key]:
+                print("   -")
+            for item in self.results[key]:
+                print(f"   {item['sql']}")
+        
+        print("\n🐢 ตารางที่ถูก sequential scan:")
+        for table in self.results['seq_scan_tables']:
+            print(f"   {table['table']}: seq_scan={table['seq_scan']:,} idx_scan={table['idx_scan']:,} rows={table['n_live_tup']:,}")
+        
+        print("\n⏱️  Queries ที่ใช้เวลามากที่สุด:")
+        for statement in self.results['statements']:
+            print(f"   {statement['total_ms']:,.0f} ms ({statement['calls']:,} calls): {statement['query'][:100]}")
+            for suggestion in statement['suggestions']:
+                print(f"      💡 {suggestion}")
+    
+    def save_results(self, filename="index_advisor_report.json"):
+        """บันทึกผลการวิเคราะห์"""
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=2, ensure_ascii=False, default=str)
+            print(f"\n💾 บันทึกผลการวิเคราะห์เป็นไฟล์: {filename}")
+        except Exception as e:
+            print(f"\n❌ ไม่สามารถบันทึกไฟล์ได้: {e}")
+    
+    def run(self, apply=False):
+        """รันการวิเคราะห์ทั้งหมด"""
+        print("🚀 เริ่มต้น Index Advisor สำหรับ LPR Server v3")
+        print("="*60)
+        
+        try:
+            self.connect()
+            self.find_missing()
+            self.find_unused()
+            self.find_redundant()
+            self.find_seq_scan_tables()
+            self.analyze_statements()
+            if apply:
+                self.apply_missing()
+            self.print_report()
+            self.save_results()
+        except Exception as e:
+            print(f"\n❌ เกิดข้อผิดพลาดในการวิเคราะห์: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if self.connection:
+                self.connection.close()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Suggest missing and unused indexes for the LPR database')
+    parser.add_argument('--top', type=int, default=20, help='Number of pg_stat_statements entries to analyze')
+    parser.add_argument('--min-rows', type=int, default=10000, help='Ignore sequential scans on smaller tables')
+    parser.add_argument('--min-index-mb', type=int, default=1, help='Ignore unused indexes smaller than this')
+    parser.add_argument('--apply', action='store_true', help='Create missing declared indexes')
+    args = parser.parse_args()
+    
+    advisor = IndexAdvisor(args.top, args.min_rows, args.min_index_mb)
+    advisor.run(apply=args.apply)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Metadata Filter Benchmark for LPR Server v3
+ทดสอบความเร็วการกรอง meta.* (metadata @> '{...}') บน lpr_records ด้วยและไม่ใช้ GIN jsonb_path_ops index
+
+ข้อมูลทดสอบอยู่ในตาราง UNLOGGED ชั่วคราว (LIKE lpr_records INCLUDING ALL) จึงไม่แตะ
+lpr_records และ idx_lpr_records_metadata ของระบบจริง
+"""
+
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+import psycopg2
+
+BENCH_CAMERA_ID = 'bench-metadata-cam'
+BENCH_TABLE = 'lpr_records_metadata_bench'
+METADATA_INDEX = 'idx_lpr_records_metadata_bench'
+
+# Containment documents as compiled from the meta.* query parameters
+METADATA_FILTERS = {
+    'meta.weather=foggy': {'weather': 'foggy'},
+    'meta.lighting=night&meta.weather=rainy': {'lighting': 'night', 'weather': 'rainy'},
+    'meta.model_version=2.1.0&meta.lighting=dusk&meta.weather=foggy': {
+        'model_version': '2.1.0', 'lighting': 'dusk', 'weather': 'foggy'
+    },
+    'meta.temperature=41': {'temperature': 41}
+}
+
+class MetadataBenchmark:
+    def __init__(self, rows, chunk_size=1000000, keep_data=False):
+        self.db_config = {
+            'host': os.environ.get('DB_HOST', 'localhost'),
+            'port': os.environ.get('DB_PORT', '5432'),
+            'user': os.environ.get('DB_USER', 'lpruser'),
+            'password': os.environ.get('DB_PASSWORD', ''),
+            'database': os.environ.get('DB_NAME', 'lprserver_v3')
+        }
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.keep_data = keep_data
+        self.connection = None
+        self.cursor = None
+        self.results = {
+            'timestamp': datetime.now().isoformat(),
+            'rows': rows,
+            'benchmarks': {}
+        }
+    
+    def connect(self):
+        """เชื่อมต่อฐานข้อมูลและสร้างตารางทดสอบ"""
+        self.connection = psycopg2.connect(**self.db_config)
+        self.connection.autocommit = True
+        self.cursor = self.connection.cursor()
+        
+        # Same columns and indexes as lpr_records, without its WAL, foreign keys or id sequence
+        self.cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        self.cursor.execute(f"CREATE UNLOGGED TABLE {BENCH_TABLE} (LIKE lpr_records INCLUDING ALL)")
+        self.cursor.execute(f"ALTER TABLE {BENCH_TABLE} ALTER COLUMN id DROP DEFAULT")
+        self.cursor.execute(f"ALTER TABLE {BENCH_TABLE} ADD COLUMN IF NOT EXISTS metadata JSONB")
+    
+    def seed_records(self):
+        """เพิ่มข้อมูลทดสอบพร้อม metadata ในตารางทดสอบ"""
+        print(f"🔧 เพิ่มข้อมูลทดสอบ {self.rows:,} แถว ใน {BENCH_TABLE}...")
+        
+        start_time = time.time()
+        for offset in range(0, self.rows, self.chunk_size):
+            count = min(self.chunk_size, self.rows - offset)
+            # Skewed like real edge data: mostly clear days, few foggy nights, one model rolling out
+            self.cursor.execute(f"""
+                INSERT INTO {BENCH_TABLE} (id, camera_id, plate_number, confidence, timestamp, created_at,
+                                           is_blacklisted, metadata)
+                SELECT s.g + 1,
+                       %s,
+                       chr(3585 + (random() * 45)::int) || chr(3585 + (random() * 45)::int)
+                           || lpad((random() * 9999)::int::text, 4, '0'),
+                       0.5 + random() / 2,
+                       NOW() - (s.g || ' seconds')::interval,
+                       NOW(),
+                       false,
+                       jsonb_build_object(
+                           'lighting', CASE WHEN s.r1 < 0.55 THEN 'day' WHEN s.r1 < 0.65 THEN 'dusk' ELSE 'night' END,
+                           'weather', CASE WHEN s.r2 < 0.6 THEN 'clear' WHEN s.r2 < 0.85 THEN 'cloudy'
+                                           WHEN s.r2 < 0.98 THEN 'rainy' ELSE 'foggy' END,
+                           'temperature', 18 + (s.r3 * 24)::int,
+                           'model_version', CASE WHEN s.r4 < 0.9 THEN '2.0.3' ELSE '2.1.0' END
+                       )
+                FROM (
+                    SELECT g, random() AS r1, random() AS r2, random() AS r3, random() AS r4
+                    FROM generate_series(%s, %s) AS g
+                ) AS s
+            """, (BENCH_CAMERA_ID, offset, offset + count - 1))
+            print(f"   ✅ {offset + count:,} / {self.rows:,}")
+        
+        self.cursor.execute(f"ANALYZE {BENCH_TABLE}")
+        self.results['benchmarks']['seed_seconds'] = round(time.time() - start_time, 2)
+    
+    def explain(self, document, listing):
+        """รัน EXPLAIN ANALYZE สำหรับการกรอง metadata (หน้ารายการ หรือ นับจำนวน)"""
+        if listing:
+            query = f"""
+                SELECT id, plate_number, timestamp FROM {BENCH_TABLE}
+                WHERE metadata @> %s::jsonb
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 50
+            """
+        else:
+            query = f"SELECT count(*) FROM {BENCH_TABLE} WHERE metadata @> %s::jsonb"
+        self.cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, (json.dumps(document),))
+        plan = self.cursor.fetchone()[0][0]
+        
+        node_types = []
+        def walk(node):
+            node_types.append(node['Node Type'])
+            for child in node.get('Plans', []):
+                walk(child)
+        walk(plan['Plan'])
+        
+        return {
+            'execution_ms': round(plan['Execution Time'], 2),
+            'planning_ms': round(plan['Planning Time'], 2),
+            'nodes': node_types,
+            'uses_index': 'Bitmap Index Scan' in node_types
+        }
+    
+    def explain_all(self):
+        """รัน EXPLAIN ทุกตัวกรอง"""
+        return {
+            name: {'listing': self.explain(document, True), 'count': self.explain(document, False)}
+            for name, document in METADATA_FILTERS.items()
+        }
+    
+    def benchmark_filters(self):
+        """เปรียบเทียบการกรองแบบ sequential scan กับ GIN jsonb_path_ops index"""
+        print("🔍 ทดสอบการกรอง metadata แบบไม่มี GIN index...")
+        # Drop the copy of idx_lpr_records_metadata that LIKE ... INCLUDING ALL brought along
+        self.cursor.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s AND indexdef LIKE '%%(metadata%%'
+        """, (BENCH_TABLE,))
+        for (index_name,) in self.cursor.fetchall():
+            self.cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+        without_index = self.explain_all()
+        
+        print("🔍 ทดสอบการกรอง metadata แบบมี GIN index...")
+        start_time = time.time()
+        self.cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {METADATA_INDEX} ON {BENCH_TABLE} USING gin (metadata jsonb_path_ops)"
+        )
+        self.cursor.execute(f"ANALYZE {BENCH_TABLE}")
+        index_build_seconds = round(time.time() - start_time, 2)
+        with_index = self.explain_all()
+        
+        self.cursor.execute("SELECT pg_relation_size(%s)", (METADATA_INDEX,))
+        index_bytes = self.cursor.fetchone()[0]
+        
+        self.results['benchmarks']['metadata_filters'] = {
+            'index_build_seconds': index_build_seconds,
+            'index_size_mb': round(index_bytes / 1024 / 1024, 1),
+            'without_index': without_index,
+            'with_index': with_index
+        }
+        
+        print(f"   index: {index_build_seconds:,.2f} s, {index_bytes / 1024 / 1024:,.1f} MB")
+        for name in METADATA_FILTERS:
+            for kind in ('listing', 'count'):
+                before = without_index[name][kind]['execution_ms']
+                after = with_index[name][kind]['execution_ms']
+                speedup = before / after if after else 0
+                print(f"   {name} [{kind}]: {before:,.2f} ms -> {after:,.2f} ms ({speedup:.1f}x) "
+                      f"{with_index[name][kind]['nodes']}")
+    
+    def cleanup(self):
+        """ลบตารางทดสอบ"""
+        if self.keep_data:
+            return
+        print(f"🧹 ลบตารางทดสอบ {BENCH_TABLE}...")
+        self.cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    
+    def save_results(self, filename="metadata_benchmark_report.json"):
+        """บันทึกผลการทดสอบ"""
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            print(f"\n💾 บันทึกผลการทดสอบเป็นไฟล์: {filename}")
+        except Exception as e:
+            print(f"\n❌ ไม่สามารถบันทึกไฟล์ได้: {e}")
+    
+    def run(self):
+        """รันการทดสอบทั้งหมด"""
+        print("🚀 เริ่มต้น Metadata Filter Benchmark สำหรับ LPR Server v3")
+        print("="*60)
+        
+        try:
+            self.connect()
+            self.seed_records()
+            self.benchmark_filters()
+            self.save_results()
+        except Exception as e:
+            print(f"\n❌ เกิดข้อผิดพลาดในการทดสอบ: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if self.cursor:
+                self.cleanup()
+                self.connection.close()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark meta.* filters on lpr_records')
+    parser.add_argument('--rows', type=int, default=10000000, help='Number of records to seed')
+    parser.add_argument('--chunk-size', type=int, default=1000000, help='Rows inserted per statement')
+    parser.add_argument('--keep-data', action='store_true', help=f'Keep the {BENCH_TABLE} table after the run')
+    args = parser.parse_args()
+    
+    benchmark = MetadataBenchmark(args.rows, args.chunk_size, args.keep_data)
+    benchmark.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Plate Search Benchmark for LPR Server v3
+ทดสอบความเร็วการค้นหาป้ายทะเบียนบน lpr_records ด้วยและไม่ใช้ pg_trgm GIN index
+"""
+
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+import psycopg2
+
+BENCH_CAMERA_ID = 'bench-search-cam'
+TRGM_INDEX = 'idx_lpr_records_plate_number_trgm'
+SEARCH_TERMS = ['1234', 'กข12', '9']
+
+class SearchBenchmark:
+    def __init__(self, rows, chunk_size=1000000, keep_data=False):
+        self.db_config = {
+            'host': os.environ.get('DB_HOST', 'localhost'),
+            'port': os.environ.get('DB_PORT', '5432'),
+            'user': os.environ.get('DB_USER', 'lpruser'),
+            'password': os.environ.get('DB_PASSWORD', ''),
+            'database': os.environ.get('DB_NAME', 'lprserver_v3')
+        }
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.keep_data = keep_data
+        self.connection = None
+        self.cursor = None
+        self.results = {
+            'timestamp': datetime.now().isoformat(),
+            'rows': rows,
+            'benchmarks': {}
+        }
+    
+    def connect(self):
+        """เชื่อมต่อฐานข้อมูล"""
+        self.connection = psycopg2.connect(**self.db_config)
+        self.connection.autocommit = True
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    def seed_records(self):
+        """เพิ่มข้อมูลทดสอบใน lpr_records"""
+        print(f"🔧 เพิ่มข้อมูลทดสอบ {self.rows:,} แถว...")
+        
+        self.cursor.execute("""
+            INSERT INTO cameras (camera_id, name, status, created_at, updated_at)
+            VALUES (%s, 'Search benchmark camera', 'inactive', NOW(), NOW())
+            ON CONFLICT (camera_id) DO NOTHING
+        """, (BENCH_CAMERA_ID,))
+        
+        start_time = time.time()
+        for offset in range(0, self.rows, self.chunk_size):
+            count = min(self.chunk_size, self.rows - offset)
+            # Thai-style plates: two consonants + four digits, e.g. 'กข1234'
+            self.cursor.execute("""
+                INSERT INTO lpr_records (camera_id, plate_number, confidence, timestamp, created_at, is_blacklisted)
+                SELECT %s,
+                       chr(3585 + (random() * 45)::int) || chr(3585 + (random() * 45)::int)
+                           || lpad((random() * 9999)::int::text, 4, '0'),
+                       0.5 + random() / 2,
+                       NOW() - (g || ' seconds')::interval,
+                       NOW(),
+                       false
+                FROM generate_series(%s, %s) AS g
+            """, (BENCH_CAMERA_ID, offset, offset + count - 1))
+            print(f"   ✅ {offset + count:,} / {self.rows:,}")
+        
+        self.cursor.execute("ANALYZE lpr_records")
+        self.results['benchmarks']['seed_seconds'] = round(time.time() - start_time, 2)
+    
+    def explain(self, term):
+        """รัน EXPLAIN ANALYZE สำหรับการค้นหาป้ายทะเบียน"""
+        self.cursor.execute("""
+            EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+            SELECT id, plate_number, timestamp FROM lpr_records
+            WHERE plate_number ILIKE %s
+            ORDER BY similarity(plate_number, %s) DESC, timestamp DESC
+            LIMIT 50
+        """, (f'%{term}%', term))
+        plan = self.cursor.fetchone()[0][0]
+        
+        node_types = []
+        def walk(node):
+            node_types.append(node['Node Type'])
+            for child in node.get('Plans', []):
+                walk(child)
+        walk(plan['Plan'])
+        
+        return {
+            'execution_ms': round(plan['Execution Time'], 2),
+            'planning_ms': round(plan['Planning Time'], 2),
+            'nodes': node_types
+        }
+    
+    def benchmark_search(self):
+        """เปรียบเทียบการค้นหาแบบ sequential scan กับ trigram index"""
+        print("🔍 ทดสอบการค้นหาแบบไม่มี trigram index...")
+        self.cursor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+        without_index = {term: self.explain(term) for term in SEARCH_TERMS}
+        
+        print("🔍 ทดสอบการค้นหาแบบมี trigram index...")
+        start_time = time.time()
+        self.cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON lpr_records USING gin (plate_number gin_trgm_ops)"
+        )
+        index_build_seconds = round(time.time() - start_time, 2)
+        with_index = {term: self.explain(term) for term in SEARCH_TERMS}
+        
+        self.results['benchmarks']['search'] = {
+            'index_build_seconds': index_build_seconds,
+            'without_index': without_index,
+            'with_index': with_index
+        }
+        
+        for term in SEARCH_TERMS:
+            before = without_index[term]['execution_ms']
+            after = with_index[term]['execution_ms']
+            speedup = before / after if after else 0
+            print(f"   '{term}': {before:,.2f} ms -> {after:,.2f} ms ({speedup:.1f}x) {with_index[term]['nodes']}")
+    
+    def cleanup(self):
+        """ลบข้อมูลทดสอบ"""
+        if self.keep_data:
+            return
+        print("🧹 ลบข้อมูลทดสอบ...")
+        self.cursor.execute("DELETE FROM lpr_records WHERE camera_id = %s", (BENCH_CAMERA_ID,))
+        self.cursor.execute("DELETE FROM cameras WHERE camera_id = %s", (BENCH_CAMERA_ID,))
+    
+    def save_results(self, filename="search_benchmark_report.json"):
+        """บันทึกผลการทดสอบ"""
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            print(f"\n💾 บันทึกผลการทดสอบเป็นไฟล์: {filename}")
+        except Exception as e:
+            print(f"\n❌ ไม่สามารถบันทึกไฟล์ได้: {e}")
+    
+    def run(self):
+        """รันการทดสอบทั้งหมด"""
+        print("🚀 เริ่มต้น Plate Search Benchmark สำหรับ LPR Server v3")
+        print("="*60)
+        
+        try:
+            self.connect()
+            self.seed_records()
+            self.benchmark_search()
+            self.save_results()
+        except Exception as e:
+            print(f"\n❌ เกิดข้อผิดพลาดในการทดสอบ: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if self.cursor:
+                self.cleanup()
+                self.connection.close()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark plate search on lpr_records')
+    parser.add_argument('--rows', type=int, default=10000000, help='Number of records to seed')
+    parser.add_argument('--chunk-size', type=int, default=1000000, help='Rows inserted per statement')
+    parser.add_argument('--keep-data', action='store_true', help='Keep seeded records after the run')
+    args = parser.parse_args()
+    
+    benchmark = SearchBenchmark(args.rows, args.chunk_size, args.keep_data)
+    benchmark.run()
+
+if __name__ == "__main__":
+    main()
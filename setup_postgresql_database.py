@@ -10,7 +10,7 @@ import subprocess
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 class PostgreSQLSetup:
@@ -129,7 +129,8 @@ class PostgreSQLSetup:
             self._create_analytics_table()
             self._create_system_logs_table()
             
-            # Create indexes
+            # Create partitions and indexes
+            self._create_partitions()
             self._create_indexes()
             
             # Commit changes
@@ -189,8 +190,8 @@ class PostgreSQLSetup:
         """สร้างตาราง detections"""
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS detections (
-                id SERIAL PRIMARY KEY,
-                detection_id UUID UNIQUE DEFAULT gen_random_uuid(),
+                id SERIAL,
+                detection_id UUID DEFAULT gen_random_uuid(),
                 camera_id VARCHAR(50) REFERENCES cameras(camera_id),
                 checkpoint_id VARCHAR(50) REFERENCES checkpoints(checkpoint_id),
                 timestamp TIMESTAMP NOT NULL,
@@ -202,8 +203,10 @@ class PostgreSQLSetup:
                 confidence_score DECIMAL(5,4),
                 detection_type VARCHAR(50) DEFAULT 'lpr',
                 metadata JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp),
+                UNIQUE (detection_id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
         """)
         print("   ✅ ตาราง detections")
     
@@ -211,8 +214,8 @@ class PostgreSQLSetup:
         """สร้างตาราง vehicles"""
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS vehicles (
-                id SERIAL PRIMARY KEY,
-                detection_id UUID REFERENCES detections(detection_id) ON DELETE CASCADE,
+                id SERIAL,
+                detection_id UUID,
                 vehicle_index INTEGER,
                 bbox_x1 INTEGER,
                 bbox_y1 INTEGER,
@@ -226,8 +229,9 @@ class PostgreSQLSetup:
                 model VARCHAR(100),
                 year INTEGER,
                 metadata JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
         """)
         print("   ✅ ตาราง vehicles")
     
@@ -235,9 +239,9 @@ class PostgreSQLSetup:
         """สร้างตาราง plates"""
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS plates (
-                id SERIAL PRIMARY KEY,
-                detection_id UUID REFERENCES detections(detection_id) ON DELETE CASCADE,
-                vehicle_id INTEGER REFERENCES vehicles(id) ON DELETE CASCADE,
+                id SERIAL,
+                detection_id UUID,
+                vehicle_id INTEGER,
                 plate_index INTEGER,
                 plate_number VARCHAR(20) NOT NULL,
                 bbox_x1 INTEGER,
@@ -254,8 +258,9 @@ class PostgreSQLSetup:
                 ocr_processed_result VARCHAR(20),
                 is_valid BOOLEAN DEFAULT true,
                 metadata JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
         """)
         print("   ✅ ตาราง plates")
     
@@ -263,8 +268,8 @@ class PostgreSQLSetup:
         """สร้างตาราง health_logs"""
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS health_logs (
-                id SERIAL PRIMARY KEY,
-                health_id UUID UNIQUE DEFAULT gen_random_uuid(),
+                id SERIAL,
+                health_id UUID DEFAULT gen_random_uuid(),
                 camera_id VARCHAR(50) REFERENCES cameras(camera_id),
                 checkpoint_id VARCHAR(50) REFERENCES checkpoints(checkpoint_id),
                 timestamp TIMESTAMP NOT NULL,
@@ -277,8 +282,10 @@ class PostgreSQLSetup:
                 network_status VARCHAR(20),
                 temperature DECIMAL(5,2),
                 details JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp),
+                UNIQUE (health_id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
         """)
         print("   ✅ ตาราง health_logs")
     
@@ -344,22 +351,42 @@ class PostgreSQLSetup:
         """)
         print("   ✅ ตาราง system_logs")
     
+    def _create_partitions(self, months_ahead=3):
+        """สร้าง partitions รายเดือนสำหรับตารางที่แบ่ง partition"""
+        print("🔧 สร้าง partitions...")
+        
+        month_start = datetime.now().date().replace(day=1)
+        for _ in range(months_ahead + 1):
+            next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            for table in ['detections', 'vehicles', 'plates', 'health_logs']:
+                self.cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table}_p{month_start:%Y%m%d} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month_start}') TO ('{next_month}')"
+                )
+            month_start = next_month
+        
+        print(f"   ✅ สร้าง partitions {months_ahead + 1} เดือน")
+    
     def _create_indexes(self):
         """สร้าง indexes สำหรับ performance"""
         print("🔧 สร้าง indexes...")
         
         indexes = [
+            # Trigram extension for substring/fuzzy plate search
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            
             # Detections indexes
             "CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_detections_camera_id ON detections(camera_id)",
-            "CREATE INDEX IF NOT EXISTS idx_detections_checkpoint_id ON detections(checkpoint_id)",
+            "CREATE INDEX IF NOT EXISTS idx_detections_camera_timestamp ON detections(camera_id, timestamp DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_detections_checkpoint_timestamp ON detections(checkpoint_id, timestamp DESC)",
             "CREATE INDEX IF NOT EXISTS idx_detections_detection_type ON detections(detection_type)",
             
             # Plates indexes
-            "CREATE INDEX IF NOT EXISTS idx_plates_plate_number ON plates(plate_number)",
+            "CREATE INDEX IF NOT EXISTS idx_plates_plate_number_created_at ON plates(plate_number, created_at DESC)",
             "CREATE INDEX IF NOT EXISTS idx_plates_detection_id ON plates(detection_id)",
             "CREATE INDEX IF NOT EXISTS idx_plates_confidence ON plates(confidence)",
             "CREATE INDEX IF NOT EXISTS idx_plates_timestamp ON plates(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_plates_plate_number_trgm ON plates USING gin (plate_number gin_trgm_ops)",
             
             # Vehicles indexes
             "CREATE INDEX IF NOT EXISTS idx_vehicles_detection_id ON vehicles(detection_id)",
@@ -368,18 +395,24 @@ class PostgreSQLSetup:
             
             # Health logs indexes
             "CREATE INDEX IF NOT EXISTS idx_health_logs_timestamp ON health_logs(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_health_logs_camera_id ON health_logs(camera_id)",
+            "CREATE INDEX IF NOT EXISTS idx_health_logs_camera_timestamp ON health_logs(camera_id, timestamp DESC)",
             "CREATE INDEX IF NOT EXISTS idx_health_logs_status ON health_logs(status)",
             
             # Analytics indexes
             "CREATE INDEX IF NOT EXISTS idx_analytics_date ON analytics(date)",
             "CREATE INDEX IF NOT EXISTS idx_analytics_checkpoint_id ON analytics(checkpoint_id)",
             "CREATE INDEX IF NOT EXISTS idx_analytics_camera_id ON analytics(camera_id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_rollup_key ON analytics(date, (COALESCE(checkpoint_id, '')), (COALESCE(camera_id, '')))",
             
             # System logs indexes
             "CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_system_logs_level ON system_logs(level)",
-            "CREATE INDEX IF NOT EXISTS idx_system_logs_component ON system_logs(component)"
+            "CREATE INDEX IF NOT EXISTS idx_system_logs_component ON system_logs(component)",
+            
+            # Blacklist indexes
+            "CREATE INDEX IF NOT EXISTS idx_blacklist_active_plate ON blacklist(plate_number) INCLUDE (alert_level, reason) WHERE is_active = true",
+            "CREATE INDEX IF NOT EXISTS idx_blacklist_plate_number_trgm ON blacklist USING gin (plate_number gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS idx_blacklist_reason_trgm ON blacklist USING gin (reason gin_trgm_ops)"
         ]
         
         for index_sql in indexes:
@@ -439,23 +472,20 @@ class PostgreSQLSetup:
             self.cursor.execute("""
                 CREATE OR REPLACE VIEW daily_statistics AS
                 SELECT 
-                    DATE(d.timestamp) as date,
-                    c.checkpoint_id,
+                    a.date,
+                    a.checkpoint_id,
                     c.name as checkpoint_name,
-                    cam.camera_id,
+                    a.camera_id,
                     cam.name as camera_name,
-                    COUNT(d.id) as total_detections,
-                    SUM(d.vehicles_count) as total_vehicles,
-                    SUM(d.plates_count) as total_plates,
-                    COUNT(DISTINCT p.plate_number) as unique_plates,
-                    AVG(d.processing_time_ms) as avg_processing_time,
-                    COUNT(CASE WHEN b.plate_number IS NOT NULL THEN 1 END) as blacklist_hits
-                FROM detections d
-                LEFT JOIN checkpoints c ON d.checkpoint_id = c.checkpoint_id
-                LEFT JOIN cameras cam ON d.camera_id = cam.camera_id
-                LEFT JOIN plates p ON d.detection_id = p.detection_id
-                LEFT JOIN blacklist b ON p.plate_number = b.plate_number AND b.is_active = true
-                GROUP BY DATE(d.timestamp), c.checkpoint_id, c.name, cam.camera_id, cam.name
+                    a.total_detections::bigint as total_detections,
+                    a.total_vehicles::bigint as total_vehicles,
+                    a.total_plates::bigint as total_plates,
+                    a.unique_plates::bigint as unique_plates,
+                    a.avg_processing_time_ms::numeric as avg_processing_time,
+                    a.blacklist_hits::bigint as blacklist_hits
+                FROM analytics a
+                LEFT JOIN checkpoints c ON a.checkpoint_id = c.checkpoint_id
+                LEFT JOIN cameras cam ON a.camera_id = cam.camera_id
                 ORDER BY date DESC, checkpoint_id, camera_id
             """)
             
@@ -16,6 +16,8 @@ from core.import_helper import setup_absolute_imports
 setup_absolute_imports()
 
 from config import get_config
+from core.db_pool import build_engine_options, build_bind_options
+from services.image_store import image_url
 
 # Initialize extensions - use the same db instance as models
 from core.models import db
@@ -77,6 +79,17 @@ def create_app(config_class=None):
     # Setup logging
     setup_logging(app)
     
+    # Pool sizing, pre-ping, recycle and statement timeout for every engine
+    if app.config.get('SQLALCHEMY_DATABASE_URI'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **build_engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']),
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+    app.config['SQLALCHEMY_BINDS'] = build_bind_options(app.config)
+    
+    # Image URLs in templates
+    app.add_template_global(image_url)
+    
     # Initialize extensions with app
     db.init_app(app)
     socketio.init_app(app, cors_allowed_origins="*")
@@ -92,6 +105,7 @@ def create_app(config_class=None):
         from web.blueprints.system import system_bp
         from web.blueprints.user import user_bp
         from web.blueprints.report import report_bp
+        from web.blueprints.images import images_bp
         
         app.register_blueprint(main_bp)
         app.register_blueprint(api_bp, url_prefix='/api')
@@ -102,6 +116,7 @@ def create_app(config_class=None):
         app.register_blueprint(system_bp)
         app.register_blueprint(user_bp)
         app.register_blueprint(report_bp)
+        app.register_blueprint(images_bp)
         
         app.logger.info("All blueprints registered successfully")
     except ImportError as e:
@@ -147,14 +162,48 @@ def _initialize_services(app):
         # Get services from container
         websocket_service = container.get('websocket_service')
         blacklist_service = container.get('blacklist_service')
+        blacklist_bulk_service = container.get('blacklist_bulk_service')
+        blacklist_expiry_service = container.get('blacklist_expiry_service')
+        blacklist_alert_service = container.get('blacklist_alert_service')
+        search_service = container.get('search_service')
         health_service = container.get('health_service')
         database_service = container.get('database_service')
+        partition_service = container.get('partition_service')
+        retention_service = container.get('retention_service')
+        analytics_service = container.get('analytics_service')
+        backup_service = container.get('backup_service')
+        archive_service = container.get('archive_service')
+        image_store = container.get('image_store')
+        image_policy_service = container.get('image_policy_service')
+        thumbnail_service = container.get('thumbnail_service')
+        image_reconciler_service = container.get('image_reconciler_service')
+        storage_quota_service = container.get('storage_quota_service')
+        camera_state_service = container.get('camera_state_service')
+        camera_registry_service = container.get('camera_registry_service')
+        detection_repository = container.get('detection_repository')
         
         # Initialize services with app context
+        image_store.initialize(db.session)
+        thumbnail_service.initialize(db.session, app)
+        storage_quota_service.initialize(db.session, app)
+        partition_service.initialize(db.session)
+        camera_state_service.initialize(db.session, app)
+        camera_registry_service.initialize(db.session, app)
+        detection_repository.initialize(db.session, app)
         websocket_service.initialize(socketio, db.session)
         blacklist_service.initialize(db.session)
+        blacklist_bulk_service.initialize(db.session, socketio, app)
+        blacklist_expiry_service.initialize(db.session, socketio, app)
+        blacklist_alert_service.initialize(socketio, db.session)
+        search_service.initialize(db.session)
         health_service.initialize(db.session, socketio)
         database_service.initialize(db.session, app.config)
+        retention_service.initialize(db.session, app)
+        analytics_service.initialize(db.session, app)
+        backup_service.initialize(db.session, app)
+        archive_service.initialize(db.session, app)
+        image_policy_service.initialize(db.session, app)
+        image_reconciler_service.initialize(db.session, app)
         
         app.logger.info("All services initialized successfully")
         
@@ -31,21 +31,64 @@ WS_EVENT_ERROR = "error"
 WS_EVENT_LPR_RESPONSE = "lpr_response"
 WS_EVENT_NEW_LPR_RECORD = "new_lpr_record"
 WS_EVENT_BLACKLIST_ALERT = "blacklist_alert"
+WS_EVENT_BLACKLIST_ALERT_UPDATE = "blacklist_alert_update"
 WS_EVENT_JOIN_DASHBOARD = "join_dashboard"
+WS_EVENT_BLACKLIST_IMPORT_PROGRESS = "blacklist_import_progress"
+WS_EVENT_BLACKLIST_EXPIRED = "blacklist_expired"
 
 # API Response Constants
 API_SUCCESS = "success"
 API_ERROR = "error"
 API_MESSAGE = "message"
 
+# Blacklist Constants
+PLATE_NUMBER_MAX_LENGTH = 20
+BLACKLIST_IMPORT_FORMATS = ['.csv', '.xlsx']
+BLACKLIST_EXPORT_COLUMNS = [
+    'id', 'license_plate_text', 'reason', 'added_by', 'expiry_date',
+    'notes', 'is_active', 'created_at', 'updated_at'
+]
+
+# Job Status Constants
+JOB_STATUS_PENDING = "pending"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_COMPLETED = "completed"
+JOB_STATUS_FAILED = "failed"
+
+# Backup Constants
+BACKUP_TYPE_FULL = "full"
+BACKUP_TYPE_INCREMENTAL = "incremental"
+BACKUP_TYPES = [BACKUP_TYPE_FULL, BACKUP_TYPE_INCREMENTAL]
+
 # Database Constants
 DB_DEFAULT_PAGE_SIZE = 20
 DB_MAX_PAGE_SIZE = 100
 
+# Partitioning Constants
+PARTITION_INTERVAL_MONTH = "month"
+PARTITION_INTERVAL_WEEK = "week"
+PARTITION_INTERVALS = [PARTITION_INTERVAL_MONTH, PARTITION_INTERVAL_WEEK]
+
 # File Storage Constants
 IMAGE_FORMATS = ['.jpg', '.jpeg', '.png', '.bmp']
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Image Storage Policy Constants
+IMAGE_POLICY_MODE_ALL = "all"
+IMAGE_POLICY_MODE_SELECTIVE = "selective"
+IMAGE_POLICY_MODES = [IMAGE_POLICY_MODE_ALL, IMAGE_POLICY_MODE_SELECTIVE]
+IMAGE_POLICY_REASON_ALL = "all"
+IMAGE_POLICY_REASON_BLACKLIST = "blacklist_hit"
+IMAGE_POLICY_REASON_LOW_CONFIDENCE = "low_confidence"
+IMAGE_POLICY_REASON_SAMPLED = "sampled"
+IMAGE_POLICY_REASON_ROUTINE = "routine"
+IMAGE_DERIVATIVE_THUMBNAIL = "thumbnail"
+IMAGE_DERIVATIVE_PREVIEW = "preview"
+IMAGE_DERIVATIVES = [IMAGE_DERIVATIVE_THUMBNAIL, IMAGE_DERIVATIVE_PREVIEW]
+STORAGE_SCOPE_CAMERA = "camera"
+STORAGE_SCOPE_CHECKPOINT = "checkpoint"
+STORAGE_SCOPES = [STORAGE_SCOPE_CAMERA, STORAGE_SCOPE_CHECKPOINT]
+
 # Time Constants
 DEFAULT_TIMEOUT_MINUTES = 5
 DEFAULT_REFRESH_INTERVAL_SECONDS = 30
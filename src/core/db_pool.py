@@ -0,0 +1,190 @@
+"""
+Database Connection Pool
+
+Engine options for the primary, replica and DatabaseService engines are
+built here from Config so every engine gets the same pool sizing,
+pre-ping, recycle and statement timeout. Queue pools are created as
+TimedQueuePool, which records checkout wait time, timeouts and overflow
+events for the pool metrics endpoint.
+
+Pools are per process: with gunicorn the server sees up to
+workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections per engine, plus
+one raw connection per DataProcessor.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+logger = logging.getLogger(__name__)
+
+class PoolStats:
+    """Checkout counters of one pool, kept over a sliding window of waits."""
+    
+    def __init__(self, window: int = 1000):
+        """
+        Initialize pool statistics.
+        
+        Args:
+            window: Number of recent checkout waits used for percentiles
+        """
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.wait_max = 0.0
+    
+    def record_checkout(self, wait: float, overflowed: bool):
+        """Record a successful checkout and whether it opened an overflow connection."""
+        with self._lock:
+            self.checkouts += 1
+            self._waits.append(wait)
+            self.wait_max = max(self.wait_max, wait)
+            if overflowed:
+                self.overflow_events += 1
+    
+    def record_timeout(self, wait: float):
+        """Record a checkout that gave up after pool_timeout."""
+        with self._lock:
+            self.timeouts += 1
+            self.wait_max = max(self.wait_max, wait)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the counters with wait times in milliseconds."""
+        with self._lock:
+            waits = sorted(self._waits)
+            count = len(waits)
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'overflow_events': self.overflow_events,
+                'checkout_wait_ms': {
+                    'avg': round(sum(waits) / count * 1000, 3) if count else 0.0,
+                    'p95': round(waits[min(count - 1, int(count * 0.95))] * 1000, 3) if count else 0.0,
+                    'max': round(self.wait_max * 1000, 3),
+                    'window': count
+                }
+            }
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that measures how long each checkout waits for a connection."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+    
+    def _do_get(self):
+        started = time.monotonic()
+        overflow_before = self.overflow()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.monotonic() - started)
+            logger.warning(f"Connection pool exhausted: {self.status()}")
+            raise
+        overflow_after = self.overflow()
+        self.stats.record_checkout(time.monotonic() - started, overflow_after > overflow_before and overflow_after > 0)
+        return connection
+
+def build_engine_options(config, url) -> Dict[str, Any]:
+    """
+    Build create_engine() options for a database URL.
+    
+    SQLite only gets pre-ping, recycle and the statement cache size; pool
+    sizing applies to server databases.
+    
+    Args:
+        config: Flask config (or any mapping with the DB_* keys)
+        url: Database URL
+    
+    Returns:
+        Keyword arguments for create_engine / SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(url)
+    options = {
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE_SECONDS', 1800),
+        'query_cache_size': config.get('DB_QUERY_CACHE_SIZE', 500)
+    }
+    if url.get_backend_name() == 'sqlite':
+        return options
+    
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT_SECONDS', 30)
+    })
+    
+    if url.get_backend_name() == 'postgresql':
+        connect_args = {}
+        statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+        if statement_timeout:
+            connect_args['options'] = f'-c statement_timeout={int(statement_timeout)}'
+        if url.get_driver_name() == 'psycopg':
+            # psycopg 3 prepares a statement server-side after it has run this many times
+            connect_args['prepare_threshold'] = config.get('DB_PREPARE_THRESHOLD', 5) or None
+        options['connect_args'] = connect_args
+    
+    return options
+
+def build_bind_options(config) -> Dict[str, Any]:
+    """
+    Expand SQLALCHEMY_BINDS URLs into per-bind engine options.
+    
+    Flask-SQLAlchemy does not apply SQLALCHEMY_ENGINE_OPTIONS to binds, so
+    each bind gets its own copy.
+    
+    Args:
+        config: Flask config
+    
+    Returns:
+        SQLALCHEMY_BINDS with dict values
+    """
+    binds = {}
+    for key, value in config.get('SQLALCHEMY_BINDS', {}).items():
+        if isinstance(value, dict):
+            binds[key] = value
+        else:
+            binds[key] = {'url': value, **build_engine_options(config, value)}
+    return binds
+
+def get_pool_metrics(engine, name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the current state and checkout statistics of an engine's pool.
+    
+    Args:
+        engine: SQLAlchemy engine
+        name: Label for the engine
+    
+    Returns:
+        Dictionary with pool occupancy and, for TimedQueuePool, checkout stats
+    """
+    pool = engine.pool
+    metrics = {
+        'name': name,
+        'url': engine.url.render_as_string(hide_password=True),
+        'pool_class': type(pool).__name__
+    }
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'pool_size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'in_use': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'timeout_seconds': pool.timeout()
+        })
+    if isinstance(pool, TimedQueuePool):
+        metrics.update(pool.stats.snapshot())
+    return metrics
@@ -0,0 +1,109 @@
+"""
+Deferred Indexes
+
+Indexes on large, write-heavy tables (lpr_records above all) are not built
+at startup: a plain CREATE INDEX holds a SHARE lock that blocks inserts for
+the whole build, and every gunicorn worker would try it. They are listed
+here instead and built online with
+    
+    python index_advisor.py --apply
+
+which runs CREATE INDEX CONCURRENTLY in autocommit. At startup the
+services only check that their indexes exist and log a warning naming the
+missing ones; queries still work without them, just slower.
+"""
+
+import logging
+from typing import List, Dict
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+logger = logging.getLogger(__name__)
+
+ADVISOR_COMMAND = 'python index_advisor.py --apply'
+
+# Columns holding image store paths, with the byte-order index the reconciler's range scans use
+IMAGE_PATH_COLUMNS = [
+    ('stored_images', 'path'),
+    ('lpr_records', 'image_path'),
+    ('lpr_records', 'plate_image_path'),
+    ('detections', 'annotated_image_path'),
+    ('plates', 'cropped_image_path'),
+]
+
+def _path_index(table: str, column: str) -> Dict[str, str]:
+    name = f'idx_{table}_{column}_c'
+    return {
+        'group': 'image_paths',
+        'name': name,
+        'table': table,
+        'sql': f'CREATE INDEX IF NOT EXISTS {name} ON {table} (({column} COLLATE "C"))'
+    }
+
+DEFERRED_INDEXES: List[Dict[str, str]] = [
+    # Plate and blacklist text search (pg_trgm)
+    {'group': 'search', 'name': 'idx_lpr_records_plate_number_trgm', 'table': 'lpr_records',
+     'sql': 'CREATE INDEX IF NOT EXISTS idx_lpr_records_plate_number_trgm ON lpr_records '
+            'USING gin (plate_number gin_trgm_ops)'},
+    {'group': 'search', 'name': 'idx_blacklist_plates_plate_trgm', 'table': 'blacklist_plates',
+     'sql': 'CREATE INDEX IF NOT EXISTS idx_blacklist_plates_plate_trgm ON blacklist_plates '
+            'USING gin (license_plate_text gin_trgm_ops)'},
+    {'group': 'search', 'name': 'idx_blacklist_plates_reason_trgm', 'table': 'blacklist_plates',
+     'sql': 'CREATE INDEX IF NOT EXISTS idx_blacklist_plates_reason_trgm ON blacklist_plates '
+            'USING gin (reason gin_trgm_ops)'},
+    {'group': 'search', 'name': 'idx_blacklist_plates_notes_trgm', 'table': 'blacklist_plates',
+     'sql': 'CREATE INDEX IF NOT EXISTS idx_blacklist_plates_notes_trgm ON blacklist_plates '
+            'USING gin (notes gin_trgm_ops)'},
+    # meta.* filters: metadata @> '{...}'
+    {'group': 'metadata', 'name': 'idx_lpr_records_metadata', 'table': 'lpr_records',
+     'sql': 'CREATE INDEX IF NOT EXISTS idx_lpr_records_metadata ON lpr_records '
+            'USING gin (metadata jsonb_path_ops)'},
+] + [_path_index(table, column) for table, column in IMAGE_PATH_COLUMNS]
+
+# Only valid indexes count; a failed CONCURRENTLY build leaves an invalid one behind
+VALID_INDEXES_SQL = """
+    SELECT c.relname FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relnamespace = current_schema()::regnamespace AND i.indisvalid
+"""
+
+TABLES_SQL = """
+    SELECT relname FROM pg_class
+    WHERE relnamespace = current_schema()::regnamespace AND relkind IN ('r', 'p')
+"""
+
+def check_deferred_indexes(engine, group: str) -> List[str]:
+    """
+    Check the deferred indexes of a group and warn about missing ones.
+    
+    Indexes of tables that do not exist are not reported. Only PostgreSQL
+    is checked.
+    
+    Args:
+        engine: SQLAlchemy engine
+        group: Index group ('search', 'image_paths', 'metadata')
+    
+    Returns:
+        Names of the missing indexes
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    
+    from sqlalchemy import text
+    try:
+        with engine.connect() as conn:
+            existing = set(conn.execute(text(VALID_INDEXES_SQL)).scalars())
+            tables = set(conn.execute(text(TABLES_SQL)).scalars())
+    except Exception as e:
+        logger.error(f"Failed to check {group} indexes: {str(e)}")
+        return []
+    
+    missing = [
+        index['name'] for index in DEFERRED_INDEXES
+        if index['group'] == group and index['table'] in tables and index['name'] not in existing
+    ]
+    if missing:
+        logger.warning(f"Missing {group} indexes {', '.join(missing)}; build them online with: {ADVISOR_COMMAND}")
+    return missing
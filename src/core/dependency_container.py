@@ -91,8 +91,25 @@ def register_services():
     # Core services
     from services.websocket_service import WebSocketService
     from services.blacklist_service import BlacklistService
+    from services.blacklist_bulk_service import BlacklistBulkService
+    from services.blacklist_expiry_service import BlacklistExpiryService
+    from services.blacklist_alert_service import BlacklistAlertService
+    from services.search_service import SearchService
     from services.health_service import HealthService
     from services.database_service import DatabaseService
+    from services.partition_service import PartitionService
+    from services.retention_service import RetentionService
+    from services.analytics_service import AnalyticsService
+    from services.backup_service import BackupService
+    from services.archive_service import ArchiveService
+    from services.image_store import ImageStore
+    from services.image_policy_service import ImagePolicyService
+    from services.thumbnail_service import ThumbnailService
+    from services.image_reconciler_service import ImageReconcilerService
+    from services.storage_quota_service import StorageQuotaService
+    from services.camera_state_service import CameraStateService
+    from services.camera_registry_service import CameraRegistryService
+    from services.detection_repository import DetectionRepository
     
     # Unified communication system services
     from services.unified_communication_service import UnifiedCommunicationService
@@ -102,8 +119,25 @@ def register_services():
     # Register core services
     container.register('websocket_service', WebSocketService)
     container.register('blacklist_service', BlacklistService)
+    container.register('blacklist_bulk_service', BlacklistBulkService)
+    container.register('blacklist_expiry_service', BlacklistExpiryService)
+    container.register('blacklist_alert_service', BlacklistAlertService)
+    container.register('search_service', SearchService)
     container.register('health_service', HealthService)
     container.register('database_service', DatabaseService)
+    container.register('partition_service', PartitionService)
+    container.register('retention_service', RetentionService)
+    container.register('analytics_service', AnalyticsService)
+    container.register('backup_service', BackupService)
+    container.register('archive_service', ArchiveService)
+    container.register('image_store', ImageStore)
+    container.register('image_policy_service', ImagePolicyService)
+    container.register('thumbnail_service', ThumbnailService)
+    container.register('image_reconciler_service', ImageReconcilerService)
+    container.register('storage_quota_service', StorageQuotaService)
+    container.register('camera_state_service', CameraStateService)
+    container.register('camera_registry_service', CameraRegistryService)
+    container.register('detection_repository', DetectionRepository)
     
     # Register unified communication services
     container.register('unified_communication_service', UnifiedCommunicationService)
@@ -0,0 +1,156 @@
+"""
+Metadata Filter Helpers
+
+Edge payloads carry metadata (weather, lighting, temperature, model
+version) that is stored with each record in a JSONB metadata column.
+Listings accept filters on it as query parameters:
+    
+    ?meta.lighting=night&meta.weather=rainy&meta.model.version=2.1
+
+Each parameter names a dotted key path and a value. A number matches
+either the JSON number or the same text stored as a string (edges send
+model.version as "2.1" or 2.1); true, false and null match as such; a
+quoted JSON string ("2.1") matches only that string; anything else
+matches as a string. Repeating a parameter matches any of its values. On PostgreSQL
+the filters compile to JSONB containment (metadata @> '{...}'), which the
+GIN jsonb_path_ops index answers: single-valued keys are merged into one
+containment document, and each repeated key adds one OR of containments.
+Other databases (SQLite in development) compare json_extract() values
+without an index.
+"""
+
+import re
+import json
+import math
+import logging
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import and_, or_, cast, func
+from sqlalchemy.dialects.postgresql import JSONB
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+logger = logging.getLogger(__name__)
+
+META_PREFIX = 'meta.'
+MAX_METADATA_FILTERS = 10
+MAX_METADATA_VALUES = 20
+
+_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+class InvalidMetadataFilterError(ValueError):
+    """Raised when a meta.* filter parameter is malformed."""
+
+def parse_metadata_filters(args) -> Dict[Tuple[str, ...], List[Any]]:
+    """
+    Collect the meta.* filters of a request.
+    
+    Args:
+        args: Request arguments (MultiDict or plain dict)
+    
+    Returns:
+        Key path -> accepted values, e.g. {('lighting',): ['night']}
+    
+    Raises:
+        InvalidMetadataFilterError: Bad key, too many keys or values, or
+            a key that is also a prefix of another (meta.model=x with
+            meta.model.version=y)
+    """
+    filters = {}
+    for name in args.keys():
+        if not name.startswith(META_PREFIX):
+            continue
+        path = tuple(name[len(META_PREFIX):].split('.'))
+        if not all(_KEY_PATTERN.match(part) for part in path):
+            raise InvalidMetadataFilterError(f"Invalid metadata key: {name}")
+        values = args.getlist(name) if hasattr(args, 'getlist') else [args[name]]
+        if len(values) > MAX_METADATA_VALUES:
+            raise InvalidMetadataFilterError(f"At most {MAX_METADATA_VALUES} values per metadata key")
+        # Keyed by JSON text: 1 and True are equal in Python but not in JSONB
+        candidates = {}
+        for value in values:
+            for candidate in _parse_value(value):
+                candidates.setdefault(json.dumps(candidate), candidate)
+        filters[path] = list(candidates.values())
+    
+    if len(filters) > MAX_METADATA_FILTERS:
+        raise InvalidMetadataFilterError(f"At most {MAX_METADATA_FILTERS} metadata filters")
+    
+    # A leaf value can not also be an object with keys, whatever the value count
+    for path in filters:
+        for prefix_length in range(1, len(path)):
+            if path[:prefix_length] in filters:
+                raise InvalidMetadataFilterError(f"Conflicting metadata filters on '{'.'.join(path[:prefix_length])}'")
+    return filters
+
+def metadata_filter_clause(column, filters: Dict[Tuple[str, ...], List[Any]], dialect: str):
+    """
+    Compile metadata filters to a WHERE clause.
+    
+    Args:
+        column: JSON/JSONB metadata column
+        filters: Result of parse_metadata_filters()
+        dialect: Database dialect name (e.g. 'postgresql', 'sqlite')
+    
+    Returns:
+        SQLAlchemy boolean expression
+    
+    Raises:
+        InvalidMetadataFilterError: Filters that contradict each other
+            (e.g. meta.model=x with meta.model.version=y)
+    """
+    if dialect != 'postgresql':
+        return and_(*[
+            or_(*[_extract_matches(column, path, value) for value in values])
+            for path, values in filters.items()
+        ])
+    
+    # Single-valued keys share one containment document, i.e. one index lookup
+    document = {}
+    clauses = []
+    for path, values in filters.items():
+        if len(values) == 1:
+            _merge(document, _nest(path, values[0]))
+        else:
+            clauses.append(or_(*[_contains(column, _nest(path, value)) for value in values]))
+    if document:
+        clauses.insert(0, _contains(column, document))
+    return and_(*clauses)
+
+def _parse_value(raw: str) -> List[Any]:
+    """Values raw matches: a number and its text, a JSON scalar, a decoded JSON string, or raw itself."""
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return [raw]
+    if value is None or isinstance(value, bool) or isinstance(value, str):
+        return [value]
+    if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+        return [value, raw]
+    return [raw]
+
+def _nest(path: Tuple[str, ...], value: Any) -> Dict[str, Any]:
+    """{'a': {'b': value}} for the path ('a', 'b')."""
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]):
+    """Merge nested single-key documents."""
+    for key, value in source.items():
+        if key not in target:
+            target[key] = value
+        elif isinstance(target[key], dict) and isinstance(value, dict):
+            _merge(target[key], value)
+        else:
+            raise InvalidMetadataFilterError(f"Conflicting metadata filters on '{key}'")
+
+def _contains(column, document: Dict[str, Any]):
+    """metadata @> document"""
+    return column.op('@>')(cast(json.dumps(document), JSONB))
+
+def _extract_matches(column, path: Tuple[str, ...], value: Any):
+    """json_extract(metadata, '$."a"."b"') = value"""
+    extracted = func.json_extract(column, '$' + ''.join(f'."{key}"' for key in path))
+    return extracted.is_(None) if value is None else extracted == value
@@ -1,12 +1,20 @@
 # Models package
 from flask_sqlalchemy import SQLAlchemy
+from core.read_replica import RoutingSession
 
 # Create a single db instance for all models
-db = SQLAlchemy()
+# (reads of read-only requests may be routed to a replica bind)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 from .camera import Camera
 from .lpr_record import LPRRecord
 from .blacklist_plate import BlacklistPlate
 from .health_check import HealthCheck
+from .archive_file import ArchiveFile
+from .stored_image import StoredImage
+from .image_storage_usage import ImageStorageUsage
+from .image_policy_stats import ImagePolicyStats
+from .blacklist_alert_window import BlacklistAlertWindow
 
-__all__ = ['db', 'Camera', 'LPRRecord', 'BlacklistPlate', 'HealthCheck']
+__all__ = ['db', 'Camera', 'LPRRecord', 'BlacklistPlate', 'HealthCheck', 'ArchiveFile', 'StoredImage',
+           'ImageStorageUsage', 'ImagePolicyStats', 'BlacklistAlertWindow']
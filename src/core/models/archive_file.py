@@ -0,0 +1,79 @@
+"""
+Archive File Model for the cold-storage metadata index
+
+Each row describes one Parquet file of the archive: which dataset, month
+and partition (camera or checkpoint) it holds, and the time and plate
+range of its rows, so archive queries open only the files that can match.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+# Import db from models package
+from core.models import db
+
+class ArchiveFile(db.Model):
+    """
+    Archive File Model for the cold-storage metadata index.
+    
+    This model includes:
+    - Location of the file (dataset, month, partition, path)
+    - Export window that produced it (used as the export watermark)
+    - Row count, size and min/max timestamp and plate for file pruning
+    """
+    __tablename__ = 'archive_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(50), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    partition_key = db.Column(db.String(50), nullable=False)
+    partition_value = db.Column(db.String(100), nullable=False)
+    path = db.Column(db.String(500), nullable=False, unique=True)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    min_timestamp = db.Column(db.DateTime, nullable=True)
+    max_timestamp = db.Column(db.DateTime, nullable=True)
+    min_plate = db.Column(db.String(20), nullable=True)
+    max_plate = db.Column(db.String(20), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # File pruning: dataset + time range, newest first
+        db.Index('idx_archive_files_dataset_max_timestamp', dataset, max_timestamp.desc()),
+        # Export watermark per dataset
+        db.Index('idx_archive_files_dataset_window_end', dataset, window_end.desc()),
+    )
+    
+    def __repr__(self):
+        return f'<ArchiveFile {self.path}>'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert archive file to dictionary.
+        
+        Returns:
+            Dictionary representation of the archive file
+        """
+        return {
+            'id': self.id,
+            'dataset': self.dataset,
+            'month': self.month.isoformat() if self.month else None,
+            'partition_key': self.partition_key,
+            'partition_value': self.partition_value,
+            'path': self.path,
+            'row_count': self.row_count,
+            'size_bytes': self.size_bytes,
+            'window_start': self.window_start.isoformat() if self.window_start else None,
+            'window_end': self.window_end.isoformat() if self.window_end else None,
+            'min_timestamp': self.min_timestamp.isoformat() if self.min_timestamp else None,
+            'max_timestamp': self.max_timestamp.isoformat() if self.max_timestamp else None,
+            'min_plate': self.min_plate,
+            'max_plate': self.max_plate,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,57 @@
+"""
+Blacklist Alert Window Model for alert coalescing across workers
+
+One row per (plate, camera) pair with an open coalescing window. Every
+worker process claims and bumps windows in this table, so a sighting is
+alerted once per window no matter which worker ingests it.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+# Import db from models package
+from core.models import db
+
+class BlacklistAlertWindow(db.Model):
+    """
+    Blacklist Alert Window Model for shared alert de-duplication.
+    
+    This model includes:
+    - Plate number and camera identifier of the window
+    - Alert identifier of the full alert that opened it
+    - Sightings counted in the window and already reported
+    - Open and last sighting times
+    """
+    __tablename__ = 'blacklist_alert_windows'
+    
+    plate_number = db.Column(db.String(20), primary_key=True)
+    camera_id = db.Column(db.String(50), primary_key=True)
+    alert_id = db.Column(db.String(36), nullable=False)
+    opened_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    sightings = db.Column(db.Integer, nullable=False, default=1)
+    reported_sightings = db.Column(db.Integer, nullable=False, default=1)
+    last_seen = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BlacklistAlertWindow {self.plate_number}@{self.camera_id}>'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert window to dictionary.
+        
+        Returns:
+            Dictionary representation of the window
+        """
+        return {
+            'plate_number': self.plate_number,
+            'camera_id': self.camera_id,
+            'alert_id': self.alert_id,
+            'opened_at': self.opened_at.isoformat() if self.opened_at else None,
+            'sightings': self.sightings,
+            'reported_sightings': self.reported_sightings,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
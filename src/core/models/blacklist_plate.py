@@ -31,12 +31,20 @@ class BlacklistPlate(db.Model):
     license_plate_text = db.Column(db.String(20), nullable=False, index=True)
     reason = db.Column(db.Text, nullable=False)
     added_by = db.Column(db.String(100), nullable=False)
-    expiry_date = db.Column(db.DateTime, nullable=True)
+    expiry_date = db.Column(db.DateTime, nullable=True, index=True)
     notes = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Active-plate lookups on ingest; inactive entries are not indexed
+        db.Index('idx_blacklist_plates_active_plate', license_plate_text,
+                 postgresql_include=['expiry_date'],
+                 postgresql_where=is_active.is_(True),
+                 sqlite_where=is_active.is_(True)),
+    )
+    
     def __repr__(self):
         return f'<BlacklistPlate {self.license_plate_text}: {self.reason}>'
     
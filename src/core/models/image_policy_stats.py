@@ -0,0 +1,70 @@
+"""
+Image Policy Stats Model for per-camera storage decisions
+
+One row per camera with the ingest decisions of the image policy and the
+bytes it stored and saved. Every worker process counts into memory and
+adds its deltas to these rows periodically, so the report covers all
+workers.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from sqlalchemy.dialects.postgresql import JSONB
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+# Import db from models package
+from core.models import db
+
+class ImagePolicyStats(db.Model):
+    """
+    Image Policy Stats Model for the image policy report.
+    
+    This model includes:
+    - Camera identifier
+    - Decision counts by reason
+    - Frames and crops stored or skipped, and their bytes
+    - Images downgraded and the bytes saved by re-encoding
+    - First and last update times
+    """
+    __tablename__ = 'image_policy_stats'
+    
+    camera_id = db.Column(db.String(50), primary_key=True)
+    decisions = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False, default=dict)
+    frames_stored = db.Column(db.BigInteger, nullable=False, default=0)
+    frames_skipped = db.Column(db.BigInteger, nullable=False, default=0)
+    crops_stored = db.Column(db.BigInteger, nullable=False, default=0)
+    crops_skipped = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_stored = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_saved_at_ingest = db.Column(db.BigInteger, nullable=False, default=0)
+    images_downgraded = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_saved_by_downgrade = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ImagePolicyStats {self.camera_id}>'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert stats to dictionary.
+        
+        Returns:
+            Dictionary representation of the policy counters
+        """
+        return {
+            'camera_id': self.camera_id,
+            'decisions': dict(self.decisions or {}),
+            'frames_stored': self.frames_stored,
+            'frames_skipped': self.frames_skipped,
+            'crops_stored': self.crops_stored,
+            'crops_skipped': self.crops_skipped,
+            'bytes_stored': self.bytes_stored,
+            'bytes_saved_at_ingest': self.bytes_saved_at_ingest,
+            'images_downgraded': self.images_downgraded,
+            'bytes_saved_by_downgrade': self.bytes_saved_by_downgrade,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,53 @@
+"""
+Image Storage Usage Model for per-camera and per-checkpoint quotas
+
+One row per camera and per checkpoint with the bytes and number of image
+files currently on disk. The image store updates the counters in the same
+transaction that adds, shrinks or removes a file, so quota checks never
+have to walk the storage directory.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+# Import db from models package
+from core.models import db
+
+class ImageStorageUsage(db.Model):
+    """
+    Image Storage Usage Model for storage quotas.
+    
+    This model includes:
+    - Scope (camera or checkpoint) and its identifier
+    - Bytes and number of original image files on disk
+    - Last update time
+    """
+    __tablename__ = 'image_storage_usage'
+    
+    scope = db.Column(db.String(20), primary_key=True)
+    scope_id = db.Column(db.String(50), primary_key=True)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    images = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ImageStorageUsage {self.scope}:{self.scope_id} {self.bytes} bytes>'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert usage to dictionary.
+        
+        Returns:
+            Dictionary representation of the usage counters
+        """
+        return {
+            'scope': self.scope,
+            'scope_id': self.scope_id,
+            'bytes': self.bytes,
+            'images': self.images,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
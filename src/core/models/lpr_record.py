@@ -2,11 +2,15 @@
 LPR Record Model for storing license plate recognition data
 
 This model stores all LPR detection records including plate numbers,
-confidence scores, timestamps, and location data.
+confidence scores, timestamps, and location data. It is the one store of
+detections for every protocol: each plate read in a detection is a row,
+and the rows of one detection share its detection_id. Rows are written
+by the detection repository (services/detection_repository.py).
 """
 
 from datetime import datetime
 from typing import Optional, Dict, Any
+from sqlalchemy.dialects.postgresql import JSONB
 from core.import_helper import setup_absolute_imports
 
 # Setup absolute imports
@@ -21,24 +25,53 @@ class LPRRecord(db.Model):
     
     This model includes:
     - Basic LPR data (plate number, confidence, timestamp)
-    - Camera information (camera_id)
+    - Camera information (camera_id, checkpoint_id)
+    - Detection it belongs to, source protocol and plate crop
     - Location data (GPS coordinates)
     - Blacklist status and reason
+    - Detection metadata (bounding boxes, plate/vehicle attributes)
     """
     __tablename__ = 'lpr_records'
     
     id = db.Column(db.Integer, primary_key=True)
-    camera_id = db.Column(db.String(50), db.ForeignKey('cameras.camera_id'), nullable=False, index=True)
-    plate_number = db.Column(db.String(20), nullable=False, index=True)
+    camera_id = db.Column(db.String(50), db.ForeignKey('cameras.camera_id'), nullable=False)
+    plate_number = db.Column(db.String(20), nullable=False)
     confidence = db.Column(db.Float, default=0.0)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     image_path = db.Column(db.String(255))
     location = db.Column(db.String(100))
     location_lat = db.Column(db.Float, nullable=True)  # GPS latitude
     location_lon = db.Column(db.Float, nullable=True)  # GPS longitude
-    is_blacklisted = db.Column(db.Boolean, default=False, index=True)  # Flag for blacklist detection
+    is_blacklisted = db.Column(db.Boolean, default=False)  # Flag for blacklist detection
     blacklist_reason = db.Column(db.Text, nullable=True)  # Reason if blacklisted
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    detection_id = db.Column(db.String(36), nullable=True)  # Shared by the plates of one detection
+    checkpoint_id = db.Column(db.String(50), nullable=True)
+    source = db.Column(db.String(20), nullable=True)  # websocket, rest_api, mqtt
+    processing_time_ms = db.Column(db.Float, nullable=True)
+    plate_image_path = db.Column(db.String(255), nullable=True)  # Cropped plate image
+    # 'metadata' is reserved on declarative models, hence the attribute name
+    detection_metadata = db.Column('metadata', db.JSON().with_variant(JSONB(), 'postgresql'), nullable=True)
+    
+    # Composite indexes for the listing/statistics access patterns; the
+    # camera_id and plate_number prefixes also serve plain equality lookups
+    __table_args__ = (
+        # Newest-first keyset pages: ORDER BY timestamp DESC, id DESC
+        db.Index('idx_lpr_records_timestamp_id', timestamp.desc(), id.desc()),
+        # Per-camera time ranges; covers per-camera counts and distinct plates
+        db.Index('idx_lpr_records_camera_timestamp', camera_id, timestamp.desc(), id.desc(),
+                 postgresql_include=['plate_number', 'is_blacklisted']),
+        # Plate history, newest first
+        db.Index('idx_lpr_records_plate_timestamp', plate_number, timestamp.desc()),
+        # Blacklist hits by time; only flagged rows are indexed
+        db.Index('idx_lpr_records_blacklisted_timestamp', timestamp.desc(),
+                 postgresql_where=is_blacklisted.is_(True),
+                 sqlite_where=is_blacklisted.is_(True)),
+        # meta.* filters: metadata @> '{...}' containment. Created with new tables only;
+        # existing tables get it CONCURRENTLY from index_advisor.py (core/deferred_indexes.py)
+        db.Index('idx_lpr_records_metadata', detection_metadata,
+                 postgresql_using='gin', postgresql_ops={'metadata': 'jsonb_path_ops'}),
+    )
     
     def __repr__(self):
         return f'<LPRRecord {self.plate_number} from {self.camera_id}>'
@@ -62,7 +95,13 @@ class LPRRecord(db.Model):
             'location_lon': self.location_lon,
             'is_blacklisted': self.is_blacklisted,
             'blacklist_reason': self.blacklist_reason,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'detection_id': self.detection_id,
+            'checkpoint_id': self.checkpoint_id,
+            'source': self.source,
+            'processing_time_ms': self.processing_time_ms,
+            'plate_image_path': self.plate_image_path,
+            'metadata': self.detection_metadata
         }
     
     @classmethod
@@ -0,0 +1,79 @@
+"""
+Stored Image Model for the content-addressed image store
+
+Each row is one image file, keyed by the SHA-256 of its bytes. Records
+that reference the same bytes share the file and the row counts the
+references; the file is removed when the last reference is released.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+# Import db from models package
+from core.models import db
+
+class StoredImage(db.Model):
+    """
+    Stored Image Model for the content-addressed image store.
+    
+    This model includes:
+    - Content hash (primary key) and the sharded path of the file
+    - Reference count of records pointing at the file and when it last grew
+    - Camera and checkpoint that first wrote it and whether it is evidence (blacklist hit)
+    - Size, first-write time and when it was downgraded to lower quality
+    - When its file was evicted to keep the owner within its storage quota
+    - Paths of the thumbnail and preview generated for list and detail views
+    """
+    __tablename__ = 'stored_images'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False, unique=True)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    last_acquired_at = db.Column(db.DateTime, nullable=True)
+    camera_id = db.Column(db.String(50), nullable=True)
+    checkpoint_id = db.Column(db.String(50), nullable=True)
+    is_evidence = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    downgraded_at = db.Column(db.DateTime, nullable=True)
+    thumbnail_path = db.Column(db.String(255), nullable=True)
+    preview_path = db.Column(db.String(255), nullable=True)
+    evicted_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Downgrade pass: oldest images that are not downgraded yet
+        db.Index('idx_stored_images_created_at', created_at),
+        # Quota eviction: oldest images of one camera / checkpoint
+        db.Index('idx_stored_images_camera_created', camera_id, created_at),
+        db.Index('idx_stored_images_checkpoint_created', checkpoint_id, created_at),
+    )
+    
+    def __repr__(self):
+        return f'<StoredImage {self.content_hash[:12]} refs={self.ref_count}>'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert stored image to dictionary.
+        
+        Returns:
+            Dictionary representation of the stored image
+        """
+        return {
+            'content_hash': self.content_hash,
+            'path': self.path,
+            'size_bytes': self.size_bytes,
+            'ref_count': self.ref_count,
+            'last_acquired_at': self.last_acquired_at.isoformat() if self.last_acquired_at else None,
+            'camera_id': self.camera_id,
+            'checkpoint_id': self.checkpoint_id,
+            'is_evidence': self.is_evidence,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'downgraded_at': self.downgraded_at.isoformat() if self.downgraded_at else None,
+            'thumbnail_path': self.thumbnail_path,
+            'preview_path': self.preview_path,
+            'evicted_at': self.evicted_at.isoformat() if self.evicted_at else None
+        }
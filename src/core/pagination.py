@@ -0,0 +1,186 @@
+"""
+Keyset Pagination Helpers
+
+This module provides cursor-based pagination for large listings. Pages are
+fetched with a row comparison on the sort keys (e.g. timestamp, id) instead
+of OFFSET, so deep pages cost the same as the first one. Totals are optional
+and, on PostgreSQL, estimated from planner statistics instead of COUNT(*).
+"""
+
+import json
+import base64
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, Sequence
+from sqlalchemy import tuple_
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models import db
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NEXT = 'next'
+CURSOR_PREV = 'prev'
+
+TOTAL_ESTIMATE = 'estimate'
+TOTAL_EXACT = 'exact'
+TOTAL_NONE = 'none'
+TOTAL_MODES = [TOTAL_ESTIMATE, TOTAL_EXACT, TOTAL_NONE]
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+def encode_cursor(values: Sequence[Any], direction: str) -> str:
+    """
+    Encode sort key values into an opaque URL-safe cursor.
+    
+    Args:
+        values: Sort key values of the boundary row
+        direction: CURSOR_NEXT or CURSOR_PREV
+    
+    Returns:
+        Cursor string
+    """
+    encoded = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps({'d': direction, 'k': encoded}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Args:
+        cursor: Cursor string
+    
+    Returns:
+        Dictionary with 'direction' and 'values'
+    
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if data['d'] not in (CURSOR_NEXT, CURSOR_PREV) or not isinstance(data['k'], list):
+            raise ValueError('unknown cursor format')
+        values = [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in data['k']
+        ]
+        return {'direction': data['d'], 'values': values}
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {str(e)}')
+
+def keyset_paginate(query, sort_keys: Sequence[Any], per_page: int, cursor: Optional[str] = None,
+                    total: str = TOTAL_ESTIMATE) -> Dict[str, Any]:
+    """
+    Fetch one page of a query ordered by sort_keys descending.
+    
+    The last sort key must be unique (normally the primary key) so that
+    rows with equal timestamps are neither skipped nor repeated.
+    
+    Args:
+        query: ORM query with filters applied and no ORDER BY
+        sort_keys: Column expressions, all sorted descending
+        per_page: Page size
+        cursor: Cursor from a previous page, or None for the first page
+        total: TOTAL_ESTIMATE, TOTAL_EXACT or TOTAL_NONE
+    
+    Returns:
+        Dictionary with items, next/prev cursors and the (optional) total
+    
+    Raises:
+        InvalidCursorError: If the cursor is malformed or does not match sort_keys
+    """
+    position = decode_cursor(cursor) if cursor else None
+    if position and len(position['values']) != len(sort_keys):
+        raise InvalidCursorError('Invalid cursor: sort keys do not match')
+    
+    backwards = position is not None and position['direction'] == CURSOR_PREV
+    page_query = query
+    if position:
+        keys, values = tuple_(*sort_keys), tuple_(*position['values'])
+        page_query = page_query.filter(keys > values if backwards else keys < values)
+    
+    order = [key.asc() if backwards else key.desc() for key in sort_keys]
+    labels = [f'_sort_key_{i}' for i in range(len(sort_keys))]
+    rows = page_query.add_columns(*[key.label(label) for key, label in zip(sort_keys, labels)])\
+        .order_by(*order)\
+        .limit(per_page + 1)\
+        .all()
+    
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else position is not None
+    
+    items = [row[0] for row in rows]
+    first_keys = [getattr(rows[0], label) for label in labels] if rows else None
+    last_keys = [getattr(rows[-1], label) for label in labels] if rows else None
+    
+    row_count = count_rows(query, total)
+    return {
+        'items': items,
+        'per_page': per_page,
+        'has_next': bool(rows) and has_next,
+        'has_prev': bool(rows) and has_prev,
+        'next_cursor': encode_cursor(last_keys, CURSOR_NEXT) if rows and has_next else None,
+        'prev_cursor': encode_cursor(first_keys, CURSOR_PREV) if rows and has_prev else None,
+        'total': row_count,
+        'total_is_estimate': row_count is not None and total == TOTAL_ESTIMATE and _is_postgresql()
+    }
+
+def count_rows(query, mode: str = TOTAL_ESTIMATE) -> Optional[int]:
+    """
+    Count the rows of a query.
+    
+    TOTAL_ESTIMATE reads the planner's row estimate on PostgreSQL (no scan)
+    and falls back to COUNT(*) elsewhere; TOTAL_EXACT always runs COUNT(*);
+    TOTAL_NONE skips counting.
+    
+    Args:
+        query: ORM query
+        mode: Counting mode
+    
+    Returns:
+        Row count, or None if skipped or unavailable
+    """
+    if mode == TOTAL_NONE:
+        return None
+    if mode == TOTAL_ESTIMATE and _is_postgresql():
+        return estimate_rows(query)
+    return query.order_by(None).count()
+
+def estimate_rows(query) -> Optional[int]:
+    """
+    Get the PostgreSQL planner's row estimate for a query.
+    
+    Args:
+        query: ORM query
+    
+    Returns:
+        Estimated row count, or None if EXPLAIN failed
+    """
+    try:
+        connection = db.session.connection()
+        compiled = query.order_by(None).statement.compile(
+            dialect=connection.dialect,
+            compile_kwargs={'render_postcompile': True}
+        )
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Failed to estimate row count: {str(e)}")
+        return None
+
+def _is_postgresql() -> bool:
+    """Whether the session is bound to PostgreSQL."""
+    return db.session.get_bind().dialect.name == 'postgresql'
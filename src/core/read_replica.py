@@ -0,0 +1,238 @@
+"""
+Read Replica Routing
+
+Read-only pages (reports, map analytics, detection statistics, health
+history) can query a streaming replica instead of the primary database.
+Replicas are configured as SQLAlchemy binds named replica_0, replica_1, ...
+(see Config.DATABASE_REPLICA_URLS). The session routes a statement to a
+replica only when the request has been marked read-only, the statement is
+not a write, and the replica's replay lag is within REPLICA_MAX_LAG_SECONDS.
+In every other case, including when no replica is healthy, it falls back
+to the primary.
+"""
+
+import re
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional, List, Dict, Any
+from flask import g, request, current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+
+# Raw SQL (text()) that writes, including data-modifying CTEs
+_WRITE_SQL = re.compile(
+    r'^\s*(INSERT|UPDATE|DELETE|MERGE|UPSERT|CREATE|ALTER|DROP|TRUNCATE|COPY|LOCK|VACUUM|ANALYZE|REINDEX|REFRESH|CALL)\b'
+    r'|^\s*WITH\b.*\b(INSERT|UPDATE|DELETE)\b',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Replay lag in seconds. A standby that has replayed everything it received
+# is not lagging even if the primary has been idle for a while.
+LAG_SQL = {
+    'postgresql': """
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END
+    """
+}
+
+class ReplicaRouter:
+    """
+    Chooses a healthy replica engine and tracks replica lag.
+    
+    Lag is measured at most once per REPLICA_CHECK_INTERVAL_SECONDS per
+    replica; requests in between reuse the last result.
+    """
+    
+    def __init__(self):
+        """Initialize replica router"""
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._counter = itertools.count()
+        self.stats = {
+            'replica_reads': 0,
+            'primary_fallbacks': 0
+        }
+    
+    def replica_keys(self, db) -> List[str]:
+        """Get the bind keys of the configured replicas."""
+        return sorted(key for key in db.engines if key and key.startswith(REPLICA_BIND_PREFIX))
+    
+    def choose(self, db):
+        """
+        Pick a healthy replica engine, round-robin.
+        
+        Args:
+            db: Flask-SQLAlchemy instance
+        
+        Returns:
+            Replica engine, or None to use the primary
+        """
+        keys = self.replica_keys(db)
+        if not keys:
+            return None
+        
+        healthy = [key for key in keys if self._check(db, key)['healthy']]
+        if not healthy:
+            self.stats['primary_fallbacks'] += 1
+            return None
+        
+        self.stats['replica_reads'] += 1
+        return db.engines[healthy[next(self._counter) % len(healthy)]]
+    
+    def engine_for_request(self, db):
+        """
+        Get the replica engine for the current request.
+        
+        The choice is made once per request so that all reads of a page see
+        the same snapshot.
+        """
+        if '_db_replica' not in g:
+            g._db_replica = self.choose(db)
+        return g._db_replica
+    
+    def get_status(self, db) -> Dict[str, Any]:
+        """
+        Get the lag and health of every replica (re-checked now).
+        
+        Args:
+            db: Flask-SQLAlchemy instance
+        
+        Returns:
+            Dictionary with per-replica status and routing counters
+        """
+        replicas = []
+        for key in self.replica_keys(db):
+            state = self._check(db, key, force=True)
+            replicas.append({
+                'bind': key,
+                'url': db.engines[key].url.render_as_string(hide_password=True),
+                'healthy': state['healthy'],
+                'lag_seconds': state['lag_seconds'],
+                'error': state['error']
+            })
+        
+        return {
+            'replicas': replicas,
+            'max_lag_seconds': current_app.config.get('REPLICA_MAX_LAG_SECONDS'),
+            'stats': dict(self.stats)
+        }
+    
+    def _check(self, db, key: str, force: bool = False) -> Dict[str, Any]:
+        """Measure a replica's lag, or return the cached result if still fresh."""
+        interval = current_app.config.get('REPLICA_CHECK_INTERVAL_SECONDS', 10)
+        with self._lock:
+            state = self._state.get(key)
+            if not force and state and time.monotonic() - state['checked_at'] < interval:
+                return state
+            
+            lag, error = None, None
+            try:
+                lag = self._measure_lag(db.engines[key])
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"Replica {key} lag check failed: {error}")
+            
+            max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 30)
+            healthy = lag is not None and lag <= max_lag
+            if lag is not None and not healthy:
+                error = f'replica lag {lag:.1f}s exceeds {max_lag}s'
+            if state and state['healthy'] != healthy:
+                log = logger.info if healthy else logger.warning
+                log(f"Replica {key} {'back in rotation' if healthy else 'out of rotation'}: {error or 'lag ok'}")
+            
+            state = {
+                'healthy': healthy,
+                'lag_seconds': lag,
+                'checked_at': time.monotonic(),
+                'error': error
+            }
+            self._state[key] = state
+            return state
+    
+    def _measure_lag(self, engine) -> Optional[float]:
+        """Get a replica's replay lag in seconds (0 for databases without replication, e.g. SQLite)."""
+        sql = LAG_SQL.get(engine.dialect.name)
+        if not sql:
+            return 0.0
+        with engine.connect() as connection:
+            lag = connection.execute(text(sql)).scalar()
+        return float(lag) if lag is not None else None
+
+replica_router = ReplicaRouter()
+
+class RoutingSession(Session):
+    """
+    Session that sends reads of read-only requests to a replica.
+    
+    Flushes, INSERT/UPDATE/DELETE statements and raw SQL that writes always
+    go to the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not is_write(clause) and is_read_only():
+            engine = replica_router.engine_for_request(self._db)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def is_write(clause) -> bool:
+    """Whether a statement writes (ORM/Core DML, or text() starting with a write verb)."""
+    if isinstance(clause, UpdateBase):
+        return True
+    return isinstance(clause, TextClause) and bool(_WRITE_SQL.match(clause.text))
+
+def is_read_only() -> bool:
+    """Whether the current request or block has been marked read-only."""
+    return has_app_context() and g.get('_db_read_only', False)
+
+@contextmanager
+def read_only():
+    """
+    Route the reads inside this block to a replica.
+    
+    ORM flushes, INSERT/UPDATE/DELETE statements and raw SQL writes still
+    go to the primary.
+    """
+    previous = g.get('_db_read_only', False)
+    g._db_read_only = True
+    try:
+        yield
+    finally:
+        g._db_read_only = previous
+        if not previous:
+            g.pop('_db_replica', None)
+
+def read_only_route(view):
+    """Decorator that runs a view inside read_only()."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_only():
+            return view(*args, **kwargs)
+    return wrapper
+
+def route_reads_to_replica():
+    """
+    before_request hook for read-only blueprints.
+    
+    Marks GET/HEAD requests read-only; other methods stay on the primary.
+    """
+    if request.method in READ_METHODS:
+        g._db_read_only = True
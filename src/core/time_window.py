@@ -0,0 +1,149 @@
+"""
+Time Window Helpers
+
+Timestamps are stored as naive UTC. Reports, however, count "today" and
+calendar days in the site's local time. This module turns local calendar
+days into half-open [start, end) UTC ranges so queries filter on the bare
+timestamp column and can use its indexes. A DATE(timestamp) = :day filter
+cannot use them. Checkpoints in another timezone can override the site
+timezone.
+"""
+
+import logging
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Tuple, Dict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import and_
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_zones: Dict[str, ZoneInfo] = {}
+
+def get_zone(name: str) -> ZoneInfo:
+    """
+    Get a timezone by IANA name, falling back to UTC for unknown names.
+    
+    Args:
+        name: IANA timezone name, e.g. 'Asia/Bangkok'
+    
+    Returns:
+        Timezone
+    """
+    zone = _zones.get(name)
+    if zone is None:
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.error(f"Unknown timezone '{name}', using UTC")
+            zone = ZoneInfo('UTC')
+        _zones[name] = zone
+    return zone
+
+def get_timezone(checkpoint_id: Optional[str] = None) -> ZoneInfo:
+    """
+    Get the timezone of a checkpoint, or the site timezone.
+    
+    Args:
+        checkpoint_id: Checkpoint with an entry in CHECKPOINT_TIMEZONES
+    
+    Returns:
+        Timezone
+    """
+    name = Config.CHECKPOINT_TIMEZONES.get(checkpoint_id) if checkpoint_id else None
+    return get_zone(name or Config.SITE_TIMEZONE)
+
+def local_today(tz: Optional[ZoneInfo] = None) -> date:
+    """Get the current calendar date in a timezone (default site timezone)."""
+    return datetime.now(tz or get_timezone()).date()
+
+def local_datetime(timestamp: datetime, tz: Optional[ZoneInfo] = None) -> datetime:
+    """
+    Convert a stored timestamp to local time.
+    
+    Args:
+        timestamp: Naive UTC (as stored) or timezone-aware datetime
+        tz: Target timezone (default site timezone)
+    
+    Returns:
+        Timezone-aware local datetime
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(tz or get_timezone())
+
+def to_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC, the storage format."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def day_window(day: Optional[date] = None, tz: Optional[ZoneInfo] = None) -> Tuple[datetime, datetime]:
+    """
+    Get the [start, end) UTC range of one local calendar day.
+    
+    The range is computed from local midnights, so DST days are 23 or 25
+    hours long.
+    
+    Args:
+        day: Local date (default today in tz)
+        tz: Timezone (default site timezone)
+    
+    Returns:
+        Tuple of naive UTC (start, end)
+    """
+    return days_window(day, day, tz)
+
+def days_window(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                tz: Optional[ZoneInfo] = None) -> Tuple[datetime, datetime]:
+    """
+    Get the [start, end) UTC range covering local dates date_from..date_to inclusive.
+    
+    Args:
+        date_from: First local date (default today in tz)
+        date_to: Last local date (default date_from)
+        tz: Timezone (default site timezone)
+    
+    Returns:
+        Tuple of naive UTC (start, end)
+    """
+    tz = tz or get_timezone()
+    date_from = date_from or local_today(tz)
+    date_to = date_to or date_from
+    start = datetime.combine(date_from, time.min, tzinfo=tz)
+    end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz)
+    return to_utc(start), to_utc(end)
+
+def within(column, window: Tuple[datetime, datetime]):
+    """
+    Build a sargable half-open range filter.
+    
+    Args:
+        column: Timestamp column
+        window: (start, end) from day_window/days_window
+    
+    Returns:
+        SQL criterion column >= start AND column < end
+    """
+    start, end = window
+    return and_(column >= start, column < end)
+
+def parse_local_date(value: Optional[str]) -> Optional[date]:
+    """
+    Parse a YYYY-MM-DD query-string date.
+    
+    Args:
+        value: Date string or None
+    
+    Returns:
+        Date, or None if missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
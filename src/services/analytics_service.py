@@ -0,0 +1,543 @@
+"""
+Analytics Service for incremental detection rollups
+
+This service maintains per-(date, checkpoint, camera) aggregates in the
+analytics table. Detections are counted into in-memory accumulators on the
+ingest path and flushed every minute with INSERT ... ON CONFLICT DO UPDATE,
+so dashboards and reports read a handful of pre-aggregated rows instead of
+scanning detections.
+"""
+
+import json
+import logging
+from collections import Counter
+from datetime import datetime, date, timedelta
+from threading import Lock, Thread, Event
+from typing import Optional, Dict, Any, Set, Tuple, Iterable
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.lpr_record import LPRRecord
+from core.models import db
+from core.time_window import get_timezone, local_today, local_datetime, day_window, days_window, within
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# ON CONFLICT target; NULL checkpoint/camera ids must still collide
+ROLLUP_KEY_INDEX_SQL = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_rollup_key
+    ON analytics (date, (COALESCE(checkpoint_id, '')), (COALESCE(camera_id, '')))
+"""
+
+# Adds two JSONB objects of counters key by key
+_JSONB_SUM = """(
+    SELECT COALESCE(jsonb_object_agg(key, total), '{{}}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::int) AS total
+        FROM (
+            SELECT * FROM jsonb_each_text(COALESCE(analytics.{column}, '{{}}'::jsonb))
+            UNION ALL
+            SELECT * FROM jsonb_each_text(EXCLUDED.{column})
+        ) AS counters
+        GROUP BY key
+    ) AS merged
+)"""
+
+# Unknown checkpoints/cameras are rolled up under NULL instead of failing the foreign key
+_CHECKPOINT_ID = "(SELECT checkpoint_id FROM checkpoints WHERE checkpoint_id = :checkpoint_id)"
+_CAMERA_ID = "(SELECT camera_id FROM cameras WHERE camera_id = :camera_id)"
+
+_UPSERT_COLUMNS = f"""
+    INSERT INTO analytics (
+        date, checkpoint_id, camera_id, total_detections, total_vehicles, total_plates,
+        unique_plates, blacklist_hits, avg_processing_time_ms, hourly_breakdown,
+        vehicle_type_breakdown, plate_type_breakdown, created_at, updated_at
+    ) VALUES (
+        :date, {_CHECKPOINT_ID}, {_CAMERA_ID}, :total_detections, :total_vehicles, :total_plates,
+        :unique_plates, :blacklist_hits, :avg_processing_time_ms, CAST(:hourly_breakdown AS jsonb),
+        CAST(:vehicle_type_breakdown AS jsonb), CAST(:plate_type_breakdown AS jsonb), NOW(), NOW()
+    )
+    ON CONFLICT (date, (COALESCE(checkpoint_id, '')), (COALESCE(camera_id, '')))
+"""
+
+# Flush: add deltas to the stored row
+UPSERT_DELTA_SQL = _UPSERT_COLUMNS + f"""
+    DO UPDATE SET
+        total_detections = analytics.total_detections + EXCLUDED.total_detections,
+        total_vehicles = analytics.total_vehicles + EXCLUDED.total_vehicles,
+        total_plates = analytics.total_plates + EXCLUDED.total_plates,
+        unique_plates = GREATEST(analytics.unique_plates, EXCLUDED.unique_plates),
+        blacklist_hits = analytics.blacklist_hits + EXCLUDED.blacklist_hits,
+        avg_processing_time_ms = (
+            COALESCE(analytics.avg_processing_time_ms, 0) * analytics.total_detections
+            + COALESCE(EXCLUDED.avg_processing_time_ms, 0) * EXCLUDED.total_detections
+        ) / NULLIF(analytics.total_detections + EXCLUDED.total_detections, 0),
+        hourly_breakdown = {_JSONB_SUM.format(column='hourly_breakdown')},
+        vehicle_type_breakdown = {_JSONB_SUM.format(column='vehicle_type_breakdown')},
+        plate_type_breakdown = {_JSONB_SUM.format(column='plate_type_breakdown')},
+        updated_at = NOW()
+"""
+
+# Rebuild: replace the stored row
+UPSERT_REPLACE_SQL = _UPSERT_COLUMNS + """
+    DO UPDATE SET
+        total_detections = EXCLUDED.total_detections,
+        total_vehicles = EXCLUDED.total_vehicles,
+        total_plates = EXCLUDED.total_plates,
+        unique_plates = EXCLUDED.unique_plates,
+        blacklist_hits = EXCLUDED.blacklist_hits,
+        avg_processing_time_ms = EXCLUDED.avg_processing_time_ms,
+        hourly_breakdown = EXCLUDED.hourly_breakdown,
+        vehicle_type_breakdown = EXCLUDED.vehicle_type_breakdown,
+        plate_type_breakdown = EXCLUDED.plate_type_breakdown,
+        updated_at = NOW()
+"""
+
+UPDATE_PEAK_SQL = f"""
+    UPDATE analytics SET (peak_hour, peak_count) = (
+        SELECT key::int, value::int FROM jsonb_each_text(hourly_breakdown)
+        ORDER BY value::int DESC, key::int
+        LIMIT 1
+    )
+    WHERE date = :date
+      AND COALESCE(checkpoint_id, '') = COALESCE({_CHECKPOINT_ID}, '')
+      AND COALESCE(camera_id, '') = COALESCE({_CAMERA_ID}, '')
+"""
+
+RollupKey = Tuple[date, Optional[str], Optional[str]]
+
+def _new_bucket() -> Dict[str, Any]:
+    """Create an empty accumulator for one rollup key."""
+    return {
+        'total_detections': 0,
+        'total_vehicles': 0,
+        'total_plates': 0,
+        'blacklist_hits': 0,
+        'processing_time_total': 0.0,
+        'processing_time_count': 0,
+        'hourly': Counter(),
+        'vehicle_types': Counter(),
+        'plate_types': Counter(),
+        'plates': set()
+    }
+
+class AnalyticsService:
+    """
+    Service for incremental analytics rollups.
+    
+    This service provides:
+    - In-memory accumulators per (date, checkpoint, camera) fed by ingest
+    - A flush thread that upserts deltas into the analytics table
+    - Distinct plate tracking per rollup key for unique_plates
+    - A rebuild of past days from lpr_records
+    - Summary and per-day readers for dashboards and reports
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.enabled = False
+        self._buckets: Dict[RollupKey, Dict[str, Any]] = {}
+        self._buckets_lock = Lock()
+        self._flush_lock = Lock()
+        # Distinct plates seen per rollup key, seeded from the database once per key
+        self._plate_sets: Dict[RollupKey, Set[str]] = {}
+        self._stop_event = Event()
+        self.flush_thread = None
+        self.running = False
+        self.last_flush = None
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Analytics Service and start the flush thread.
+        
+        Rollups need the analytics table and PostgreSQL; otherwise readers
+        fall back to querying lpr_records directly.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to flush in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        
+        try:
+            bind = db_session.get_bind()
+            if bind.dialect.name != 'postgresql':
+                logger.info("Analytics rollups disabled: PostgreSQL required")
+                return
+            if not db_session.execute(text("SELECT to_regclass('analytics') IS NOT NULL")).scalar():
+                logger.warning("Analytics rollups disabled: analytics table not found")
+                return
+            db_session.execute(text(ROLLUP_KEY_INDEX_SQL))
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            logger.error(f"Analytics rollups disabled: {str(e)}")
+            return
+        
+        self.enabled = True
+        self.running = True
+        self.flush_thread = Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+        logger.info("Analytics service initialized")
+    
+    def stop(self):
+        """Stop the flush thread."""
+        self.running = False
+        self._stop_event.set()
+    
+    def record_detection(self, camera_id: Optional[str], checkpoint_id: Optional[str] = None,
+                         timestamp=None, plate_numbers: Iterable[str] = (),
+                         vehicles: int = 1, plates: Optional[int] = None,
+                         processing_time_ms: Optional[float] = None, blacklist_hits: int = 0,
+                         vehicle_types: Iterable[str] = (), plate_types: Iterable[str] = ()):
+        """
+        Count one detection into the in-memory rollup (no database access).
+        
+        Args:
+            camera_id: Camera that made the detection
+            checkpoint_id: Checkpoint of the camera
+            timestamp: Detection time (datetime or ISO string, default now)
+            plate_numbers: Plates read in the detection
+            vehicles: Number of vehicles in the detection
+            plates: Number of plates (default len(plate_numbers))
+            processing_time_ms: Edge processing time
+            blacklist_hits: Number of blacklisted plates in the detection
+            vehicle_types: Vehicle class of each vehicle
+            plate_types: Plate type of each plate
+        """
+        if not self.enabled:
+            return
+        
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        # Rollups are per local calendar day of the checkpoint
+        local_time = local_datetime(timestamp or datetime.utcnow(), get_timezone(checkpoint_id))
+        plate_numbers = [plate for plate in plate_numbers if plate]
+        key = (local_time.date(), checkpoint_id, camera_id)
+        
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _new_bucket()
+            bucket['total_detections'] += 1
+            bucket['total_vehicles'] += vehicles or 0
+            bucket['total_plates'] += len(plate_numbers) if plates is None else plates
+            bucket['blacklist_hits'] += blacklist_hits
+            if processing_time_ms is not None:
+                bucket['processing_time_total'] += processing_time_ms
+                bucket['processing_time_count'] += 1
+            bucket['hourly'][str(local_time.hour)] += 1
+            bucket['vehicle_types'].update(t for t in vehicle_types if t)
+            bucket['plate_types'].update(t for t in plate_types if t)
+            bucket['plates'].update(plate_numbers)
+    
+    def record_lpr_record(self, record: LPRRecord, checkpoint_id: Optional[str] = None):
+        """
+        Count a stored LPR record into the rollup.
+        
+        Args:
+            record: LPR record (after blacklist processing)
+            checkpoint_id: Checkpoint of the camera, if known
+        """
+        self.record_detection(
+            camera_id=record.camera_id,
+            checkpoint_id=checkpoint_id,
+            timestamp=record.timestamp,
+            plate_numbers=[record.plate_number],
+            blacklist_hits=1 if record.is_blacklisted else 0
+        )
+    
+    def flush(self) -> int:
+        """
+        Upsert accumulated deltas into the analytics table.
+        
+        Returns:
+            Number of rollup rows written
+        """
+        if not self.enabled:
+            return 0
+        
+        with self._flush_lock:
+            with self._buckets_lock:
+                buckets, self._buckets = self._buckets, {}
+            if not buckets:
+                return 0
+            
+            try:
+                rows = [self._bucket_row(key, bucket) for key, bucket in buckets.items()]
+                self.db_session.execute(text(UPSERT_DELTA_SQL), rows)
+                self.db_session.execute(text(UPDATE_PEAK_SQL), [
+                    {'date': row['date'], 'checkpoint_id': row['checkpoint_id'], 'camera_id': row['camera_id']}
+                    for row in rows
+                ])
+                self.db_session.commit()
+                self.last_flush = datetime.utcnow()
+                self._prune_plate_sets()
+                return len(rows)
+            
+            except Exception as e:
+                self.db_session.rollback()
+                logger.error(f"Error flushing analytics rollups: {str(e)}")
+                # Keep the deltas for the next flush
+                self._merge_back(buckets)
+                return 0
+    
+    def rebuild(self, date_from: date, date_to: date) -> Dict[str, Any]:
+        """
+        Recompute rollups for past days from lpr_records.
+        
+        Existing rollups of those days are replaced. Days from today onwards
+        are skipped, since their records are also counted by the live
+        accumulators.
+        
+        Args:
+            date_from: First day to rebuild
+            date_to: Last day to rebuild (inclusive)
+        
+        Returns:
+            Dictionary with the number of rows rebuilt
+        """
+        if not self.enabled:
+            return {'success': False, 'error': 'Analytics rollups are not enabled'}
+        
+        date_to = min(date_to, local_today() - timedelta(days=1))
+        if date_to < date_from:
+            return {'success': True, 'data': {'rows': 0}}
+        
+        window = days_window(date_from, date_to)
+        
+        try:
+            # Group by site-local day and hour; the range filter stays on the bare column
+            local_timestamp = db.func.timezone(Config.SITE_TIMEZONE, db.func.timezone('UTC', LPRRecord.timestamp))
+            day = db.func.date(local_timestamp)
+            hour = db.func.extract('hour', local_timestamp)
+            hourly = self.db_session.query(
+                day, LPRRecord.camera_id, hour,
+                db.func.count(LPRRecord.id),
+                db.func.count(LPRRecord.id).filter(LPRRecord.is_blacklisted == True)
+            ).filter(within(LPRRecord.timestamp, window))\
+                .group_by(day, LPRRecord.camera_id, hour)\
+                .all()
+            distinct_plates = dict(
+                ((row[0], row[1]), row[2]) for row in self.db_session.query(
+                    day, LPRRecord.camera_id, db.func.count(db.distinct(LPRRecord.plate_number))
+                ).filter(within(LPRRecord.timestamp, window))
+                .group_by(day, LPRRecord.camera_id)
+            )
+            
+            buckets: Dict[RollupKey, Dict[str, Any]] = {}
+            for row_day, camera_id, row_hour, count, hits in hourly:
+                bucket = buckets.setdefault((row_day, None, camera_id), _new_bucket())
+                bucket['total_detections'] += count
+                bucket['total_vehicles'] += count
+                bucket['total_plates'] += count
+                bucket['blacklist_hits'] += hits
+                bucket['hourly'][str(int(row_hour))] += count
+            
+            rows = []
+            for key, bucket in buckets.items():
+                row = self._bucket_row(key, bucket, seed=False)
+                row['unique_plates'] = distinct_plates.get((key[0], key[2]), 0)
+                rows.append(row)
+            
+            self.db_session.execute(
+                text("DELETE FROM analytics WHERE date BETWEEN :date_from AND :date_to"),
+                {'date_from': date_from, 'date_to': date_to}
+            )
+            if rows:
+                self.db_session.execute(text(UPSERT_REPLACE_SQL), rows)
+                self.db_session.execute(text(UPDATE_PEAK_SQL), [
+                    {'date': row['date'], 'checkpoint_id': row['checkpoint_id'], 'camera_id': row['camera_id']}
+                    for row in rows
+                ])
+            self.db_session.commit()
+            
+            logger.info(f"Rebuilt {len(rows)} analytics rollups for {date_from} to {date_to}")
+            return {'success': True, 'data': {'rows': len(rows)}}
+        
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Error rebuilding analytics rollups: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def get_summary(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Get detection totals for dashboards.
+        
+        Reads the rollups plus deltas not flushed yet. Without rollups it
+        falls back to counting lpr_records.
+        
+        Args:
+            today: Day counted as today (default current site-local date)
+        
+        Returns:
+            Dictionary with today/total detections and per-camera counts
+        """
+        today = today or local_today()
+        
+        if self.enabled:
+            rows = self.db_session.execute(text("""
+                SELECT camera_id, SUM(total_detections), COALESCE(SUM(total_detections) FILTER (WHERE date = :today), 0)
+                FROM analytics
+                GROUP BY camera_id
+            """), {'today': today}).all()
+            totals = {camera_id: [int(total or 0), int(today_total or 0)] for camera_id, total, today_total in rows}
+            
+            with self._buckets_lock:
+                for (day, _, camera_id), bucket in self._buckets.items():
+                    counts = totals.setdefault(camera_id, [0, 0])
+                    counts[0] += bucket['total_detections']
+                    if day == today:
+                        counts[1] += bucket['total_detections']
+        else:
+            rows = self.db_session.query(
+                LPRRecord.camera_id,
+                db.func.count(LPRRecord.id),
+                db.func.count(LPRRecord.id).filter(within(LPRRecord.timestamp, day_window(today)))
+            ).group_by(LPRRecord.camera_id).all()
+            totals = {camera_id: [total, today_total] for camera_id, total, today_total in rows}
+        
+        cameras = [
+            {'camera_id': camera_id, 'count': counts[0], 'today_count': counts[1]}
+            for camera_id, counts in totals.items() if camera_id is not None
+        ]
+        return {
+            'today_records': sum(counts[1] for counts in totals.values()),
+            'total_records': sum(counts[0] for counts in totals.values()),
+            'unique_cameras': len(cameras),
+            'camera_statistics': cameras
+        }
+    
+    def get_daily_rollups(self, date_from: date, date_to: date, camera_id: Optional[str] = None,
+                          checkpoint_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get pre-aggregated rows for reports.
+        
+        Read-only: rows include deltas up to the last flush (at most
+        ANALYTICS_FLUSH_INTERVAL_SECONDS old). Flushing here would write
+        from report requests, which may be routed to a replica.
+        
+        Args:
+            date_from: First day
+            date_to: Last day (inclusive)
+            camera_id: Optional camera filter
+            checkpoint_id: Optional checkpoint filter
+        
+        Returns:
+            Dictionary with one row per (date, checkpoint, camera)
+        """
+        if not self.enabled:
+            return {'success': False, 'error': 'Analytics rollups are not enabled'}
+        
+        try:
+            sql = """
+                SELECT date, checkpoint_id, camera_id, total_detections, total_vehicles, total_plates,
+                       unique_plates, blacklist_hits, avg_processing_time_ms, peak_hour, peak_count,
+                       hourly_breakdown, vehicle_type_breakdown, plate_type_breakdown
+                FROM analytics
+                WHERE date BETWEEN :date_from AND :date_to
+            """
+            params = {'date_from': date_from, 'date_to': date_to}
+            if camera_id:
+                sql += " AND camera_id = :camera_id"
+                params['camera_id'] = camera_id
+            if checkpoint_id:
+                sql += " AND checkpoint_id = :checkpoint_id"
+                params['checkpoint_id'] = checkpoint_id
+            sql += " ORDER BY date DESC, checkpoint_id, camera_id"
+            
+            rows = self.db_session.execute(text(sql), params).mappings().all()
+            data = []
+            for row in rows:
+                item = dict(row)
+                item['date'] = item['date'].isoformat()
+                if item['avg_processing_time_ms'] is not None:
+                    item['avg_processing_time_ms'] = float(item['avg_processing_time_ms'])
+                data.append(item)
+            
+            return {'success': True, 'data': data}
+        
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Error getting analytics rollups: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def _bucket_row(self, key: RollupKey, bucket: Dict[str, Any], seed: bool = True) -> Dict[str, Any]:
+        """Turn an accumulator into upsert parameters."""
+        day, checkpoint_id, camera_id = key
+        unique_plates = 0
+        if seed:
+            plate_set = self._get_plate_set(key)
+            plate_set |= bucket['plates']
+            unique_plates = len(plate_set)
+        
+        avg_processing_time = None
+        if bucket['processing_time_count']:
+            avg_processing_time = bucket['processing_time_total'] / bucket['processing_time_count']
+        
+        return {
+            'date': day,
+            'checkpoint_id': checkpoint_id,
+            'camera_id': camera_id,
+            'total_detections': bucket['total_detections'],
+            'total_vehicles': bucket['total_vehicles'],
+            'total_plates': bucket['total_plates'],
+            'unique_plates': unique_plates,
+            'blacklist_hits': bucket['blacklist_hits'],
+            'avg_processing_time_ms': avg_processing_time,
+            'hourly_breakdown': json.dumps(bucket['hourly']),
+            'vehicle_type_breakdown': json.dumps(bucket['vehicle_types']),
+            'plate_type_breakdown': json.dumps(bucket['plate_types'])
+        }
+    
+    def _get_plate_set(self, key: RollupKey) -> Set[str]:
+        """Get the distinct plates of a rollup key, seeding it from lpr_records after a restart."""
+        plate_set = self._plate_sets.get(key)
+        if plate_set is None:
+            day, checkpoint_id, camera_id = key
+            rows = self.db_session.query(LPRRecord.plate_number).distinct()\
+                .filter(
+                    LPRRecord.camera_id == camera_id,
+                    within(LPRRecord.timestamp, day_window(day, get_timezone(checkpoint_id)))
+                )\
+                .all()
+            plate_set = self._plate_sets[key] = {row[0] for row in rows}
+        return plate_set
+    
+    def _prune_plate_sets(self):
+        """Drop plate sets of days that no longer receive detections."""
+        oldest = local_today() - timedelta(days=1)
+        for key in [key for key in self._plate_sets if key[0] < oldest]:
+            del self._plate_sets[key]
+    
+    def _merge_back(self, buckets: Dict[RollupKey, Dict[str, Any]]):
+        """Return unflushed deltas to the accumulators."""
+        with self._buckets_lock:
+            for key, bucket in buckets.items():
+                current = self._buckets.get(key)
+                if current is None:
+                    self._buckets[key] = bucket
+                    continue
+                for field in ('total_detections', 'total_vehicles', 'total_plates', 'blacklist_hits',
+                              'processing_time_total', 'processing_time_count'):
+                    current[field] += bucket[field]
+                for field in ('hourly', 'vehicle_types', 'plate_types'):
+                    current[field].update(bucket[field])
+                current['plates'] |= bucket['plates']
+    
+    def _flush_loop(self):
+        """Flush accumulators every ANALYTICS_FLUSH_INTERVAL_SECONDS."""
+        while self.running:
+            self._stop_event.wait(Config.ANALYTICS_FLUSH_INTERVAL_SECONDS)
+            try:
+                with self.app.app_context():
+                    self.flush()
+                    self.db_session.remove()
+            except Exception as e:
+                logger.error(f"Error in analytics flush loop: {str(e)}")
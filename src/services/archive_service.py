@@ -0,0 +1,542 @@
+"""
+Archive Service for columnar cold storage
+
+Aged detection and plate rows are exported to zstd-compressed Parquet files
+laid out as <dataset>/month=YYYY-MM/<camera_id|checkpoint_id>=<value>/.
+Each file is sorted by plate number and indexed in the archive_files table
+with its time and plate range. Queries prune files with that index, and
+pyarrow then pushes the plate/time/camera predicates and the selected
+columns down to the Parquet row groups. get_by_plate_number merges
+archived history with the hot lpr_records rows.
+
+Exports only ever move forward from the last exported window, so rows that
+arrive with timestamps older than ARCHIVE_MIN_AGE_DAYS after their window
+was exported stay hot-only until retention removes them.
+"""
+
+import os
+import re
+import json
+import fcntl
+import logging
+from itertools import groupby
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+from typing import Optional, List, Dict, Any
+from sqlalchemy import text, func, column, inspect, or_, Integer, String, Float, Boolean, DateTime
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.lpr_record import LPRRecord
+from core.models.archive_file import ArchiveFile
+from services.partition_service import period_start, next_period
+from config import Config
+from constants import PARTITION_INTERVAL_MONTH
+
+logger = logging.getLogger(__name__)
+
+# SQLAlchemy result types by column type name (Arrow types: ArchiveService._arrow_type)
+_TYPES = {
+    'int64': Integer,
+    'string': String,
+    'float64': Float,
+    'bool': Boolean,
+    'timestamp': DateTime
+}
+
+# Archived datasets. Every dataset has a 'timestamp' column; rows are
+# selected by time_column in [start, end) and must come back ordered by
+# partition_column first (one open file at a time), then plate number.
+ARCHIVE_DATASETS = {
+    # Every column of lpr_records: retention deletes what has been archived.
+    # Files written before the detection columns existed are partitioned by
+    # camera_id and lack them; queries read those columns as null.
+    'lpr_records': {
+        'table': 'lpr_records',
+        'time_column': 'timestamp',
+        'partition_column': 'checkpoint_id',
+        'columns': [
+            ('id', 'int64'), ('detection_id', 'string'), ('camera_id', 'string'),
+            ('checkpoint_id', 'string'), ('plate_number', 'string'), ('confidence', 'float64'),
+            ('timestamp', 'timestamp'), ('image_path', 'string'), ('plate_image_path', 'string'),
+            ('location', 'string'), ('location_lat', 'float64'), ('location_lon', 'float64'),
+            ('is_blacklisted', 'bool'), ('blacklist_reason', 'string'), ('source', 'string'),
+            ('processing_time_ms', 'float64'), ('metadata', 'string'), ('created_at', 'timestamp')
+        ],
+        'sql': """
+            SELECT id, detection_id, camera_id, checkpoint_id, plate_number, confidence, timestamp,
+                   image_path, plate_image_path, location, location_lat, location_lon,
+                   is_blacklisted, blacklist_reason, source, processing_time_ms,
+                   CAST(metadata AS TEXT) AS metadata, created_at
+            FROM lpr_records
+            WHERE timestamp >= :start AND timestamp < :end
+            ORDER BY checkpoint_id, plate_number, timestamp
+        """
+    },
+    # Legacy: detections and plates are no longer written (every protocol stores
+    # lpr_records through the detection repository). They stay here so their
+    # remaining rows are archived before retention removes them.
+    'detections': {
+        'table': 'detections',
+        'time_column': 'timestamp',
+        'partition_column': 'checkpoint_id',
+        'columns': [
+            ('id', 'int64'), ('detection_id', 'string'), ('camera_id', 'string'),
+            ('checkpoint_id', 'string'), ('timestamp', 'timestamp'), ('vehicles_count', 'int64'),
+            ('plates_count', 'int64'), ('processing_time_ms', 'int64'), ('annotated_image_path', 'string'),
+            ('confidence_score', 'float64'), ('detection_type', 'string'), ('metadata', 'string'),
+            ('created_at', 'timestamp')
+        ],
+        'sql': """
+            SELECT id, detection_id::text AS detection_id, camera_id, checkpoint_id, timestamp,
+                   vehicles_count, plates_count, processing_time_ms, annotated_image_path,
+                   confidence_score::float8 AS confidence_score, detection_type,
+                   metadata::text AS metadata, created_at
+            FROM detections
+            WHERE timestamp >= :start AND timestamp < :end
+            ORDER BY checkpoint_id, timestamp
+        """
+    },
+    'plates': {
+        'table': 'plates',
+        'time_column': 'created_at',
+        'partition_column': 'checkpoint_id',
+        'columns': [
+            ('id', 'int64'), ('detection_id', 'string'), ('plate_number', 'string'),
+            ('confidence', 'float64'), ('plate_type', 'string'), ('province', 'string'),
+            ('country', 'string'), ('ocr_processed_result', 'string'), ('is_valid', 'bool'),
+            ('cropped_image_path', 'string'), ('camera_id', 'string'), ('checkpoint_id', 'string'),
+            ('timestamp', 'timestamp'), ('created_at', 'timestamp')
+        ],
+        # Plates carry camera, checkpoint and capture time through their detection;
+        # the time bound on the join lets PostgreSQL prune detections partitions
+        'sql': """
+            SELECT p.id, p.detection_id::text AS detection_id, p.plate_number,
+                   p.confidence::float8 AS confidence, p.plate_type, p.province, p.country,
+                   p.ocr_processed_result, p.is_valid, p.cropped_image_path,
+                   d.camera_id, d.checkpoint_id, COALESCE(d.timestamp, p.created_at) AS timestamp,
+                   p.created_at
+            FROM plates p
+            LEFT JOIN detections d ON d.detection_id = p.detection_id
+                AND d.timestamp >= CAST(:start AS timestamp) - INTERVAL '1 day'
+                AND d.timestamp < CAST(:end AS timestamp) + INTERVAL '1 day'
+            WHERE p.created_at >= :start AND p.created_at < :end
+            ORDER BY d.checkpoint_id, p.plate_number, p.created_at
+        """
+    }
+}
+
+# Filters accepted by query(): camera_id and checkpoint_id apply where the dataset has them
+QUERY_FILTER_COLUMNS = ['camera_id', 'checkpoint_id']
+
+_UNSAFE_PATH_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+LOCK_FILE = 'archive.lock'
+
+def _load_pyarrow():
+    """Import pyarrow (optional dependency, needed only by the archive tier)."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.dataset
+        return pyarrow
+    except ImportError:
+        raise RuntimeError('pyarrow is required for the archive tier')
+
+class ArchiveService:
+    """
+    Service for the columnar cold-storage archive.
+    
+    This service provides:
+    - Month/partition Parquet exports of aged rows, resumable by window
+    - The archive_files metadata index
+    - Archive queries with file pruning and predicate/column pushdown
+    - Plate history spanning hot and archived records
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.run_lock = Lock()
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Archive Service.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run exports in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        os.makedirs(Config.ARCHIVE_DIR, exist_ok=True)
+        logger.info("Archive service initialized")
+    
+    def archive(self, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Export rows older than until for every dataset.
+        
+        Runs in the caller's thread; concurrent exports (also from other
+        workers) wait for each other.
+        
+        Args:
+            until: Export rows before this naive UTC time
+                   (default now minus ARCHIVE_MIN_AGE_DAYS)
+        
+        Returns:
+            Dictionary with files and rows written per dataset
+        """
+        until = until or datetime.utcnow() - timedelta(days=Config.ARCHIVE_MIN_AGE_DAYS)
+        _load_pyarrow()
+        
+        with open(os.path.join(Config.ARCHIVE_DIR, LOCK_FILE), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                results = {}
+                for name, spec in ARCHIVE_DATASETS.items():
+                    if self._table_exists(spec['table']):
+                        results[name] = self._archive_dataset(name, spec, until)
+                return results
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def start_archive(self) -> Dict[str, Any]:
+        """
+        Run archive() on a background thread unless an export is already running.
+        
+        Returns:
+            Dictionary with operation result and run information
+        """
+        with self.run_lock:
+            if self.last_run and self.last_run['status'] == 'running':
+                return {'success': True, 'message': 'Archive export already running', 'run': dict(self.last_run)}
+            self.last_run = {
+                'status': 'running',
+                'results': None,
+                'error': None,
+                'started_at': datetime.utcnow().isoformat(),
+                'finished_at': None
+            }
+            run = dict(self.last_run)
+        
+        Thread(target=self._run_archive, daemon=True).start()
+        return {'success': True, 'message': 'Archive export started', 'run': run}
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the archive contents per dataset and the last export run.
+        
+        Returns:
+            Dictionary with per-dataset file/row/byte totals and watermarks
+        """
+        rows = self.db_session.query(
+            ArchiveFile.dataset,
+            func.count(ArchiveFile.id),
+            func.sum(ArchiveFile.row_count),
+            func.sum(ArchiveFile.size_bytes),
+            func.min(ArchiveFile.min_timestamp),
+            func.max(ArchiveFile.max_timestamp),
+            func.max(ArchiveFile.window_end)
+        ).group_by(ArchiveFile.dataset).all()
+        
+        datasets = {
+            dataset: {
+                'files': files,
+                'rows': int(row_count or 0),
+                'size_bytes': int(size_bytes or 0),
+                'oldest': oldest.isoformat() if oldest else None,
+                'newest': newest.isoformat() if newest else None,
+                'watermark': watermark.isoformat() if watermark else None
+            }
+            for dataset, files, row_count, size_bytes, oldest, newest, watermark in rows
+        }
+        with self.run_lock:
+            last_run = dict(self.last_run) if self.last_run else None
+        return {'datasets': datasets, 'last_run': last_run}
+    
+    def query(self, dataset: str = 'lpr_records', plate_number: Optional[str] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None,
+              filters: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Search archived rows, newest first.
+        
+        Args:
+            dataset: Archived dataset name
+            plate_number: Exact plate number
+            start: Naive UTC lower bound (inclusive)
+            end: Naive UTC upper bound (exclusive)
+            filters: Equality filters on camera_id/checkpoint_id
+            columns: Columns to read (default all)
+            limit: Maximum number of rows
+        
+        Returns:
+            List of row dictionaries with ISO timestamps
+        
+        Raises:
+            ValueError: For an unknown dataset, column or filter
+        """
+        spec = ARCHIVE_DATASETS.get(dataset)
+        if not spec:
+            raise ValueError(f'Unknown archive dataset: {dataset}')
+        names = [name for name, _ in spec['columns']]
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        for name in list(filters) + (columns or []) + (['plate_number'] if plate_number else []):
+            if name not in names:
+                raise ValueError(f'Column {name} is not in archive dataset {dataset}')
+        
+        pa = _load_pyarrow()
+        ds = pa.dataset
+        
+        # File pruning through the metadata index
+        files = self.db_session.query(ArchiveFile).filter(ArchiveFile.dataset == dataset)
+        if start:
+            files = files.filter(ArchiveFile.max_timestamp >= start)
+        if end:
+            files = files.filter(ArchiveFile.min_timestamp < end)
+        if plate_number:
+            files = files.filter(ArchiveFile.min_plate <= plate_number, ArchiveFile.max_plate >= plate_number)
+        # Skip files partitioned by a filtered column with another value; the
+        # partition column of a dataset may have changed between exports
+        for name, value in filters.items():
+            files = files.filter(or_(ArchiveFile.partition_key != name, ArchiveFile.partition_value == value))
+        files = files.order_by(ArchiveFile.max_timestamp.desc()).all()
+        
+        # Row-group pruning and column projection inside the files
+        expression = None
+        conditions = [ds.field(name) == value for name, value in filters.items()]
+        if plate_number:
+            conditions.append(ds.field('plate_number') == plate_number)
+        if start:
+            conditions.append(ds.field('timestamp') >= pa.scalar(start, type=pa.timestamp('us')))
+        if end:
+            conditions.append(ds.field('timestamp') < pa.scalar(end, type=pa.timestamp('us')))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        
+        selected = list(dict.fromkeys((columns or names) + ['timestamp']))
+        schema = pa.schema([(column_name, self._arrow_type(pa, type_name)) for column_name, type_name in spec['columns']])
+        rows: List[Dict[str, Any]] = []
+        batch_size = Config.ARCHIVE_QUERY_FILES_PER_SCAN
+        for offset in range(0, len(files), batch_size):
+            batch = files[offset:offset + batch_size]
+            # Files are newest first: once limit rows are in hand, older files cannot displace them
+            if len(rows) >= limit and batch[0].max_timestamp and batch[0].max_timestamp < rows[limit - 1]['timestamp']:
+                break
+            paths = [os.path.join(Config.ARCHIVE_DIR, archive_file.path) for archive_file in batch]
+            # The explicit schema reads columns missing from older files as null
+            table = ds.dataset(paths, format='parquet', schema=schema).to_table(columns=selected, filter=expression)
+            rows.extend(table.to_pylist())
+            rows.sort(key=lambda row: row['timestamp'], reverse=True)
+        
+        return [self._serialize(row, columns) for row in rows[:limit]]
+    
+    def get_by_plate_number(self, plate_number: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get LPR records by plate number from the hot table and the archive.
+        
+        Like LPRRecord.get_by_plate_number, but returns dictionaries marked
+        with 'source' ('hot' or 'archive'), newest first. Rows that are
+        archived and still hot appear once.
+        
+        Args:
+            plate_number: License plate number to search for
+            limit: Maximum number of records to return
+        
+        Returns:
+            List of record dictionaries
+        """
+        hot = [dict(record.to_dict(), source='hot') for record in LPRRecord.get_by_plate_number(plate_number, limit)]
+        if not Config.ARCHIVE_ENABLED:
+            return hot
+        
+        # With a full page of hot rows, only older archived rows can still make the cut
+        end = datetime.fromisoformat(hot[-1]['timestamp']) if len(hot) >= limit and hot[-1]['timestamp'] else None
+        try:
+            archived = self.query('lpr_records', plate_number=plate_number, end=end, limit=limit)
+        except RuntimeError as e:
+            logger.warning(f"Archive search skipped: {str(e)}")
+            return hot
+        
+        hot_ids = {row['id'] for row in hot}
+        merged = hot + [dict(row, source='archive') for row in archived if row['id'] not in hot_ids]
+        merged.sort(key=lambda row: row['timestamp'] or '', reverse=True)
+        return merged[:limit]
+    
+    def _run_archive(self):
+        """Run an export on the background thread and record the outcome."""
+        try:
+            with self.app.app_context():
+                results = self.archive()
+                status, error = 'completed', None
+                logger.info(f"Archive export completed: {results}")
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Archive export failed: {str(e)}")
+            results, status, error = None, 'failed', str(e)
+        finally:
+            self.db_session.remove()
+        
+        with self.run_lock:
+            self.last_run.update(
+                status=status,
+                results=results,
+                error=error,
+                finished_at=datetime.utcnow().isoformat()
+            )
+    
+    def _archive_dataset(self, name: str, spec: Dict[str, Any], until: datetime) -> Dict[str, int]:
+        """Export one dataset month by month from its watermark up to until."""
+        watermark = self.db_session.query(func.max(ArchiveFile.window_end))\
+            .filter(ArchiveFile.dataset == name)\
+            .scalar()
+        if watermark is None:
+            oldest = self.db_session.execute(
+                text(f"SELECT MIN({spec['time_column']}) FROM {spec['table']}")
+            ).scalar()
+            self.db_session.rollback()
+            if oldest is None:
+                return {'files': 0, 'rows': 0}
+            if isinstance(oldest, str):
+                oldest = datetime.fromisoformat(oldest)
+            watermark = period_start(oldest, PARTITION_INTERVAL_MONTH)
+        
+        totals = {'files': 0, 'rows': 0}
+        start = watermark
+        while start < until:
+            end = min(next_period(period_start(start, PARTITION_INTERVAL_MONTH), PARTITION_INTERVAL_MONTH), until)
+            files = self._export_window(name, spec, start, end)
+            totals['files'] += len(files)
+            totals['rows'] += sum(archive_file.row_count for archive_file in files)
+            start = end
+        return totals
+    
+    def _export_window(self, name: str, spec: Dict[str, Any], start: datetime, end: datetime) -> List[ArchiveFile]:
+        """
+        Export the rows of one [start, end) window, one file per partition value.
+        
+        The window's files are indexed in one commit, which also advances
+        the watermark; a crashed export rewrites the same file names.
+        """
+        pa = _load_pyarrow()
+        schema = pa.schema([(column_name, self._arrow_type(pa, type_name)) for column_name, type_name in spec['columns']])
+        statement = text(spec['sql']).columns(*[column(column_name, _TYPES[type_name]) for column_name, type_name in spec['columns']])
+        partition_column = spec['partition_column']
+        
+        result = self.db_session.execute(
+            statement, {'start': start, 'end': end},
+            execution_options={'stream_results': True}
+        )
+        
+        files: List[ArchiveFile] = []
+        writer = None
+        try:
+            for batch in result.mappings().partitions(Config.ARCHIVE_ROW_GROUP_SIZE):
+                for value, group in groupby(batch, key=lambda row: row[partition_column]):
+                    group = [dict(row) for row in group]
+                    value = str(value) if value is not None else 'unknown'
+                    if writer is None or writer['value'] != value:
+                        if writer is not None:
+                            files.append(self._close_writer(writer))
+                        writer = self._open_writer(pa, schema, name, partition_column, value, start, end)
+                    writer['writer'].write_table(pa.Table.from_pylist(group, schema=schema))
+                    self._track(writer, group)
+            if writer is not None:
+                files.append(self._close_writer(writer))
+                writer = None
+        finally:
+            result.close()
+            if writer is not None:
+                writer['writer'].close()
+                os.remove(writer['tmp_path'])
+        
+        self.db_session.add_all(files)
+        self.db_session.commit()
+        if files:
+            logger.info(f"Archived {sum(f.row_count for f in files)} {name} rows from {start} to {end} into {len(files)} files")
+        return files
+    
+    def _open_writer(self, pa, schema, name: str, partition_column: str, value: str,
+                     start: datetime, end: datetime) -> Dict[str, Any]:
+        """Open a Parquet writer for one month/partition file."""
+        month = period_start(start, PARTITION_INTERVAL_MONTH)
+        relative_path = os.path.join(
+            name,
+            f"month={month.strftime('%Y-%m')}",
+            f"{partition_column}={_UNSAFE_PATH_CHARS.sub('_', value)}",
+            f"part-{start.strftime('%Y%m%dT%H%M%S')}-{end.strftime('%Y%m%dT%H%M%S')}.parquet"
+        )
+        path = os.path.join(Config.ARCHIVE_DIR, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        return {
+            'writer': pa.parquet.ParquetWriter(
+                tmp_path, schema,
+                compression=Config.ARCHIVE_COMPRESSION,
+                use_dictionary=True,
+                write_statistics=True
+            ),
+            'tmp_path': tmp_path,
+            'path': path,
+            'file': ArchiveFile(
+                dataset=name,
+                month=month.date(),
+                partition_key=partition_column,
+                partition_value=value,
+                path=relative_path,
+                row_count=0,
+                window_start=start,
+                window_end=end
+            ),
+            'value': value
+        }
+    
+    @staticmethod
+    def _track(writer: Dict[str, Any], rows: List[Dict[str, Any]]):
+        """Update a file's row count and min/max timestamp and plate."""
+        archive_file = writer['file']
+        archive_file.row_count += len(rows)
+        timestamps = [row['timestamp'] for row in rows if row['timestamp']]
+        plates = [row['plate_number'] for row in rows if row.get('plate_number')]
+        if timestamps:
+            archive_file.min_timestamp = min([archive_file.min_timestamp or timestamps[0]] + timestamps)
+            archive_file.max_timestamp = max([archive_file.max_timestamp or timestamps[0]] + timestamps)
+        if plates:
+            archive_file.min_plate = min([archive_file.min_plate or plates[0]] + plates)
+            archive_file.max_plate = max([archive_file.max_plate or plates[0]] + plates)
+    
+    @staticmethod
+    def _close_writer(writer: Dict[str, Any]) -> ArchiveFile:
+        """Close a writer and move its file into place."""
+        writer['writer'].close()
+        os.replace(writer['tmp_path'], writer['path'])
+        writer['file'].size_bytes = os.path.getsize(writer['path'])
+        return writer['file']
+    
+    @staticmethod
+    def _arrow_type(pa, type_name: str):
+        """Map a column type name to an Arrow type."""
+        return {
+            'int64': pa.int64(),
+            'string': pa.string(),
+            'float64': pa.float64(),
+            'bool': pa.bool_(),
+            'timestamp': pa.timestamp('us')
+        }[type_name]
+    
+    @staticmethod
+    def _serialize(row: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+        """Convert datetimes to ISO strings, decode metadata and drop columns that were only read for sorting."""
+        row = {key: value for key, value in row.items() if columns is None or key in columns}
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row[key] = value.isoformat()
+            elif key == 'metadata' and isinstance(value, str):
+                row[key] = json.loads(value)
+        return row
+    
+    def _table_exists(self, table: str) -> bool:
+        """Whether a table exists in the database."""
+        return inspect(self.db_session.get_bind()).has_table(table)
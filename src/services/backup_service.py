@@ -0,0 +1,707 @@
+"""
+Backup Service for PostgreSQL backup and restore
+
+Full backups are pg_dump directory archives written with parallel jobs and
+compression. Incremental backups stream only the rows added since the
+previous backup's watermark with COPY, plus a snapshot of the small
+mutable tables, into compressed CSV files. Every backup directory has a
+manifest.json, and the manifests form a chain from the last full backup.
+Restores replay the chain: pg_restore the full backup, then merge each
+incremental in order. Snapshot tables are upserted, so rows deleted from
+them after the full backup are kept.
+
+Jobs run one at a time on a background thread. A lock file makes this hold
+across gunicorn workers, and progress is written to a job file that any
+worker can read.
+"""
+
+import os
+import re
+import json
+import gzip
+import uuid
+import fcntl
+import shutil
+import logging
+import subprocess
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from config import Config
+from constants import (
+    JOB_STATUS_PENDING, JOB_STATUS_RUNNING, JOB_STATUS_COMPLETED, JOB_STATUS_FAILED,
+    BACKUP_TYPE_FULL, BACKUP_TYPE_INCREMENTAL, BACKUP_TYPES
+)
+
+logger = logging.getLogger(__name__)
+
+# Append-only tables and the column holding their (UTC) insert time;
+# incrementals copy rows in [previous watermark, new watermark)
+APPEND_ONLY_TABLES = {
+    'lpr_records': 'created_at',
+    'health_checks': 'timestamp',
+    'detections': 'created_at',
+    'vehicles': 'created_at',
+    'plates': 'created_at',
+    'health_logs': 'created_at',
+    'archive_files': 'created_at'
+}
+
+# Tables whose rows are updated in place; incrementals copy them whole.
+# stored_images is larger than the rest, but its ref counts must match the
+# restored records or ImageStore.release() unlinks files still in use.
+SNAPSHOT_TABLES = [
+    'cameras', 'blacklist_plates', 'checkpoints', 'blacklist', 'analytics',
+    'stored_images', 'image_storage_usage', 'image_policy_stats'
+]
+
+MANIFEST_FILE = 'manifest.json'
+JOB_FILE = 'job.json'
+LOCK_FILE = 'backup.lock'
+
+_DUMP_PROGRESS = re.compile(r'dumping contents of table "([^"]+)"')
+_RESTORE_PROGRESS = re.compile(r'processing data for table "([^"]+)"|launching item \d+ TABLE DATA \S+ (\S+)')
+_TOOL_VERSION = re.compile(r'(\d+)(?:\.\d+)?')
+
+class BackupService:
+    """
+    Service for PostgreSQL backups and restores.
+    
+    This service provides:
+    - Full backups with pg_dump -Fd -j N and gzip/zstd compression
+    - Incremental backups of rows added since the last watermark
+    - Restores with pg_restore -j N followed by the incremental chain
+    - Job progress for the system maintenance API
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.job: Optional[Dict[str, Any]] = None
+        self.job_lock = Lock()
+        self._lock_file = None
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Backup Service.
+        
+        A job left running by a server that has since stopped is marked as
+        failed; pg_dump and pg_restore cannot resume.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run jobs in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        os.makedirs(Config.BACKUP_DIR, exist_ok=True)
+        
+        job = self._read_job_file()
+        if job and job['status'] in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING) and self._acquire_lock():
+            try:
+                self.job = job
+                self._update_job(
+                    status=JOB_STATUS_FAILED,
+                    error='Interrupted by server restart',
+                    finished_at=datetime.utcnow().isoformat()
+                )
+            finally:
+                self._release_lock()
+        
+        logger.info("Backup service initialized")
+    
+    def is_supported(self) -> bool:
+        """Whether the database is PostgreSQL."""
+        return self.db_session is not None and self.db_session.get_bind().dialect.name == 'postgresql'
+    
+    def start_backup(self, backup_type: str = BACKUP_TYPE_FULL) -> Dict[str, Any]:
+        """
+        Start a full or incremental backup unless a job is already running.
+        
+        Args:
+            backup_type: BACKUP_TYPE_FULL or BACKUP_TYPE_INCREMENTAL
+        
+        Returns:
+            Dictionary with operation result and job information
+        """
+        if backup_type not in BACKUP_TYPES:
+            return {'success': False, 'message': f'Unknown backup type: {backup_type}', 'job': None}
+        
+        if backup_type == BACKUP_TYPE_INCREMENTAL and not self._latest_manifest():
+            return {'success': False, 'message': 'No full backup to build on; run a full backup first', 'job': None}
+        
+        backup_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{backup_type}"
+        return self._start_job({
+            'operation': 'backup',
+            'backup_type': backup_type,
+            'backup_id': backup_id
+        }, self._run_full_backup if backup_type == BACKUP_TYPE_FULL else self._run_incremental_backup)
+    
+    def start_restore(self, backup_id: str) -> Dict[str, Any]:
+        """
+        Start restoring a backup and the chain of backups it depends on.
+        
+        Stop ingest before restoring: the full restore drops and recreates
+        the tables.
+        
+        Args:
+            backup_id: ID of a full or incremental backup
+        
+        Returns:
+            Dictionary with operation result and job information
+        """
+        try:
+            chain = self._backup_chain(backup_id)
+        except ValueError as e:
+            return {'success': False, 'message': str(e), 'job': None}
+        
+        return self._start_job({
+            'operation': 'restore',
+            'backup_type': chain[-1]['backup_type'],
+            'backup_id': backup_id,
+            'chain': [manifest['backup_id'] for manifest in chain]
+        }, self._run_restore)
+    
+    def get_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of the current or last backup/restore job.
+        
+        The job file is read so that any worker reports the progress of a
+        job running in another worker.
+        
+        Returns:
+            Job dictionary or None if no job has run
+        """
+        with self.job_lock:
+            if self.job and self.job['status'] in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING):
+                return dict(self.job)
+        return self._read_job_file()
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """
+        List completed backups, newest first.
+        
+        Returns:
+            List of manifests without per-table details
+        """
+        backups = []
+        for manifest in self._manifests():
+            summary = {key: value for key, value in manifest.items() if key not in ('tables', 'partitions')}
+            summary['table_count'] = len(manifest.get('tables', []))
+            backups.append(summary)
+        return backups
+    
+    def _start_job(self, fields: Dict[str, Any], target) -> Dict[str, Any]:
+        """Take the backup lock, record the job and run target on a daemon thread."""
+        if not self.is_supported():
+            return {'success': False, 'message': 'Backups through BackupService require PostgreSQL', 'job': None}
+        
+        if not self._acquire_lock():
+            return {
+                'success': True,
+                'message': 'Backup job already running',
+                'job': self.get_job()
+            }
+        
+        now = datetime.utcnow().isoformat()
+        with self.job_lock:
+            self.job = {
+                'job_id': str(uuid.uuid4()),
+                'status': JOB_STATUS_PENDING,
+                **fields,
+                'stage': 'starting',
+                'tables_total': 0,
+                'tables_done': 0,
+                'current_table': None,
+                'rows': 0,
+                'bytes': 0,
+                'progress': 0.0,
+                'error': None,
+                'started_at': now,
+                'updated_at': now,
+                'finished_at': None
+            }
+            self._write_job_file()
+            job = dict(self.job)
+        
+        Thread(target=self._run_job, args=(target,), daemon=True).start()
+        logger.info(f"Backup job {job['job_id']} started ({job['operation']} {job['backup_id']})")
+        
+        return {
+            'success': True,
+            'message': f"{job['operation'].capitalize()} job started",
+            'job': job
+        }
+    
+    def _run_job(self, target):
+        """Run a job, record its outcome and release the lock."""
+        try:
+            with self.app.app_context():
+                self._update_job(status=JOB_STATUS_RUNNING)
+                target()
+                self._update_job(
+                    status=JOB_STATUS_COMPLETED,
+                    stage='done',
+                    progress=100.0,
+                    current_table=None,
+                    finished_at=datetime.utcnow().isoformat()
+                )
+                logger.info(f"Backup job {self.job['job_id']} completed: {self.job['operation']} {self.job['backup_id']}")
+        
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Backup job failed: {str(e)}")
+            self._update_job(
+                status=JOB_STATUS_FAILED,
+                error=str(e),
+                finished_at=datetime.utcnow().isoformat()
+            )
+        finally:
+            self.db_session.remove()
+            self._release_lock()
+    
+    def _run_full_backup(self):
+        """Dump the whole database with pg_dump -Fd -j N."""
+        backup_id = self.job['backup_id']
+        path = os.path.join(Config.BACKUP_DIR, backup_id)
+        partial_path = f"{path}.partial"
+        shutil.rmtree(partial_path, ignore_errors=True)
+        
+        # Rows inserted up to the watermark are certainly in the dump's
+        # snapshot; the next incremental starts there (rows in both are
+        # merged without duplicates on restore)
+        watermark = self._watermark()
+        self._update_job(stage='dump', tables_total=self._count_data_tables())
+        
+        command = [
+            Config.PG_DUMP_PATH,
+            '--format=directory',
+            f'--jobs={Config.BACKUP_JOBS}',
+            f'--file={partial_path}',
+            '--verbose',
+            '--no-password',
+            *self._dump_compression_args()
+        ]
+        self._run_tool(command, _DUMP_PROGRESS)
+        
+        self._write_manifest(partial_path, {
+            'backup_id': backup_id,
+            'backup_type': BACKUP_TYPE_FULL,
+            'parent': None,
+            'format': 'directory',
+            'compression': self._dump_compression_name(),
+            'watermark_from': None,
+            'watermark': watermark.isoformat(),
+            'tables': [],
+            'partitions': self._list_partitions()
+        })
+        os.replace(partial_path, path)
+    
+    def _run_incremental_backup(self):
+        """Copy rows added since the previous backup, in one snapshot."""
+        parent = self._latest_manifest()
+        if not parent:
+            raise RuntimeError('No full backup to build on; run a full backup first')
+        
+        backup_id = self.job['backup_id']
+        path = os.path.join(Config.BACKUP_DIR, backup_id)
+        partial_path = f"{path}.partial"
+        shutil.rmtree(partial_path, ignore_errors=True)
+        os.makedirs(partial_path)
+        
+        watermark_from = datetime.fromisoformat(parent['watermark'])
+        watermark = self._watermark()
+        compression, extension = self._copy_compression()
+        
+        connection = self.db_session.get_bind().raw_connection()
+        try:
+            cursor = connection.cursor()
+            # One snapshot for all tables
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            
+            # Snapshot tables first: on restore, new cameras must exist before their records
+            tables = [(table, None) for table in SNAPSHOT_TABLES if self._table_exists(cursor, table)]
+            tables += [(table, column) for table, column in APPEND_ONLY_TABLES.items() if self._table_exists(cursor, table)]
+            self._update_job(stage='copy', tables_total=len(tables))
+            
+            entries = []
+            for table, column in tables:
+                self._update_job(current_table=table)
+                columns = self._table_columns(cursor, table)
+                select = f"SELECT {', '.join(columns)} FROM {table}"
+                if column:
+                    select += cursor.mogrify(f" WHERE {column} >= %s AND {column} < %s", (watermark_from, watermark)).decode()
+                
+                file_name = f"{table}.csv{extension}"
+                with self._open_compressed(os.path.join(partial_path, file_name), 'wb', compression) as f:
+                    cursor.copy_expert(f"COPY ({select}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+                rows = max(cursor.rowcount, 0)
+                size = os.path.getsize(os.path.join(partial_path, file_name))
+                
+                entries.append({
+                    'table': table,
+                    'file': file_name,
+                    'mode': 'append' if column else 'snapshot',
+                    'columns': columns,
+                    'rows': rows
+                })
+                self._advance(table, rows=rows, size=size)
+            
+            partitions = self._list_partitions(cursor)
+        finally:
+            connection.rollback()
+            connection.close()
+        
+        self._write_manifest(partial_path, {
+            'backup_id': backup_id,
+            'backup_type': BACKUP_TYPE_INCREMENTAL,
+            'parent': parent['backup_id'],
+            'format': 'copy',
+            'compression': compression,
+            'watermark_from': watermark_from.isoformat(),
+            'watermark': watermark.isoformat(),
+            'tables': entries,
+            'partitions': partitions
+        })
+        os.replace(partial_path, path)
+    
+    def _run_restore(self):
+        """pg_restore the full backup, then merge each incremental in order."""
+        chain = [self._read_manifest(backup_id) for backup_id in self.job['chain']]
+        full, incrementals = chain[0], chain[1:]
+        full_path = os.path.join(Config.BACKUP_DIR, full['backup_id'])
+        
+        data_items = self._count_archive_data(full_path)
+        self._update_job(
+            stage='pg_restore',
+            tables_total=data_items + sum(len(manifest['tables']) for manifest in incrementals)
+        )
+        
+        command = [
+            Config.PG_RESTORE_PATH,
+            '--clean',
+            '--if-exists',
+            '--no-owner',
+            f'--jobs={Config.BACKUP_JOBS}',
+            '--verbose',
+            '--no-password',
+            f"--dbname={self.db_session.get_bind().url.database}",
+            full_path
+        ]
+        self._run_tool(command, _RESTORE_PROGRESS)
+        
+        for manifest in incrementals:
+            self._update_job(stage=f"incremental {manifest['backup_id']}")
+            self._apply_incremental(manifest)
+    
+    def _apply_incremental(self, manifest: Dict[str, Any]):
+        """Merge one incremental backup into the restored database."""
+        path = os.path.join(Config.BACKUP_DIR, manifest['backup_id'])
+        connection = self.db_session.get_bind().raw_connection()
+        try:
+            cursor = connection.cursor()
+            
+            # Partitions created after the previous backup
+            for partition in manifest['partitions']:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {partition['name']} PARTITION OF {partition['parent']} {partition['bound']}"
+                )
+            connection.commit()
+            
+            for entry in manifest['tables']:
+                table, columns = entry['table'], entry['columns']
+                self._update_job(current_table=table)
+                
+                cursor.execute(f"CREATE TEMP TABLE restore_rows (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                with self._open_compressed(os.path.join(path, entry['file']), 'rb', manifest['compression']) as f:
+                    cursor.copy_expert(
+                        f"COPY restore_rows ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER)", f
+                    )
+                
+                column_list = ', '.join(columns)
+                conflict = 'DO NOTHING'
+                if entry['mode'] == 'snapshot':
+                    key = self._primary_key(cursor, table)
+                    updates = [column for column in columns if column not in key]
+                    if key and updates:
+                        conflict = f"({', '.join(key)}) DO UPDATE SET " + \
+                            ', '.join(f"{column} = EXCLUDED.{column}" for column in updates)
+                cursor.execute(
+                    f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM restore_rows ON CONFLICT {conflict}"
+                )
+                rows = max(cursor.rowcount, 0)
+                self._reset_sequences(cursor, table)
+                connection.commit()
+                self._advance(table, rows=rows)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+    
+    def _run_tool(self, command: List[str], progress_pattern):
+        """Run pg_dump/pg_restore, tracking per-table progress from its verbose output."""
+        tail = deque(maxlen=20)
+        process = subprocess.Popen(
+            command,
+            env=self._libpq_env(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        for line in process.stderr:
+            line = line.strip()
+            tail.append(line)
+            match = progress_pattern.search(line)
+            if match:
+                self._advance(next(group for group in match.groups() if group))
+        
+        if process.wait() != 0:
+            raise RuntimeError(f"{os.path.basename(command[0])} exited with code {process.returncode}: "
+                               f"{' | '.join(tail)}")
+    
+    def _advance(self, table: str, rows: int = 0, size: int = 0):
+        """Count one more table as done."""
+        with self.job_lock:
+            done = self.job['tables_done'] + 1
+            total = max(self.job['tables_total'], done)
+        self._update_job(
+            current_table=table,
+            tables_done=done,
+            rows=self.job['rows'] + rows,
+            bytes=self.job['bytes'] + size,
+            progress=round(done * 100.0 / total, 1)
+        )
+    
+    def _libpq_env(self) -> Dict[str, str]:
+        """Environment for pg_dump/pg_restore with the connection settings (password stays off the command line)."""
+        url = self.db_session.get_bind().url
+        env = dict(os.environ)
+        for name, value in [('PGHOST', url.host), ('PGPORT', url.port), ('PGUSER', url.username),
+                            ('PGPASSWORD', url.password), ('PGDATABASE', url.database)]:
+            if value is not None:
+                env[name] = str(value)
+        return env
+    
+    def _watermark(self) -> datetime:
+        """Get the server's current UTC time minus the settle interval for in-flight inserts."""
+        now = self.db_session.execute(text("SELECT now() AT TIME ZONE 'UTC'")).scalar()
+        self.db_session.rollback()
+        return now - timedelta(seconds=Config.BACKUP_SETTLE_SECONDS)
+    
+    def _count_data_tables(self) -> int:
+        """Count the tables pg_dump will dump data for."""
+        count = self.db_session.execute(text("""
+            SELECT COUNT(*)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'm')
+              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+              AND n.nspname NOT LIKE 'pg_toast%'
+        """)).scalar()
+        self.db_session.rollback()
+        return count
+    
+    def _count_archive_data(self, path: str) -> int:
+        """Count the TABLE DATA entries of a pg_dump archive."""
+        listing = subprocess.run(
+            [Config.PG_RESTORE_PATH, '--list', path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        return sum(1 for line in listing.splitlines() if ' TABLE DATA ' in line and not line.startswith(';'))
+    
+    def _list_partitions(self, cursor=None) -> List[Dict[str, str]]:
+        """List every partition with its parent and bound, so a restore can recreate new ones."""
+        sql = """
+            SELECT c.relname, p.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relkind = 'p' AND c.relpartbound IS NOT NULL
+            ORDER BY p.relname, c.relname
+        """
+        if cursor is not None:
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+        else:
+            rows = self.db_session.execute(text(sql)).all()
+            self.db_session.rollback()
+        return [{'name': name, 'parent': parent, 'bound': bound} for name, parent, bound in rows]
+    
+    @staticmethod
+    def _table_exists(cursor, table: str) -> bool:
+        """Whether a table exists."""
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+        return cursor.fetchone()[0]
+    
+    @staticmethod
+    def _table_columns(cursor, table: str) -> List[str]:
+        """Get a table's column names in definition order."""
+        cursor.execute("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """, (table,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _primary_key(cursor, table: str) -> List[str]:
+        """Get a table's primary key columns."""
+        cursor.execute("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = to_regclass(%s) AND i.indisprimary
+        """, (table,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _reset_sequences(cursor, table: str):
+        """Move serial sequences past the highest restored id."""
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+        sequence = cursor.fetchone()[0]
+        if sequence:
+            cursor.execute(f"SELECT setval(%s, GREATEST((SELECT COALESCE(MAX(id), 0) FROM {table}), 1))", (sequence,))
+    
+    def _dump_compression_args(self) -> List[str]:
+        """pg_dump compression arguments (zstd needs pg_dump 16 or newer)."""
+        level = Config.BACKUP_COMPRESSION_LEVEL
+        if self._tool_major_version(Config.PG_DUMP_PATH) >= 16:
+            return [f'--compress={self._dump_compression_name()}:{level}']
+        return [f'--compress={level}']
+    
+    def _dump_compression_name(self) -> str:
+        """Compression method pg_dump will use."""
+        if Config.BACKUP_COMPRESSION == 'zstd' and self._tool_major_version(Config.PG_DUMP_PATH) >= 16:
+            return 'zstd'
+        return 'gzip'
+    
+    @staticmethod
+    def _tool_major_version(path: str) -> int:
+        """Get the major version of a PostgreSQL client tool."""
+        output = subprocess.run([path, '--version'], capture_output=True, text=True, check=True).stdout
+        match = _TOOL_VERSION.search(output.rsplit(' ', 1)[-1])
+        return int(match.group(1)) if match else 0
+    
+    @staticmethod
+    def _copy_compression() -> Tuple[str, str]:
+        """Compression method and file extension for incremental COPY files."""
+        if Config.BACKUP_COMPRESSION == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+                return 'zstd', '.zst'
+            except ImportError:
+                logger.warning("zstandard is not installed; incremental backups use gzip")
+        return 'gzip', '.gz'
+    
+    @staticmethod
+    def _open_compressed(path: str, mode: str, compression: str):
+        """Open a compressed file for binary streaming."""
+        if compression == 'zstd':
+            import zstandard
+            if mode == 'wb':
+                return zstandard.ZstdCompressor(level=Config.BACKUP_COMPRESSION_LEVEL).stream_writer(open(path, 'wb'))
+            return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return gzip.open(path, mode, compresslevel=Config.BACKUP_COMPRESSION_LEVEL)
+    
+    def _manifests(self) -> List[Dict[str, Any]]:
+        """Read every completed backup's manifest, newest first."""
+        manifests = []
+        for name in os.listdir(Config.BACKUP_DIR):
+            manifest = self._read_manifest(name)
+            if manifest:
+                manifests.append(manifest)
+        manifests.sort(key=lambda manifest: manifest['created_at'], reverse=True)
+        return manifests
+    
+    def _latest_manifest(self) -> Optional[Dict[str, Any]]:
+        """Get the newest completed backup."""
+        manifests = self._manifests()
+        return manifests[0] if manifests else None
+    
+    def _backup_chain(self, backup_id: str) -> List[Dict[str, Any]]:
+        """Get the manifests from the base full backup to backup_id."""
+        chain = []
+        current = backup_id
+        while current:
+            manifest = self._read_manifest(current)
+            if not manifest:
+                raise ValueError(f'Backup not found: {current}')
+            chain.append(manifest)
+            current = manifest['parent']
+        chain.reverse()
+        return chain
+    
+    def _read_manifest(self, backup_id: str) -> Optional[Dict[str, Any]]:
+        """Read a backup's manifest, or None if it is not a completed backup."""
+        if os.path.basename(backup_id) != backup_id:
+            return None
+        try:
+            with open(os.path.join(Config.BACKUP_DIR, backup_id, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_manifest(self, path: str, manifest: Dict[str, Any]):
+        """Write a backup's manifest."""
+        manifest['created_at'] = datetime.utcnow().isoformat()
+        manifest['size_bytes'] = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        )
+        with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        self._update_job(bytes=manifest['size_bytes'])
+    
+    def _acquire_lock(self) -> bool:
+        """Take the cross-process backup lock without waiting."""
+        lock_file = open(os.path.join(Config.BACKUP_DIR, LOCK_FILE), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def _release_lock(self):
+        """Release the backup lock."""
+        if self._lock_file:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def _update_job(self, **fields):
+        """Update the current job and write the job file."""
+        with self.job_lock:
+            self.job.update(fields, updated_at=datetime.utcnow().isoformat())
+            self._write_job_file()
+    
+    def _write_job_file(self):
+        """Write the current job to the job file atomically."""
+        path = os.path.join(Config.BACKUP_DIR, JOB_FILE)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.job, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write backup job file: {str(e)}")
+    
+    def _read_job_file(self) -> Optional[Dict[str, Any]]:
+        """Read the job file, if any."""
+        try:
+            with open(os.path.join(Config.BACKUP_DIR, JOB_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read backup job file: {str(e)}")
+            return None
@@ -0,0 +1,425 @@
+"""
+Blacklist Alert Service for coalesced, asynchronous alert delivery
+
+This service takes blacklist alerts off the ingest path. Alerts are
+de-duplicated per (plate, camera) within a configurable window, queued, and
+delivered by a dedicated worker to Socket.IO rooms, MQTT and webhooks.
+
+On PostgreSQL the windows live in the blacklist_alert_windows table, so all
+worker processes share them: the worker that opens a window sends the alert,
+the others only bump its counters, and whichever worker deletes the expired
+row publishes the counter update. Other databases keep the windows in
+process memory.
+"""
+
+import time
+import uuid
+import queue
+import logging
+import requests
+from datetime import datetime, timedelta
+from threading import BoundedSemaphore, Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+from sqlalchemy import DateTime, text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from services.image_store import image_url
+from config import Config
+from constants import WS_EVENT_BLACKLIST_ALERT, WS_EVENT_BLACKLIST_ALERT_UPDATE, IMAGE_DERIVATIVE_THUMBNAIL
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO rooms that receive blacklist alerts
+ALERT_ROOMS = ('dashboard', 'health_monitoring')
+
+# How often the worker checks for closed coalescing windows
+FLUSH_INTERVAL_SECONDS = 1.0
+
+# A sighting inside an open window only bumps its counter
+BUMP_WINDOW_SQL = """
+    UPDATE blacklist_alert_windows
+    SET sightings = sightings + 1, last_seen = :seen
+    WHERE plate_number = :plate_number AND camera_id = :camera_id AND opened_at > :cutoff
+    RETURNING alert_id
+"""
+
+# Opens a window unless another worker already holds one for the pair
+OPEN_WINDOW_SQL = """
+    INSERT INTO blacklist_alert_windows
+        (plate_number, camera_id, alert_id, opened_at, sightings, reported_sightings, last_seen)
+    VALUES (:plate_number, :camera_id, :alert_id, :seen, 1, 1, :seen)
+    ON CONFLICT (plate_number, camera_id) DO NOTHING
+    RETURNING alert_id
+"""
+
+# Expired windows are deleted by exactly one worker, which reports their repeats
+CLOSE_WINDOWS_SQL = """
+    DELETE FROM blacklist_alert_windows
+    WHERE opened_at <= :cutoff
+    RETURNING plate_number, camera_id, alert_id, sightings, reported_sightings, last_seen
+"""
+
+CLOSE_WINDOW_SQL = """
+    DELETE FROM blacklist_alert_windows
+    WHERE plate_number = :plate_number AND camera_id = :camera_id AND opened_at <= :cutoff
+    RETURNING plate_number, camera_id, alert_id, sightings, reported_sightings, last_seen
+"""
+
+class BlacklistAlertService:
+    """
+    Service for dispatching blacklist alerts.
+    
+    This service provides:
+    - Per (plate, camera) de-duplication within a time window, shared by
+      all workers on PostgreSQL
+    - Aggregation of repeat sightings into counter updates
+    - A bounded queue so alerting never blocks ingest
+    - Fan-out to Socket.IO rooms and MQTT from a worker thread
+    - Webhook POSTs on their own thread pool
+    """
+    
+    def __init__(self):
+        self.socketio = None
+        self.engine = None
+        self.persisted = False
+        self.alert_queue: queue.Queue = queue.Queue(maxsize=Config.BLACKLIST_ALERT_QUEUE_SIZE)
+        self.worker_thread = None
+        self.webhook_pool = None
+        self.webhook_slots = None
+        self.running = False
+        
+        # (plate, camera_id) -> open coalescing window (when not persisted)
+        self._windows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._windows_lock = Lock()
+        
+        # Metrics
+        self.metrics = {
+            'alerts_submitted': 0,
+            'alerts_coalesced': 0,
+            'alerts_dropped': 0,
+            'alerts_delivered': 0,
+            'updates_delivered': 0,
+            'mqtt_failures': 0,
+            'webhook_failures': 0,
+            'webhooks_dropped': 0
+        }
+    
+    def initialize(self, socketio=None, db_session=None):
+        """
+        Initialize the Blacklist Alert Service and start the delivery worker.
+        
+        Args:
+            socketio: SocketIO instance for real-time alerts
+            db_session: Database session, whose engine holds the shared windows
+        """
+        self.socketio = socketio
+        if db_session is not None:
+            self.engine = db_session.get_bind()
+            self.persisted = self.engine.dialect.name == 'postgresql'
+        
+        if Config.BLACKLIST_ALERT_WEBHOOK_URLS:
+            self.webhook_pool = ThreadPoolExecutor(
+                max_workers=Config.BLACKLIST_ALERT_WEBHOOK_WORKERS,
+                thread_name_prefix='blacklist-webhook'
+            )
+            self.webhook_slots = BoundedSemaphore(Config.BLACKLIST_ALERT_QUEUE_SIZE)
+        
+        self.running = True
+        self.worker_thread = Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+        logger.info(f"Blacklist alert service initialized (shared windows: {self.persisted})")
+    
+    def stop(self):
+        """Stop the delivery worker and the webhook pool."""
+        self.running = False
+        if self.webhook_pool is not None:
+            self.webhook_pool.shutdown(wait=False)
+    
+    def submit(self, lpr_record, blacklist_entry) -> bool:
+        """
+        Submit a blacklist sighting without waiting for delivery.
+        
+        The first sighting of a (plate, camera) pair is queued as a full alert.
+        Further sightings inside the coalescing window only bump a counter,
+        which the worker publishes as one update when the window closes.
+        
+        Args:
+            lpr_record: LPR record that triggered the alert
+            blacklist_entry: Blacklist entry that matched
+        
+        Returns:
+            True if the sighting was queued or coalesced, False if dropped
+        """
+        self.metrics['alerts_submitted'] += 1
+        if self.persisted:
+            return self._submit_shared(lpr_record, blacklist_entry)
+        return self._submit_local(lpr_record, blacklist_entry)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get dispatcher state and delivery metrics.
+        
+        Returns:
+            Dictionary with queue depth, open windows and metrics
+        """
+        if self.persisted:
+            open_windows = self._count_shared_windows()
+        else:
+            with self._windows_lock:
+                open_windows = len(self._windows)
+        
+        return {
+            'running': self.running,
+            'queue_size': self.alert_queue.qsize(),
+            'open_windows': open_windows,
+            'shared_windows': self.persisted,
+            'coalesce_seconds': Config.BLACKLIST_ALERT_COALESCE_SECONDS,
+            'webhooks': len(Config.BLACKLIST_ALERT_WEBHOOK_URLS),
+            'metrics': dict(self.metrics)
+        }
+    
+    def _submit_local(self, lpr_record, blacklist_entry) -> bool:
+        """Coalesce a sighting against the windows of this process."""
+        now = time.monotonic()
+        key = (lpr_record.plate_number, lpr_record.camera_id)
+        
+        with self._windows_lock:
+            window = self._windows.get(key)
+            if window and now - window['opened_at'] < Config.BLACKLIST_ALERT_COALESCE_SECONDS:
+                window['sightings'] += 1
+                window['last_seen'] = datetime.utcnow()
+                self.metrics['alerts_coalesced'] += 1
+                return True
+            
+            alert = self._build_alert(lpr_record, blacklist_entry)
+            if not self._enqueue(WS_EVENT_BLACKLIST_ALERT, alert):
+                return False
+            
+            # The window opens only once its alert is queued
+            self._windows[key] = {
+                'alert_id': alert['alert_id'],
+                'opened_at': now,
+                'sightings': 1,
+                'reported_sightings': 1,
+                'last_seen': datetime.utcnow()
+            }
+        
+        if window:
+            self._enqueue_update(key[0], key[1], window)
+        return True
+    
+    def _submit_shared(self, lpr_record, blacklist_entry) -> bool:
+        """
+        Coalesce a sighting against the windows shared by all workers.
+        
+        The window row is committed only after its alert is queued; when the
+        queue is full the transaction is rolled back and no window opens.
+        """
+        now = datetime.utcnow()
+        params = {
+            'plate_number': lpr_record.plate_number,
+            'camera_id': lpr_record.camera_id,
+            'seen': now,
+            'cutoff': now - timedelta(seconds=Config.BLACKLIST_ALERT_COALESCE_SECONDS)
+        }
+        queued = False
+        
+        try:
+            with self.engine.connect() as conn:
+                if conn.execute(text(BUMP_WINDOW_SQL), params).first():
+                    conn.commit()
+                    self.metrics['alerts_coalesced'] += 1
+                    return True
+                
+                closed = conn.execute(text(CLOSE_WINDOW_SQL).columns(last_seen=DateTime), params).mappings().all()
+                alert = self._build_alert(lpr_record, blacklist_entry)
+                
+                if not conn.execute(text(OPEN_WINDOW_SQL), {**params, 'alert_id': alert['alert_id']}).first():
+                    # Another worker opened the window first
+                    conn.execute(text(BUMP_WINDOW_SQL), params)
+                    conn.commit()
+                    self.metrics['alerts_coalesced'] += 1
+                    return True
+                
+                queued = self._enqueue(WS_EVENT_BLACKLIST_ALERT, alert)
+                if not queued:
+                    conn.rollback()
+                    return False
+                conn.commit()
+            
+            for window in closed:
+                self._enqueue_update(window['plate_number'], window['camera_id'], window)
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error coalescing blacklist alert for {lpr_record.plate_number}: {str(e)}")
+            if queued:
+                return True
+            # Alert without coalescing rather than miss the sighting
+            return self._enqueue(WS_EVENT_BLACKLIST_ALERT, self._build_alert(lpr_record, blacklist_entry))
+    
+    def _count_shared_windows(self):
+        """Number of open windows in blacklist_alert_windows (None on error)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=Config.BLACKLIST_ALERT_COALESCE_SECONDS)
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(
+                    text("SELECT COUNT(*) FROM blacklist_alert_windows WHERE opened_at > :cutoff"),
+                    {'cutoff': cutoff}
+                ).scalar()
+        except Exception as e:
+            logger.error(f"Error counting blacklist alert windows: {str(e)}")
+            return None
+    
+    def _build_alert(self, lpr_record, blacklist_entry) -> Dict[str, Any]:
+        """Build a compact alert payload from a record and its blacklist entry."""
+        camera = get_service('camera_registry_service').get_camera(lpr_record.camera_id) or {}
+        return {
+            'type': WS_EVENT_BLACKLIST_ALERT,
+            'alert_id': str(uuid.uuid4()),
+            'record_id': lpr_record.id,
+            'plate_number': lpr_record.plate_number,
+            'camera_id': lpr_record.camera_id,
+            'camera_name': camera.get('name'),
+            'checkpoint_id': camera.get('checkpoint_id'),
+            'confidence': lpr_record.confidence,
+            'location': lpr_record.location or camera.get('location'),
+            'image_path': lpr_record.image_path,
+            # Immutable content-hash URL, so every dashboard after the first hits its browser cache
+            'image_url': image_url(lpr_record.image_path),
+            'thumbnail_url': image_url(lpr_record.image_path, IMAGE_DERIVATIVE_THUMBNAIL),
+            'detected_at': lpr_record.timestamp.isoformat() if lpr_record.timestamp else datetime.utcnow().isoformat(),
+            'blacklist_id': blacklist_entry.id,
+            'reason': blacklist_entry.reason,
+            'sightings': 1,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    def _enqueue(self, event: str, payload: Dict[str, Any]) -> bool:
+        """Queue an event for delivery, dropping it if the queue is full."""
+        try:
+            self.alert_queue.put_nowait((event, payload))
+            return True
+        except queue.Full:
+            self.metrics['alerts_dropped'] += 1
+            logger.warning(f"Blacklist alert queue full, dropped {event} for {payload.get('plate_number')}")
+            return False
+    
+    def _worker_loop(self):
+        """Deliver queued alerts and publish counter updates for closed windows."""
+        while self.running:
+            try:
+                try:
+                    event, payload = self.alert_queue.get(timeout=FLUSH_INTERVAL_SECONDS)
+                    self._deliver(event, payload)
+                except queue.Empty:
+                    pass
+                
+                self._flush_windows()
+            
+            except Exception as e:
+                logger.error(f"Error in blacklist alert worker: {str(e)}")
+    
+    def _flush_windows(self):
+        """Close expired windows and queue one counter update per window with repeats."""
+        closed: List[Tuple[str, str, Dict[str, Any]]] = []
+        
+        if self.persisted:
+            cutoff = datetime.utcnow() - timedelta(seconds=Config.BLACKLIST_ALERT_COALESCE_SECONDS)
+            with self.engine.begin() as conn:
+                for window in conn.execute(text(CLOSE_WINDOWS_SQL).columns(last_seen=DateTime), {'cutoff': cutoff}).mappings():
+                    closed.append((window['plate_number'], window['camera_id'], window))
+        else:
+            now = time.monotonic()
+            with self._windows_lock:
+                for key, window in list(self._windows.items()):
+                    if now - window['opened_at'] < Config.BLACKLIST_ALERT_COALESCE_SECONDS:
+                        continue
+                    del self._windows[key]
+                    closed.append((key[0], key[1], window))
+        
+        for plate_number, camera_id, window in closed:
+            self._enqueue_update(plate_number, camera_id, window)
+    
+    def _enqueue_update(self, plate_number: str, camera_id: str, window) -> bool:
+        """Queue the counter update of a closed window that saw repeat sightings."""
+        if window['sightings'] <= window['reported_sightings']:
+            return False
+        return self._enqueue(WS_EVENT_BLACKLIST_ALERT_UPDATE, {
+            'type': WS_EVENT_BLACKLIST_ALERT_UPDATE,
+            'alert_id': window['alert_id'],
+            'plate_number': plate_number,
+            'camera_id': camera_id,
+            'sightings': window['sightings'],
+            'last_seen': window['last_seen'].isoformat(),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    
+    def _deliver(self, event: str, payload: Dict[str, Any]):
+        """Fan an event out to Socket.IO rooms, MQTT and webhooks."""
+        if self.socketio:
+            for room in ALERT_ROOMS:
+                try:
+                    self.socketio.emit(event, payload, room=room)
+                except Exception as e:
+                    logger.error(f"Error emitting {event} to {room}: {str(e)}")
+        
+        if Config.BLACKLIST_ALERT_MQTT_ENABLED:
+            self._publish_mqtt(payload)
+        
+        for url in Config.BLACKLIST_ALERT_WEBHOOK_URLS:
+            self._submit_webhook(url, payload)
+        
+        if event == WS_EVENT_BLACKLIST_ALERT:
+            self.metrics['alerts_delivered'] += 1
+            logger.info(f"Blacklist alert sent for plate: {payload['plate_number']}")
+        else:
+            self.metrics['updates_delivered'] += 1
+    
+    def _publish_mqtt(self, payload: Dict[str, Any]):
+        """Publish an alert to the blacklist notification topic."""
+        try:
+            from mqtt_config import MQTTConfig, QOS_BLACKLIST
+            mqtt_service = get_service('mqtt_service')
+            if not mqtt_service.publish(MQTTConfig.TOPIC_BLACKLIST_NOTIFICATION, payload, QOS_BLACKLIST):
+                self.metrics['mqtt_failures'] += 1
+        except Exception as e:
+            self.metrics['mqtt_failures'] += 1
+            logger.error(f"Error publishing blacklist alert to MQTT: {str(e)}")
+    
+    def _submit_webhook(self, url: str, payload: Dict[str, Any]):
+        """Hand a webhook POST to the pool, dropping it if too many are pending."""
+        if self.webhook_pool is None:
+            return
+        if not self.webhook_slots.acquire(blocking=False):
+            self.metrics['webhooks_dropped'] += 1
+            logger.warning(f"Blacklist webhook backlog full, dropped POST to {url}")
+            return
+        try:
+            self.webhook_pool.submit(self._post_webhook_queued, url, payload)
+        except RuntimeError:
+            # Pool shut down
+            self.webhook_slots.release()
+    
+    def _post_webhook_queued(self, url: str, payload: Dict[str, Any]):
+        """POST a pooled webhook and free its slot."""
+        try:
+            self._post_webhook(url, payload)
+        finally:
+            self.webhook_slots.release()
+    
+    def _post_webhook(self, url: str, payload: Dict[str, Any]):
+        """POST an alert to a webhook endpoint."""
+        try:
+            response = requests.post(url, json=payload, timeout=Config.BLACKLIST_ALERT_WEBHOOK_TIMEOUT_SECONDS)
+            if response.status_code >= 400:
+                self.metrics['webhook_failures'] += 1
+                logger.warning(f"Blacklist webhook {url} returned {response.status_code}")
+        except requests.RequestException as e:
+            self.metrics['webhook_failures'] += 1
+            logger.error(f"Error posting blacklist alert to {url}: {str(e)}")
@@ -0,0 +1,494 @@
+"""
+Blacklist Bulk Service for watchlist import and export
+
+This service loads agency watchlists (CSV/Excel, tens of thousands of plates)
+into the blacklist as a background job and streams the blacklist back out as
+CSV for audits.
+
+Import jobs run in the worker that received the upload; their progress is
+written to a job file per import so any gunicorn worker can report it.
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import uuid
+import logging
+import tempfile
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.blacklist_plate import BlacklistPlate
+from core.dependency_container import get_service
+from services.blacklist_service import normalize_plate_number
+from config import Config
+from constants import (
+    BLACKLIST_STATUS_ACTIVE, PLATE_NUMBER_MAX_LENGTH, BLACKLIST_IMPORT_FORMATS,
+    BLACKLIST_EXPORT_COLUMNS, WS_EVENT_BLACKLIST_IMPORT_PROGRESS,
+    JOB_STATUS_PENDING, JOB_STATUS_RUNNING, JOB_STATUS_COMPLETED, JOB_STATUS_FAILED
+)
+
+logger = logging.getLogger(__name__)
+
+# Header names accepted for the plate column in uploaded watchlists
+PLATE_COLUMN_ALIASES = ('license_plate_text', 'plate_number', 'license_plate', 'plate')
+
+# Only the first errors are kept so a broken file cannot bloat the job status
+MAX_REPORTED_ERRORS = 100
+
+# Job files of finished imports are removed after this long
+JOB_FILE_RETENTION_SECONDS = 7 * 24 * 3600
+
+STAGING_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS blacklist_import_staging (
+        license_plate_text VARCHAR(20) NOT NULL,
+        reason TEXT NOT NULL,
+        added_by VARCHAR(100) NOT NULL,
+        expiry_date TIMESTAMP,
+        notes TEXT
+    ) ON COMMIT DELETE ROWS
+"""
+
+STAGING_COPY_SQL = """
+    COPY blacklist_import_staging (license_plate_text, reason, added_by, expiry_date, notes)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# NOT EXISTS guards against plates activated by another writer during the job
+STAGING_MERGE_SQL = """
+    INSERT INTO blacklist_plates (
+        license_plate_text, reason, added_by, expiry_date, notes,
+        is_active, created_at, updated_at
+    )
+    SELECT s.license_plate_text, s.reason, s.added_by, s.expiry_date, s.notes,
+           TRUE, %(now)s, %(now)s
+    FROM blacklist_import_staging s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM blacklist_plates b
+        WHERE b.license_plate_text = s.license_plate_text AND b.is_active
+    )
+"""
+
+class BlacklistBulkService:
+    """
+    Service for bulk blacklist operations.
+    
+    This service provides:
+    - Streaming CSV/Excel watchlist import as a background job
+    - Plate normalization and de-duplication against active entries
+    - COPY into a staging table plus merge on PostgreSQL
+    - Import progress over Socket.IO and in per-job files
+    - Streaming CSV export of blacklist entries
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.socketio = None
+        self.app = None
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.jobs_lock = Lock()
+    
+    def initialize(self, db_session, socketio=None, app=None):
+        """
+        Initialize the Blacklist Bulk Service with dependencies.
+        
+        Args:
+            db_session: Database session
+            socketio: SocketIO instance for progress updates
+            app: Flask application used to run jobs inside an app context
+        """
+        self.db_session = db_session
+        self.socketio = socketio
+        self.app = app
+        os.makedirs(Config.BLACKLIST_IMPORT_JOB_DIR, exist_ok=True)
+        logger.info("Blacklist bulk service initialized")
+    
+    def start_import(self, file_storage, added_by: str,
+                     default_reason: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start a background import job for an uploaded watchlist.
+        
+        Args:
+            file_storage: Uploaded file (werkzeug FileStorage)
+            added_by: User who imports the list
+            default_reason: Reason used for rows without a reason column
+        
+        Returns:
+            Dictionary with operation result and job information
+        """
+        filename = file_storage.filename or ''
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in BLACKLIST_IMPORT_FORMATS:
+            return {
+                'success': False,
+                'message': f'Unsupported file type: {extension or filename}'
+            }
+        
+        # The request stream is gone once the job runs, so spool to disk
+        fd, path = tempfile.mkstemp(prefix='blacklist_import_', suffix=extension)
+        os.close(fd)
+        file_storage.save(path)
+        
+        self._prune_job_files()
+        job_id = str(uuid.uuid4())
+        with self.jobs_lock:
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'filename': filename,
+                'added_by': added_by,
+                'status': JOB_STATUS_PENDING,
+                'rows_read': 0,
+                'rows_invalid': 0,
+                'duplicates_in_file': 0,
+                'already_active': 0,
+                'inserted': 0,
+                'errors': [],
+                'started_at': datetime.utcnow().isoformat(),
+                'finished_at': None
+            }
+        self._write_job_file(job_id)
+        
+        if self.socketio:
+            self.socketio.start_background_task(
+                self._run_import, job_id, path, extension, added_by, default_reason
+            )
+        else:
+            Thread(
+                target=self._run_import,
+                args=(job_id, path, extension, added_by, default_reason),
+                daemon=True
+            ).start()
+        
+        logger.info(f"Blacklist import {job_id} started for {filename} by {added_by}")
+        
+        return {
+            'success': True,
+            'message': f'Import of {filename} started',
+            'job_id': job_id,
+            'job': self.get_job(job_id)
+        }
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of an import job.
+        
+        Jobs of this worker are read from memory; jobs running in or run by
+        another worker from their job file (updated once per batch).
+        
+        Args:
+            job_id: Import job identifier
+        
+        Returns:
+            Job dictionary or None if not found
+        """
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job, errors=list(job['errors']))
+        return self._read_job_file(job_id)
+    
+    def iter_export_csv(self, active_only: bool = True, batch_size: int = 1000) -> Iterator[str]:
+        """
+        Stream blacklist entries as CSV text.
+        
+        Rows are fetched with a server-side cursor in batches, so memory use
+        does not grow with the size of the blacklist. Must run inside an
+        app context (use flask.stream_with_context).
+        
+        Args:
+            active_only: Whether to export only active entries
+            batch_size: Rows fetched per round trip
+        
+        Yields:
+            CSV text chunks, header first
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(BLACKLIST_EXPORT_COLUMNS)
+        
+        query = self.db_session.query(BlacklistPlate)
+        if active_only:
+            query = query.filter_by(is_active=BLACKLIST_STATUS_ACTIVE)
+        query = query.order_by(BlacklistPlate.id)\
+            .execution_options(stream_results=True)\
+            .yield_per(batch_size)
+        
+        for count, entry in enumerate(query, start=1):
+            entry_dict = entry.to_dict()
+            writer.writerow([entry_dict[column] for column in BLACKLIST_EXPORT_COLUMNS])
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        
+        yield buffer.getvalue()
+    
+    def _run_import(self, job_id: str, path: str, extension: str,
+                    added_by: str, default_reason: Optional[str]):
+        """Run an import job: read, normalize, de-duplicate and load in batches."""
+        try:
+            with self.app.app_context():
+                self._update_job(job_id, status=JOB_STATUS_RUNNING)
+                self._emit_progress(job_id)
+                
+                active_plates = self._load_active_plates()
+                seen_plates = set()
+                batch: List[Dict[str, Any]] = []
+                
+                for line_number, row in self._read_rows(path, extension):
+                    self._increment(job_id, 'rows_read')
+                    entry, error = self._parse_row(row, added_by, default_reason)
+                    
+                    if error:
+                        self._record_error(job_id, line_number, error)
+                        continue
+                    
+                    plate = entry['license_plate_text']
+                    if plate in seen_plates:
+                        self._increment(job_id, 'duplicates_in_file')
+                        continue
+                    seen_plates.add(plate)
+                    
+                    if plate in active_plates:
+                        self._increment(job_id, 'already_active')
+                        continue
+                    
+                    batch.append(entry)
+                    if len(batch) >= Config.BLACKLIST_IMPORT_BATCH_SIZE:
+                        self._increment(job_id, 'inserted', self._load_batch(batch))
+                        batch = []
+                        self._emit_progress(job_id)
+                
+                if batch:
+                    self._increment(job_id, 'inserted', self._load_batch(batch))
+                
+                # Rebuild matcher caches and the expiry schedule once for the whole file
+                get_service('blacklist_service').invalidate_cache()
+                get_service('blacklist_expiry_service').reload()
+                
+                self._update_job(job_id, status=JOB_STATUS_COMPLETED)
+                logger.info(f"Blacklist import {job_id} completed: {self.get_job(job_id)['inserted']} inserted")
+        
+        except Exception as e:
+            if self.db_session:
+                self.db_session.rollback()
+            self._update_job(job_id, status=JOB_STATUS_FAILED)
+            self._record_error(job_id, None, str(e))
+            logger.error(f"Blacklist import {job_id} failed: {str(e)}")
+        finally:
+            self._update_job(job_id, finished_at=datetime.utcnow().isoformat())
+            self._emit_progress(job_id)
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove import file {path}: {str(e)}")
+            # The job file now has the final state
+            with self.jobs_lock:
+                self.jobs.pop(job_id, None)
+    
+    def _load_active_plates(self) -> set:
+        """Load normalized plates of all active entries for the set difference."""
+        rows = self.db_session.query(BlacklistPlate.license_plate_text)\
+            .filter_by(is_active=BLACKLIST_STATUS_ACTIVE)\
+            .yield_per(10000)
+        return {normalize_plate_number(row[0]) for row in rows}
+    
+    def _read_rows(self, path: str, extension: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Stream rows from a CSV or Excel file as dictionaries.
+        
+        Header names are lower-cased and stripped. Line numbers count the
+        header as line 1.
+        """
+        if extension == '.csv':
+            with open(path, newline='', encoding='utf-8-sig') as csv_file:
+                reader = csv.reader(csv_file)
+                header = [str(name or '').strip().lower() for name in next(reader, [])]
+                for line_number, values in enumerate(reader, start=2):
+                    yield line_number, dict(zip(header, values))
+        else:
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise RuntimeError('openpyxl is required to import Excel files')
+            
+            workbook = load_workbook(path, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = [str(name or '').strip().lower() for name in next(rows, ())]
+                for line_number, values in enumerate(rows, start=2):
+                    yield line_number, dict(zip(header, values))
+            finally:
+                workbook.close()
+    
+    def _parse_row(self, row: Dict[str, Any], added_by: str,
+                   default_reason: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Validate and normalize one watchlist row.
+        
+        Returns:
+            Tuple of (entry dictionary, None) or (None, error message)
+        """
+        raw_plate = next((row.get(name) for name in PLATE_COLUMN_ALIASES if row.get(name)), None)
+        plate = normalize_plate_number(raw_plate)
+        if not plate:
+            return None, 'Missing plate number'
+        if len(plate) > PLATE_NUMBER_MAX_LENGTH:
+            return None, f'Invalid plate number format: {raw_plate}'
+        
+        reason = str(row.get('reason') or default_reason or '').strip()
+        if not reason:
+            return None, f'Missing reason for {plate}'
+        
+        expiry_date = row.get('expiry_date')
+        if isinstance(expiry_date, str):
+            expiry_date = expiry_date.strip()
+            try:
+                expiry_date = datetime.fromisoformat(expiry_date.replace('Z', '+00:00')) if expiry_date else None
+            except ValueError:
+                return None, f'Invalid date format: {expiry_date}'
+        if isinstance(expiry_date, datetime) and expiry_date.tzinfo:
+            expiry_date = expiry_date.astimezone(timezone.utc).replace(tzinfo=None)
+        if expiry_date is not None and not isinstance(expiry_date, datetime):
+            return None, f'Invalid date format: {expiry_date}'
+        
+        notes = row.get('notes')
+        return {
+            'license_plate_text': plate,
+            'reason': reason,
+            'added_by': str(row.get('added_by') or added_by),
+            'expiry_date': expiry_date,
+            'notes': str(notes) if notes else None
+        }, None
+    
+    def _load_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Load a batch of new entries and commit.
+        
+        Returns:
+            Number of entries inserted
+        """
+        if self.db_session.get_bind().dialect.name == 'postgresql':
+            return self._copy_batch(batch)
+        
+        now = datetime.utcnow()
+        self.db_session.bulk_insert_mappings(BlacklistPlate, [
+            dict(entry, is_active=BLACKLIST_STATUS_ACTIVE, created_at=now, updated_at=now)
+            for entry in batch
+        ])
+        self.db_session.commit()
+        return len(batch)
+    
+    def _copy_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """COPY a batch into the staging table and merge it into blacklist_plates."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for entry in batch:
+            writer.writerow([
+                entry['license_plate_text'],
+                entry['reason'],
+                entry['added_by'],
+                entry['expiry_date'].isoformat() if entry['expiry_date'] else '',
+                entry['notes'] or ''
+            ])
+        buffer.seek(0)
+        
+        cursor = self.db_session.connection().connection.cursor()
+        try:
+            cursor.execute(STAGING_TABLE_SQL)
+            cursor.copy_expert(STAGING_COPY_SQL, buffer)
+            cursor.execute(STAGING_MERGE_SQL, {'now': datetime.utcnow()})
+            inserted = cursor.rowcount
+        finally:
+            cursor.close()
+        
+        self.db_session.commit()
+        return inserted
+    
+    def _update_job(self, job_id: str, **fields):
+        """Update fields of an import job and write its job file."""
+        with self.jobs_lock:
+            self.jobs[job_id].update(fields)
+        self._write_job_file(job_id)
+    
+    def _increment(self, job_id: str, counter: str, amount: int = 1):
+        """Increment a counter of an import job."""
+        with self.jobs_lock:
+            self.jobs[job_id][counter] += amount
+    
+    def _record_error(self, job_id: str, line_number: Optional[int], message: str):
+        """Count an invalid row and keep the first errors for the report."""
+        with self.jobs_lock:
+            job = self.jobs[job_id]
+            if line_number is not None:
+                job['rows_invalid'] += 1
+            if len(job['errors']) < MAX_REPORTED_ERRORS:
+                job['errors'].append({'line': line_number, 'message': message})
+    
+    def _emit_progress(self, job_id: str):
+        """Write the job file and emit import progress to the dashboard room."""
+        self._write_job_file(job_id)
+        if not self.socketio:
+            return
+        try:
+            self.socketio.emit(WS_EVENT_BLACKLIST_IMPORT_PROGRESS, self.get_job(job_id), room='dashboard')
+        except Exception as e:
+            logger.error(f"Error emitting import progress: {str(e)}")
+    
+    @staticmethod
+    def _job_file_path(job_id: str) -> Optional[str]:
+        """Job file of an import, or None if job_id is not a job identifier."""
+        try:
+            job_id = str(uuid.UUID(job_id))
+        except ValueError:
+            return None
+        return os.path.join(Config.BLACKLIST_IMPORT_JOB_DIR, f'{job_id}.json')
+    
+    def _write_job_file(self, job_id: str):
+        """Write the current state of an import job to its job file atomically."""
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            # Readers can tell a job whose worker died by its stale updated_at
+            job = dict(job, errors=list(job['errors']), updated_at=datetime.utcnow().isoformat())
+        
+        path = self._job_file_path(job_id)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write import job file: {str(e)}")
+    
+    def _read_job_file(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Read the job file of an import, if any."""
+        path = self._job_file_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read import job file: {str(e)}")
+            return None
+    
+    def _prune_job_files(self):
+        """Remove job files older than JOB_FILE_RETENTION_SECONDS."""
+        cutoff = time.time() - JOB_FILE_RETENTION_SECONDS
+        try:
+            for entry in os.scandir(Config.BLACKLIST_IMPORT_JOB_DIR):
+                if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+        except OSError as e:
+            logger.warning(f"Failed to prune import job files: {str(e)}")
@@ -0,0 +1,253 @@
+"""
+Blacklist Expiry Service for enforcing blacklist expiry dates
+
+This service keeps upcoming blacklist expirations in a min-heap and
+deactivates entries in batches when they are due, without scanning the
+blacklist table on a timer.
+"""
+
+import heapq
+import logging
+from datetime import datetime
+from threading import Lock, Thread, Event
+from typing import Optional, List, Dict, Any, Tuple
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.blacklist_plate import BlacklistPlate
+from core.dependency_container import get_service
+from core.time_window import to_utc
+from config import Config
+from constants import BLACKLIST_STATUS_ACTIVE, BLACKLIST_STATUS_INACTIVE, WS_EVENT_BLACKLIST_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for a single sleep so clock changes are picked up eventually
+MAX_IDLE_SECONDS = 3600
+
+class BlacklistExpiryService:
+    """
+    Service for enforcing blacklist expiry dates.
+    
+    This service provides:
+    - Min-heap of (expiry_date, blacklist_id) for active entries
+    - A scheduler thread that sleeps until the next expiry is due
+    - Batched deactivation followed by matcher cache invalidation
+    - A view of upcoming expirations
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.socketio = None
+        self.app = None
+        self._heap: List[Tuple[datetime, int]] = []
+        self._heap_lock = Lock()
+        self._wakeup = Event()
+        self.scheduler_thread = None
+        self.running = False
+        self.expired_count = 0
+        self.last_run = None
+    
+    def initialize(self, db_session, socketio=None, app=None):
+        """
+        Initialize the Blacklist Expiry Service and start the scheduler.
+        
+        Args:
+            db_session: Database session
+            socketio: SocketIO instance for expiry notifications
+            app: Flask application used to run the scheduler in an app context
+        """
+        self.db_session = db_session
+        self.socketio = socketio
+        self.app = app
+        
+        self.reload()
+        
+        self.running = True
+        self.scheduler_thread = Thread(target=self._scheduler_loop, daemon=True)
+        self.scheduler_thread.start()
+        logger.info("Blacklist expiry service initialized")
+    
+    def stop(self):
+        """Stop the scheduler thread."""
+        self.running = False
+        self._wakeup.set()
+    
+    def reload(self):
+        """
+        Rebuild the heap from active entries that have an expiry date.
+        
+        Runs once at startup and after bulk imports; it is not periodic.
+        """
+        try:
+            rows = self.db_session.query(BlacklistPlate.expiry_date, BlacklistPlate.id)\
+                .filter(
+                    BlacklistPlate.is_active == BLACKLIST_STATUS_ACTIVE,
+                    BlacklistPlate.expiry_date.isnot(None)
+                )\
+                .yield_per(10000)
+            heap = [(row.expiry_date, row.id) for row in rows]
+            heapq.heapify(heap)
+            
+            with self._heap_lock:
+                self._heap = heap
+            self._wakeup.set()
+            
+            logger.info(f"Blacklist expiry heap loaded with {len(heap)} entries")
+        
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Error loading blacklist expirations: {str(e)}")
+    
+    def schedule(self, blacklist_id: int, expiry_date: Optional[datetime]):
+        """
+        Schedule expiry for a single blacklist entry.
+        
+        Args:
+            blacklist_id: ID of the blacklist entry
+            expiry_date: When the entry expires (ignored if None)
+        """
+        if expiry_date is None:
+            return
+        # The heap holds naive UTC; an aware value would break every comparison
+        if expiry_date.tzinfo is not None:
+            expiry_date = to_utc(expiry_date)
+        
+        with self._heap_lock:
+            heapq.heappush(self._heap, (expiry_date, blacklist_id))
+            is_next = self._heap[0] == (expiry_date, blacklist_id)
+        
+        # Only an earlier deadline changes how long the scheduler sleeps
+        if is_next:
+            self._wakeup.set()
+    
+    def get_upcoming_expirations(self, limit: int = 50) -> Dict[str, Any]:
+        """
+        Get the next blacklist entries due to expire.
+        
+        Args:
+            limit: Maximum number of entries to return
+        
+        Returns:
+            Dictionary with upcoming entries and scheduler state
+        """
+        try:
+            entries = self.db_session.query(BlacklistPlate)\
+                .filter(
+                    BlacklistPlate.is_active == BLACKLIST_STATUS_ACTIVE,
+                    BlacklistPlate.expiry_date.isnot(None)
+                )\
+                .order_by(BlacklistPlate.expiry_date.asc())\
+                .limit(limit)\
+                .all()
+            
+            with self._heap_lock:
+                scheduled = len(self._heap)
+                next_due = self._heap[0][0] if self._heap else None
+            
+            return {
+                'success': True,
+                'data': [entry.to_dict() for entry in entries],
+                'scheduler': {
+                    'running': self.running,
+                    'scheduled': scheduled,
+                    'next_due': next_due.isoformat() if next_due else None,
+                    'expired_count': self.expired_count,
+                    'last_run': self.last_run.isoformat() if self.last_run else None
+                }
+            }
+        
+        except Exception as e:
+            logger.error(f"Error getting upcoming expirations: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _scheduler_loop(self):
+        """Sleep until the earliest expiry is due, then expire everything due."""
+        while self.running:
+            try:
+                with self._heap_lock:
+                    next_due = self._heap[0][0] if self._heap else None
+                
+                if next_due is None:
+                    timeout = MAX_IDLE_SECONDS
+                else:
+                    timeout = (next_due - datetime.utcnow()).total_seconds()
+                
+                if timeout > 0:
+                    self._wakeup.wait(min(timeout, MAX_IDLE_SECONDS))
+                    self._wakeup.clear()
+                    continue
+                
+                self._expire_due_entries()
+            
+            except Exception as e:
+                logger.error(f"Error in blacklist expiry scheduler: {str(e)}")
+                self._wakeup.wait(30)
+                self._wakeup.clear()
+    
+    def _expire_due_entries(self):
+        """Pop all due entries off the heap and deactivate them in batches."""
+        now = datetime.utcnow()
+        due_ids = []
+        with self._heap_lock:
+            while self._heap and self._heap[0][0] <= now:
+                due_ids.append(heapq.heappop(self._heap)[1])
+        
+        if not due_ids:
+            return
+        
+        batch_size = Config.BLACKLIST_EXPIRY_BATCH_SIZE
+        expired = 0
+        
+        with self.app.app_context():
+            try:
+                for start in range(0, len(due_ids), batch_size):
+                    batch = due_ids[start:start + batch_size]
+                    # Entries removed or changed since scheduling are skipped here
+                    expired += self.db_session.query(BlacklistPlate)\
+                        .filter(
+                            BlacklistPlate.id.in_(batch),
+                            BlacklistPlate.is_active == BLACKLIST_STATUS_ACTIVE,
+                            BlacklistPlate.expiry_date <= now
+                        )\
+                        .update({
+                            BlacklistPlate.is_active: BLACKLIST_STATUS_INACTIVE,
+                            BlacklistPlate.updated_at: now
+                        }, synchronize_session=False)
+                    self.db_session.commit()
+            
+            except Exception as e:
+                self.db_session.rollback()
+                logger.error(f"Error expiring blacklist entries: {str(e)}")
+                # Put the batch back so it is retried on the next wakeup
+                with self._heap_lock:
+                    for blacklist_id in due_ids:
+                        heapq.heappush(self._heap, (now, blacklist_id))
+                raise
+            finally:
+                self.db_session.remove()
+            
+            self.expired_count += expired
+            self.last_run = now
+            
+            if expired:
+                get_service('blacklist_service').invalidate_cache()
+                self._emit_expired(expired, now)
+                logger.info(f"Expired {expired} blacklist entries")
+    
+    def _emit_expired(self, expired: int, timestamp: datetime):
+        """Notify dashboards that blacklist entries expired."""
+        if not self.socketio:
+            return
+        try:
+            self.socketio.emit(WS_EVENT_BLACKLIST_EXPIRED, {
+                'expired': expired,
+                'timestamp': timestamp.isoformat()
+            }, room='dashboard')
+        except Exception as e:
+            logger.error(f"Error emitting blacklist expiry: {str(e)}")
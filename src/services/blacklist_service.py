@@ -3,11 +3,20 @@ Blacklist Service for License Plate Management
 
 This service manages blacklisted license plates, including adding, removing,
 checking, and processing LPR detections against the blacklist.
+
+Every gunicorn worker caches the active plates. A change in any worker
+touches a version file (BLACKLIST_VERSION_PATH), and the other workers
+stat it on each check and reload when it moved, so a new plate is flagged
+everywhere immediately rather than after BLACKLIST_CACHE_TTL_SECONDS.
 """
 
+import os
+import re
+import time
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from threading import Lock
+from typing import Optional, List, Dict, Any, Callable, Set
 from core.import_helper import setup_absolute_imports
 
 # Setup absolute imports
@@ -16,10 +25,32 @@ setup_absolute_imports()
 from core.models.blacklist_plate import BlacklistPlate
 from core.models.lpr_record import LPRRecord
 from core.models import db
-from constants import BLACKLIST_STATUS_ACTIVE, BLACKLIST_STATUS_INACTIVE
+from core.time_window import local_today, local_datetime, day_window, within, to_utc
+from config import Config
+from constants import BLACKLIST_STATUS_ACTIVE, BLACKLIST_STATUS_INACTIVE, PLATE_NUMBER_MAX_LENGTH
 
 logger = logging.getLogger(__name__)
 
+# Separators that edge OCR and agency watchlists use inconsistently
+_PLATE_SEPARATOR_PATTERN = re.compile(r'[\s\-\.]+')
+
+def normalize_plate_number(plate_number: Optional[str]) -> str:
+    """
+    Normalize a license plate for matching and storage.
+    
+    Removes whitespace, dashes and dots and upper-cases Latin characters,
+    so "กข 1234", "กข-1234" and "กข1234" all compare equal.
+    
+    Args:
+        plate_number: Raw plate text
+    
+    Returns:
+        Normalized plate text (empty string if nothing is left)
+    """
+    if not plate_number:
+        return ''
+    return _PLATE_SEPARATOR_PATTERN.sub('', str(plate_number)).upper()
+
 class BlacklistService:
     """
     Service for managing blacklist functionality.
@@ -35,6 +66,21 @@ class BlacklistService:
     def __init__(self):
         self.db_session = None
         self.socketio = None
+        
+        # Matcher cache: normalized plates of all active entries
+        self._active_plates: Optional[Set[str]] = None
+        self._active_plates_loaded_at = 0.0
+        self._active_plates_version: Optional[int] = None
+        self._cache_lock = Lock()
+        self._invalidation_listeners: List[Callable[[], None]] = []
+        
+        # Statistics cache and the incrementally maintained detection counter
+        self._statistics: Optional[Dict[str, int]] = None
+        self._statistics_loaded_at = 0.0
+        self._today_detections = 0
+        self._today_detections_date = None
+        self._today_detections_loaded_at = 0.0
+        self._stats_lock = Lock()
     
     def initialize(self, db_session, socketio=None):
         """
@@ -63,6 +109,17 @@ class BlacklistService:
         Returns:
             Dictionary with operation result
         """
+        license_plate_text = normalize_plate_number(license_plate_text)
+        if not license_plate_text or len(license_plate_text) > PLATE_NUMBER_MAX_LENGTH:
+            return {
+                'success': False,
+                'message': 'Invalid plate number format'
+            }
+        
+        # Stored and scheduled as naive UTC
+        if expiry_date is not None and expiry_date.tzinfo is not None:
+            expiry_date = to_utc(expiry_date)
+        
         try:
             # Check if already exists
             existing = self.db_session.query(BlacklistPlate).filter_by(
@@ -87,6 +144,11 @@ class BlacklistService:
             
             self.db_session.add(blacklist_entry)
             self.db_session.commit()
+            self.invalidate_cache()
+            
+            if expiry_date:
+                from core.dependency_container import get_service
+                get_service('blacklist_expiry_service').schedule(blacklist_entry.id, expiry_date)
             
             logger.info(f"Added {license_plate_text} to blacklist by {added_by}")
             
@@ -132,6 +194,7 @@ class BlacklistService:
             
             blacklist_entry.deactivate()
             self.db_session.commit()
+            self.invalidate_cache()
             
             logger.info(f"Removed {blacklist_entry.license_plate_text} from blacklist by {removed_by}")
             
@@ -157,11 +220,112 @@ class BlacklistService:
         Returns:
             BlacklistPlate object if found, None otherwise
         """
-        return self.db_session.query(BlacklistPlate).filter_by(
-            license_plate_text=license_plate_text,
-            is_active=BLACKLIST_STATUS_ACTIVE
+        normalized = normalize_plate_number(license_plate_text)
+        
+        # Most detections are not blacklisted; answer those from memory
+        active_plates = self.get_active_plate_set()
+        if active_plates is not None and normalized not in active_plates:
+            return None
+        
+        # Expired entries never match, even before the expiry scheduler deactivates them
+        return self.db_session.query(BlacklistPlate).filter(
+            BlacklistPlate.license_plate_text.in_([license_plate_text, normalized]),
+            BlacklistPlate.is_active == BLACKLIST_STATUS_ACTIVE,
+            db.or_(
+                BlacklistPlate.expiry_date.is_(None),
+                BlacklistPlate.expiry_date > datetime.utcnow()
+            )
         ).first()
     
+    def get_active_plate_set(self) -> Optional[Set[str]]:
+        """
+        Get the normalized plate numbers of all active blacklist entries.
+        
+        The set is cached in memory and reloaded after invalidation, when
+        another worker changed the blacklist (its version file moved), or
+        once BLACKLIST_CACHE_TTL_SECONDS has passed (changes made outside
+        the server).
+        
+        Returns:
+            Set of normalized plates, or None if the cache could not be loaded
+        """
+        # Read before loading, so a change made during the load triggers another one
+        version = self._blacklist_version()
+        with self._cache_lock:
+            changed = self._active_plates is not None and version != self._active_plates_version
+            expired = time.monotonic() - self._active_plates_loaded_at > Config.BLACKLIST_CACHE_TTL_SECONDS
+            if self._active_plates is None or expired or changed:
+                try:
+                    rows = self.db_session.query(BlacklistPlate.license_plate_text)\
+                        .filter_by(is_active=BLACKLIST_STATUS_ACTIVE)\
+                        .all()
+                    self._active_plates = {normalize_plate_number(row[0]) for row in rows}
+                    self._active_plates_loaded_at = time.monotonic()
+                    self._active_plates_version = version
+                except Exception as e:
+                    logger.error(f"Error loading blacklist cache: {str(e)}")
+                    self._active_plates = None
+            active_plates = self._active_plates
+        
+        if changed:
+            # Changed by another worker: drop the other caches of this one too
+            with self._stats_lock:
+                self._statistics = None
+            self._notify_invalidation_listeners()
+        return active_plates
+    
+    def add_invalidation_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Register a callback that runs whenever the blacklist changes.
+        
+        Args:
+            listener: Callable without arguments
+        """
+        self._invalidation_listeners.append(listener)
+    
+    def invalidate_cache(self) -> None:
+        """
+        Drop the matcher cache and notify listeners that the blacklist changed.
+        
+        The version file is touched so other workers reload too.
+        """
+        self._touch_version()
+        with self._cache_lock:
+            self._active_plates = None
+            self._active_plates_loaded_at = 0.0
+        
+        with self._stats_lock:
+            self._statistics = None
+        
+        self._notify_invalidation_listeners()
+    
+    @staticmethod
+    def _blacklist_version() -> Optional[int]:
+        """Modification time of the version file (None before the first change)."""
+        try:
+            return os.stat(Config.BLACKLIST_VERSION_PATH).st_mtime_ns
+        except OSError:
+            return None
+    
+    @staticmethod
+    def _touch_version() -> None:
+        """Move the version file's modification time forward."""
+        path = Config.BLACKLIST_VERSION_PATH
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'a'):
+                os.utime(path)
+        except OSError as e:
+            logger.error(f"Failed to touch blacklist version file: {str(e)}")
+    
+    def _notify_invalidation_listeners(self) -> None:
+        """Run the invalidation listeners, logging their failures."""
+        for listener in self._invalidation_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Blacklist invalidation listener failed: {str(e)}")
+    
     def get_blacklist_entries(self, page: int = 1, per_page: int = 20, 
                             active_only: bool = True) -> Dict[str, Any]:
         """
@@ -219,18 +383,11 @@ class BlacklistService:
             True if blacklisted, False otherwise
         """
         try:
-            # Check if plate is blacklisted
-            blacklist_entry = self.check_blacklist(lpr_record.plate_number)
+            blacklist_entry = self.match_lpr_detection(lpr_record)
             
             if blacklist_entry:
-                # Mark record as blacklisted
-                lpr_record.is_blacklisted = True
                 self.db_session.commit()
-                
-                # Send blacklist alert
-                self.send_blacklist_alert(lpr_record, blacklist_entry)
-                
-                logger.warning(f"Blacklisted plate detected: {lpr_record.plate_number}")
+                self.notify_lpr_detection(lpr_record, blacklist_entry)
                 return True
             
             return False
@@ -239,31 +396,51 @@ class BlacklistService:
             logger.error(f"Error processing LPR detection: {str(e)}")
             return False
     
+    def match_lpr_detection(self, lpr_record: LPRRecord) -> Optional[BlacklistPlate]:
+        """
+        Flag a record whose plate is blacklisted, without committing.
+        
+        Used before the record is stored, so the flag is part of the insert.
+        
+        Args:
+            lpr_record: LPR record to check
+        
+        Returns:
+            Matching blacklist entry, or None
+        """
+        blacklist_entry = self.check_blacklist(lpr_record.plate_number)
+        if blacklist_entry:
+            lpr_record.is_blacklisted = True
+            lpr_record.blacklist_reason = blacklist_entry.reason
+        return blacklist_entry
+    
+    def notify_lpr_detection(self, lpr_record: LPRRecord, blacklist_entry: BlacklistPlate) -> None:
+        """
+        Count and alert a stored blacklisted record.
+        
+        Args:
+            lpr_record: Stored LPR record flagged by match_lpr_detection
+            blacklist_entry: Blacklist entry that matched
+        """
+        self._count_blacklist_detection(lpr_record.timestamp)
+        self.send_blacklist_alert(lpr_record, blacklist_entry)
+        logger.warning(f"Blacklisted plate detected: {lpr_record.plate_number}")
+    
     def send_blacklist_alert(self, lpr_record: LPRRecord, blacklist_entry: BlacklistPlate) -> None:
         """
-        Send blacklist alert via WebSocket.
+        Hand a blacklist alert to the alert dispatcher.
+        
+        Delivery (Socket.IO, MQTT, webhooks) and de-duplication of repeat
+        sightings happen on the dispatcher's worker, not on the ingest path.
         
         Args:
             lpr_record: LPR record that triggered the alert
             blacklist_entry: Blacklist entry that matched
         """
         try:
-            if self.socketio:
-                alert_data = {
-                    'type': 'blacklist_alert',
-                    'lpr_record': lpr_record.to_dict(),
-                    'blacklist_entry': blacklist_entry.to_dict(),
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-                
-                # Send to dashboard room
-                self.socketio.emit('blacklist_alert', alert_data, room='dashboard')
-                
-                # Send to health monitoring room
-                self.socketio.emit('blacklist_alert', alert_data, room='health_monitoring')
-                
-                logger.info(f"Blacklist alert sent for plate: {lpr_record.plate_number}")
-                
+            from core.dependency_container import get_service
+            get_service('blacklist_alert_service').submit(lpr_record, blacklist_entry)
+        
         except Exception as e:
             logger.error(f"Error sending blacklist alert: {str(e)}")
     
@@ -271,52 +448,79 @@ class BlacklistService:
         """
         Get blacklist statistics.
         
+        Entry counts come from a single aggregate query cached for
+        BLACKLIST_STATS_CACHE_TTL_SECONDS and dropped on blacklist changes.
+        Today's detections come from a counter re-seeded from the partial
+        blacklisted-timestamp index on the same TTL and fed by this
+        worker's ingest path in between.
+        
         Returns:
             Dictionary with blacklist statistics
         """
         try:
-            # Total active blacklist entries
-            total_active = self.db_session.query(BlacklistPlate)\
-                .filter_by(is_active=BLACKLIST_STATUS_ACTIVE)\
-                .count()
-            
-            # Total inactive entries
-            total_inactive = self.db_session.query(BlacklistPlate)\
-                .filter_by(is_active=BLACKLIST_STATUS_INACTIVE)\
-                .count()
-            
-            # Recent additions (last 7 days)
-            week_ago = datetime.utcnow() - timedelta(days=7)
-            recent_additions = self.db_session.query(BlacklistPlate)\
-                .filter(BlacklistPlate.created_at >= week_ago)\
-                .count()
-            
-            # Blacklist detections today
-            today = datetime.utcnow().date()
-            today_detections = self.db_session.query(LPRRecord)\
-                .filter(
-                    LPRRecord.is_blacklisted == True,
-                    db.func.date(LPRRecord.timestamp) == today
-                )\
-                .count()
+            with self._stats_lock:
+                expired = time.monotonic() - self._statistics_loaded_at > Config.BLACKLIST_STATS_CACHE_TTL_SECONDS
+                if self._statistics is None or expired:
+                    week_ago = datetime.utcnow() - timedelta(days=7)
+                    total_active, total_inactive, recent_additions = self.db_session.query(
+                        db.func.count(BlacklistPlate.id).filter(BlacklistPlate.is_active == BLACKLIST_STATUS_ACTIVE),
+                        db.func.count(BlacklistPlate.id).filter(BlacklistPlate.is_active == BLACKLIST_STATUS_INACTIVE),
+                        db.func.count(BlacklistPlate.id).filter(BlacklistPlate.created_at >= week_ago)
+                    ).one()
+                    self._statistics = {
+                        'total_active': total_active,
+                        'total_inactive': total_inactive,
+                        'recent_additions': recent_additions
+                    }
+                    self._statistics_loaded_at = time.monotonic()
+                statistics = dict(self._statistics)
+            
+            statistics['today_detections'] = self._get_today_detections()
             
             return {
                 'success': True,
-                'data': {
-                    'total_active': total_active,
-                    'total_inactive': total_inactive,
-                    'recent_additions': recent_additions,
-                    'today_detections': today_detections
-                }
+                'data': statistics
             }
             
         except Exception as e:
+            self.db_session.rollback()
             logger.error(f"Error getting blacklist statistics: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _get_today_detections(self) -> int:
+        """
+        Get today's blacklist detections (site-local day).
+        
+        The counter is seeded with one timestamp range query and
+        incremented by this worker's ingest path afterwards. Other workers
+        ingest too, so it is re-seeded every
+        BLACKLIST_STATS_CACHE_TTL_SECONDS and at the start of each day.
+        """
+        today = local_today()
+        with self._stats_lock:
+            expired = time.monotonic() - self._today_detections_loaded_at > Config.BLACKLIST_STATS_CACHE_TTL_SECONDS
+            if self._today_detections_date != today or expired:
+                self._today_detections = self.db_session.query(db.func.count(LPRRecord.id))\
+                    .filter(
+                        LPRRecord.is_blacklisted == True,
+                        within(LPRRecord.timestamp, day_window(today))
+                    )\
+                    .scalar() or 0
+                self._today_detections_date = today
+                self._today_detections_loaded_at = time.monotonic()
+            return self._today_detections
+    
+    def _count_blacklist_detection(self, timestamp: Optional[datetime]) -> None:
+        """Increment today's detection counter for a newly flagged record."""
+        day = local_datetime(timestamp or datetime.utcnow()).date()
+        with self._stats_lock:
+            # An unseeded counter picks the record up when it is seeded
+            if self._today_detections_date == day:
+                self._today_detections += 1
+    
     @classmethod
     def get_active_blacklist(cls) -> List[Dict[str, Any]]:
         """
@@ -336,7 +540,7 @@ class BlacklistService:
     
     def search_blacklist(self, search_term: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
         """
-        Search blacklist entries.
+        Search blacklist entries, best matches first.
         
         Args:
             search_term: Search term
@@ -346,39 +550,5 @@ class BlacklistService:
         Returns:
             Dictionary with search results
         """
-        try:
-            query = self.db_session.query(BlacklistPlate)\
-                .filter(
-                    db.or_(
-                        BlacklistPlate.license_plate_text.contains(search_term),
-                        BlacklistPlate.reason.contains(search_term),
-                        BlacklistPlate.notes.contains(search_term)
-                    )
-                )
-            
-            # Get total count
-            total = query.count()
-            
-            # Get paginated results
-            entries = query.order_by(BlacklistPlate.created_at.desc())\
-                .offset((page - 1) * per_page)\
-                .limit(per_page)\
-                .all()
-            
-            return {
-                'success': True,
-                'data': [entry.to_dict() for entry in entries],
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': total,
-                    'pages': (total + per_page - 1) // per_page
-                }
-            }
-            
-        except Exception as e:
-            logger.error(f"Error searching blacklist: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        from core.dependency_container import get_service
+        return get_service('search_service').search_blacklist(search_term, page=page, per_page=per_page)
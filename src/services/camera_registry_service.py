@@ -0,0 +1,260 @@
+"""
+Camera Registry Service for in-process camera and checkpoint lookups
+
+Camera metadata used to be queried wherever it was needed; the health
+check loaded every Camera row on each run. The registry holds all
+cameras and checkpoints in memory, indexed by camera_id and
+checkpoint_id, and combines them with the live state of the camera state
+service. Online/offline tallies are recomputed when a camera changes
+state and every CAMERA_REGISTRY_TALLY_SECONDS (so idle cameras age out);
+metadata is reloaded after changes made through the registry and every
+CAMERA_REGISTRY_REFRESH_SECONDS for changes made elsewhere.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from typing import Optional, Dict, Any, List
+from sqlalchemy import text, inspect
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from config import Config
+from constants import CAMERA_STATUS_INACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Columns differ between the PostgreSQL schema and the ORM table; keep whatever is there
+LOAD_CAMERAS_SQL = "SELECT * FROM cameras"
+LOAD_CHECKPOINTS_SQL = "SELECT * FROM checkpoints"
+
+class CameraRegistryService:
+    """
+    Service for in-memory camera and checkpoint metadata.
+    
+    This service provides:
+    - O(1) camera and checkpoint lookups
+    - Cameras per checkpoint
+    - Precomputed online/offline tallies, overall and per checkpoint
+    - Reloads after changes and on a timer
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.engine = None
+        self._cameras: Dict[str, Dict[str, Any]] = {}
+        self._checkpoints: Dict[str, Dict[str, Any]] = {}
+        self._tallies: Dict[str, Any] = {'total': 0, 'online': 0, 'offline': 0, 'checkpoints': {}}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self.refresh_thread = None
+        self.running = False
+        self.last_refresh = None
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Camera Registry Service, load cameras and checkpoints and start the refresh thread.
+        
+        Args:
+            db_session: Database session
+            app: Flask application
+        """
+        self.db_session = db_session
+        self.app = app
+        self.engine = db_session.get_bind()
+        
+        self.refresh()
+        get_service('camera_state_service').add_change_listener(self._on_state_change)
+        
+        self.running = True
+        self.refresh_thread = Thread(target=self._refresh_loop, daemon=True)
+        self.refresh_thread.start()
+        logger.info(f"Camera registry initialized with {len(self._cameras)} cameras "
+                    f"and {len(self._checkpoints)} checkpoints")
+    
+    def stop(self):
+        """Stop the refresh thread."""
+        self.running = False
+        self._stop_event.set()
+    
+    def refresh(self) -> bool:
+        """
+        Reload cameras and checkpoints from the database.
+        
+        Returns:
+            True if the registry was reloaded
+        """
+        try:
+            inspector = inspect(self.engine)
+            with self.engine.connect() as conn:
+                cameras = {row.camera_id: dict(row._mapping) for row in conn.execute(text(LOAD_CAMERAS_SQL))}
+                checkpoints = {}
+                if inspector.has_table('checkpoints'):
+                    checkpoints = {
+                        row.checkpoint_id: dict(row._mapping) for row in conn.execute(text(LOAD_CHECKPOINTS_SQL))
+                    }
+        except Exception as e:
+            logger.error(f"Failed to load camera registry: {str(e)}")
+            return False
+        
+        with self._lock:
+            self._cameras = cameras
+            self._checkpoints = checkpoints
+        self.last_refresh = datetime.utcnow()
+        self._recompute_tallies()
+        return True
+    
+    def get_camera(self, camera_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a camera with its live state.
+        
+        Args:
+            camera_id: Camera identifier
+        
+        Returns:
+            Camera dictionary (metadata, state and is_online), or None if unknown
+        """
+        state = get_service('camera_state_service').get_camera(camera_id)
+        with self._lock:
+            metadata = self._cameras.get(camera_id)
+        if metadata is None and state is None:
+            return None
+        return self._merge(camera_id, metadata, state)
+    
+    def get_cameras(self, checkpoint_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get all cameras with their live state.
+        
+        Args:
+            checkpoint_id: Only cameras of this checkpoint
+        
+        Returns:
+            List of camera dictionaries sorted by camera_id
+        """
+        states = {state['camera_id']: state for state in get_service('camera_state_service').get_cameras()}
+        with self._lock:
+            metadata = dict(self._cameras)
+        cameras = [
+            self._merge(camera_id, metadata.get(camera_id), states.get(camera_id))
+            for camera_id in sorted(set(metadata) | set(states))
+        ]
+        if checkpoint_id is not None:
+            cameras = [camera for camera in cameras if camera.get('checkpoint_id') == checkpoint_id]
+        return cameras
+    
+    def get_checkpoint(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a checkpoint.
+        
+        Args:
+            checkpoint_id: Checkpoint identifier
+        
+        Returns:
+            Checkpoint dictionary, or None if unknown
+        """
+        with self._lock:
+            checkpoint = self._checkpoints.get(checkpoint_id)
+            return dict(checkpoint) if checkpoint else None
+    
+    def get_checkpoints(self) -> List[Dict[str, Any]]:
+        """
+        Get all checkpoints.
+        
+        Returns:
+            List of checkpoint dictionaries
+        """
+        with self._lock:
+            return [dict(checkpoint) for checkpoint in self._checkpoints.values()]
+    
+    def get_tallies(self) -> Dict[str, Any]:
+        """
+        Get the precomputed online/offline camera counts.
+        
+        Returns:
+            Dictionary with total, online and offline counts and the same per checkpoint
+        """
+        with self._lock:
+            tallies = dict(self._tallies)
+            tallies['checkpoints'] = {key: dict(value) for key, value in self._tallies['checkpoints'].items()}
+        return tallies
+    
+    @staticmethod
+    def is_online(camera: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        """
+        Whether a camera counts as online.
+        
+        A camera is online unless it disconnected (inactive) or has not been
+        heard from for CAMERA_ONLINE_TIMEOUT_SECONDS.
+        """
+        last_activity = camera.get('last_activity')
+        if camera.get('status') == CAMERA_STATUS_INACTIVE or not isinstance(last_activity, datetime):
+            return False
+        now = now or datetime.utcnow()
+        return now - last_activity < timedelta(seconds=Config.CAMERA_ONLINE_TIMEOUT_SECONDS)
+    
+    def _merge(self, camera_id: str, metadata: Optional[Dict[str, Any]],
+               state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Camera metadata overlaid with live state.
+        
+        The state of this worker may be older than the database row (another
+        worker holds the camera's connection): the newer last_activity wins,
+        and with it its status.
+        """
+        camera = dict(metadata or {})
+        stored_activity = camera.get('last_activity')
+        for key, value in (state or {}).items():
+            if value is not None:
+                camera[key] = value
+        live_activity = camera.get('last_activity')
+        if isinstance(stored_activity, datetime) and (
+                not isinstance(live_activity, datetime) or stored_activity > live_activity):
+            camera['last_activity'] = stored_activity
+            camera['status'] = metadata.get('status') or camera.get('status')
+        camera['camera_id'] = camera_id
+        camera['is_online'] = self.is_online(camera)
+        checkpoint = self._checkpoints.get(camera.get('checkpoint_id'))
+        if checkpoint and not camera.get('location'):
+            camera['location'] = checkpoint.get('location') or checkpoint.get('name')
+        return camera
+    
+    def _recompute_tallies(self):
+        """Recount online/offline cameras (memory only)."""
+        now = datetime.utcnow()
+        tallies = {'total': 0, 'online': 0, 'offline': 0, 'checkpoints': {}}
+        for camera in self.get_cameras():
+            online = self.is_online(camera, now)
+            key = 'online' if online else 'offline'
+            tallies['total'] += 1
+            tallies[key] += 1
+            checkpoint = tallies['checkpoints'].setdefault(
+                camera.get('checkpoint_id') or 'unknown', {'total': 0, 'online': 0, 'offline': 0}
+            )
+            checkpoint['total'] += 1
+            checkpoint[key] += 1
+        tallies['computed_at'] = now.isoformat()
+        with self._lock:
+            self._tallies = tallies
+    
+    def _on_state_change(self, camera_id: str):
+        """Camera state listener: a camera changed status or appeared."""
+        self._recompute_tallies()
+    
+    def _refresh_loop(self):
+        """Recount tallies every CAMERA_REGISTRY_TALLY_SECONDS and reload every CAMERA_REGISTRY_REFRESH_SECONDS."""
+        while self.running:
+            self._stop_event.wait(Config.CAMERA_REGISTRY_TALLY_SECONDS)
+            if not self.running:
+                break
+            try:
+                due = datetime.utcnow() - timedelta(seconds=Config.CAMERA_REGISTRY_REFRESH_SECONDS)
+                if self.last_refresh is None or self.last_refresh < due:
+                    self.refresh()
+                else:
+                    self._recompute_tallies()
+            except Exception as e:
+                logger.error(f"Error in camera registry refresh loop: {str(e)}")
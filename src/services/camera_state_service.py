@@ -0,0 +1,363 @@
+"""
+Camera State Service for camera liveness and health
+
+Camera registrations and health messages used to load and commit the
+cameras row every time, so a fleet heartbeating every few seconds kept
+the table under constant write load. Liveness (status, last_activity) and
+health state now live in memory, and readers get them from here. Changed
+cameras are written in one batched UPSERT every
+CAMERA_STATE_FLUSH_INTERVAL_SECONDS; a change of status or health status
+(e.g. active -> inactive, healthy -> error) is written at once.
+
+The state is per process: a gunicorn worker only sees activity of the
+cameras whose connections it holds. Every CAMERA_STATE_RELOAD_SECONDS each
+worker merges the stored rows back in, keeping whichever of memory and
+database has the newer last_activity (status) and last_health_check
+(health), so all workers converge on the latest state.
+
+Rows follow the PostgreSQL cameras schema (database_schema.sql); on other
+databases the state is kept in memory only.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from typing import Optional, Dict, Any, List, Set, Callable
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Unknown checkpoints are stored as NULL instead of failing the foreign key
+_CHECKPOINT_ID = "(SELECT checkpoint_id FROM checkpoints WHERE checkpoint_id = :checkpoint_id)"
+
+# One camera per parameter set; executed as a batch. Fields not known yet
+# (None) keep their stored values.
+CAMERA_UPSERT_SQL = f"""
+    INSERT INTO cameras (
+        camera_id, checkpoint_id, name, status, health_status, health_details,
+        registered_at, last_activity, last_health_check, updated_at
+    ) VALUES (
+        :camera_id, {_CHECKPOINT_ID}, :name, COALESCE(:status, 'active'), COALESCE(:health_status, 'unknown'),
+        CAST(:health_details AS jsonb), :registered_at, :last_activity, :last_health_check, :updated_at
+    )
+    ON CONFLICT (camera_id) DO UPDATE SET
+        checkpoint_id = COALESCE(EXCLUDED.checkpoint_id, cameras.checkpoint_id),
+        status = COALESCE(:status, cameras.status),
+        health_status = COALESCE(:health_status, cameras.health_status),
+        health_details = COALESCE(EXCLUDED.health_details, cameras.health_details),
+        last_activity = GREATEST(cameras.last_activity, EXCLUDED.last_activity),
+        last_health_check = COALESCE(EXCLUDED.last_health_check, cameras.last_health_check),
+        updated_at = EXCLUDED.updated_at
+"""
+
+LOAD_CAMERAS_SQL = """
+    SELECT camera_id, checkpoint_id, status, health_status, health_details,
+           registered_at, last_activity, last_health_check
+    FROM cameras
+"""
+
+STATE_FIELDS = ('checkpoint_id', 'status', 'health_status', 'health_details',
+                'registered_at', 'last_activity', 'last_health_check')
+
+class CameraStateService:
+    """
+    Service for in-memory camera liveness and health state.
+    
+    This service provides:
+    - Status, activity and health updates without database access
+    - Immediate writes on status and health status transitions
+    - Batched UPSERT of the remaining changes on a flush thread
+    - Reads of the current state of one or all cameras
+    - Listeners notified of new cameras and status transitions
+    - Periodic merge of the state written by other workers
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.engine = None
+        self.persistent = False
+        self._cameras: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._change_listeners: List[Callable[[str], None]] = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._stop_event = Event()
+        self.flush_thread = None
+        self.running = False
+        self.last_flush = None
+        self.last_reload = None
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Camera State Service, load the stored state and start the flush thread.
+        
+        Args:
+            db_session: Database session
+            app: Flask application
+        """
+        self.db_session = db_session
+        self.app = app
+        self.engine = db_session.get_bind()
+        
+        if self.engine.dialect.name != 'postgresql':
+            logger.info("Camera state kept in memory only: PostgreSQL required for the cameras table")
+            return
+        
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(LOAD_CAMERAS_SQL)).all()
+        except Exception as e:
+            logger.error(f"Camera state kept in memory only: {str(e)}")
+            return
+        
+        with self._lock:
+            for row in rows:
+                state = dict(row._mapping)
+                state.pop('camera_id')
+                self._cameras.setdefault(row.camera_id, state)
+        self.last_reload = datetime.utcnow()
+        
+        self.persistent = True
+        self.running = True
+        self.flush_thread = Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+        logger.info(f"Camera state service initialized with {len(rows)} cameras")
+    
+    def stop(self):
+        """Stop the flush thread and write pending changes."""
+        self.running = False
+        self._stop_event.set()
+        self.flush()
+    
+    def add_change_listener(self, listener: Callable[[str], None]):
+        """
+        Register a callback for new cameras and status/health transitions.
+        
+        Args:
+            listener: Called with the camera_id after the change is applied
+        """
+        self._change_listeners.append(listener)
+    
+    def record_status(self, camera_id: str, checkpoint_id: Optional[str], status: str,
+                      timestamp: Optional[str] = None):
+        """
+        Record a camera status (registration, disconnect).
+        
+        Args:
+            camera_id: Camera identifier
+            checkpoint_id: Checkpoint identifier
+            status: Camera status (active, inactive, maintenance)
+            timestamp: Registration timestamp (ISO format) for new cameras
+        """
+        registered_at = datetime.fromisoformat(timestamp) if timestamp else None
+        self._update(camera_id, checkpoint_id, 'status', status, registered_at=registered_at)
+    
+    def record_health(self, camera_id: str, checkpoint_id: Optional[str], health_status: str,
+                      details: Optional[Dict[str, Any]] = None):
+        """
+        Record a camera health report.
+        
+        Args:
+            camera_id: Camera identifier
+            checkpoint_id: Checkpoint identifier
+            health_status: Reported health status
+            details: Health details
+        """
+        self._update(camera_id, checkpoint_id, 'health_status', health_status,
+                     health_details=details, last_health_check=datetime.utcnow())
+    
+    def touch(self, camera_id: str, checkpoint_id: Optional[str] = None):
+        """
+        Record activity of a camera (e.g. a detection) without changing its status.
+        
+        Args:
+            camera_id: Camera identifier
+            checkpoint_id: Checkpoint identifier
+        """
+        self._update(camera_id, checkpoint_id)
+    
+    def get_camera(self, camera_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a camera.
+        
+        Args:
+            camera_id: Camera identifier
+        
+        Returns:
+            Dictionary with the camera state, or None if unknown
+        """
+        with self._lock:
+            state = self._cameras.get(camera_id)
+            return dict(state, camera_id=camera_id) if state else None
+    
+    def get_cameras(self) -> List[Dict[str, Any]]:
+        """
+        Get the current state of all cameras.
+        
+        Returns:
+            List of camera state dictionaries
+        """
+        with self._lock:
+            return [dict(state, camera_id=camera_id) for camera_id, state in self._cameras.items()]
+    
+    def flush(self, camera_ids: Optional[List[str]] = None) -> int:
+        """
+        Write changed cameras to the cameras table in one batch.
+        
+        Args:
+            camera_ids: Only these cameras (immediate writes); default all changed cameras
+        
+        Returns:
+            Number of camera rows written
+        """
+        if not self.persistent:
+            return 0
+        
+        with self._flush_lock:
+            with self._lock:
+                pending = set(self._dirty) if camera_ids is None else self._dirty.intersection(camera_ids)
+                self._dirty -= pending
+                rows = [self._camera_row(camera_id) for camera_id in pending]
+            if not rows:
+                return 0
+            
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text(CAMERA_UPSERT_SQL), rows)
+                self.last_flush = datetime.utcnow()
+                return len(rows)
+            
+            except Exception as e:
+                logger.error(f"Error writing camera state: {str(e)}")
+                # Keep the changes for the next flush
+                with self._lock:
+                    self._dirty |= pending
+                return 0
+    
+    def reload(self) -> int:
+        """
+        Merge the stored state of all cameras, as written by every worker.
+        
+        For each camera the newer of memory and database wins: status and
+        last_activity by last_activity, health by last_health_check.
+        Merged values are not marked for writing.
+        
+        Returns:
+            Number of cameras that appeared or changed status or health status
+        """
+        if not self.persistent:
+            return 0
+        
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(LOAD_CAMERAS_SQL)).all()
+        except Exception as e:
+            logger.error(f"Error reloading camera state: {str(e)}")
+            return 0
+        
+        changed = []
+        with self._lock:
+            for row in rows:
+                stored = dict(row._mapping)
+                camera_id = stored.pop('camera_id')
+                state = self._cameras.get(camera_id)
+                if state is None:
+                    self._cameras[camera_id] = stored
+                    changed.append(camera_id)
+                    continue
+                
+                transition = False
+                if _is_newer(stored['last_activity'], state['last_activity']):
+                    transition = stored['status'] is not None and stored['status'] != state['status']
+                    if stored['status'] is not None:
+                        state['status'] = stored['status']
+                    state['last_activity'] = stored['last_activity']
+                    state['checkpoint_id'] = stored['checkpoint_id'] or state['checkpoint_id']
+                if _is_newer(stored['last_health_check'], state['last_health_check']):
+                    transition = transition or stored['health_status'] != state['health_status']
+                    for key in ('health_status', 'health_details', 'last_health_check'):
+                        state[key] = stored[key]
+                if transition:
+                    changed.append(camera_id)
+        
+        self.last_reload = datetime.utcnow()
+        for camera_id in changed:
+            self._notify(camera_id)
+        return len(changed)
+    
+    def _update(self, camera_id: str, checkpoint_id: Optional[str], field: Optional[str] = None,
+                value: Any = None, **extra):
+        """Apply a change in memory; write at once if field changed value."""
+        now = datetime.utcnow()
+        with self._lock:
+            state = self._cameras.get(camera_id)
+            is_new = state is None
+            if is_new:
+                state = self._cameras[camera_id] = {key: None for key in STATE_FIELDS}
+                state['registered_at'] = extra.get('registered_at') or now
+            
+            transition = is_new or (field is not None and state[field] != value)
+            if field is not None:
+                state[field] = value
+            if checkpoint_id:
+                state['checkpoint_id'] = checkpoint_id
+            for key, extra_value in extra.items():
+                if extra_value is not None and key != 'registered_at':
+                    state[key] = extra_value
+            state['last_activity'] = now
+            self._dirty.add(camera_id)
+        
+        if transition:
+            self.flush([camera_id])
+            if not is_new:
+                logger.info(f"Camera {camera_id} {field} changed to {value}")
+            self._notify(camera_id)
+    
+    def _notify(self, camera_id: str):
+        """Call the change listeners for a camera."""
+        for listener in self._change_listeners:
+            try:
+                listener(camera_id)
+            except Exception as e:
+                logger.error(f"Camera state listener failed: {str(e)}")
+    
+    def _camera_row(self, camera_id: str) -> Dict[str, Any]:
+        """UPSERT parameters of a camera; call with _lock held."""
+        state = self._cameras[camera_id]
+        details = state['health_details']
+        return {
+            'camera_id': camera_id,
+            'checkpoint_id': state['checkpoint_id'],
+            'name': f"Camera {camera_id} at Checkpoint {state['checkpoint_id']}",
+            'status': state['status'],
+            'health_status': state['health_status'],
+            'health_details': json.dumps(details) if details is not None and not isinstance(details, str) else details,
+            'registered_at': state['registered_at'],
+            'last_activity': state['last_activity'],
+            'last_health_check': state['last_health_check'],
+            'updated_at': datetime.utcnow()
+        }
+    
+    def _flush_loop(self):
+        """Write changed cameras every CAMERA_STATE_FLUSH_INTERVAL_SECONDS and merge stored state every CAMERA_STATE_RELOAD_SECONDS."""
+        while self.running:
+            self._stop_event.wait(Config.CAMERA_STATE_FLUSH_INTERVAL_SECONDS)
+            try:
+                self.flush()
+                due = datetime.utcnow() - timedelta(seconds=Config.CAMERA_STATE_RELOAD_SECONDS)
+                if self.running and (self.last_reload is None or self.last_reload < due):
+                    self.reload()
+            except Exception as e:
+                logger.error(f"Error in camera state flush loop: {str(e)}")
+
+def _is_newer(stored: Optional[datetime], current: Optional[datetime]) -> bool:
+    """Whether a stored timestamp is newer than the in-memory one."""
+    return stored is not None and (current is None or stored > current)
@@ -2,16 +2,16 @@
 Data Processor for LPR Server v3
 
 This module handles centralized data processing and storage to PostgreSQL
-for all communication protocols (WebSocket, REST API, MQTT).
+for all communication protocols (WebSocket, REST API, MQTT). Detections
+are stored through the detection repository, the same single write path
+the WebSocket handler uses; other message types go to their own tables.
 """
 
 import json
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import uuid
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -83,9 +83,10 @@ class DataProcessor:
             payload = data.get("payload")
             metadata = data.get("metadata", {})
             
-            # 3. Apply business logic based on data type
+            # 3. Apply business logic based on data type; detections are stored,
+            # counted and checked against the blacklist by the detection repository
             if data_type == "detection":
-                self._process_detection(payload, edge_device_id, timestamp, metadata, protocol)
+                self._process_detection(payload, edge_device_id, timestamp, dict(metadata, message_id=message_id), protocol)
             elif data_type == "health":
                 self._process_health(payload, edge_device_id, timestamp, metadata, protocol)
             elif data_type == "config":
@@ -94,12 +95,10 @@ class DataProcessor:
                 self._process_control(payload, edge_device_id, timestamp, metadata, protocol)
             
             # 4. Store to PostgreSQL
-            self._store_to_database(data)
+            if data_type != "detection":
+                self._store_to_database(data)
             
-            # 5. Update analytics
-            self._update_analytics(data)
-            
-            # 6. Trigger notifications if needed
+            # 5. Trigger notifications if needed
             self._trigger_notifications(data)
             
             logger.debug(f"Processed {data_type} data from {edge_device_id} via {protocol}")
@@ -146,29 +145,47 @@ class DataProcessor:
             timestamp: Detection timestamp
             metadata: Message metadata
             protocol: Source protocol
+        
+        Returns:
+            int: Number of blacklisted plates in the detection
         """
         try:
+            from core.dependency_container import get_service
+            
             # Extract detection information
             detection_data = payload.get("detection_data", {})
             vehicles = detection_data.get("vehicles", [])
-            plates = detection_data.get("plates", [])
-            
-            # Process each vehicle detection
-            for vehicle in vehicles:
-                self._store_vehicle_detection(vehicle, edge_device_id, timestamp, metadata, protocol)
-            
-            # Process each plate detection
-            for plate in plates:
-                self._store_plate_detection(plate, edge_device_id, timestamp, metadata, protocol)
-            
-            # Check for blacklist matches
-            self._check_blacklist_matches(plates, edge_device_id, timestamp)
-            
-            # Update detection statistics
-            self._update_detection_stats(edge_device_id, len(vehicles), len(plates))
-            
+            vehicles_by_index = {vehicle.get("vehicle_index"): vehicle for vehicle in vehicles}
+            
+            # One record per plate; bounding boxes and vehicle attributes go to the record metadata
+            plates = []
+            for plate in detection_data.get("plates", []):
+                details = {key: value for key, value in plate.items() if key not in ("plate_number", "confidence")}
+                vehicle = vehicles_by_index.get(plate.get("vehicle_id"))
+                if vehicle:
+                    details["vehicle"] = vehicle
+                plates.append({
+                    "plate_number": plate.get("plate_number"),
+                    "confidence": plate.get("confidence"),
+                    "metadata": details
+                })
+            
+            result = get_service('detection_repository').save_detection(
+                edge_device_id, payload.get("checkpoint_id"), timestamp, plates,
+                source=protocol,
+                processing_time_ms=detection_data.get("processing_time_ms"),
+                vehicles_count=detection_data.get("vehicles_count", len(vehicles)),
+                plates_count=detection_data.get("plates_count", len(plates)),
+                metadata=dict(metadata, detection_type=detection_data.get("detection_type", "lpr")),
+                vehicle_types=[vehicle.get("vehicle_type") for vehicle in vehicles],
+                plate_types=[plate["metadata"].get("plate_type") for plate in plates]
+            )
+            
+            return result['blacklist_hits']
+        
         except Exception as e:
             logger.error(f"Error processing detection data: {e}")
+            return 0
     
     def _process_health(self, payload: Dict[str, Any], edge_device_id: str, 
                        timestamp: str, metadata: Dict[str, Any], protocol: str):
@@ -266,11 +283,9 @@ class DataProcessor:
             # Store in unified message log
             self._store_message_log(data)
             
-            # Store in protocol-specific tables
+            # Store in protocol-specific tables (detections go through the detection repository)
             data_type = data.get("data_type")
-            if data_type == "detection":
-                self._store_detection_data(data)
-            elif data_type == "health":
+            if data_type == "health":
                 self._store_health_data(data)
             elif data_type == "config":
                 self._store_config_data(data)
@@ -310,108 +325,6 @@ class DataProcessor:
             logger.error(f"Error storing message log: {e}")
             self.db_connection.rollback()
     
-    def _store_detection_data(self, data: Dict[str, Any]):
-        """Store detection data in database"""
-        try:
-            cursor = self.db_connection.cursor()
-            
-            # Insert detection record
-            detection_query = """
-                INSERT INTO detections (
-                    detection_id, camera_id, checkpoint_id, timestamp,
-                    vehicles_count, plates_count, processing_time_ms,
-                    confidence_score, detection_type, metadata, created_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """
-            
-            payload = data.get("payload", {})
-            detection_data = payload.get("detection_data", {})
-            
-            cursor.execute(detection_query, (
-                data.get("message_id"),
-                data.get("edge_device_id"),
-                payload.get("checkpoint_id"),
-                data.get("timestamp"),
-                detection_data.get("vehicles_count", 0),
-                detection_data.get("plates_count", 0),
-                detection_data.get("processing_time_ms"),
-                detection_data.get("confidence_score"),
-                detection_data.get("detection_type", "lpr"),
-                json.dumps(data.get("metadata", {})),
-                datetime.utcnow()
-            ))
-            
-            detection_id = cursor.fetchone()[0]
-            
-            # Insert vehicle records
-            vehicles = detection_data.get("vehicles", [])
-            for vehicle in vehicles:
-                vehicle_query = """
-                    INSERT INTO vehicles (
-                        detection_id, vehicle_index, bbox_x1, bbox_y1, bbox_x2, bbox_y2,
-                        confidence, vehicle_class, vehicle_type, color, brand, model, year, metadata
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """
-                
-                bbox = vehicle.get("bbox", [0, 0, 0, 0])
-                cursor.execute(vehicle_query, (
-                    detection_id,
-                    vehicle.get("vehicle_index", 0),
-                    bbox[0] if len(bbox) > 0 else 0,
-                    bbox[1] if len(bbox) > 1 else 0,
-                    bbox[2] if len(bbox) > 2 else 0,
-                    bbox[3] if len(bbox) > 3 else 0,
-                    vehicle.get("confidence"),
-                    vehicle.get("vehicle_class"),
-                    vehicle.get("vehicle_type"),
-                    vehicle.get("color"),
-                    vehicle.get("brand"),
-                    vehicle.get("model"),
-                    vehicle.get("year"),
-                    json.dumps(vehicle.get("metadata", {}))
-                ))
-                
-                vehicle_id = cursor.fetchone()[0]
-                
-                # Insert plate records for this vehicle
-                plates = detection_data.get("plates", [])
-                for plate in plates:
-                    if plate.get("vehicle_id") == vehicle.get("vehicle_index"):
-                        plate_query = """
-                            INSERT INTO plates (
-                                detection_id, vehicle_id, plate_index, plate_number,
-                                bbox_x1, bbox_y1, bbox_x2, bbox_y2, confidence,
-                                plate_type, country, province, is_valid, metadata
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        
-                        plate_bbox = plate.get("bbox", [0, 0, 0, 0])
-                        cursor.execute(plate_query, (
-                            detection_id,
-                            vehicle_id,
-                            plate.get("plate_index", 0),
-                            plate.get("plate_number"),
-                            plate_bbox[0] if len(plate_bbox) > 0 else 0,
-                            plate_bbox[1] if len(plate_bbox) > 1 else 0,
-                            plate_bbox[2] if len(plate_bbox) > 2 else 0,
-                            plate_bbox[3] if len(plate_bbox) > 3 else 0,
-                            plate.get("confidence"),
-                            plate.get("plate_type"),
-                            plate.get("country", "TH"),
-                            plate.get("province"),
-                            plate.get("is_valid", True),
-                            json.dumps(plate.get("metadata", {}))
-                        ))
-            
-            self.db_connection.commit()
-            cursor.close()
-            
-        except Exception as e:
-            logger.error(f"Error storing detection data: {e}")
-            self.db_connection.rollback()
-    
     def _store_health_data(self, data: Dict[str, Any]):
         """Store health data in database"""
         try:
@@ -505,87 +418,15 @@ class DataProcessor:
             logger.error(f"Error storing control data: {e}")
             self.db_connection.rollback()
     
-    def _check_blacklist_matches(self, plates: List[Dict[str, Any]], edge_device_id: str, timestamp: str):
-        """Check for blacklist matches and trigger alerts"""
+    def _update_device_health(self, edge_device_id: str, health_status: str, health_details: Dict[str, Any]):
+        """Record device health in the camera state (written at once only when it changes)"""
         try:
-            if not plates:
-                return
-            
-            cursor = self.db_connection.cursor(cursor_factory=RealDictCursor)
-            
-            for plate in plates:
-                plate_number = plate.get("plate_number")
-                if not plate_number:
-                    continue
-                
-                # Check blacklist
-                query = """
-                    SELECT * FROM blacklist 
-                    WHERE plate_number = %s AND is_active = true
-                """
-                cursor.execute(query, (plate_number,))
-                blacklist_entry = cursor.fetchone()
-                
-                if blacklist_entry:
-                    # Trigger alert
-                    self._trigger_blacklist_alert(plate, blacklist_entry, edge_device_id, timestamp)
-            
-            cursor.close()
-            
-        except Exception as e:
-            logger.error(f"Error checking blacklist matches: {e}")
-    
-    def _trigger_blacklist_alert(self, plate: Dict[str, Any], blacklist_entry: Dict[str, Any], 
-                                edge_device_id: str, timestamp: str):
-        """Trigger blacklist alert"""
-        try:
-            alert_data = {
-                "type": "blacklist_match",
-                "plate_number": plate.get("plate_number"),
-                "confidence": plate.get("confidence"),
-                "edge_device_id": edge_device_id,
-                "timestamp": timestamp,
-                "blacklist_reason": blacklist_entry.get("reason"),
-                "alert_level": blacklist_entry.get("alert_level", "high")
-            }
-            
-            # Store alert
-            cursor = self.db_connection.cursor()
-            query = """
-                INSERT INTO system_logs (
-                    message_id, timestamp, protocol, edge_device_id,
-                    data_type, payload, metadata, created_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(query, (
-                str(uuid.uuid4()),
-                timestamp,
-                "system",
-                edge_device_id,
-                "blacklist_alert",
-                json.dumps(alert_data),
-                json.dumps({"source": "data_processor"}),
-                datetime.utcnow()
-            ))
-            
-            self.db_connection.commit()
-            cursor.close()
-            
-            logger.warning(f"Blacklist alert triggered for {plate.get('plate_number')}")
-            
-        except Exception as e:
-            logger.error(f"Error triggering blacklist alert: {e}")
-    
-    def _update_analytics(self, data: Dict[str, Any]):
-        """Update analytics and metrics"""
-        try:
-            # This would update real-time analytics
-            # For now, we'll just log the update
-            logger.debug(f"Analytics updated for {data.get('data_type')} from {data.get('edge_device_id')}")
+            from core.dependency_container import get_service
             
+            get_service('camera_state_service').record_health(edge_device_id, None, health_status, health_details)
+        
         except Exception as e:
-            logger.error(f"Error updating analytics: {e}")
+            logger.error(f"Error updating device health: {e}")
     
     def _trigger_notifications(self, data: Dict[str, Any]):
         """Trigger notifications based on data"""
@@ -18,9 +18,12 @@ from core.import_helper import setup_absolute_imports
 setup_absolute_imports()
 
 from core.models.lpr_record import LPRRecord
-from core.models.camera import Camera
 from core.models.blacklist_plate import BlacklistPlate
 from core.models.health_check import HealthCheck
+from core.time_window import day_window, within
+from core.db_pool import build_engine_options, get_pool_metrics
+from config import Config
+from constants import BACKUP_TYPE_FULL, BACKUP_TYPE_INCREMENTAL
 
 logger = logging.getLogger(__name__)
 
@@ -50,10 +53,12 @@ class DatabaseService:
     def initialize_database(self):
         """Initialize database connection and create tables."""
         try:
-            # Create database engine
+            # Create database engine with the configured pool
+            database_url = self.app_config.get('SQLALCHEMY_DATABASE_URI')
             self.engine = create_engine(
-                self.app_config.SQLALCHEMY_DATABASE_URI,
-                echo=self.app_config.DEBUG
+                database_url,
+                echo=self.app_config.get('DEBUG', False),
+                **build_engine_options(self.app_config, database_url)
             )
             
             # Create session factory
@@ -64,8 +69,8 @@ class DatabaseService:
             )
             
             # Create all tables
-            from core.models import Base
-            Base.metadata.create_all(bind=self.engine)
+            from core.models import db
+            db.metadata.create_all(bind=self.engine)
             
             logger.info("Database initialized successfully")
             return True
@@ -80,6 +85,63 @@ class DatabaseService:
             return self.SessionLocal()
         return self.db_session
     
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """
+        Get connection pool metrics of this process.
+        
+        Reports every Flask-SQLAlchemy engine (primary and replicas) and the
+        service's own engine, plus PostgreSQL's connection budget so the pool
+        can be sized against max_connections.
+        """
+        from core.models import db
+        
+        pools = [get_pool_metrics(engine, key or 'primary') for key, engine in db.engines.items()]
+        if self.engine is not None:
+            pools.append(get_pool_metrics(self.engine, 'database_service'))
+        
+        return {
+            'pid': os.getpid(),
+            'pools': pools,
+            'server': self.get_connection_usage()
+        }
+    
+    def get_connection_usage(self) -> Optional[Dict[str, Any]]:
+        """
+        Get PostgreSQL max_connections and the connections currently open.
+        
+        Returns:
+            Dictionary with the server's connection budget, or None if not PostgreSQL
+        """
+        try:
+            if self.db_session.get_bind().dialect.name != 'postgresql':
+                return None
+            
+            max_connections = int(self.db_session.execute(text("SHOW max_connections")).scalar())
+            reserved = int(self.db_session.execute(text("SHOW superuser_reserved_connections")).scalar())
+            rows = self.db_session.execute(text("""
+                SELECT COALESCE(application_name, ''), COALESCE(state, ''), COUNT(*)
+                FROM pg_stat_activity
+                WHERE backend_type = 'client backend'
+                GROUP BY 1, 2
+            """)).fetchall()
+            self.db_session.rollback()
+            
+            connections = sum(row[2] for row in rows)
+            return {
+                'max_connections': max_connections,
+                'superuser_reserved_connections': reserved,
+                'connections': connections,
+                'available': max_connections - reserved - connections,
+                'by_state': [
+                    {'application_name': row[0], 'state': row[1], 'count': row[2]}
+                    for row in rows
+                ]
+            }
+        except SQLAlchemyError as e:
+            self.db_session.rollback()
+            logger.error(f"Failed to get connection usage: {str(e)}")
+            return None
+    
     def test_connection(self) -> bool:
         """Test database connection."""
         try:
@@ -94,17 +156,21 @@ class DatabaseService:
         try:
             stats = {}
             
-            # Count records in each table
+            # Count records in each table (cameras come from the in-memory registry)
+            from core.dependency_container import get_service
             stats['lpr_records_count'] = self.db_session.query(LPRRecord).count()
-            stats['cameras_count'] = self.db_session.query(Camera).count()
+            stats['cameras_count'] = get_service('camera_registry_service').get_tallies()['total']
             stats['blacklist_plates_count'] = self.db_session.query(BlacklistPlate).count()
             stats['health_checks_count'] = self.db_session.query(HealthCheck).count()
             
-            # Get recent activity
+            # Get recent activity (rolling 24 hours and the site-local day)
             yesterday = datetime.utcnow() - timedelta(days=1)
             stats['recent_lpr_records'] = self.db_session.query(LPRRecord)\
                 .filter(LPRRecord.timestamp >= yesterday)\
                 .count()
+            stats['today_lpr_records'] = self.db_session.query(LPRRecord)\
+                .filter(within(LPRRecord.timestamp, day_window()))\
+                .count()
             
             # Get database size
             stats['database_size_mb'] = self._get_database_size()
@@ -115,57 +181,31 @@ class DatabaseService:
             logger.error(f"Failed to get database stats: {str(e)}")
             return {}
     
-    def cleanup_old_data(self, days: int = 30) -> Dict[str, int]:
+    def cleanup_old_data(self, days: int = 30) -> Dict[str, Any]:
         """
         Clean up old data based on retention policy.
         
+        Cleanup runs as a background retention job; this only enqueues it
+        (or returns the job already running).
+        
         Args:
             days: Number of days to keep data
             
         Returns:
-            Dictionary with cleanup results
+            Dictionary with the retention job
         """
-        try:
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            cleanup_results = {}
-            
-            # Clean up old LPR records
-            old_lpr_records = self.db_session.query(LPRRecord)\
-                .filter(LPRRecord.timestamp < cutoff_date)\
-                .all()
-            
-            for record in old_lpr_records:
-                # Remove associated image file
-                if record.image_path and os.path.exists(record.image_path):
-                    try:
-                        os.remove(record.image_path)
-                    except OSError as e:
-                        logger.warning(f"Failed to remove image file {record.image_path}: {str(e)}")
-            
-            deleted_lpr_count = self.db_session.query(LPRRecord)\
-                .filter(LPRRecord.timestamp < cutoff_date)\
-                .delete()
-            
-            cleanup_results['lpr_records_deleted'] = deleted_lpr_count
-            
-            # Clean up old health checks (keep only last 7 days)
-            health_cutoff = datetime.utcnow() - timedelta(days=7)
-            deleted_health_count = self.db_session.query(HealthCheck)\
-                .filter(HealthCheck.timestamp < health_cutoff)\
-                .delete()
-            
-            cleanup_results['health_checks_deleted'] = deleted_health_count
-            
-            # Commit changes
-            self.db_session.commit()
-            
-            logger.info(f"Data cleanup completed: {cleanup_results}")
-            return cleanup_results
-            
-        except Exception as e:
-            logger.error(f"Data cleanup failed: {str(e)}")
-            self.db_session.rollback()
-            return {}
+        from core.dependency_container import get_service
+        return get_service('retention_service').start_job(days)
+    
+    def get_cleanup_status(self) -> Optional[Dict[str, Any]]:
+        """
+        Get progress of the current or last retention job.
+        
+        Returns:
+            Job dictionary or None if no job has run
+        """
+        from core.dependency_container import get_service
+        return get_service('retention_service').get_job()
     
     def optimize_database(self) -> bool:
         """Optimize database performance."""
@@ -185,61 +225,84 @@ class DatabaseService:
             logger.error(f"Database optimization failed: {str(e)}")
             return False
     
-    def backup_database(self, backup_path: str) -> bool:
+    def backup_database(self, backup_path: Optional[str] = None, incremental: bool = False) -> Dict[str, Any]:
         """
         Create database backup.
         
+        PostgreSQL backups run as a background job (see BackupService): a
+        full backup is a parallel pg_dump directory archive, an incremental
+        backup copies only the rows added since the previous backup. SQLite
+        databases are copied to backup_path in BACKUP_DIR.
+        
         Args:
-            backup_path: Path where backup should be saved
+            backup_path: File name of a SQLite backup in BACKUP_DIR
+            incremental: Back up only changes since the last backup (PostgreSQL)
             
         Returns:
-            True if backup successful, False otherwise
+            Dictionary with operation result and, for PostgreSQL, the backup job
         """
         try:
-            if 'sqlite' in self.app_config.SQLALCHEMY_DATABASE_URI.lower():
+            database_url = self.app_config.get('SQLALCHEMY_DATABASE_URI', '')
+            if 'sqlite' in database_url.lower():
                 # For SQLite, copy the database file
-                db_path = self.app_config.SQLALCHEMY_DATABASE_URI.replace('sqlite:///', '')
+                db_path = database_url.replace('sqlite:///', '')
+                backup_file = self._sqlite_backup_file(backup_path)
+                if backup_file is None:
+                    return {'success': False, 'message': f'Invalid backup file name: {backup_path}', 'job': None}
                 if os.path.exists(db_path):
                     import shutil
-                    shutil.copy2(db_path, backup_path)
-                    logger.info(f"Database backup created: {backup_path}")
-                    return True
-            else:
-                # For other databases, implement specific backup logic
-                logger.warning("Database backup not implemented for this database type")
-                return False
+                    os.makedirs(Config.BACKUP_DIR, exist_ok=True)
+                    shutil.copy2(db_path, backup_file)
+                    logger.info(f"Database backup created: {backup_file}")
+                    return {'success': True, 'message': f'Database backup created: {backup_path}', 'job': None}
+                return {'success': False, 'message': 'SQLite database not found', 'job': None}
+            
+            from core.dependency_container import get_service
+            backup_type = BACKUP_TYPE_INCREMENTAL if incremental else BACKUP_TYPE_FULL
+            return get_service('backup_service').start_backup(backup_type)
                 
         except Exception as e:
             logger.error(f"Database backup failed: {str(e)}")
-            return False
+            return {'success': False, 'message': str(e), 'job': None}
     
-    def restore_database(self, backup_path: str) -> bool:
+    def restore_database(self, backup: str) -> Dict[str, Any]:
         """
         Restore database from backup.
         
         Args:
-            backup_path: Path to backup file
+            backup: Backup ID (PostgreSQL) or file name of a SQLite backup in BACKUP_DIR
             
         Returns:
-            True if restore successful, False otherwise
+            Dictionary with operation result and, for PostgreSQL, the restore job
         """
         try:
-            if 'sqlite' in self.app_config.SQLALCHEMY_DATABASE_URI.lower():
+            database_url = self.app_config.get('SQLALCHEMY_DATABASE_URI', '')
+            if 'sqlite' in database_url.lower():
                 # For SQLite, copy the backup file to database location
-                db_path = self.app_config.SQLALCHEMY_DATABASE_URI.replace('sqlite:///', '')
-                if os.path.exists(backup_path):
+                db_path = database_url.replace('sqlite:///', '')
+                backup_file = self._sqlite_backup_file(backup)
+                if backup_file is None:
+                    return {'success': False, 'message': f'Invalid backup file name: {backup}', 'job': None}
+                if os.path.isfile(backup_file):
                     import shutil
-                    shutil.copy2(backup_path, db_path)
-                    logger.info(f"Database restored from: {backup_path}")
-                    return True
-            else:
-                # For other databases, implement specific restore logic
-                logger.warning("Database restore not implemented for this database type")
-                return False
+                    shutil.copy2(backup_file, db_path)
+                    logger.info(f"Database restored from: {backup}")
+                    return {'success': True, 'message': f'Database restored from: {backup}', 'job': None}
+                return {'success': False, 'message': f'Backup file not found: {backup}', 'job': None}
+            
+            from core.dependency_container import get_service
+            return get_service('backup_service').start_restore(backup)
                 
         except Exception as e:
             logger.error(f"Database restore failed: {str(e)}")
-            return False
+            return {'success': False, 'message': str(e), 'job': None}
+    
+    @staticmethod
+    def _sqlite_backup_file(name: Optional[str]) -> Optional[str]:
+        """Path of a SQLite backup in BACKUP_DIR, or None if name is not a plain file name."""
+        if not name or os.path.basename(name) != name or name in ('.', '..'):
+            return None
+        return os.path.join(Config.BACKUP_DIR, name)
     
     def _get_database_size(self) -> float:
         """Get database file size in MB."""
@@ -0,0 +1,319 @@
+"""
+Detection Repository, the single write path for detections
+
+A detection used to be stored up to four times: as an LPRRecord by the
+WebSocket handler and POST /api/records, as detections/vehicles/plates
+rows by the DataProcessor (MQTT, REST), and as a full JSON copy of the
+message in system_logs. Every protocol now stores detections through
+save_detection(): one lpr_records row per plate read, all rows of the
+detection inserted and committed in one transaction together with their
+blacklist flags and image references. Analytics, the camera state,
+blacklist alerts and the optional audit log entry are fed from memory
+after the commit; the audit entry is a compact summary written to
+system_logs in batches by a background thread.
+"""
+
+import json
+import uuid
+import queue
+import logging
+from datetime import datetime
+from threading import Thread, Event
+from typing import Optional, Dict, Any, List
+from flask import has_app_context
+from sqlalchemy import text, inspect
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from core.time_window import to_utc
+from core.deferred_indexes import check_deferred_indexes
+from core.models.lpr_record import LPRRecord
+from services.image_store import ADD_REFERENCES_SQL
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Detection columns of lpr_records for databases created before they existed
+DETECTION_COLUMNS_SQL = [
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS detection_id VARCHAR(36)",
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS checkpoint_id VARCHAR(50)",
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS source VARCHAR(20)",
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS processing_time_ms DOUBLE PRECISION",
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS plate_image_path VARCHAR(255)",
+    "ALTER TABLE lpr_records ADD COLUMN IF NOT EXISTS metadata JSONB"
+]
+
+# system_logs as defined in database_schema.sql
+AUDIT_INSERT_SQL = """
+    INSERT INTO system_logs (timestamp, level, component, message, details)
+    VALUES (:timestamp, 'INFO', 'detection', :message, CAST(:details AS jsonb))
+"""
+
+class DetectionRepository:
+    """
+    Repository for storing detections.
+    
+    This service provides:
+    - One transactional insert per detection for every protocol
+    - Blacklist flags set before the insert instead of a second commit
+    - One image reference per record that points at a shared frame
+    - Analytics, camera activity and blacklist alerts after the commit
+    - An optional, asynchronous audit log projection
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.engine = None
+        self.audit_enabled = False
+        self.audit_queue: queue.Queue = queue.Queue(maxsize=Config.DETECTION_AUDIT_QUEUE_SIZE)
+        self._stop_event = Event()
+        self.audit_thread = None
+        self.running = False
+        self.metrics = {'detections_saved': 0, 'records_saved': 0, 'audit_written': 0, 'audit_dropped': 0}
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Detection Repository and start the audit writer if enabled.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used by callers without an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        self.engine = db_session.get_bind()
+        
+        if self.engine.dialect.name == 'postgresql':
+            try:
+                with self.engine.begin() as conn:
+                    for statement in DETECTION_COLUMNS_SQL:
+                        conn.execute(text(statement))
+            except Exception as e:
+                logger.error(f"Failed to add detection columns to lpr_records: {str(e)}")
+            # The GIN index for meta.* filters is built online by index_advisor.py
+            check_deferred_indexes(self.engine, 'metadata')
+        
+        if Config.DETECTION_AUDIT_ENABLED:
+            if inspect(self.engine).has_table('system_logs'):
+                self.audit_enabled = True
+                self.running = True
+                self.audit_thread = Thread(target=self._audit_loop, daemon=True)
+                self.audit_thread.start()
+            else:
+                logger.warning("Detection audit log disabled: no system_logs table")
+        
+        logger.info("Detection repository initialized")
+    
+    def stop(self):
+        """Stop the audit writer after writing the queued entries."""
+        self.running = False
+        self._stop_event.set()
+        if self.audit_enabled:
+            self._write_audit_batch()
+    
+    def save_detection(self, camera_id: str, checkpoint_id: Optional[str], timestamp,
+                       plates: List[Dict[str, Any]], **fields) -> Dict[str, Any]:
+        """
+        Store one detection.
+        
+        Runs in the caller's app context, or in one of its own for
+        background callers (MQTT/REST processing thread).
+        
+        Args:
+            camera_id: Camera that made the detection
+            checkpoint_id: Checkpoint of the camera
+            timestamp: Detection time (datetime or ISO string, default now)
+            plates: Plates read, each a dict with plate_number and optional
+                confidence, plate_image_path and metadata
+            **fields: Optional detection fields: detection_id, source,
+                image_path, location, location_lat, location_lon,
+                processing_time_ms, vehicles_count, plates_count, metadata
+                (shared by all rows), vehicle_types, plate_types
+        
+        Returns:
+            Dictionary with detection_id, stored records and blacklist hits
+        
+        Raises:
+            Exception: The insert failed; nothing was stored
+        """
+        if has_app_context() or self.app is None:
+            return self._save_detection(camera_id, checkpoint_id, timestamp, plates, fields)
+        
+        with self.app.app_context():
+            try:
+                return self._save_detection(camera_id, checkpoint_id, timestamp, plates, fields)
+            finally:
+                self.db_session.remove()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get write and audit counters.
+        
+        Returns:
+            Dictionary with counters and the audit queue depth
+        """
+        return dict(self.metrics, audit_enabled=self.audit_enabled, audit_queue_depth=self.audit_queue.qsize())
+    
+    def _save_detection(self, camera_id: str, checkpoint_id: Optional[str], timestamp,
+                        plates: List[Dict[str, Any]], fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert the records of a detection in one transaction, then run the side effects."""
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        if timestamp is not None and timestamp.tzinfo is not None:
+            timestamp = to_utc(timestamp)
+        timestamp = timestamp or datetime.utcnow()
+        detection_id = fields.get('detection_id') or str(uuid.uuid4())
+        image_path = fields.get('image_path')
+        shared_metadata = fields.get('metadata') or {}
+        blacklist_service = get_service('blacklist_service')
+        
+        records, matches, unreferenced = [], [], []
+        for plate in plates:
+            if not plate.get('plate_number'):
+                unreferenced.append(plate.get('plate_image_path'))
+                continue
+            record = LPRRecord(
+                detection_id=detection_id,
+                camera_id=camera_id,
+                checkpoint_id=checkpoint_id,
+                plate_number=plate['plate_number'],
+                confidence=plate.get('confidence') or 0.0,
+                timestamp=timestamp,
+                image_path=image_path,
+                plate_image_path=plate.get('plate_image_path'),
+                location=fields.get('location'),
+                location_lat=fields.get('location_lat'),
+                location_lon=fields.get('location_lon'),
+                source=fields.get('source'),
+                processing_time_ms=fields.get('processing_time_ms'),
+                detection_metadata=dict(shared_metadata, **(plate.get('metadata') or {})) or None
+            )
+            blacklist_entry = blacklist_service.match_lpr_detection(record)
+            if blacklist_entry:
+                matches.append((record, blacklist_entry))
+            records.append(record)
+        
+        if records:
+            try:
+                self.db_session.add_all(records)
+                # put() took one reference to the frame; each further record holds its own
+                if image_path and len(records) > 1:
+                    self.db_session.execute(text(ADD_REFERENCES_SQL), {
+                        'path': image_path,
+                        'count': len(records) - 1,
+                        'acquired_at': datetime.utcnow()
+                    })
+                self.db_session.flush()
+                stored = [record.to_dict() for record in records]
+                self.db_session.commit()
+            except Exception:
+                self.db_session.rollback()
+                raise
+        else:
+            stored = []
+            unreferenced.append(image_path)
+        
+        # Images of a detection without readable plates are not referenced by any record
+        image_store = get_service('image_store')
+        for path in unreferenced:
+            if path:
+                image_store.release(path)
+        
+        self.metrics['detections_saved'] += 1
+        self.metrics['records_saved'] += len(stored)
+        self._after_commit(detection_id, camera_id, checkpoint_id, timestamp, stored, matches, fields)
+        
+        return {
+            'detection_id': detection_id,
+            'records': stored,
+            'blacklist_hits': len(matches)
+        }
+    
+    def _after_commit(self, detection_id: str, camera_id: str, checkpoint_id: Optional[str], timestamp: datetime,
+                      stored: List[Dict[str, Any]], matches: List[tuple], fields: Dict[str, Any]):
+        """Feed the in-memory consumers of a stored detection; failures are logged only."""
+        try:
+            get_service('camera_state_service').touch(camera_id, checkpoint_id)
+        except Exception as e:
+            logger.error(f"Error recording camera activity: {str(e)}")
+        
+        blacklist_service = get_service('blacklist_service')
+        for record, blacklist_entry in matches:
+            try:
+                blacklist_service.notify_lpr_detection(record, blacklist_entry)
+            except Exception as e:
+                logger.error(f"Error sending blacklist alert: {str(e)}")
+        
+        plate_numbers = [record['plate_number'] for record in stored]
+        try:
+            get_service('analytics_service').record_detection(
+                camera_id=camera_id,
+                checkpoint_id=checkpoint_id,
+                timestamp=timestamp,
+                plate_numbers=plate_numbers,
+                vehicles=fields.get('vehicles_count', 1),
+                plates=fields.get('plates_count'),
+                processing_time_ms=fields.get('processing_time_ms'),
+                blacklist_hits=len(matches),
+                vehicle_types=fields.get('vehicle_types', ()),
+                plate_types=fields.get('plate_types', ())
+            )
+        except Exception as e:
+            logger.error(f"Error updating analytics: {str(e)}")
+        
+        if self.audit_enabled:
+            self._enqueue_audit({
+                'timestamp': datetime.utcnow(),
+                'message': f"Detection {detection_id} from {camera_id}",
+                'details': json.dumps({
+                    'detection_id': detection_id,
+                    'camera_id': camera_id,
+                    'checkpoint_id': checkpoint_id,
+                    'source': fields.get('source'),
+                    'detected_at': timestamp.isoformat(),
+                    'record_ids': [record['id'] for record in stored],
+                    'plates': plate_numbers,
+                    'blacklist_hits': len(matches)
+                })
+            })
+    
+    def _enqueue_audit(self, entry: Dict[str, Any]):
+        """Queue an audit entry, dropping it if the writer is behind."""
+        try:
+            self.audit_queue.put_nowait(entry)
+        except queue.Full:
+            self.metrics['audit_dropped'] += 1
+    
+    def _write_audit_batch(self) -> int:
+        """Write up to DETECTION_AUDIT_BATCH_SIZE queued entries in one statement."""
+        batch = []
+        while len(batch) < Config.DETECTION_AUDIT_BATCH_SIZE:
+            try:
+                batch.append(self.audit_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return 0
+        
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(AUDIT_INSERT_SQL), batch)
+            self.metrics['audit_written'] += len(batch)
+        except Exception as e:
+            self.metrics['audit_dropped'] += len(batch)
+            logger.error(f"Error writing detection audit log: {str(e)}")
+        return len(batch)
+    
+    def _audit_loop(self):
+        """Write queued audit entries every DETECTION_AUDIT_FLUSH_SECONDS."""
+        while self.running:
+            self._stop_event.wait(Config.DETECTION_AUDIT_FLUSH_SECONDS)
+            try:
+                while self._write_audit_batch() >= Config.DETECTION_AUDIT_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"Error in detection audit loop: {str(e)}")
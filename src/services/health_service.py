@@ -18,7 +18,6 @@ from core.import_helper import setup_absolute_imports
 setup_absolute_imports()
 
 from core.models.health_check import HealthCheck
-from core.models.camera import Camera
 from constants import HEALTH_STATUS_PASS, HEALTH_STATUS_FAIL, HEALTH_STATUS_WARNING
 
 logger = logging.getLogger(__name__)
@@ -69,6 +68,10 @@ class HealthService:
         disk_status = self._check_disk_space()
         health_results['components']['disk_space'] = disk_status
         
+        # Check per-camera/checkpoint image storage quotas
+        quota_status = self._check_storage_quotas()
+        health_results['components']['storage_quotas'] = quota_status
+        
         # Check system resources
         system_status = self._check_system_resources()
         health_results['components']['system_resources'] = system_status
@@ -166,6 +169,32 @@ class HealthService:
                 'details': {}
             }
     
+    def _check_storage_quotas(self) -> Dict[str, Any]:
+        """Check image storage usage against per-camera/checkpoint quotas."""
+        try:
+            from core.dependency_container import get_service
+            usage = get_service('storage_quota_service').get_usage()
+            
+            if usage['over_quota']:
+                status = HEALTH_STATUS_WARNING
+                message = f"{len(usage['over_quota'])} camera/checkpoint storage quotas exceeded"
+            else:
+                status = HEALTH_STATUS_PASS
+                message = 'Storage quotas within limits' if usage['quotas_configured'] else 'No storage quotas configured'
+            
+            return {
+                'status': status,
+                'message': message,
+                'details': usage
+            }
+        except Exception as e:
+            logger.error(f"Storage quota check failed: {str(e)}")
+            return {
+                'status': HEALTH_STATUS_WARNING,
+                'message': f'Storage quota check failed: {str(e)}',
+                'details': {}
+            }
+    
     def _check_system_resources(self) -> Dict[str, Any]:
         """Check system resource usage."""
         try:
@@ -207,10 +236,11 @@ class HealthService:
     def _check_camera_connectivity(self) -> Dict[str, Any]:
         """Check camera connectivity status."""
         try:
-            # Get all cameras from database
-            cameras = self.db_session.query(Camera).all()
+            # Tallies are precomputed by the camera registry
+            from core.dependency_container import get_service
+            tallies = get_service('camera_registry_service').get_tallies()
             
-            if not cameras:
+            if not tallies['total']:
                 return {
                     'status': HEALTH_STATUS_WARNING,
                     'message': 'No cameras registered',
@@ -221,19 +251,9 @@ class HealthService:
                     }
                 }
             
-            # Check last activity for each camera
-            now = datetime.utcnow()
-            connected_count = 0
-            disconnected_count = 0
-            
-            for camera in cameras:
-                # Consider camera connected if last activity was within 5 minutes
-                if camera.last_activity and (now - camera.last_activity) < timedelta(minutes=5):
-                    connected_count += 1
-                else:
-                    disconnected_count += 1
-            
-            total_cameras = len(cameras)
+            connected_count = tallies['online']
+            disconnected_count = tallies['offline']
+            total_cameras = tallies['total']
             
             if disconnected_count == total_cameras:
                 status = HEALTH_STATUS_FAIL
@@ -251,14 +271,15 @@ class HealthService:
                 'details': {
                     'total_cameras': total_cameras,
                     'connected_cameras': connected_count,
-                    'disconnected_cameras': disconnected_count
+                    'disconnected_cameras': disconnected_count,
+                    'checkpoints': tallies['checkpoints']
                 }
             }
         except Exception as e:
             logger.error(f"Camera connectivity check failed: {str(e)}")
             return {
                 'status': HEALTH_STATUS_WARNING,
-                'message': 'Camera connectivity check failed - no cameras table',
+                'message': 'Camera connectivity check failed - camera registry unavailable',
                 'details': {
                     'total_cameras': 0,
                     'connected_cameras': 0,
@@ -0,0 +1,495 @@
+"""
+Image Policy Service for ingest-time storage decisions
+
+Every detection used to store its full annotated frame and every plate
+crop. This service decides at ingest which images are worth the disk
+I/O: in selective mode full frames are kept only for blacklist hits,
+low-confidence reads and a 1-in-N sample per camera, while plate crops
+are kept for everything (IMAGE_POLICY_KEEP_PLATE_CROPS). A background
+pass re-encodes images older than IMAGE_DOWNGRADE_AFTER_DAYS at lower
+quality, leaving blacklist-hit images untouched.
+
+Decisions and bytes saved are counted per camera in memory and added to
+the image_policy_stats table every IMAGE_POLICY_FLUSH_INTERVAL_SECONDS, so
+the report sums every gunicorn worker (PostgreSQL only; elsewhere it shows
+this process since it started).
+"""
+
+import io
+import os
+import json
+import fcntl
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from typing import Optional, List, Dict, Any, Iterable
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from config import Config
+from constants import (
+    IMAGE_POLICY_MODE_SELECTIVE, IMAGE_POLICY_REASON_ALL, IMAGE_POLICY_REASON_BLACKLIST,
+    IMAGE_POLICY_REASON_LOW_CONFIDENCE, IMAGE_POLICY_REASON_SAMPLED, IMAGE_POLICY_REASON_ROUTINE
+)
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = '.downgrade.lock'
+
+_COUNTER_COLUMNS = [
+    'frames_stored', 'frames_skipped', 'crops_stored', 'crops_skipped', 'bytes_stored',
+    'bytes_saved_at_ingest', 'images_downgraded', 'bytes_saved_by_downgrade'
+]
+
+# Flush: add one process's deltas to the stored row; decisions are summed key by key
+UPSERT_STATS_SQL = f"""
+    INSERT INTO image_policy_stats (camera_id, decisions, {', '.join(_COUNTER_COLUMNS)}, created_at, updated_at)
+    VALUES (:camera_id, CAST(:decisions AS jsonb), {', '.join(f':{column}' for column in _COUNTER_COLUMNS)},
+            :updated_at, :updated_at)
+    ON CONFLICT (camera_id) DO UPDATE SET
+        decisions = (
+            SELECT COALESCE(jsonb_object_agg(key, total), '{{}}'::jsonb)
+            FROM (
+                SELECT key, SUM(value::bigint) AS total
+                FROM (
+                    SELECT * FROM jsonb_each_text(image_policy_stats.decisions)
+                    UNION ALL
+                    SELECT * FROM jsonb_each_text(EXCLUDED.decisions)
+                ) AS counters
+                GROUP BY key
+            ) AS merged
+        ),
+        {', '.join(f'{column} = image_policy_stats.{column} + EXCLUDED.{column}' for column in _COUNTER_COLUMNS)},
+        updated_at = EXCLUDED.updated_at
+"""
+
+STATS_SQL = f"""
+    SELECT camera_id, decisions, {', '.join(_COUNTER_COLUMNS)}, created_at FROM image_policy_stats
+"""
+
+# Keyset over (created_at, content_hash); evidence and already downgraded images are skipped
+DOWNGRADE_CANDIDATES_SQL = """
+    SELECT content_hash, path, size_bytes, camera_id, created_at
+    FROM stored_images
+    WHERE created_at < :cutoff
+      AND downgraded_at IS NULL
+      AND evicted_at IS NULL
+      AND NOT is_evidence
+      AND (created_at, content_hash) > (:last_created_at, :last_hash)
+    ORDER BY created_at, content_hash
+    LIMIT :limit
+"""
+
+def _load_pil():
+    """Import Pillow (optional dependency, needed only by the downgrade pass)."""
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        raise RuntimeError('Pillow is required for image downgrading')
+
+def decoded_size(image_data: str) -> int:
+    """Size in bytes of base64 encoded data, without decoding it."""
+    return len(image_data) * 3 // 4 - image_data[-2:].count('=')
+
+def _new_camera_stats() -> Dict[str, Any]:
+    """Empty per-camera counters."""
+    return {
+        'decisions': Counter(),
+        'frames_stored': 0,
+        'frames_skipped': 0,
+        'crops_stored': 0,
+        'crops_skipped': 0,
+        'bytes_stored': 0,
+        'bytes_saved_at_ingest': 0,
+        'images_downgraded': 0,
+        'bytes_saved_by_downgrade': 0
+    }
+
+class ImagePolicyService:
+    """
+    Service for the image storage policy.
+    
+    This service provides:
+    - Full-frame / plate-crop decisions at ingest
+    - Per-camera 1-in-N sampling of routine frames
+    - A background downgrade pass for aged images
+    - Per-camera decision and bytes-saved counters shared by all workers
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.started_at = None
+        self.persisted = False
+        # Counters not yet added to image_policy_stats (all counters when not persisted)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.stats_lock = Lock()
+        self._flush_lock = Lock()
+        self._routine_frames: Counter = Counter()
+        self._stop_event = Event()
+        self.downgrade_thread = None
+        self.flush_thread = None
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.run_lock = Lock()
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Image Policy Service and start the downgrade thread.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run the downgrade pass in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        self.started_at = datetime.utcnow()
+        self.persisted = db_session.get_bind().dialect.name == 'postgresql'
+        
+        if app is not None:
+            self.running = True
+            if self.persisted:
+                self.flush_thread = Thread(target=self._flush_loop, daemon=True)
+                self.flush_thread.start()
+            if Config.IMAGE_DOWNGRADE_ENABLED:
+                self.downgrade_thread = Thread(target=self._downgrade_loop, daemon=True)
+                self.downgrade_thread.start()
+        
+        logger.info(f"Image policy service initialized (full frames: {Config.IMAGE_POLICY_FULL_FRAMES})")
+    
+    def stop(self):
+        """Stop the downgrade and flush threads."""
+        self.running = False
+        self._stop_event.set()
+    
+    def evaluate(self, camera_id: str, plate_numbers: Iterable[str] = (),
+                 plate_detections: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Decide which images of a detection to store.
+        
+        Args:
+            camera_id: Camera identifier
+            plate_numbers: OCR results of the detection
+            plate_detections: Plate detections with optional 'confidence' (0-1)
+        
+        Returns:
+            Dictionary with full_frame/plate_crops flags, the reason and
+            whether the images are evidence (blacklist hit)
+        """
+        plate_numbers = [plate for plate in plate_numbers if plate]
+        evidence = self._is_blacklist_hit(plate_numbers)
+        
+        if Config.IMAGE_POLICY_FULL_FRAMES != IMAGE_POLICY_MODE_SELECTIVE:
+            reason = IMAGE_POLICY_REASON_BLACKLIST if evidence else IMAGE_POLICY_REASON_ALL
+        elif evidence:
+            reason = IMAGE_POLICY_REASON_BLACKLIST
+        elif self._is_low_confidence(plate_detections or []):
+            reason = IMAGE_POLICY_REASON_LOW_CONFIDENCE
+        elif self._take_sample(camera_id):
+            reason = IMAGE_POLICY_REASON_SAMPLED
+        else:
+            reason = IMAGE_POLICY_REASON_ROUTINE
+        
+        with self.stats_lock:
+            self._camera_stats(camera_id)['decisions'][reason] += 1
+        
+        return {
+            'full_frame': reason != IMAGE_POLICY_REASON_ROUTINE,
+            'plate_crops': Config.IMAGE_POLICY_KEEP_PLATE_CROPS or evidence,
+            'reason': reason,
+            'evidence': evidence
+        }
+    
+    def record_image(self, camera_id: str, kind: str, stored: bool, size_bytes: int):
+        """
+        Count one image the policy stored or skipped.
+        
+        Args:
+            camera_id: Camera identifier
+            kind: 'frame' or 'crop'
+            stored: Whether the image was written
+            size_bytes: Decoded image size
+        """
+        with self.stats_lock:
+            stats = self._camera_stats(camera_id)
+            stats[f"{kind}s_{'stored' if stored else 'skipped'}"] += 1
+            stats['bytes_stored' if stored else 'bytes_saved_at_ingest'] += size_bytes
+    
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Get the policy settings and per-camera decisions and bytes saved.
+        
+        Stored counters of all workers are read and this process's
+        unflushed counters added to them.
+        
+        Returns:
+            Dictionary with the policy, per-camera counters, totals and the last downgrade run
+        """
+        cameras: Dict[str, Dict[str, Any]] = {}
+        since = self.started_at
+        if self.persisted:
+            try:
+                for row in self.db_session.execute(text(STATS_SQL)).mappings():
+                    stats = cameras[row['camera_id']] = _new_camera_stats()
+                    self._add_stats(stats, row)
+                    if row['created_at'] and (since is None or row['created_at'] < since):
+                        since = row['created_at']
+            except Exception as e:
+                self.db_session.rollback()
+                logger.error(f"Error reading image policy stats: {str(e)}")
+        
+        with self.stats_lock:
+            for camera_id, pending in self.stats.items():
+                self._add_stats(cameras.setdefault(camera_id, _new_camera_stats()), pending)
+        
+        totals = _new_camera_stats()
+        for stats in cameras.values():
+            self._add_stats(totals, stats)
+        for stats in list(cameras.values()) + [totals]:
+            stats['decisions'] = dict(stats['decisions'])
+        totals['bytes_saved'] = totals['bytes_saved_at_ingest'] + totals['bytes_saved_by_downgrade']
+        
+        with self.run_lock:
+            last_run = dict(self.last_run) if self.last_run else None
+        
+        return {
+            'policy': {
+                'full_frames': Config.IMAGE_POLICY_FULL_FRAMES,
+                'low_confidence': Config.IMAGE_POLICY_LOW_CONFIDENCE,
+                'sample_every': Config.IMAGE_POLICY_SAMPLE_EVERY,
+                'keep_plate_crops': Config.IMAGE_POLICY_KEEP_PLATE_CROPS,
+                'downgrade_enabled': Config.IMAGE_DOWNGRADE_ENABLED,
+                'downgrade_after_days': Config.IMAGE_DOWNGRADE_AFTER_DAYS,
+                'downgrade_quality': Config.IMAGE_DOWNGRADE_QUALITY
+            },
+            'cameras': cameras,
+            'totals': totals,
+            'last_downgrade': last_run,
+            'since': since.isoformat() if since else None
+        }
+    
+    def flush(self) -> int:
+        """
+        Add this process's counters to image_policy_stats.
+        
+        Returns:
+            Number of camera rows written
+        """
+        if not self.persisted:
+            return 0
+        
+        with self._flush_lock:
+            with self.stats_lock:
+                pending, self.stats = self.stats, {}
+            if not pending:
+                return 0
+            
+            now = datetime.utcnow()
+            try:
+                self.db_session.execute(text(UPSERT_STATS_SQL), [
+                    {
+                        'camera_id': camera_id,
+                        'decisions': json.dumps(dict(stats['decisions'])),
+                        'updated_at': now,
+                        **{column: stats[column] for column in _COUNTER_COLUMNS}
+                    }
+                    for camera_id, stats in pending.items()
+                ])
+                self.db_session.commit()
+                return len(pending)
+            
+            except Exception as e:
+                self.db_session.rollback()
+                logger.error(f"Error flushing image policy stats: {str(e)}")
+                # Keep the counters for the next flush
+                with self.stats_lock:
+                    for camera_id, stats in pending.items():
+                        self._add_stats(self._camera_stats(camera_id), stats)
+                return 0
+    
+    def downgrade(self, older_than: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Re-encode stored images older than older_than at lower quality.
+        
+        Runs in the caller's thread. Only one worker runs the pass at a
+        time; others return immediately with skipped set.
+        
+        Args:
+            older_than: Naive UTC cutoff (default now minus IMAGE_DOWNGRADE_AFTER_DAYS)
+        
+        Returns:
+            Dictionary with images downgraded, bytes saved, unchanged images and errors
+        """
+        image_module = _load_pil()
+        image_store = get_service('image_store')
+        cutoff = older_than or datetime.utcnow() - timedelta(days=Config.IMAGE_DOWNGRADE_AFTER_DAYS)
+        results = {'images_downgraded': 0, 'bytes_saved': 0, 'images_unchanged': 0, 'errors': 0, 'skipped': False}
+        
+        with open(os.path.join(Config.IMAGE_STORAGE_PATH, LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                results['skipped'] = True
+                return results
+            
+            try:
+                last_created_at, last_hash = datetime(1970, 1, 1), ''
+                while True:
+                    rows = self.db_session.execute(text(DOWNGRADE_CANDIDATES_SQL), {
+                        'cutoff': cutoff,
+                        'last_created_at': last_created_at,
+                        'last_hash': last_hash,
+                        'limit': Config.IMAGE_DOWNGRADE_BATCH_SIZE
+                    }).all()
+                    self.db_session.commit()
+                    if not rows:
+                        return results
+                    
+                    for row in rows:
+                        self._downgrade_image(image_module, image_store, row, results)
+                    last_created_at, last_hash = rows[-1].created_at, rows[-1].content_hash
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def start_downgrade(self) -> Dict[str, Any]:
+        """
+        Run downgrade() on a background thread unless a pass is already running.
+        
+        Returns:
+            Dictionary with operation result and run information
+        """
+        with self.run_lock:
+            if self.last_run and self.last_run['status'] == 'running':
+                return {'success': True, 'message': 'Image downgrade already running', 'run': dict(self.last_run)}
+            self.last_run = {
+                'status': 'running',
+                'results': None,
+                'error': None,
+                'started_at': datetime.utcnow().isoformat(),
+                'finished_at': None
+            }
+            run = dict(self.last_run)
+        
+        Thread(target=self._run_downgrade, daemon=True).start()
+        return {'success': True, 'message': 'Image downgrade started', 'run': run}
+    
+    def _downgrade_image(self, image_module, image_store, row, results: Dict[str, Any]):
+        """Re-encode one image and replace it if the copy is smaller."""
+        try:
+            with image_module.open(row.path) as image:
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                if image.width > Config.IMAGE_DOWNGRADE_MAX_WIDTH:
+                    image.thumbnail((Config.IMAGE_DOWNGRADE_MAX_WIDTH, image.height))
+                buffer = io.BytesIO()
+                image.save(buffer, 'JPEG', quality=Config.IMAGE_DOWNGRADE_QUALITY, optimize=True)
+        except Exception as e:
+            logger.warning(f"Failed to re-encode image {row.path}: {str(e)}")
+            results['errors'] += 1
+            return
+        
+        data = buffer.getvalue()
+        if len(data) >= row.size_bytes:
+            # Already small enough; mark it so later passes skip it
+            image_store.downgrade(row.content_hash, None)
+            results['images_unchanged'] += 1
+            return
+        
+        if image_store.downgrade(row.content_hash, data):
+            saved = row.size_bytes - len(data)
+            results['images_downgraded'] += 1
+            results['bytes_saved'] += saved
+            with self.stats_lock:
+                stats = self._camera_stats(row.camera_id)
+                stats['images_downgraded'] += 1
+                stats['bytes_saved_by_downgrade'] += saved
+    
+    def _run_downgrade(self):
+        """Run a downgrade pass on the background thread and record the outcome."""
+        try:
+            with self.app.app_context():
+                results = self.downgrade()
+                status, error = 'completed', None
+                logger.info(f"Image downgrade completed: {results}")
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Image downgrade failed: {str(e)}")
+            results, status, error = None, 'failed', str(e)
+        finally:
+            self.db_session.remove()
+        
+        with self.run_lock:
+            self.last_run.update(
+                status=status,
+                results=results,
+                error=error,
+                finished_at=datetime.utcnow().isoformat()
+            )
+    
+    def _flush_loop(self):
+        """Flush counters every IMAGE_POLICY_FLUSH_INTERVAL_SECONDS."""
+        while self.running:
+            self._stop_event.wait(Config.IMAGE_POLICY_FLUSH_INTERVAL_SECONDS)
+            try:
+                with self.app.app_context():
+                    self.flush()
+                    self.db_session.remove()
+            except Exception as e:
+                logger.error(f"Error in image policy flush loop: {str(e)}")
+    
+    def _downgrade_loop(self):
+        """Run the downgrade pass every IMAGE_DOWNGRADE_INTERVAL_MINUTES."""
+        while self.running:
+            self._stop_event.wait(Config.IMAGE_DOWNGRADE_INTERVAL_MINUTES * 60)
+            if self.running:
+                self.start_downgrade()
+    
+    def _is_blacklist_hit(self, plate_numbers: List[str]) -> bool:
+        """Whether any plate of the detection is on the active blacklist."""
+        if not plate_numbers:
+            return False
+        try:
+            blacklist_service = get_service('blacklist_service')
+            return any(blacklist_service.check_blacklist(plate) for plate in plate_numbers)
+        except Exception as e:
+            # Keep the frame when the blacklist can not be checked
+            logger.error(f"Error checking blacklist for image policy: {str(e)}")
+            return True
+    
+    @staticmethod
+    def _is_low_confidence(plate_detections: List[Dict[str, Any]]) -> bool:
+        """Whether any plate was read below IMAGE_POLICY_LOW_CONFIDENCE."""
+        confidences = [
+            detection['confidence'] for detection in plate_detections
+            if isinstance(detection, dict) and isinstance(detection.get('confidence'), (int, float))
+        ]
+        return bool(confidences) and min(confidences) < Config.IMAGE_POLICY_LOW_CONFIDENCE
+    
+    def _take_sample(self, camera_id: str) -> bool:
+        """Keep every IMAGE_POLICY_SAMPLE_EVERY-th routine frame of a camera."""
+        if Config.IMAGE_POLICY_SAMPLE_EVERY <= 0:
+            return False
+        with self.stats_lock:
+            count = self._routine_frames[camera_id]
+            self._routine_frames[camera_id] += 1
+        return count % Config.IMAGE_POLICY_SAMPLE_EVERY == 0
+    
+    @staticmethod
+    def _add_stats(target: Dict[str, Any], source):
+        """Add the counters of source (stats dictionary or stored row) to target."""
+        target['decisions'].update(source['decisions'] or {})
+        for column in _COUNTER_COLUMNS:
+            target[column] += source[column] or 0
+    
+    def _camera_stats(self, camera_id: Optional[str]) -> Dict[str, Any]:
+        """Counters of one camera; call with stats_lock held."""
+        key = camera_id or 'unknown'
+        if key not in self.stats:
+            self.stats[key] = _new_camera_stats()
+        return self.stats[key]
@@ -0,0 +1,480 @@
+"""
+Image Reconciler Service for the image store
+
+Image files and the database drift apart: a record insert that rolls back
+after _save_image() leaves a file nobody references, and a record removed
+outside retention leaves its file behind. This service compares the store
+with the database one day shard (IMAGE_STORAGE_PATH/YYYY/MM/DD) at a time:
+
+1. References vs index: reference counts of lpr_records.image_path,
+   detections.annotated_image_path and plates.cropped_image_path are
+   merged with the stored_images rows of the shard.
+2. Index vs disk: the sorted directory walk of the shard is merged with
+   the original and derivative paths of the stored_images rows.
+
+Both sides of each merge are streamed in path order (server-side cursors,
+COLLATE "C" on PostgreSQL to match Python's byte-wise string order), so a
+shard is checked in O(n) with constant memory. Runs are throttled, resume
+from a checkpoint and only change anything when asked to apply fixes.
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Callable, Tuple
+from sqlalchemy import text, inspect
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from core.deferred_indexes import IMAGE_PATH_COLUMNS, check_deferred_indexes
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = '.reconcile.lock'
+
+# Columns holding image store paths. Their byte-order (COLLATE "C") indexes
+# for the range scans and ORDER BY below are deferred indexes, built online
+# by index_advisor.py
+REFERENCE_COLUMNS = [(table, column) for table, column in IMAGE_PATH_COLUMNS if table != 'stored_images']
+
+STORED_IMAGES_SQL = """
+    SELECT content_hash, path, ref_count, last_acquired_at, thumbnail_path, preview_path, evicted_at
+    FROM stored_images
+    WHERE path{collate} >= :low AND path{collate} < :high
+    ORDER BY path{collate}
+"""
+
+REFERENCE_SELECT_SQL = """
+    SELECT {column} AS path FROM {table}
+    WHERE {column}{collate} >= :low AND {column}{collate} < :high
+"""
+
+REFERENCES_SQL = """
+    SELECT path, COUNT(*) AS refs FROM ({selects}) refs
+    GROUP BY path
+    ORDER BY path{collate}
+"""
+
+_END = object()
+
+def merge_join(left: Iterable, right: Iterable,
+               left_key: Callable, right_key: Callable) -> Iterator[Tuple[Any, Any, Any]]:
+    """
+    Full outer join of two iterables sorted by unique keys.
+    
+    Yields:
+        (key, left item or None, right item or None)
+    """
+    left, right = iter(left), iter(right)
+    left_item, right_item = next(left, _END), next(right, _END)
+    while left_item is not _END or right_item is not _END:
+        if right_item is _END or (left_item is not _END and left_key(left_item) < right_key(right_item)):
+            yield left_key(left_item), left_item, None
+            left_item = next(left, _END)
+        elif left_item is _END or right_key(right_item) < left_key(left_item):
+            yield right_key(right_item), None, right_item
+            right_item = next(right, _END)
+        else:
+            yield left_key(left_item), left_item, right_item
+            left_item, right_item = next(left, _END), next(right, _END)
+
+def _new_results() -> Dict[str, int]:
+    """Counters of a reconcile run."""
+    return {
+        'files': 0,
+        'orphan_files': 0,
+        'missing_files': 0,
+        'missing_derivatives': 0,
+        'unreferenced_images': 0,
+        'miscounted_images': 0,
+        'unindexed_files': 0,
+        'dangling_references': 0,
+        'fixed': 0,
+    }
+
+class ImageReconcilerService:
+    """
+    Service for reconciling the image store with the database.
+    
+    This service provides:
+    - Orphan file detection (files without a stored_images row)
+    - Dangling reference detection (rows or records pointing at missing files)
+    - Reference count correction for rows leaked by failed commits
+    - Incremental, throttled runs per day shard with a checkpoint
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.engine = None
+        self.collate = ''
+        self.reference_columns: List[Tuple[str, str]] = []
+        self._stop_event = Event()
+        self.reconcile_thread = None
+        self.running = False
+        self._items = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.run_lock = Lock()
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Image Reconciler Service and start the reconcile thread.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run reconciles in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        self.engine = db_session.get_bind()
+        
+        inspector = inspect(self.engine)
+        self.reference_columns = [(table, column) for table, column in REFERENCE_COLUMNS if inspector.has_table(table)]
+        
+        if self.engine.dialect.name == 'postgresql':
+            self.collate = ' COLLATE "C"'
+            check_deferred_indexes(self.engine, 'image_paths')
+        
+        if Config.RECONCILE_ENABLED and app is not None:
+            self.running = True
+            self.reconcile_thread = Thread(target=self._reconcile_loop, daemon=True)
+            self.reconcile_thread.start()
+        
+        logger.info("Image reconciler service initialized")
+    
+    def stop(self):
+        """Stop the reconcile thread."""
+        self.running = False
+        self._stop_event.set()
+    
+    def list_shards(self) -> List[str]:
+        """
+        List the day shards of the image store, oldest first.
+        
+        Returns:
+            List of 'YYYY/MM/DD' shard names
+        """
+        root = Config.IMAGE_STORAGE_PATH
+        return [
+            f"{year}/{month}/{day}"
+            for year in self._sorted_dirs(root, 4)
+            for month in self._sorted_dirs(os.path.join(root, year), 2)
+            for day in self._sorted_dirs(os.path.join(root, year, month), 2)
+        ]
+    
+    def reconcile(self, apply: Optional[bool] = None, shards: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Reconcile the next RECONCILE_SHARDS_PER_RUN day shards.
+        
+        Continues after the checkpointed shard and wraps around to the
+        oldest one. Shards younger than RECONCILE_GRACE_MINUTES are left
+        alone. Only one worker runs at a time; others return immediately
+        with skipped set.
+        
+        Args:
+            apply: Fix what is found (default RECONCILE_APPLY); otherwise only report
+            shards: Explicit shards to reconcile instead of the checkpointed range
+        
+        Returns:
+            Dictionary with per-shard counters and totals
+        """
+        apply = Config.RECONCILE_APPLY if apply is None else apply
+        results = {'shards': {}, 'totals': _new_results(), 'applied': apply, 'skipped': False}
+        
+        os.makedirs(Config.IMAGE_STORAGE_PATH, exist_ok=True)
+        with open(os.path.join(Config.IMAGE_STORAGE_PATH, LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                results['skipped'] = True
+                return results
+            
+            try:
+                checkpoint = self._load_checkpoint() or {}
+                if shards is None:
+                    shards = self._next_shards(checkpoint.get('last_shard'))
+                
+                for shard in shards:
+                    if self._stop_event.is_set():
+                        break
+                    counters = self.reconcile_shard(shard, apply)
+                    results['shards'][shard] = counters
+                    for key, value in counters.items():
+                        results['totals'][key] += value
+                    
+                    checkpoint = {'last_shard': shard, 'updated_at': datetime.utcnow().isoformat()}
+                    self._save_checkpoint(checkpoint)
+                return results
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def reconcile_shard(self, shard: str, apply: bool = False) -> Dict[str, int]:
+        """
+        Reconcile one day shard.
+        
+        Args:
+            shard: 'YYYY/MM/DD' shard name
+            apply: Fix what is found; otherwise only report
+        
+        Returns:
+            Dictionary of counters
+        """
+        prefix = os.path.join(Config.IMAGE_STORAGE_PATH, *shard.split('/'))
+        # Every path below the shard sorts in [prefix + '/', prefix + '0')
+        bounds = {'low': prefix + os.sep, 'high': prefix + chr(ord(os.sep) + 1)}
+        cutoff = datetime.utcnow() - timedelta(minutes=Config.RECONCILE_GRACE_MINUTES)
+        results = _new_results()
+        
+        if self.reference_columns:
+            self._reconcile_references(bounds, cutoff, apply, results)
+        else:
+            logger.warning("No image reference tables found; skipping reference check")
+        self._reconcile_files(prefix, bounds, cutoff, apply, results)
+        
+        logger.info(f"Reconciled image shard {shard}: {results}")
+        return results
+    
+    def start_reconcile(self, apply: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Run reconcile() on a background thread unless a run is already in progress.
+        
+        Args:
+            apply: Fix what is found (default RECONCILE_APPLY)
+        
+        Returns:
+            Dictionary with operation result and run information
+        """
+        with self.run_lock:
+            if self.last_run and self.last_run['status'] == 'running':
+                return {'success': True, 'message': 'Image reconcile already running', 'run': dict(self.last_run)}
+            self.last_run = {
+                'status': 'running',
+                'results': None,
+                'error': None,
+                'started_at': datetime.utcnow().isoformat(),
+                'finished_at': None
+            }
+            run = dict(self.last_run)
+        
+        Thread(target=self._run_reconcile, args=(apply,), daemon=True).start()
+        return {'success': True, 'message': 'Image reconcile started', 'run': run}
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the checkpoint and the last reconcile run.
+        
+        Returns:
+            Dictionary with status information
+        """
+        with self.run_lock:
+            last_run = dict(self.last_run) if self.last_run else None
+        return {
+            'enabled': Config.RECONCILE_ENABLED,
+            'apply': Config.RECONCILE_APPLY,
+            'checkpoint': self._load_checkpoint(),
+            'last_run': last_run
+        }
+    
+    def _reconcile_references(self, bounds: Dict[str, str], cutoff: datetime, apply: bool,
+                              results: Dict[str, int]):
+        """Merge record references with stored_images rows and fix reference counts."""
+        image_store = get_service('image_store')
+        selects = ' UNION ALL '.join(
+            REFERENCE_SELECT_SQL.format(table=table, column=column, collate=self.collate)
+            for table, column in self.reference_columns
+        )
+        
+        with self.engine.connect() as rows_conn, self.engine.connect() as refs_conn:
+            rows = self._stream(rows_conn, STORED_IMAGES_SQL.format(collate=self.collate), bounds)
+            refs = self._stream(refs_conn, REFERENCES_SQL.format(selects=selects, collate=self.collate), bounds)
+            
+            for path, row, ref in merge_join(rows, refs, lambda r: r.path, lambda r: r.path):
+                self._throttle()
+                if row is None:
+                    if os.path.exists(path):
+                        # Referenced file whose row is gone; index it again
+                        results['unindexed_files'] += 1
+                        if apply and image_store.adopt(path, ref.refs):
+                            results['fixed'] += 1
+                    else:
+                        results['dangling_references'] += ref.refs
+                    continue
+                
+                refs_count = ref.refs if ref is not None else 0
+                if refs_count == row.ref_count:
+                    continue
+                results['unreferenced_images' if refs_count == 0 else 'miscounted_images'] += 1
+                # Rows touched recently may belong to a record not yet committed
+                if apply and not self._is_recent(row.last_acquired_at, cutoff):
+                    if image_store.set_ref_count(row.content_hash, row.ref_count, refs_count):
+                        results['fixed'] += 1
+    
+    def _reconcile_files(self, prefix: str, bounds: Dict[str, str], cutoff: datetime, apply: bool,
+                         results: Dict[str, int]):
+        """Merge the shard's files with the paths recorded in stored_images."""
+        image_store = get_service('image_store')
+        cutoff_mtime = time.time() - Config.RECONCILE_GRACE_MINUTES * 60
+        
+        with self.engine.connect() as conn:
+            rows = self._stream(conn, STORED_IMAGES_SQL.format(collate=self.collate), bounds)
+            
+            for path, found, expected in merge_join(self._walk_shard(prefix), self._expected_files(rows),
+                                                    lambda f: f[0], lambda e: e[0]):
+                self._throttle()
+                if found is not None and expected is not None:
+                    results['files'] += 1
+                elif expected is None:
+                    # Written moments ago by a put() that has not committed yet
+                    if found[1] > cutoff_mtime:
+                        continue
+                    results['orphan_files'] += 1
+                    if apply and self._remove(path):
+                        results['fixed'] += 1
+                else:
+                    _, content_hash, kind = expected
+                    results['missing_derivatives' if kind else 'missing_files'] += 1
+                    if apply and image_store.forget_file(content_hash, kind):
+                        results['fixed'] += 1
+    
+    def _stream(self, conn, sql: str, params: Dict[str, Any]):
+        """Execute a query on a server-side cursor."""
+        return conn.execution_options(stream_results=True, yield_per=Config.RECONCILE_BATCH_SIZE).execute(
+            text(sql), params
+        )
+    
+    @staticmethod
+    def _expected_files(rows) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """Original and derivative paths of stored_images rows, in path order."""
+        for row in rows:
+            # Evicted images keep their row but not their file
+            files = [] if row.evicted_at else [(row.path, row.content_hash, None)]
+            if row.preview_path:
+                files.append((row.preview_path, row.content_hash, 'preview'))
+            if row.thumbnail_path:
+                files.append((row.thumbnail_path, row.content_hash, 'thumbnail'))
+            # All three share the '<hash>.' prefix, so sorting per row keeps the global order
+            yield from sorted(files)
+    
+    @classmethod
+    def _walk_shard(cls, prefix: str) -> Iterator[Tuple[str, float]]:
+        """(path, mtime) of the files of a day shard (HH/ab/<file>) in path order."""
+        for hour in cls._sorted_dirs(prefix, 2):
+            hour_path = os.path.join(prefix, hour)
+            for hash_prefix in cls._sorted_dirs(hour_path, 2):
+                directory = os.path.join(hour_path, hash_prefix)
+                try:
+                    entries = sorted((entry for entry in os.scandir(directory) if entry.is_file()),
+                                     key=lambda entry: entry.name)
+                except FileNotFoundError:
+                    continue
+                for entry in entries:
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, mtime
+    
+    @staticmethod
+    def _sorted_dirs(path: str, width: int) -> List[str]:
+        """Fixed-width shard directory names below path, sorted."""
+        try:
+            return sorted(
+                entry.name for entry in os.scandir(path)
+                if entry.is_dir() and len(entry.name) == width and entry.name.isalnum()
+            )
+        except FileNotFoundError:
+            return []
+    
+    def _next_shards(self, last_shard: Optional[str]) -> List[str]:
+        """Up to RECONCILE_SHARDS_PER_RUN settled shards after last_shard, wrapping around."""
+        newest = (datetime.utcnow() - timedelta(minutes=Config.RECONCILE_GRACE_MINUTES)).strftime('%Y/%m/%d')
+        shards = [shard for shard in self.list_shards() if shard < newest and shard.replace('/', '').isdigit()]
+        if last_shard:
+            shards = [shard for shard in shards if shard > last_shard] + [shard for shard in shards if shard <= last_shard]
+        return shards[:Config.RECONCILE_SHARDS_PER_RUN]
+    
+    @staticmethod
+    def _is_recent(value, cutoff: datetime) -> bool:
+        """Whether a timestamp column (datetime or SQLite text) is after cutoff."""
+        if value is None:
+            return False
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value > cutoff
+    
+    @staticmethod
+    def _remove(path: str) -> bool:
+        """Delete an orphan file."""
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Failed to delete orphan image {path}: {str(e)}")
+            return False
+    
+    def _throttle(self):
+        """Pause every RECONCILE_BATCH_SIZE items to leave I/O for ingest."""
+        self._items += 1
+        if self._items % Config.RECONCILE_BATCH_SIZE == 0:
+            time.sleep(Config.RECONCILE_SLEEP_SECONDS)
+    
+    def _run_reconcile(self, apply: Optional[bool]):
+        """Run reconcile() on the background thread and record the outcome."""
+        try:
+            with self.app.app_context():
+                results = self.reconcile(apply)
+                status, error = 'completed', None
+                logger.info(f"Image reconcile completed: {results['totals']}")
+        except Exception as e:
+            logger.error(f"Image reconcile failed: {str(e)}")
+            results, status, error = None, 'failed', str(e)
+        finally:
+            self.db_session.remove()
+        
+        with self.run_lock:
+            self.last_run.update(
+                status=status,
+                results=results,
+                error=error,
+                finished_at=datetime.utcnow().isoformat()
+            )
+    
+    def _reconcile_loop(self):
+        """Reconcile the next shards every RECONCILE_INTERVAL_MINUTES."""
+        while self.running:
+            self._stop_event.wait(Config.RECONCILE_INTERVAL_MINUTES * 60)
+            if self.running:
+                self.start_reconcile()
+    
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        """Write the checkpoint file atomically."""
+        path = Config.RECONCILE_CHECKPOINT_PATH
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write reconcile checkpoint: {str(e)}")
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Read the checkpoint file, if any."""
+        try:
+            with open(Config.RECONCILE_CHECKPOINT_PATH) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read reconcile checkpoint: {str(e)}")
+            return None
@@ -0,0 +1,616 @@
+"""
+Image Store for content-addressed image files
+
+Images are named by the SHA-256 of their bytes and sharded by the hour
+they were first written and the first two hex digits of the hash:
+
+    IMAGE_STORAGE_PATH/YYYY/MM/DD/HH/ab/<sha256>.jpg
+
+so no directory grows past one hour of one hash prefix. Identical payloads
+(e.g. frames resent by a retrying edge) are stored once; the stored_images
+row counts the records that reference the file, and the file is removed
+when the last reference is released. Thumbnails and previews are written
+next to the original as <sha256>.thumbnail.jpg and <sha256>.preview.jpg.
+
+Bytes and file counts per camera and checkpoint are kept in
+image_storage_usage, updated in the same transaction as the file change,
+for storage quotas. Evicting an image removes its file but keeps the row,
+so records still resolve it (as evicted) and a re-upload restores it.
+
+The stored_images row is locked (by the upsert or the decrement) for the
+whole of put() and release(), so a concurrent put of the same bytes can
+not pick up a file that is being removed.
+"""
+
+import os
+import re
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple, Any, Callable
+from sqlalchemy import text, bindparam
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from config import Config
+from constants import (
+    IMAGE_DERIVATIVE_THUMBNAIL, IMAGE_DERIVATIVE_PREVIEW, IMAGE_DERIVATIVES,
+    STORAGE_SCOPE_CAMERA, STORAGE_SCOPE_CHECKPOINT
+)
+
+logger = logging.getLogger(__name__)
+
+# <sha256>.jpg, <sha256>.thumbnail.jpg or <sha256>.preview.jpg
+STORE_FILENAME_PATTERN = re.compile(r'^([0-9a-f]{64})(?:\.(thumbnail|preview))?\.[a-z0-9]+$')
+
+def parse_store_path(path: Optional[str]) -> Optional[Tuple[str, Optional[str]]]:
+    """Content hash and derivative kind (None for the original) of a store path."""
+    if not path:
+        return None
+    match = STORE_FILENAME_PATTERN.match(os.path.basename(path))
+    return (match.group(1), match.group(2)) if match else None
+
+def image_url(path: Optional[str], kind: Optional[str] = None) -> Optional[str]:
+    """
+    URL of a stored image on the image delivery endpoint.
+    
+    Store files get immutable content-hash URLs (/images/<hash>[/<kind>]);
+    files written before the store existed are addressed by their path and
+    have no derivatives.
+    """
+    if not path:
+        return None
+    parsed = parse_store_path(path)
+    if parsed:
+        content_hash, kind = parsed[0], kind or parsed[1]
+        return f"/images/{content_hash}/{kind}" if kind else f"/images/{content_hash}"
+    return '/images/file/' + os.path.relpath(path, Config.IMAGE_STORAGE_PATH).replace(os.sep, '/')
+
+# Take a reference, inserting the row for new content; returns the existing path for duplicates
+ACQUIRE_SQL = """
+    INSERT INTO stored_images (content_hash, path, size_bytes, ref_count, camera_id, checkpoint_id,
+                               is_evidence, created_at, last_acquired_at)
+    VALUES (:content_hash, :path, :size_bytes, 1, :camera_id, :checkpoint_id,
+            :is_evidence, :created_at, :created_at)
+    ON CONFLICT (content_hash) DO UPDATE SET
+        ref_count = stored_images.ref_count + 1,
+        is_evidence = stored_images.is_evidence OR EXCLUDED.is_evidence,
+        last_acquired_at = EXCLUDED.last_acquired_at
+    RETURNING path, ref_count, size_bytes, camera_id, checkpoint_id, evicted_at
+"""
+
+# References held by further records of the same put (e.g. one frame shared by the
+# plates of a detection); run in the transaction that stores those records
+ADD_REFERENCES_SQL = """
+    UPDATE stored_images SET ref_count = ref_count + :count, last_acquired_at = :acquired_at
+    WHERE path = :path
+"""
+
+# Rewritten file of an existing row (went missing or was evicted)
+RESTORE_SQL = """
+    UPDATE stored_images SET size_bytes = :size_bytes, downgraded_at = NULL, evicted_at = NULL
+    WHERE content_hash = :content_hash
+"""
+
+RELEASE_SQL = """
+    UPDATE stored_images SET ref_count = ref_count - 1
+    WHERE path = :path
+    RETURNING content_hash, ref_count
+"""
+
+DELETE_SQL = """
+    DELETE FROM stored_images WHERE content_hash = :content_hash AND ref_count <= 0
+    RETURNING thumbnail_path, preview_path, size_bytes, camera_id, checkpoint_id, evicted_at
+"""
+
+# Derivative kind -> stored_images column holding its path
+DERIVATIVE_COLUMNS = {
+    IMAGE_DERIVATIVE_THUMBNAIL: 'thumbnail_path',
+    IMAGE_DERIVATIVE_PREVIEW: 'preview_path'
+}
+
+DOWNGRADE_SQL = """
+    UPDATE stored_images SET size_bytes = COALESCE(:size_bytes, size_bytes), downgraded_at = :downgraded_at
+    WHERE content_hash = :content_hash AND ref_count > 0 AND evicted_at IS NULL
+    RETURNING path, camera_id, checkpoint_id
+"""
+
+# Remove the file of a non-evidence image but keep its row and references
+EVICT_SQL = """
+    UPDATE stored_images SET evicted_at = :evicted_at, thumbnail_path = NULL, preview_path = NULL
+    WHERE content_hash = :content_hash AND ref_count > 0 AND evicted_at IS NULL AND NOT is_evidence
+    RETURNING path, size_bytes, camera_id, checkpoint_id
+"""
+
+# Add to the usage counters of one camera or checkpoint; returns the new byte total
+USAGE_SQL = """
+    INSERT INTO image_storage_usage (scope, scope_id, bytes, images, updated_at)
+    VALUES (:scope, :scope_id, :bytes, :images, :updated_at)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET
+        bytes = image_storage_usage.bytes + EXCLUDED.bytes,
+        images = image_storage_usage.images + EXCLUDED.images,
+        updated_at = EXCLUDED.updated_at
+    RETURNING bytes
+"""
+
+class ImageStore:
+    """
+    Content-addressed, date-sharded image store with reference counting.
+    
+    This service provides:
+    - put(): store bytes once per content hash and take a reference
+    - release(): drop a reference and remove the file with the last one
+    - Atomic writes (temporary file + rename) so readers never see partial files
+    - Plain unlinks for files written before the store existed
+    - In-place replacement with a re-encoded copy for the downgrade pass
+    - Thumbnail/preview derivatives next to the original, removed with it
+    - Write listeners notified of every new file (e.g. thumbnail generation)
+    - Per-camera/checkpoint usage counters and quota eviction of whole files
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.engine = None
+        self.root = None
+        self._write_listeners: List[Callable[[str, str, bytes], None]] = []
+        self._usage_listeners: List[Callable[[str, str, int], None]] = []
+    
+    def initialize(self, db_session):
+        """
+        Initialize the Image Store.
+        
+        Reference counts are updated on engine connections rather than the
+        scoped session, so put() and release() can run from worker threads
+        and never commit the caller's pending changes.
+        
+        Args:
+            db_session: Database session
+        """
+        self.db_session = db_session
+        self.engine = db_session.get_bind()
+        self.root = Config.IMAGE_STORAGE_PATH
+        os.makedirs(self.root, exist_ok=True)
+        logger.info(f"Image store initialized at {self.root}")
+    
+    def shard_path(self, content_hash: str, timestamp: datetime, extension: str = 'jpg') -> str:
+        """
+        Get the sharded path of an image.
+        
+        Args:
+            content_hash: SHA-256 hex digest of the image bytes
+            timestamp: Write time (UTC) used for the date/hour shard
+            extension: File extension
+        
+        Returns:
+            Path below IMAGE_STORAGE_PATH
+        """
+        return os.path.join(
+            self.root, timestamp.strftime('%Y'), timestamp.strftime('%m'), timestamp.strftime('%d'),
+            timestamp.strftime('%H'), content_hash[:2], f"{content_hash}.{extension}"
+        )
+    
+    def add_write_listener(self, listener: Callable[[str, str, bytes], None]) -> None:
+        """
+        Register a callback that runs after a new file has been written.
+        
+        Args:
+            listener: Callable taking (content_hash, path, data)
+        """
+        self._write_listeners.append(listener)
+    
+    def add_usage_listener(self, listener: Callable[[str, str, int], None]) -> None:
+        """
+        Register a callback that runs after put() has grown a usage counter.
+        
+        Args:
+            listener: Callable taking (scope, scope_id, bytes in use)
+        """
+        self._usage_listeners.append(listener)
+    
+    def put(self, data: bytes, extension: str = 'jpg', timestamp: Optional[datetime] = None,
+            camera_id: Optional[str] = None, evidence: bool = False,
+            checkpoint_id: Optional[str] = None) -> Optional[str]:
+        """
+        Store image bytes and take a reference to them.
+        
+        Args:
+            data: Image bytes
+            extension: File extension for new files
+            timestamp: Write time (UTC) for the shard; defaults to now
+            camera_id: Camera the image came from (owner of new files)
+            evidence: Keep the file at original quality and never evict it (e.g. blacklist hits)
+            checkpoint_id: Checkpoint of the camera (owner of new files)
+        
+        Returns:
+            Path of the stored file (an existing one for duplicate content), or None on error
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        written = False
+        usage = []
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(text(ACQUIRE_SQL), {
+                    'content_hash': content_hash,
+                    'path': self.shard_path(content_hash, timestamp or datetime.utcnow(), extension),
+                    'size_bytes': len(data),
+                    'camera_id': camera_id,
+                    'checkpoint_id': checkpoint_id,
+                    'is_evidence': evidence,
+                    'created_at': datetime.utcnow()
+                }).one()
+                # Also rewrites a file that went missing under a live row or was evicted
+                if not os.path.exists(row.path):
+                    self._write_atomic(row.path, data)
+                    written = True
+                    if row.ref_count > 1:
+                        conn.execute(text(RESTORE_SQL), {'content_hash': content_hash, 'size_bytes': len(data)})
+                    # The file of a live, non-evicted row is already counted
+                    counted = row.ref_count > 1 and row.evicted_at is None
+                    usage = self._add_usage(
+                        conn, row.camera_id, row.checkpoint_id,
+                        len(data) - (row.size_bytes if counted else 0), 0 if counted else 1
+                    )
+                elif row.ref_count > 1:
+                    logger.debug(f"Image deduplicated: {row.path} ({row.ref_count} references)")
+                path = row.path
+        
+        except Exception as e:
+            logger.error(f"Error storing image {content_hash}: {str(e)}")
+            return None
+        
+        # After commit, so listeners see the row
+        if written:
+            for listener in self._write_listeners:
+                try:
+                    listener(content_hash, path, data)
+                except Exception as e:
+                    logger.error(f"Image write listener failed: {str(e)}")
+        for scope, scope_id, total in usage:
+            for listener in self._usage_listeners:
+                try:
+                    listener(scope, scope_id, total)
+                except Exception as e:
+                    logger.error(f"Image usage listener failed: {str(e)}")
+        return path
+    
+    def release(self, path: str) -> Optional[bool]:
+        """
+        Drop one reference to an image and remove the file with the last one.
+        
+        Paths that are not in the store (files written before it existed)
+        are unlinked directly.
+        
+        Args:
+            path: Path returned by put()
+        
+        Returns:
+            True if the file was removed, None if it is still referenced or
+            was already gone, False on error
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(text(RELEASE_SQL), {'path': path}).one_or_none()
+                if row is None:
+                    return self._unlink(path)
+                if row.ref_count > 0:
+                    return None
+                deleted = conn.execute(text(DELETE_SQL), {'content_hash': row.content_hash}).one_or_none()
+                if deleted is not None:
+                    self._remove_files(deleted, conn)
+                return self._unlink(path)
+        
+        except Exception as e:
+            logger.warning(f"Failed to release image {path}: {str(e)}")
+            return False
+    
+    def downgrade(self, content_hash: str, data: Optional[bytes]) -> bool:
+        """
+        Replace a stored file with a re-encoded copy and mark it downgraded.
+        
+        The file keeps its path (and content hash name), so records that
+        reference it are unaffected; new uploads of the original bytes are
+        deduplicated onto the downgraded copy.
+        
+        Args:
+            content_hash: Content hash of the stored image
+            data: Re-encoded bytes, or None to only mark the image as done
+        
+        Returns:
+            True if the image was updated, False if it was released meanwhile or on error
+        """
+        try:
+            with self.engine.begin() as conn:
+                old_size = conn.execute(
+                    text("SELECT size_bytes FROM stored_images WHERE content_hash = :content_hash"),
+                    {'content_hash': content_hash}
+                ).scalar()
+                row = conn.execute(text(DOWNGRADE_SQL), {
+                    'content_hash': content_hash,
+                    'size_bytes': len(data) if data is not None else None,
+                    'downgraded_at': datetime.utcnow()
+                }).one_or_none()
+                if row is None:
+                    return False
+                if data is not None:
+                    self._write_atomic(row.path, data)
+                    self._add_usage(conn, row.camera_id, row.checkpoint_id, len(data) - old_size, 0)
+                return True
+        
+        except Exception as e:
+            logger.warning(f"Failed to downgrade image {content_hash}: {str(e)}")
+            return False
+    
+    def evict(self, content_hash: str) -> int:
+        """
+        Remove the file and derivatives of an image to free quota.
+        
+        The row stays (with evicted_at set) so records keep resolving the
+        image; evidence images are never evicted.
+        
+        Args:
+            content_hash: Content hash of the stored image
+        
+        Returns:
+            Bytes freed (0 if the image is evidence, already evicted or released)
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(text(EVICT_SQL), {
+                    'content_hash': content_hash,
+                    'evicted_at': datetime.utcnow()
+                }).one_or_none()
+                if row is None:
+                    return 0
+                for kind in IMAGE_DERIVATIVES:
+                    self._unlink(self.derivative_path(row.path, kind))
+                self._unlink(row.path)
+                self._add_usage(conn, row.camera_id, row.checkpoint_id, -row.size_bytes, -1)
+                return row.size_bytes
+        
+        except Exception as e:
+            logger.warning(f"Failed to evict image {content_hash}: {str(e)}")
+            return 0
+    
+    def set_ref_count(self, content_hash: str, expected: int, ref_count: int) -> bool:
+        """
+        Correct a reference count (reconciler), unless it changed meanwhile.
+        
+        A count of 0 removes the image and its derivatives.
+        
+        Args:
+            content_hash: Content hash of the stored image
+            expected: Count the caller saw
+            ref_count: Actual number of references
+        
+        Returns:
+            True if the row was updated or removed
+        """
+        try:
+            with self.engine.begin() as conn:
+                if ref_count > 0:
+                    return conn.execute(text("""
+                        UPDATE stored_images SET ref_count = :ref_count
+                        WHERE content_hash = :content_hash AND ref_count = :expected
+                    """), {'content_hash': content_hash, 'expected': expected, 'ref_count': ref_count}).rowcount == 1
+                row = conn.execute(text("""
+                    DELETE FROM stored_images WHERE content_hash = :content_hash AND ref_count = :expected
+                    RETURNING path, thumbnail_path, preview_path, size_bytes, camera_id, checkpoint_id, evicted_at
+                """), {'content_hash': content_hash, 'expected': expected}).one_or_none()
+                if row is None:
+                    return False
+                self._remove_files(row, conn)
+                self._unlink(row.path)
+                return True
+        
+        except Exception as e:
+            logger.warning(f"Failed to correct references of image {content_hash}: {str(e)}")
+            return False
+    
+    def adopt(self, path: str, ref_count: int) -> bool:
+        """
+        Index a referenced store file that has no stored_images row (reconciler).
+        
+        The owner of the file is unknown, so it counts towards no quota.
+        
+        Args:
+            path: Path of the file
+            ref_count: Number of records referencing it
+        
+        Returns:
+            True if a row was inserted
+        """
+        parsed = parse_store_path(path)
+        if not parsed or parsed[1]:
+            return False
+        try:
+            with self.engine.begin() as conn:
+                return conn.execute(text("""
+                    INSERT INTO stored_images (content_hash, path, size_bytes, ref_count, created_at, last_acquired_at)
+                    VALUES (:content_hash, :path, :size_bytes, :ref_count, :now, :now)
+                    ON CONFLICT (content_hash) DO NOTHING
+                """), {
+                    'content_hash': parsed[0],
+                    'path': path,
+                    'size_bytes': os.path.getsize(path),
+                    'ref_count': ref_count,
+                    'now': datetime.utcnow()
+                }).rowcount == 1
+        
+        except Exception as e:
+            logger.warning(f"Failed to adopt image file {path}: {str(e)}")
+            return False
+    
+    def forget_file(self, content_hash: str, kind: Optional[str] = None) -> bool:
+        """
+        Drop the record of a file that is missing on disk (reconciler).
+        
+        Args:
+            content_hash: Content hash of the stored image
+            kind: Derivative kind, or None to remove the image row
+        
+        Returns:
+            True if the row was updated or removed
+        """
+        try:
+            with self.engine.begin() as conn:
+                if kind:
+                    column = DERIVATIVE_COLUMNS[kind]
+                    statement = text(f"UPDATE stored_images SET {column} = NULL WHERE content_hash = :content_hash")
+                    return conn.execute(statement, {'content_hash': content_hash}).rowcount == 1
+                row = conn.execute(text("""
+                    DELETE FROM stored_images WHERE content_hash = :content_hash
+                    RETURNING thumbnail_path, preview_path, size_bytes, camera_id, checkpoint_id, evicted_at
+                """), {'content_hash': content_hash}).one_or_none()
+                if row is not None:
+                    self._remove_files(row, conn)
+                return row is not None
+        
+        except Exception as e:
+            logger.warning(f"Failed to forget image {content_hash}: {str(e)}")
+            return False
+    
+    @staticmethod
+    def derivative_path(path: str, kind: str) -> str:
+        """Path of a derivative next to its original: <hash>.<kind>.jpg."""
+        return f"{os.path.splitext(path)[0]}.{kind}.jpg"
+    
+    def save_derivative(self, content_hash: str, kind: str, data: bytes) -> Optional[str]:
+        """
+        Write a thumbnail/preview of a stored image and record its path.
+        
+        Args:
+            content_hash: Content hash of the original
+            kind: Derivative kind (thumbnail or preview)
+            data: Encoded derivative bytes
+        
+        Returns:
+            Path of the derivative, or None if the original was released meanwhile or on error
+        """
+        column = DERIVATIVE_COLUMNS[kind]
+        try:
+            with self.engine.begin() as conn:
+                path = conn.execute(
+                    text("SELECT path FROM stored_images WHERE content_hash = :content_hash"),
+                    {'content_hash': content_hash}
+                ).scalar()
+                if path is None:
+                    return None
+                derivative_path = self.derivative_path(path, kind)
+                # Locks the row against a concurrent release
+                updated = conn.execute(text(f"""
+                    UPDATE stored_images SET {column} = :derivative_path
+                    WHERE content_hash = :content_hash AND ref_count > 0
+                    RETURNING content_hash
+                """), {'content_hash': content_hash, 'derivative_path': derivative_path}).one_or_none()
+                if updated is None:
+                    return None
+                self._write_atomic(derivative_path, data)
+                return derivative_path
+        
+        except Exception as e:
+            logger.warning(f"Failed to save {kind} of image {content_hash}: {str(e)}")
+            return None
+    
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a stored image by content hash.
+        
+        Args:
+            content_hash: SHA-256 hex digest
+        
+        Returns:
+            Dictionary with path, derivative paths, camera, evidence flag,
+            downgrade and eviction time, or None if not stored
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT content_hash, path, thumbnail_path, preview_path, camera_id, is_evidence,
+                       downgraded_at, evicted_at
+                FROM stored_images WHERE content_hash = :content_hash AND ref_count > 0
+            """), {'content_hash': content_hash}).one_or_none()
+        return dict(row._mapping) if row else None
+    
+    def get_derivatives(self, paths: List[str]) -> Dict[str, Dict[str, Optional[str]]]:
+        """
+        Look up the derivatives of stored images.
+        
+        Args:
+            paths: Image paths (e.g. of one page of records)
+        
+        Returns:
+            Dictionary of path -> {kind: derivative path or None}; paths
+            not in the store are omitted
+        """
+        paths = list({path for path in paths if path})
+        if not paths:
+            return {}
+        query = text(
+            "SELECT path, thumbnail_path, preview_path FROM stored_images WHERE path IN :paths"
+        ).bindparams(bindparam('paths', expanding=True))
+        with self.engine.connect() as conn:
+            rows = conn.execute(query, {'paths': paths}).all()
+        return {
+            row.path: {IMAGE_DERIVATIVE_THUMBNAIL: row.thumbnail_path, IMAGE_DERIVATIVE_PREVIEW: row.preview_path}
+            for row in rows
+        }
+    
+    def _remove_files(self, deleted, conn):
+        """Unlink the derivatives of a deleted row and uncount its file."""
+        for derivative_path in (deleted.thumbnail_path, deleted.preview_path):
+            if derivative_path:
+                self._unlink(derivative_path)
+        if deleted.evicted_at is None:
+            self._add_usage(conn, deleted.camera_id, deleted.checkpoint_id, -deleted.size_bytes, -1)
+    
+    @staticmethod
+    def _add_usage(conn, camera_id: Optional[str], checkpoint_id: Optional[str],
+                   bytes_delta: int, images_delta: int) -> List[Tuple[str, str, int]]:
+        """
+        Add to the usage counters of a camera and its checkpoint.
+        
+        Returns:
+            List of (scope, scope_id, bytes in use) of the updated counters
+        """
+        usage = []
+        if not bytes_delta and not images_delta:
+            return usage
+        for scope, scope_id in ((STORAGE_SCOPE_CAMERA, camera_id), (STORAGE_SCOPE_CHECKPOINT, checkpoint_id)):
+            if scope_id:
+                total = conn.execute(text(USAGE_SQL), {
+                    'scope': scope,
+                    'scope_id': scope_id,
+                    'bytes': bytes_delta,
+                    'images': images_delta,
+                    'updated_at': datetime.utcnow()
+                }).scalar()
+                usage.append((scope, scope_id, total))
+        return usage
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write a file through a temporary name in the same directory."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    @staticmethod
+    def _unlink(path: str) -> Optional[bool]:
+        """Remove one image file; None if it was already gone."""
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to remove image file {path}: {str(e)}")
+            return False
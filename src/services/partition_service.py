@@ -0,0 +1,627 @@
+"""
+Partition Service for time-partitioned tables
+
+This service manages native PostgreSQL range partitioning of the large
+time-series tables. Partitions are created ahead of time by a maintenance
+thread, and retention detaches and drops whole partitions instead of
+deleting rows.
+
+Cameras send their own timestamps, so rows can fall outside the premade
+range (buffered detections replayed from last month, a wrong clock). A
+DEFAULT partition takes them instead of failing the insert; its rows are
+moved into their partition when one is created for them, and expired ones
+are deleted by retention.
+
+Conversion, partition creation and retention run DDL on shared tables, so
+every gunicorn worker takes a PostgreSQL advisory lock for them: startup
+waits for it, while the periodic maintenance skips a run another worker
+is doing.
+"""
+
+import re
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import Thread, Event, Lock
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from config import Config
+from constants import PARTITION_INTERVAL_WEEK
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables: range column, image columns released with the partition, retention setting
+PARTITIONED_TABLES = {
+    'lpr_records': {'column': 'timestamp', 'image_columns': ['image_path', 'plate_image_path'],
+                    'retention': 'DATA_RETENTION_DAYS'},
+    'detections': {'column': 'timestamp', 'image_columns': ['annotated_image_path'], 'retention': 'DATA_RETENTION_DAYS'},
+    'vehicles': {'column': 'created_at', 'image_columns': [], 'retention': 'DATA_RETENTION_DAYS'},
+    'plates': {'column': 'created_at', 'image_columns': ['cropped_image_path'], 'retention': 'DATA_RETENTION_DAYS'},
+    'health_logs': {'column': 'timestamp', 'image_columns': [], 'retention': 'HEALTH_CHECK_RETENTION_DAYS'}
+}
+
+# pg_advisory_lock key shared by all workers for partition DDL
+PARTITION_LOCK_KEY = 0x4c5052_0031
+
+_BOUND_PATTERN = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+_NAME_DATE_PATTERN = re.compile(r"_p(\d{8})$")
+
+def period_start(value: datetime, interval: str) -> datetime:
+    """
+    Get the start of the partition period containing a timestamp.
+    
+    Args:
+        value: Timestamp
+        interval: Partition interval (month or week)
+    
+    Returns:
+        Midnight of the first day of the month, or of the Monday of the week
+    """
+    day = value.date()
+    if interval == PARTITION_INTERVAL_WEEK:
+        day = day - timedelta(days=day.weekday())
+    else:
+        day = day.replace(day=1)
+    return datetime.combine(day, datetime.min.time())
+
+def next_period(start: datetime, interval: str) -> datetime:
+    """Get the start of the period after the one starting at start."""
+    if interval == PARTITION_INTERVAL_WEEK:
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def partition_name(table: str, start: datetime) -> str:
+    """Name of the partition of table that starts at start, e.g. lpr_records_p20261001."""
+    return f"{table}_p{start:%Y%m%d}"
+
+def default_partition_name(table: str) -> str:
+    """Name of the DEFAULT partition of table, e.g. lpr_records_default."""
+    return f"{table}_default"
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    """Parse one side of a partition bound expression (None for MINVALUE/MAXVALUE)."""
+    value = value.strip()
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+class PartitionService:
+    """
+    Service for time-based partitioning of large tables.
+    
+    This service provides:
+    - Conversion of plain tables to RANGE partitioned tables
+    - Partition creation ahead of time by a maintenance thread
+    - A DEFAULT partition for rows outside the premade range
+    - Retention by DETACH/DROP PARTITION, removing image files of dropped rows
+    - An advisory lock so one worker at a time runs partition DDL
+    - Partition status for monitoring
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.engine = None
+        self.interval = Config.PARTITION_INTERVAL
+        self.maintenance_thread = None
+        self.running = False
+        self._stop_event = Event()
+        self._maintenance_lock = Lock()
+        self.last_maintenance = None
+        self.last_result = None
+    
+    def initialize(self, db_session):
+        """
+        Initialize the Partition Service and start partition maintenance.
+        
+        Empty tables that are not partitioned yet (e.g. lpr_records right
+        after db.create_all()) are converted at startup. Populated tables are
+        only converted when PARTITION_CONVERT_EXISTING is set, because the
+        conversion validates and indexes the existing rows. Workers wait for
+        each other here, so only the first converts a table.
+        
+        Args:
+            db_session: Database session
+        """
+        self.db_session = db_session
+        self.engine = db_session.get_bind()
+        
+        if not Config.PARTITIONING_ENABLED or not self.is_supported():
+            logger.info("Table partitioning disabled or not supported by this database")
+            return
+        
+        with self._advisory_lock():
+            for table in PARTITIONED_TABLES:
+                if not self._table_exists(table) or self.is_partitioned(table):
+                    continue
+                if Config.PARTITION_CONVERT_EXISTING or self._is_empty(table):
+                    self.convert_to_partitioned(table)
+                else:
+                    logger.warning(f"Table {table} is not partitioned; set PARTITION_CONVERT_EXISTING=True to convert it")
+            
+            self._ensure_partitions()
+        
+        self.running = True
+        self.maintenance_thread = Thread(target=self._maintenance_loop, daemon=True)
+        self.maintenance_thread.start()
+        logger.info(f"Partition service initialized ({self.interval} partitions, {Config.PARTITION_PREMAKE} ahead)")
+    
+    def stop(self):
+        """Stop the maintenance thread."""
+        self.running = False
+        self._stop_event.set()
+    
+    def is_supported(self) -> bool:
+        """Whether the database supports native partitioning."""
+        return self.engine is not None and self.engine.dialect.name == 'postgresql'
+    
+    def is_partitioned(self, table: str) -> bool:
+        """Whether table is a partitioned table."""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+                {'table': table}
+            ).scalar()
+    
+    def list_partitions(self, table: str) -> List[Dict[str, Any]]:
+        """
+        List the partitions attached to a table, oldest first.
+        
+        Args:
+            table: Partitioned table name
+        
+        Returns:
+            List of partitions with bounds, estimated rows and size
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+                       pg_total_relation_size(c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(:table)
+            """), {'table': table}).all()
+        
+        partitions = []
+        for name, bound, estimated_rows, size_bytes in rows:
+            match = _BOUND_PATTERN.search(bound or '')
+            if not match:
+                continue
+            partitions.append({
+                'name': name,
+                'from': _parse_bound(match.group(1)),
+                'to': _parse_bound(match.group(2)),
+                'estimated_rows': max(estimated_rows, 0),
+                'size_bytes': size_bytes
+            })
+        
+        partitions.sort(key=lambda p: p['to'] or datetime.max)
+        return partitions
+    
+    def ensure_partitions(self, premake: Optional[int] = None) -> List[str]:
+        """
+        Create the DEFAULT partition, and partitions for the current period
+        and the next premake periods.
+        
+        Rows the DEFAULT partition holds for a new partition's range are
+        moved into it.
+        
+        Args:
+            premake: Number of future periods (default PARTITION_PREMAKE)
+        
+        Returns:
+            Names of the partitions created
+        """
+        with self._advisory_lock():
+            return self._ensure_partitions(premake)
+    
+    def _ensure_partitions(self, premake: Optional[int] = None) -> List[str]:
+        """ensure_partitions() for a caller holding the advisory lock."""
+        premake = Config.PARTITION_PREMAKE if premake is None else premake
+        current = period_start(datetime.utcnow(), self.interval)
+        end = current
+        for _ in range(premake + 1):
+            end = next_period(end, self.interval)
+        
+        created = []
+        for table, spec in PARTITIONED_TABLES.items():
+            try:
+                if not self.is_partitioned(table):
+                    continue
+                
+                default = default_partition_name(table)
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT"))
+                
+                # Never overlap partitions that already exist (e.g. a converted legacy table)
+                covered_until = max((p['to'] for p in self.list_partitions(table) if p['to']), default=None)
+                start = max(current, covered_until) if covered_until else current
+                
+                while start < end:
+                    upper = next_period(start, self.interval)
+                    name = partition_name(table, start)
+                    with self.engine.begin() as conn:
+                        self._create_partition(conn, table, spec['column'], name, start, upper)
+                    created.append(name)
+                    start = upper
+            
+            except Exception as e:
+                logger.error(f"Error creating partitions for {table}: {str(e)}")
+        
+        if created:
+            logger.info(f"Created partitions: {', '.join(created)}")
+        return created
+    
+    def drop_expired_partitions(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """
+        Detach and drop partitions whose whole range is past retention.
+        
+        A partition is only dropped once its upper bound is older than the
+        cutoff, so up to one extra period of data is kept.
+        
+        Args:
+            retention_days: Override for DATA_RETENTION_DAYS (health_logs
+                always uses HEALTH_CHECK_RETENTION_DAYS)
+        
+        Returns:
+            Dictionary with dropped partition, row and image counts
+        """
+        with self._advisory_lock():
+            return self._drop_expired_partitions(retention_days)
+    
+    def _drop_expired_partitions(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """drop_expired_partitions() for a caller holding the advisory lock."""
+        results = {'partitions_dropped': 0, 'rows_dropped': 0, 'images_deleted': 0}
+        now = datetime.utcnow()
+        
+        for table, spec in PARTITIONED_TABLES.items():
+            try:
+                if not self._table_exists(table) or not self.is_partitioned(table):
+                    continue
+                
+                days = getattr(Config, spec['retention'])
+                if retention_days is not None and spec['retention'] == 'DATA_RETENTION_DAYS':
+                    days = retention_days
+                cutoff = now - timedelta(days=days)
+                
+                for partition in self.list_partitions(table):
+                    if partition['to'] and partition['to'] <= cutoff:
+                        results['images_deleted'] += self._drop_partition(table, partition['name'], spec)
+                        results['partitions_dropped'] += 1
+                        results['rows_dropped'] += partition['estimated_rows']
+                
+                rows, images = self._expire_default_rows(table, spec, cutoff)
+                results['rows_dropped'] += rows
+                results['images_deleted'] += images
+                
+                # Partitions left detached by an interrupted run
+                for name in self._find_detached(table):
+                    start = datetime.strptime(_NAME_DATE_PATTERN.search(name).group(1), '%Y%m%d')
+                    if next_period(start, self.interval) <= cutoff:
+                        results['images_deleted'] += self._drop_partition(table, name, spec, detach=False)
+                        results['partitions_dropped'] += 1
+            
+            except Exception as e:
+                logger.error(f"Error dropping expired partitions of {table}: {str(e)}")
+        
+        if results['partitions_dropped']:
+            logger.info(f"Partition retention completed: {results}")
+        return results
+    
+    def run_maintenance(self, retention_days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Create upcoming partitions and drop expired ones.
+        
+        Skipped (with skipped set) while another worker holds the
+        advisory lock.
+        
+        Args:
+            retention_days: Override for DATA_RETENTION_DAYS
+        
+        Returns:
+            Dictionary with maintenance results
+        """
+        with self._maintenance_lock, self._advisory_lock(wait=False) as acquired:
+            if not acquired:
+                logger.info("Partition maintenance skipped: another worker is running it")
+                return {'skipped': True}
+            created = self._ensure_partitions()
+            dropped = self._drop_expired_partitions(retention_days)
+            self.last_maintenance = datetime.utcnow()
+            self.last_result = dict(dropped, partitions_created=len(created), skipped=False)
+            return self.last_result
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get partitioning state of all managed tables.
+        
+        Returns:
+            Dictionary with per-table partitions and maintenance state
+        """
+        try:
+            tables = {}
+            if Config.PARTITIONING_ENABLED and self.is_supported():
+                for table in PARTITIONED_TABLES:
+                    if not self._table_exists(table):
+                        continue
+                    partitioned = self.is_partitioned(table)
+                    tables[table] = {
+                        'partitioned': partitioned,
+                        'partitions': [
+                            {
+                                'name': p['name'],
+                                'from': p['from'].isoformat() if p['from'] else None,
+                                'to': p['to'].isoformat() if p['to'] else None,
+                                'estimated_rows': p['estimated_rows'],
+                                'size_bytes': p['size_bytes']
+                            }
+                            for p in self.list_partitions(table)
+                        ] if partitioned else []
+                    }
+            
+            return {
+                'success': True,
+                'data': {
+                    'enabled': Config.PARTITIONING_ENABLED and self.is_supported(),
+                    'interval': self.interval,
+                    'premake': Config.PARTITION_PREMAKE,
+                    'tables': tables,
+                    'last_maintenance': self.last_maintenance.isoformat() if self.last_maintenance else None,
+                    'last_result': self.last_result
+                }
+            }
+        
+        except Exception as e:
+            logger.error(f"Error getting partition status: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def convert_to_partitioned(self, table: str) -> bool:
+        """
+        Convert a plain table into a RANGE partitioned table.
+        
+        The table is renamed to <table>_legacy and a partitioned table with
+        the same columns, defaults, indexes and outgoing foreign keys takes
+        its name. Primary keys and unique constraints gain the partition
+        column, as PostgreSQL requires. Existing rows stay in place: the old
+        table is attached as one partition covering everything before the
+        cutover, and is dropped by retention like any other partition.
+        Foreign keys pointing at the table are dropped because they cannot
+        reference a partitioned table. Dependent views are recreated.
+        
+        Args:
+            table: Table name (must be in PARTITIONED_TABLES)
+        
+        Returns:
+            True if converted, False on error
+        """
+        column = PARTITIONED_TABLES[table]['column']
+        legacy = f"{table}_legacy"
+        
+        try:
+            with self.engine.begin() as conn:
+                params = {'table': table}
+                incoming = conn.execute(text("""
+                    SELECT conname, conrelid::regclass::text FROM pg_constraint
+                    WHERE contype = 'f' AND confrelid = to_regclass(:table) AND conrelid <> confrelid
+                """), params).all()
+                keys = conn.execute(text("""
+                    SELECT c.conname, c.contype,
+                           ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+                                 JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                                 ORDER BY k.ord)
+                    FROM pg_constraint c
+                    WHERE c.conrelid = to_regclass(:table) AND c.contype IN ('p', 'u')
+                """), params).all()
+                foreign_keys = conn.execute(text("""
+                    SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+                    WHERE conrelid = to_regclass(:table) AND contype = 'f'
+                """), params).all()
+                indexes = conn.execute(text("""
+                    SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique,
+                           EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE i.indrelid = to_regclass(:table)
+                """), params).all()
+                views = conn.execute(text("""
+                    SELECT DISTINCT v.relname, pg_get_viewdef(v.oid)
+                    FROM pg_depend d
+                    JOIN pg_rewrite r ON r.oid = d.objid
+                    JOIN pg_class v ON v.oid = r.ev_class
+                    WHERE d.refobjid = to_regclass(:table) AND v.relkind = 'v'
+                """), params).all()
+                sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), params).scalar()
+                newest = conn.execute(text(f"SELECT max({column}) FROM {table}")).scalar()
+                
+                for name, child in incoming:
+                    logger.warning(f"Dropping foreign key {name} on {child}: it cannot reference partitioned {table}")
+                    conn.execute(text(f"ALTER TABLE {child} DROP CONSTRAINT {name}"))
+                
+                # Free the original names for the new table
+                conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+                for name, _, _, _ in indexes:
+                    conn.execute(text(f"ALTER INDEX {name} RENAME TO {name[:55]}_legacy"))
+                if sequence:
+                    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+                
+                conn.execute(text(f"UPDATE {legacy} SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL"))
+                conn.execute(text(f"ALTER TABLE {legacy} ALTER COLUMN {column} SET NOT NULL"))
+                conn.execute(text(
+                    f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS) "
+                    f"PARTITION BY RANGE ({column})"
+                ))
+                if sequence:
+                    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+                
+                for name, contype, columns in keys:
+                    columns = list(columns) if column in columns else list(columns) + [column]
+                    kind = 'PRIMARY KEY' if contype == 'p' else 'UNIQUE'
+                    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {kind} ({', '.join(columns)})"))
+                for name, definition, unique, is_constraint in indexes:
+                    if is_constraint:
+                        continue
+                    if unique:
+                        logger.warning(f"Skipping unique index {name} on {table}: it does not include {column}")
+                        continue
+                    conn.execute(text(definition))
+                for name, definition in foreign_keys:
+                    conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+                for name, definition in views:
+                    conn.execute(text(f"CREATE OR REPLACE VIEW {name} AS {definition}"))
+                
+                if newest is None:
+                    conn.execute(text(f"DROP TABLE {legacy}"))
+                else:
+                    # Validate the bound up front so ATTACH does not rescan the table
+                    cutover = next_period(period_start(max(newest, datetime.utcnow()), self.interval), self.interval)
+                    conn.execute(text(
+                        f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_bound "
+                        f"CHECK ({column} < '{cutover.isoformat()}') NOT VALID"
+                    ))
+                    conn.execute(text(f"ALTER TABLE {legacy} VALIDATE CONSTRAINT {legacy}_bound"))
+                    conn.execute(text(
+                        f"ALTER TABLE {table} ATTACH PARTITION {legacy} "
+                        f"FOR VALUES FROM (MINVALUE) TO ('{cutover.isoformat()}')"
+                    ))
+                    conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_bound"))
+            
+            logger.info(f"Converted {table} to a partitioned table")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error converting {table} to a partitioned table: {str(e)}")
+            return False
+    
+    @contextmanager
+    def _advisory_lock(self, wait: bool = True):
+        """
+        Hold the partition advisory lock on a dedicated autocommit connection.
+        
+        Yields whether the lock was taken (always True when waiting).
+        """
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            if wait:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': PARTITION_LOCK_KEY})
+                acquired = True
+            else:
+                acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': PARTITION_LOCK_KEY}).scalar()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': PARTITION_LOCK_KEY})
+    
+    def _create_partition(self, conn, table: str, column: str, name: str, start: datetime, upper: datetime):
+        """Create one range partition, moving rows the DEFAULT partition holds for it."""
+        default = default_partition_name(table)
+        bounds = f"FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+        params = {'start': start, 'upper': upper}
+        
+        stray = conn.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= :start AND {column} < :upper)"
+        ), params).scalar()
+        if not stray:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES {bounds}"))
+            return
+        
+        # PARTITION OF would fail on the rows in DEFAULT; build the table, fill it and attach it
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        moved = conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {column} >= :start AND {column} < :upper RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), params).rowcount
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        logger.info(f"Moved {moved} rows of {table} from {default} into {name}")
+    
+    def _expire_default_rows(self, table: str, spec: Dict[str, Any], cutoff: datetime) -> Tuple[int, int]:
+        """Delete DEFAULT partition rows older than cutoff and release their images. Returns (rows, images)."""
+        default = default_partition_name(table)
+        if not self._table_exists(default):
+            return 0, 0
+        
+        returning = ', '.join(spec['image_columns']) or '1'
+        with self.engine.begin() as conn:
+            rows = conn.execute(text(
+                f"DELETE FROM {default} WHERE {spec['column']} < :cutoff RETURNING {returning}"
+            ), {'cutoff': cutoff}).all()
+        
+        image_store = get_service('image_store')
+        images = 0
+        for row in rows:
+            for image_path in row[:len(spec['image_columns'])]:
+                if image_path and image_store.release(image_path):
+                    images += 1
+        return len(rows), images
+    
+    def _drop_partition(self, table: str, name: str, spec: Dict[str, Any], detach: bool = True) -> int:
+        """Detach a partition, remove its image files and drop it. Returns images deleted."""
+        if detach:
+            with self.engine.connect() as conn:
+                conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                # CONCURRENTLY (PostgreSQL 14+) avoids blocking writers on the parent
+                concurrently = ' CONCURRENTLY' if conn.dialect.server_version_info >= (14,) else ''
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}{concurrently}"))
+        
+        images_deleted = 0
+        for image_column in spec['image_columns']:
+            images_deleted += self._delete_partition_images(name, image_column)
+        
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        
+        logger.info(f"Dropped partition {name} of {table}")
+        return images_deleted
+    
+    def _delete_partition_images(self, name: str, image_column: str) -> int:
+        """Release the images referenced by a detached partition, streaming the paths."""
+        image_store = get_service('image_store')
+        deleted = 0
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=1000).execute(
+                text(f"SELECT {image_column} FROM {name} WHERE {image_column} IS NOT NULL")
+            )
+            for (image_path,) in result:
+                if image_store.release(image_path):
+                    deleted += 1
+        return deleted
+    
+    def _find_detached(self, table: str) -> List[str]:
+        """Find <table>_pYYYYMMDD tables that are no longer attached."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT relname FROM pg_class
+                WHERE relkind = 'r' AND NOT relispartition AND relname ~ :pattern
+            """), {'pattern': f"^{table}_p[0-9]{{8}}$"}).all()
+        return [row[0] for row in rows]
+    
+    def _table_exists(self, table: str) -> bool:
+        """Whether a table exists."""
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {'table': table}).scalar()
+    
+    def _is_empty(self, table: str) -> bool:
+        """Whether a table has no rows."""
+        with self.engine.connect() as conn:
+            return not conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table})")).scalar()
+    
+    def _maintenance_loop(self):
+        """Run partition maintenance every PARTITION_MAINTENANCE_INTERVAL_HOURS."""
+        while self.running:
+            self._stop_event.wait(Config.PARTITION_MAINTENANCE_INTERVAL_HOURS * 3600)
+            if not self.running:
+                break
+            try:
+                self.run_maintenance()
+            except Exception as e:
+                logger.error(f"Error in partition maintenance: {str(e)}")
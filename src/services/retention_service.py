@@ -0,0 +1,342 @@
+"""
+Retention Service for background data cleanup
+
+This service runs data retention as a background job. Expired rows are
+deleted in small keyset batches with a pause between batches, image files
+are unlinked by a thread pool, and progress is checkpointed to disk so a
+restarted server resumes an interrupted job.
+
+A lock file next to the checkpoint makes one job run at a time across
+gunicorn workers: the worker holding it runs (or resumes) the job, and the
+others report progress from the checkpoint file.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import logging
+from datetime import datetime, timedelta
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import select, delete
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.lpr_record import LPRRecord
+from core.models.health_check import HealthCheck
+from core.dependency_container import get_service
+from config import Config
+from constants import JOB_STATUS_PENDING, JOB_STATUS_RUNNING, JOB_STATUS_COMPLETED, JOB_STATUS_FAILED
+
+logger = logging.getLogger(__name__)
+
+class RetentionService:
+    """
+    Service for running data retention in the background.
+    
+    This service provides:
+    - A single retention job at a time, started from the API
+    - Keyset-batched DELETE ... WHERE id IN (SELECT ... LIMIT n)
+    - Sleep-based throttling between batches
+    - Image unlinks on a thread pool
+    - A checkpoint file so an interrupted job resumes after restart
+    - A lock file so one worker runs the job and the others report it
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.job: Optional[Dict[str, Any]] = None
+        self.job_lock = Lock()
+        self.unlink_pool: Optional[ThreadPoolExecutor] = None
+        self._lock_file = None
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Retention Service and resume an interrupted job.
+        
+        Only the worker that takes the retention lock resumes the job.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run jobs in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        self.unlink_pool = ThreadPoolExecutor(
+            max_workers=Config.RETENTION_UNLINK_WORKERS,
+            thread_name_prefix='retention-unlink'
+        )
+        
+        checkpoint = self._load_checkpoint()
+        if checkpoint and checkpoint.get('status') in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING) \
+                and self._acquire_lock():
+            # Another worker may have finished it between the read and the lock
+            checkpoint = self._load_checkpoint()
+            if checkpoint and checkpoint.get('status') in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING):
+                logger.info(f"Resuming retention job {checkpoint['job_id']} from checkpoint")
+                self.job = checkpoint
+                self._start_worker()
+            else:
+                self._release_lock()
+        
+        logger.info("Retention service initialized")
+    
+    def start_job(self, days: int) -> Dict[str, Any]:
+        """
+        Enqueue a retention job unless one is already running.
+        
+        Args:
+            days: Number of days of LPR records to keep
+        
+        Returns:
+            Dictionary with operation result and job information
+        """
+        if not self._acquire_lock():
+            return {
+                'success': True,
+                'message': 'Retention job already running',
+                'job': self.get_job()
+            }
+        
+        # A job whose worker died is resumed rather than replaced
+        checkpoint = self._load_checkpoint()
+        if checkpoint and checkpoint.get('status') in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING):
+            with self.job_lock:
+                self.job = checkpoint
+                job = dict(self.job)
+            self._start_worker()
+            logger.info(f"Resuming retention job {job['job_id']} from checkpoint")
+            return {
+                'success': True,
+                'message': 'Retention job resumed',
+                'job': job
+            }
+        
+        with self.job_lock:
+            now = datetime.utcnow()
+            self.job = {
+                'job_id': str(uuid.uuid4()),
+                'status': JOB_STATUS_PENDING,
+                'days': days,
+                'cutoff': (now - timedelta(days=days)).isoformat(),
+                'health_cutoff': (now - timedelta(days=Config.HEALTH_CHECK_RETENTION_DAYS)).isoformat(),
+                'stage': 'lpr_records',
+                'last_id': 0,
+                'lpr_records_deleted': 0,
+                'health_checks_deleted': 0,
+                'partitions_dropped': 0,
+                'images_deleted': 0,
+                'image_errors': 0,
+                'rows_archived': 0,
+                'batches': 0,
+                'error': None,
+                'started_at': now.isoformat(),
+                'updated_at': now.isoformat(),
+                'finished_at': None
+            }
+            self._save_checkpoint()
+            job = dict(self.job)
+        
+        self._start_worker()
+        logger.info(f"Retention job {job['job_id']} started (keep {days} days)")
+        
+        return {
+            'success': True,
+            'message': 'Retention job started',
+            'job': job
+        }
+    
+    def get_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of the current or last retention job.
+        
+        The checkpoint file is read so that any worker reports the progress
+        of a job running in another worker.
+        
+        Returns:
+            Job dictionary or None if no job has run
+        """
+        with self.job_lock:
+            if self.job and self.job['status'] in (JOB_STATUS_PENDING, JOB_STATUS_RUNNING):
+                return dict(self.job)
+        return self._load_checkpoint()
+    
+    def _start_worker(self):
+        """Run the current job on a daemon thread."""
+        Thread(target=self._run_job, daemon=True).start()
+    
+    def _run_job(self):
+        """Run the current job stage by stage, resuming from the checkpoint, then release the lock."""
+        try:
+            with self.app.app_context():
+                self._update_job(status=JOB_STATUS_RUNNING)
+                
+                if self.job['stage'] == 'lpr_records':
+                    self._expire_lpr_records()
+                    self._update_job(stage='health_checks', last_id=0)
+                
+                if self.job['stage'] == 'health_checks':
+                    self._expire_health_checks()
+                
+                self._update_job(
+                    status=JOB_STATUS_COMPLETED,
+                    stage='done',
+                    finished_at=datetime.utcnow().isoformat()
+                )
+                logger.info(f"Retention job {self.job['job_id']} completed: "
+                            f"{self.job['lpr_records_deleted']} records, {self.job['images_deleted']} images")
+        
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Retention job failed: {str(e)}")
+            self._update_job(
+                status=JOB_STATUS_FAILED,
+                error=str(e),
+                finished_at=datetime.utcnow().isoformat()
+            )
+        finally:
+            self.db_session.remove()
+            self._release_lock()
+    
+    def _expire_lpr_records(self):
+        """Delete expired LPR records in keyset batches and unlink their images."""
+        if Config.ARCHIVE_ENABLED:
+            # Expired rows must reach the archive before they are deleted
+            results = get_service('archive_service').archive(until=datetime.fromisoformat(self.job['cutoff']))
+            self._update_job(rows_archived=sum(result['rows'] for result in results.values()))
+        
+        partition_service = get_service('partition_service')
+        if partition_service.is_supported() and partition_service.is_partitioned(LPRRecord.__tablename__):
+            results = partition_service.drop_expired_partitions(self.job['days'])
+            self._update_job(
+                partitions_dropped=results['partitions_dropped'],
+                lpr_records_deleted=results['rows_dropped'],
+                images_deleted=results['images_deleted']
+            )
+            return
+        
+        cutoff = datetime.fromisoformat(self.job['cutoff'])
+        table = LPRRecord.__table__
+        
+        while True:
+            batch_ids = select(table.c.id)\
+                .where(table.c.timestamp < cutoff, table.c.id > self.job['last_id'])\
+                .order_by(table.c.id)\
+                .limit(Config.RETENTION_BATCH_SIZE)
+            rows = self.db_session.execute(
+                delete(table).where(table.c.id.in_(batch_ids))
+                .returning(table.c.id, table.c.image_path, table.c.plate_image_path)
+            ).all()
+            self.db_session.commit()
+            
+            if not rows:
+                return
+            
+            image_paths = [path for row in rows for path in (row.image_path, row.plate_image_path) if path]
+            images_deleted, image_errors = self._unlink_images(image_paths)
+            
+            self._update_job(
+                last_id=max(row.id for row in rows),
+                lpr_records_deleted=self.job['lpr_records_deleted'] + len(rows),
+                images_deleted=self.job['images_deleted'] + images_deleted,
+                image_errors=self.job['image_errors'] + image_errors,
+                batches=self.job['batches'] + 1
+            )
+            
+            # Leave I/O headroom for ingest between batches
+            time.sleep(Config.RETENTION_BATCH_SLEEP_SECONDS)
+    
+    def _expire_health_checks(self):
+        """Delete expired health checks in keyset batches."""
+        cutoff = datetime.fromisoformat(self.job['health_cutoff'])
+        table = HealthCheck.__table__
+        
+        while True:
+            batch_ids = select(table.c.id)\
+                .where(table.c.timestamp < cutoff, table.c.id > self.job['last_id'])\
+                .order_by(table.c.id)\
+                .limit(Config.RETENTION_BATCH_SIZE)
+            rows = self.db_session.execute(
+                delete(table).where(table.c.id.in_(batch_ids)).returning(table.c.id)
+            ).all()
+            self.db_session.commit()
+            
+            if not rows:
+                return
+            
+            self._update_job(
+                last_id=max(row.id for row in rows),
+                health_checks_deleted=self.job['health_checks_deleted'] + len(rows),
+                batches=self.job['batches'] + 1
+            )
+            time.sleep(Config.RETENTION_BATCH_SLEEP_SECONDS)
+    
+    def _unlink_images(self, image_paths: List[str]) -> Tuple[int, int]:
+        """
+        Release images through the image store on the thread pool.
+        
+        Files shared with records that are kept are only dereferenced.
+        Returns (deleted, errors).
+        """
+        image_store = get_service('image_store')
+        results = list(self.unlink_pool.map(image_store.release, image_paths))
+        return results.count(True), results.count(False)
+    
+    def _acquire_lock(self) -> bool:
+        """Take the cross-process retention lock without waiting."""
+        path = f"{Config.RETENTION_CHECKPOINT_PATH}.lock"
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            lock_file = open(path, 'w')
+        except OSError as e:
+            logger.error(f"Failed to open retention lock: {str(e)}")
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def _release_lock(self):
+        """Release the retention lock."""
+        if self._lock_file:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def _update_job(self, **fields):
+        """Update the current job and write the checkpoint."""
+        with self.job_lock:
+            self.job.update(fields, updated_at=datetime.utcnow().isoformat())
+            self._save_checkpoint()
+    
+    def _save_checkpoint(self):
+        """Write the current job to the checkpoint file atomically."""
+        path = Config.RETENTION_CHECKPOINT_PATH
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.job, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write retention checkpoint: {str(e)}")
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Read the checkpoint file, if any."""
+        try:
+            with open(Config.RETENTION_CHECKPOINT_PATH) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read retention checkpoint: {str(e)}")
+            return None
@@ -0,0 +1,360 @@
+"""
+Search Service for plate and blacklist text search
+
+This service backs substring/fuzzy search over plates and blacklist entries.
+On PostgreSQL it relies on pg_trgm GIN indexes; on SQLite (development and
+test mode) it falls back to an in-memory trigram index. Terms shorter than
+a trigram can only be found by substring, so they are matched with ILIKE
+on both.
+"""
+
+import logging
+from threading import Lock
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, Set, Iterable, Tuple
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.models.blacklist_plate import BlacklistPlate
+from core.models.lpr_record import LPRRecord
+from core.models import db
+from core.dependency_container import get_service
+from core.deferred_indexes import check_deferred_indexes
+
+logger = logging.getLogger(__name__)
+
+# The trigram indexes of the ORM tables are deferred indexes (core/deferred_indexes.py),
+# built online by index_advisor.py; the raw-SQL tables get theirs in database_schema.sql
+TRIGRAM_EXTENSION_SQL = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+# Terms shorter than this share no trigram with a mid-word substring
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+# Record matches on SQLite come from ILIKE; the in-memory index only ranks the best ones
+MAX_RANKED_RECORDS = 5000
+
+def trigrams(value: Optional[str]) -> Set[str]:
+    """
+    Split text into trigrams the way pg_trgm does.
+    
+    Each word is lower-cased and padded with two spaces in front and one
+    behind, so short plates still produce trigrams.
+    
+    Args:
+        value: Text to split
+    
+    Returns:
+        Set of trigrams
+    """
+    grams = set()
+    for word in (value or '').lower().split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _like_pattern(term: str) -> str:
+    """Build an ILIKE substring pattern with LIKE wildcards escaped."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+class NgramIndex:
+    """
+    In-memory trigram index with pg_trgm-style similarity ranking.
+    
+    Used when the database has no pg_trgm (SQLite). Documents are keyed by
+    row id; each document may have several text fields.
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.documents: Dict[int, Tuple[str, ...]] = {}
+        self.document_grams: Dict[int, Set[str]] = {}
+        self.last_id = 0
+    
+    def add(self, doc_id: int, fields: Iterable[Optional[str]]):
+        """
+        Add or replace a document.
+        
+        Args:
+            doc_id: Row id
+            fields: Text fields of the row
+        """
+        self.remove(doc_id)
+        values = tuple((field or '').lower() for field in fields)
+        grams = set()
+        for value in values:
+            grams |= trigrams(value)
+        for gram in grams:
+            self.postings[gram].add(doc_id)
+        self.documents[doc_id] = values
+        self.document_grams[doc_id] = grams
+        self.last_id = max(self.last_id, doc_id)
+    
+    def remove(self, doc_id: int):
+        """Remove a document if present."""
+        for gram in self.document_grams.pop(doc_id, ()):
+            self.postings[gram].discard(doc_id)
+        self.documents.pop(doc_id, None)
+    
+    def search(self, term: str, threshold: float = 0.3, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find documents that contain the term or are similar to it.
+        
+        Substrings shorter than MIN_TRIGRAM_TERM_LENGTH inside a word share
+        no trigram with it; callers scan with ILIKE for such terms.
+        
+        Args:
+            term: Search term
+            threshold: Minimum similarity for non-substring matches
+            limit: Maximum number of results (None for all)
+        
+        Returns:
+            List of (doc_id, score) sorted by score descending
+        """
+        needle = term.lower().strip()
+        query_grams = trigrams(needle)
+        if not query_grams:
+            return []
+        
+        candidates: Set[int] = set()
+        for gram in query_grams:
+            candidates |= self.postings.get(gram, set())
+        
+        results = []
+        for doc_id in candidates:
+            doc_grams = self.document_grams[doc_id]
+            score = len(query_grams & doc_grams) / len(query_grams | doc_grams)
+            if any(needle in value for value in self.documents[doc_id]):
+                # Substring hits always outrank fuzzy-only hits
+                score += 1.0
+            elif score < threshold:
+                continue
+            results.append((doc_id, score))
+        
+        results.sort(key=lambda item: (-item[1], -item[0]))
+        return results if limit is None else results[:limit]
+
+class SearchService:
+    """
+    Service for ranked text search over plates and blacklist entries.
+    
+    This service provides:
+    - pg_trgm extension and GIN index creation on PostgreSQL
+    - Ranked blacklist search over plate, reason and notes
+    - Plate filtering for LPR record listings
+    - In-memory trigram index fallback for SQLite/test mode
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self._blacklist_index: Optional[NgramIndex] = None
+        self._records_index: Optional[NgramIndex] = None
+        self._index_lock = Lock()
+    
+    def initialize(self, db_session):
+        """
+        Initialize the Search Service.
+        
+        Args:
+            db_session: Database session
+        """
+        self.db_session = db_session
+        self.ensure_indexes()
+        get_service('blacklist_service').add_invalidation_listener(self.invalidate_blacklist_index)
+        logger.info(f"Search service initialized ({'pg_trgm' if self.uses_trigram_indexes() else 'in-memory n-gram'} backend)")
+    
+    def uses_trigram_indexes(self) -> bool:
+        """Whether the database supports pg_trgm."""
+        return self.db_session.get_bind().dialect.name == 'postgresql'
+    
+    def ensure_indexes(self) -> bool:
+        """
+        Create pg_trgm on PostgreSQL and check the trigram GIN indexes.
+        
+        The indexes are not built here: a plain CREATE INDEX on lpr_records
+        blocks ingest for the whole build. Missing ones are logged with the
+        index_advisor.py command that builds them CONCURRENTLY.
+        
+        Returns:
+            True if indexes exist (or are not applicable), False otherwise
+        """
+        if not self.uses_trigram_indexes():
+            return True
+        try:
+            self.db_session.execute(text(TRIGRAM_EXTENSION_SQL))
+            self.db_session.commit()
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Failed to create pg_trgm extension: {str(e)}")
+            return False
+        return not check_deferred_indexes(self.db_session.get_bind(), 'search')
+    
+    def invalidate_blacklist_index(self):
+        """Drop the in-memory blacklist index; it is rebuilt on the next search."""
+        with self._index_lock:
+            self._blacklist_index = None
+    
+    def search_blacklist(self, search_term: str, page: int = 1, per_page: int = 20,
+                         active_only: bool = False) -> Dict[str, Any]:
+        """
+        Search blacklist entries by plate, reason and notes, best matches first.
+        
+        Args:
+            search_term: Search term
+            page: Page number
+            per_page: Items per page
+            active_only: Whether to return only active entries
+        
+        Returns:
+            Dictionary with ranked results and pagination info
+        """
+        try:
+            term = search_term.strip()
+            query = self.db_session.query(BlacklistPlate)
+            if active_only:
+                query = query.filter(BlacklistPlate.is_active == True)
+            
+            if len(term) < MIN_TRIGRAM_TERM_LENGTH:
+                # No trigram to look up: substring scan, newest first
+                pattern = _like_pattern(term)
+                query = query.filter(
+                    db.or_(
+                        BlacklistPlate.license_plate_text.ilike(pattern, escape='\\'),
+                        BlacklistPlate.reason.ilike(pattern, escape='\\'),
+                        BlacklistPlate.notes.ilike(pattern, escape='\\')
+                    )
+                )
+                total = query.count()
+                entries = query.order_by(BlacklistPlate.created_at.desc())\
+                    .offset((page - 1) * per_page)\
+                    .limit(per_page)\
+                    .all()
+            elif self.uses_trigram_indexes():
+                pattern = _like_pattern(term)
+                rank = db.func.greatest(
+                    db.func.similarity(BlacklistPlate.license_plate_text, term),
+                    db.func.word_similarity(term, db.func.coalesce(BlacklistPlate.reason, '')),
+                    db.func.word_similarity(term, db.func.coalesce(BlacklistPlate.notes, ''))
+                )
+                query = query.filter(
+                    db.or_(
+                        BlacklistPlate.license_plate_text.ilike(pattern, escape='\\'),
+                        BlacklistPlate.license_plate_text.op('%')(term),
+                        BlacklistPlate.reason.ilike(pattern, escape='\\'),
+                        BlacklistPlate.notes.ilike(pattern, escape='\\')
+                    )
+                )
+                total = query.count()
+                entries = query.order_by(rank.desc(), BlacklistPlate.created_at.desc())\
+                    .offset((page - 1) * per_page)\
+                    .limit(per_page)\
+                    .all()
+            else:
+                ranked_ids = [doc_id for doc_id, _ in self._get_blacklist_index().search(term)]
+                if active_only and ranked_ids:
+                    # All active ids rather than IN (ranked_ids), which can exceed SQLite's bind limit
+                    active_ids = {row[0] for row in query.with_entities(BlacklistPlate.id)}
+                    ranked_ids = [doc_id for doc_id in ranked_ids if doc_id in active_ids]
+                total = len(ranked_ids)
+                page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+                entries_by_id = {entry.id: entry for entry in
+                                 self.db_session.query(BlacklistPlate).filter(BlacklistPlate.id.in_(page_ids))} if page_ids else {}
+                entries = [entries_by_id[doc_id] for doc_id in page_ids if doc_id in entries_by_id]
+            
+            return {
+                'success': True,
+                'data': [entry.to_dict() for entry in entries],
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': total,
+                    'pages': (total + per_page - 1) // per_page
+                }
+            }
+        
+        except Exception as e:
+            logger.error(f"Error searching blacklist: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def filter_records_by_plate(self, query, plate_number: str):
+        """
+        Restrict an LPRRecord query to plates matching a search term, ranked.
+        
+        On PostgreSQL the substring match is served by the trigram index and
+        results are ordered by similarity, then newest first. On SQLite the
+        same ILIKE filter selects the rows and the in-memory index ranks the
+        best MAX_RANKED_RECORDS of them.
+        
+        Args:
+            query: LPRRecord query (filters applied, not yet ordered)
+            plate_number: Plate search term
+        
+        Returns:
+            Filtered and ordered query
+        """
+        criterion, rank = self.match_records_by_plate(plate_number)
+        return query.filter(criterion).order_by(rank.desc(), LPRRecord.timestamp.desc())
+    
+    def match_records_by_plate(self, plate_number: str):
+        """
+        Build the plate filter and rank expression for LPR record searches.
+        
+        Higher ranks are better matches, so callers that paginate by
+        (rank, timestamp, id) can sort every key descending.
+        
+        Args:
+            plate_number: Plate search term
+        
+        Returns:
+            Tuple of (filter criterion, rank expression)
+        """
+        term = plate_number.strip()
+        criterion = LPRRecord.plate_number.ilike(_like_pattern(term), escape='\\')
+        
+        if self.uses_trigram_indexes():
+            return criterion, db.func.similarity(LPRRecord.plate_number, term)
+        
+        # Terms shorter than a trigram are not in the index; they rank equally, newest first
+        ranked_ids = []
+        if len(term) >= MIN_TRIGRAM_TERM_LENGTH:
+            ranked_ids = [doc_id for doc_id, _ in
+                          self._get_records_index().search(term, threshold=1.0, limit=MAX_RANKED_RECORDS)]
+        if not ranked_ids:
+            return criterion, db.literal(0)
+        
+        rank = db.case({doc_id: -position for position, doc_id in enumerate(ranked_ids)},
+                       value=LPRRecord.id, else_=-len(ranked_ids))
+        return criterion, rank
+    
+    def _get_blacklist_index(self) -> NgramIndex:
+        """Get the in-memory blacklist index, building it if needed."""
+        with self._index_lock:
+            if self._blacklist_index is None:
+                index = NgramIndex()
+                rows = self.db_session.query(
+                    BlacklistPlate.id, BlacklistPlate.license_plate_text,
+                    BlacklistPlate.reason, BlacklistPlate.notes
+                ).yield_per(10000)
+                for row in rows:
+                    index.add(row.id, (row.license_plate_text, row.reason, row.notes))
+                self._blacklist_index = index
+            return self._blacklist_index
+    
+    def _get_records_index(self) -> NgramIndex:
+        """Get the in-memory record index, catching up on rows added since the last search."""
+        with self._index_lock:
+            if self._records_index is None:
+                self._records_index = NgramIndex()
+            index = self._records_index
+            rows = self.db_session.query(LPRRecord.id, LPRRecord.plate_number)\
+                .filter(LPRRecord.id > index.last_id)\
+                .yield_per(10000)
+            for row in rows:
+                index.add(row.id, (row.plate_number,))
+            return index
@@ -0,0 +1,295 @@
+"""
+Storage Quota Service for per-camera and per-checkpoint image quotas
+
+One busy checkpoint used to be able to fill the image disk for every
+camera. The image store counts the bytes each camera and checkpoint has
+on disk in image_storage_usage as files are written, shrunk and removed;
+this service compares those counters with the configured quotas and, for
+a scope over quota, evicts its oldest images until usage is back under
+STORAGE_QUOTA_LOW_WATERMARK of the quota. Evidence images (blacklist
+hits) are never evicted.
+"""
+
+import os
+import fcntl
+import logging
+from datetime import datetime
+from threading import Lock, Thread, Event
+from typing import Optional, Dict, Any, Tuple
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from config import Config
+from constants import STORAGE_SCOPE_CAMERA, STORAGE_SCOPE_CHECKPOINT
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = '.quota.lock'
+
+# Owner column of stored_images per scope
+SCOPE_COLUMNS = {
+    STORAGE_SCOPE_CAMERA: 'camera_id',
+    STORAGE_SCOPE_CHECKPOINT: 'checkpoint_id'
+}
+
+# Oldest evictable images of one camera or checkpoint (keyset pagination)
+EVICTION_CANDIDATES_SQL = """
+    SELECT content_hash, created_at FROM stored_images
+    WHERE {column} = :scope_id
+      AND evicted_at IS NULL
+      AND NOT is_evidence
+      AND (created_at, content_hash) > (:last_created_at, :last_hash)
+    ORDER BY created_at, content_hash
+    LIMIT :limit
+"""
+
+# Recount usage from stored_images (first start after the counters were added)
+REBUILD_USAGE_SQL = """
+    INSERT INTO image_storage_usage (scope, scope_id, bytes, images, updated_at)
+    SELECT :scope, {column}, SUM(size_bytes), COUNT(*), :updated_at
+    FROM stored_images
+    WHERE {column} IS NOT NULL AND evicted_at IS NULL
+    GROUP BY {column}
+"""
+
+GB = 1024 ** 3
+
+class StorageQuotaService:
+    """
+    Service for image storage quotas.
+    
+    This service provides:
+    - Quota lookup per camera and checkpoint (defaults and overrides)
+    - Usage report from the incrementally maintained counters
+    - Eviction of the oldest non-evidence images of scopes over quota
+    - A background enforcement thread woken as soon as a write crosses a quota
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self._wake_event = Event()
+        self.quota_thread = None
+        self.running = False
+        self.last_enforcement: Optional[Dict[str, Any]] = None
+        self.enforcement_lock = Lock()
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Storage Quota Service and start the enforcement thread.
+        
+        Args:
+            db_session: Database session
+            app: Flask application used to run enforcement in an app context
+        """
+        self.db_session = db_session
+        self.app = app
+        
+        try:
+            if self.db_session.execute(text("SELECT 1 FROM image_storage_usage LIMIT 1")).first() is None:
+                self.rebuild_usage()
+            self.db_session.commit()
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Failed to check image storage usage: {str(e)}")
+        
+        if self._quotas_configured() and app is not None:
+            get_service('image_store').add_usage_listener(self.on_usage)
+            self.running = True
+            self.quota_thread = Thread(target=self._quota_loop, daemon=True)
+            self.quota_thread.start()
+        
+        logger.info("Storage quota service initialized")
+    
+    def stop(self):
+        """Stop the enforcement thread."""
+        self.running = False
+        self._wake_event.set()
+    
+    def get_quota(self, scope: str, scope_id: str) -> Optional[int]:
+        """
+        Get the quota of a camera or checkpoint.
+        
+        Args:
+            scope: camera or checkpoint
+            scope_id: Camera or checkpoint identifier
+        
+        Returns:
+            Quota in bytes, or None if unlimited
+        """
+        quota_gb = Config.STORAGE_QUOTA_OVERRIDES.get(f"{scope}:{scope_id}")
+        if quota_gb is None:
+            quota_gb = (Config.STORAGE_QUOTA_PER_CAMERA_GB if scope == STORAGE_SCOPE_CAMERA
+                        else Config.STORAGE_QUOTA_PER_CHECKPOINT_GB)
+        return int(quota_gb * GB) if quota_gb > 0 else None
+    
+    def on_usage(self, scope: str, scope_id: str, used_bytes: int):
+        """
+        Image store usage listener: wake enforcement when a write crosses a quota.
+        
+        Args:
+            scope: camera or checkpoint
+            scope_id: Camera or checkpoint identifier
+            used_bytes: Bytes in use after the write
+        """
+        quota = self.get_quota(scope, scope_id)
+        if quota is not None and used_bytes > quota:
+            self._wake_event.set()
+    
+    def get_usage(self) -> Dict[str, Any]:
+        """
+        Get usage and quota of every camera and checkpoint.
+        
+        Returns:
+            Dictionary with per-scope usage, scopes over quota and the last enforcement
+        """
+        rows = self.db_session.execute(text(
+            "SELECT scope, scope_id, bytes, images, updated_at FROM image_storage_usage ORDER BY scope, scope_id"
+        )).all()
+        self.db_session.commit()
+        
+        usage = {STORAGE_SCOPE_CAMERA: [], STORAGE_SCOPE_CHECKPOINT: []}
+        over_quota = []
+        for row in rows:
+            quota = self.get_quota(row.scope, row.scope_id)
+            entry = {
+                'id': row.scope_id,
+                'bytes': row.bytes,
+                'images': row.images,
+                'quota_bytes': quota,
+                'usage_percent': round(row.bytes / quota * 100, 2) if quota else None,
+                'over_quota': quota is not None and row.bytes > quota
+            }
+            usage.setdefault(row.scope, []).append(entry)
+            if entry['over_quota']:
+                over_quota.append(f"{row.scope}:{row.scope_id}")
+        
+        with self.enforcement_lock:
+            last_enforcement = dict(self.last_enforcement) if self.last_enforcement else None
+        return {
+            'quotas_configured': self._quotas_configured(),
+            'usage': usage,
+            'over_quota': over_quota,
+            'last_enforcement': last_enforcement
+        }
+    
+    def enforce(self) -> Dict[str, Any]:
+        """
+        Evict images of every camera and checkpoint over its quota.
+        
+        Runs in the caller's thread. Only one worker enforces at a time;
+        others return immediately with skipped set.
+        
+        Returns:
+            Dictionary with images evicted, bytes freed and scopes that
+            stay over quota because only evidence images are left
+        """
+        results = {'images_evicted': 0, 'bytes_freed': 0, 'scopes': {}, 'unevictable': [], 'skipped': False}
+        
+        os.makedirs(Config.IMAGE_STORAGE_PATH, exist_ok=True)
+        with open(os.path.join(Config.IMAGE_STORAGE_PATH, LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                results['skipped'] = True
+                return results
+            
+            try:
+                rows = self.db_session.execute(
+                    text("SELECT scope, scope_id, bytes FROM image_storage_usage")
+                ).all()
+                self.db_session.commit()
+                for row in rows:
+                    quota = self.get_quota(row.scope, row.scope_id)
+                    if quota is None or row.bytes <= quota or row.scope not in SCOPE_COLUMNS:
+                        continue
+                    target = row.bytes - int(quota * Config.STORAGE_QUOTA_LOW_WATERMARK)
+                    evicted, freed = self._evict_scope(row.scope, row.scope_id, target)
+                    key = f"{row.scope}:{row.scope_id}"
+                    results['scopes'][key] = {'images_evicted': evicted, 'bytes_freed': freed}
+                    results['images_evicted'] += evicted
+                    results['bytes_freed'] += freed
+                    if row.bytes - freed > quota:
+                        results['unevictable'].append(key)
+                        logger.warning(f"Storage quota of {key} exceeded by evidence images only")
+                return results
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def rebuild_usage(self):
+        """Recount the usage counters from stored_images (runs on the session, caller commits)."""
+        self.db_session.execute(text("DELETE FROM image_storage_usage"))
+        for scope, column in SCOPE_COLUMNS.items():
+            self.db_session.execute(text(REBUILD_USAGE_SQL.format(column=column)), {
+                'scope': scope,
+                'updated_at': datetime.utcnow()
+            })
+        logger.info("Image storage usage counters rebuilt")
+    
+    def _evict_scope(self, scope: str, scope_id: str, target: int) -> Tuple[int, int]:
+        """Evict the oldest images of one scope until target bytes are freed."""
+        image_store = get_service('image_store')
+        evicted, freed = 0, 0
+        last_created_at, last_hash = datetime(1970, 1, 1), ''
+        while freed < target:
+            candidates = self.db_session.execute(text(EVICTION_CANDIDATES_SQL.format(column=SCOPE_COLUMNS[scope])), {
+                'scope_id': scope_id,
+                'last_created_at': last_created_at,
+                'last_hash': last_hash,
+                'limit': Config.STORAGE_QUOTA_EVICT_BATCH_SIZE
+            }).all()
+            self.db_session.commit()
+            if not candidates:
+                break
+            
+            for candidate in candidates:
+                size = image_store.evict(candidate.content_hash)
+                if size:
+                    evicted += 1
+                    freed += size
+                if freed >= target:
+                    break
+            last_created_at, last_hash = candidates[-1].created_at, candidates[-1].content_hash
+        
+        if evicted:
+            logger.info(f"Evicted {evicted} images ({freed} bytes) of {scope} {scope_id} over storage quota")
+        return evicted, freed
+    
+    @staticmethod
+    def _quotas_configured() -> bool:
+        """Whether any quota is set."""
+        return (Config.STORAGE_QUOTA_PER_CAMERA_GB > 0 or Config.STORAGE_QUOTA_PER_CHECKPOINT_GB > 0
+                or any(quota > 0 for quota in Config.STORAGE_QUOTA_OVERRIDES.values()))
+    
+    def _run_enforcement(self):
+        """Enforce quotas in an app context and record the outcome."""
+        try:
+            with self.app.app_context():
+                results = self.enforce()
+                status, error = 'completed', None
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f"Storage quota enforcement failed: {str(e)}")
+            results, status, error = None, 'failed', str(e)
+        finally:
+            self.db_session.remove()
+        
+        with self.enforcement_lock:
+            self.last_enforcement = {
+                'status': status,
+                'results': results,
+                'error': error,
+                'finished_at': datetime.utcnow().isoformat()
+            }
+    
+    def _quota_loop(self):
+        """Enforce quotas every STORAGE_QUOTA_CHECK_SECONDS or when a write crosses a quota."""
+        while self.running:
+            self._wake_event.wait(Config.STORAGE_QUOTA_CHECK_SECONDS)
+            self._wake_event.clear()
+            if self.running:
+                self._run_enforcement()
@@ -0,0 +1,218 @@
+"""
+Thumbnail Service for image previews
+
+List and detail pages used to load full-size annotated frames. This
+service generates a small thumbnail (THUMBNAIL_SIZE) and a mid-size
+preview (PREVIEW_SIZE) of every stored image on a worker pool as soon as
+the image store writes a new file, so ingest never waits for encoding.
+Derivatives are written next to the original and their paths recorded in
+stored_images; backfill() generates them for images stored earlier.
+
+Each queued task holds the original bytes, so at most THUMBNAIL_QUEUE_SIZE
+images wait per worker process. Images arriving while the queue is full
+are skipped and counted; their rows keep a NULL thumbnail_path, so the
+next backfill generates them.
+"""
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, BoundedSemaphore
+from typing import Optional, Dict, Any
+from sqlalchemy import text
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from config import Config
+from constants import IMAGE_DERIVATIVE_THUMBNAIL, IMAGE_DERIVATIVE_PREVIEW
+
+logger = logging.getLogger(__name__)
+
+# Keyset over content_hash of images missing a derivative
+BACKFILL_SQL = """
+    SELECT content_hash, path FROM stored_images
+    WHERE (thumbnail_path IS NULL OR preview_path IS NULL)
+      AND evicted_at IS NULL
+      AND content_hash > :last_hash
+    ORDER BY content_hash
+    LIMIT :limit
+"""
+
+def _load_pil():
+    """Import Pillow (optional dependency, needed only for thumbnails)."""
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        raise RuntimeError('Pillow is required for thumbnail generation')
+
+class ThumbnailService:
+    """
+    Service for thumbnail and preview generation.
+    
+    This service provides:
+    - Generation on a worker pool for every new file of the image store
+    - Fixed-size JPEG thumbnails and previews next to the original
+    - A backfill for images stored before thumbnails existed
+    - A bounded queue that skips images when full
+    - Queue counters for monitoring
+    """
+    
+    def __init__(self):
+        self.db_session = None
+        self.app = None
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.slots: Optional[BoundedSemaphore] = None
+        self.counters = {'queued': 0, 'generated': 0, 'failed': 0, 'skipped': 0}
+        self.counters_lock = Lock()
+    
+    def initialize(self, db_session, app=None):
+        """
+        Initialize the Thumbnail Service and subscribe to new images.
+        
+        Args:
+            db_session: Database session
+            app: Flask application
+        """
+        self.db_session = db_session
+        self.app = app
+        
+        if not Config.THUMBNAILS_ENABLED:
+            logger.info("Thumbnail generation disabled")
+            return
+        
+        self.pool = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS, thread_name_prefix='thumbnail')
+        self.slots = BoundedSemaphore(Config.THUMBNAIL_QUEUE_SIZE)
+        get_service('image_store').add_write_listener(self.submit)
+        logger.info("Thumbnail service initialized")
+    
+    def submit(self, content_hash: str, path: str, data: Optional[bytes] = None):
+        """
+        Queue thumbnail generation for a stored image.
+        
+        The image is skipped, to be picked up by backfill(), when the queue
+        is full.
+        
+        Args:
+            content_hash: Content hash of the image
+            path: Path of the original
+            data: Original bytes, if already in memory
+        """
+        if self.pool is None:
+            return
+        if not self.slots.acquire(blocking=False):
+            with self.counters_lock:
+                self.counters['skipped'] += 1
+                skipped = self.counters['skipped']
+            if skipped % 1000 == 1:
+                logger.warning(f"Thumbnail queue full, {skipped} images skipped; "
+                               f"generate them with: python backfill_thumbnails.py")
+            return
+        with self.counters_lock:
+            self.counters['queued'] += 1
+        try:
+            self.pool.submit(self._generate_queued, content_hash, path, data)
+        except RuntimeError:
+            # Pool shut down
+            self.slots.release()
+            raise
+    
+    def generate(self, content_hash: str, path: str, data: Optional[bytes] = None) -> Dict[str, Optional[str]]:
+        """
+        Generate the thumbnail and preview of one image.
+        
+        Args:
+            content_hash: Content hash of the image
+            path: Path of the original
+            data: Original bytes (read from path when omitted)
+        
+        Returns:
+            Dictionary of kind -> derivative path (None if not written)
+        """
+        image_module = _load_pil()
+        image_store = get_service('image_store')
+        source = io.BytesIO(data) if data is not None else path
+        
+        results = {}
+        with image_module.open(source) as image:
+            image.load()
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            for kind, size in ((IMAGE_DERIVATIVE_THUMBNAIL, Config.THUMBNAIL_SIZE),
+                               (IMAGE_DERIVATIVE_PREVIEW, Config.PREVIEW_SIZE)):
+                derivative = image.copy()
+                derivative.thumbnail((size, size))
+                buffer = io.BytesIO()
+                derivative.save(buffer, 'JPEG', quality=Config.THUMBNAIL_QUALITY, optimize=True)
+                results[kind] = image_store.save_derivative(content_hash, kind, buffer.getvalue())
+        return results
+    
+    def backfill(self, batch_size: int = 500, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Generate missing derivatives of images already in the store.
+        
+        Runs on the worker pool in batches and waits for each batch.
+        
+        Args:
+            batch_size: Images per batch
+            limit: Stop after this many images
+        
+        Returns:
+            Dictionary with images processed and failures
+        """
+        _load_pil()
+        pool = self.pool or ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS, thread_name_prefix='thumbnail')
+        results = {'images': 0, 'failed': 0}
+        last_hash = ''
+        
+        while limit is None or results['images'] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - results['images'])
+            rows = self.db_session.execute(text(BACKFILL_SQL), {'last_hash': last_hash, 'limit': size}).all()
+            self.db_session.commit()
+            if not rows:
+                break
+            
+            outcomes = pool.map(lambda row: self._try_generate(row.content_hash, row.path), rows)
+            for ok in outcomes:
+                results['images'] += 1
+                if not ok:
+                    results['failed'] += 1
+            last_hash = rows[-1].content_hash
+            logger.info(f"Thumbnail backfill: {results['images']} images ({results['failed']} failed)")
+        
+        if pool is not self.pool:
+            pool.shutdown()
+        return results
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the generation counters.
+        
+        Returns:
+            Dictionary with queued, generated, failed and skipped counts and the pending backlog
+        """
+        with self.counters_lock:
+            counters = dict(self.counters)
+        counters['pending'] = counters['queued'] - counters['generated'] - counters['failed']
+        counters['enabled'] = self.pool is not None
+        return counters
+    
+    def _generate_queued(self, content_hash: str, path: str, data: Optional[bytes]):
+        """Worker entry point for queued images."""
+        try:
+            ok = self._try_generate(content_hash, path, data)
+        finally:
+            self.slots.release()
+        with self.counters_lock:
+            self.counters['generated' if ok else 'failed'] += 1
+    
+    def _try_generate(self, content_hash: str, path: str, data: Optional[bytes] = None) -> bool:
+        """Generate derivatives, logging instead of raising."""
+        try:
+            return all(self.generate(content_hash, path, data).values())
+        except Exception as e:
+            logger.warning(f"Failed to generate thumbnails of {path}: {str(e)}")
+            return False
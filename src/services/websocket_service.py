@@ -8,7 +8,6 @@ Supports both SocketIO and REST API communication with fallback mechanism.
 
 import json
 import base64
-import os
 import logging
 import uuid
 from datetime import datetime
@@ -20,9 +19,8 @@ from core.import_helper import setup_absolute_imports
 setup_absolute_imports()
 
 from src.app import socketio, db
-from core.models.lpr_record import LPRRecord
-from core.models.camera import Camera
 from core.dependency_container import get_service
+from services.image_policy_service import decoded_size
 from config import Config
 from constants import WS_EVENT_CAMERA_REGISTER, WS_EVENT_LPR_DATA, WS_EVENT_STATUS, WS_EVENT_ERROR
 
@@ -111,9 +109,9 @@ class WebSocketService:
         """Handle client disconnection."""
         logger.info(f"Client disconnected: {sid}")
         if sid and sid in self.connected_cameras:
-            camera_key = self.connected_cameras[sid]
-            del self.connected_cameras[sid]
-            logger.info(f"Camera {camera_key} disconnected")
+            camera_id, checkpoint_id = self.connected_cameras.pop(sid)
+            self._update_camera_status(camera_id, checkpoint_id, 'inactive')
+            logger.info(f"Camera {camera_id} at checkpoint {checkpoint_id} disconnected")
     
     def handle_camera_register(self, sid, data):
         """Handle camera registration with new specification."""
@@ -127,10 +125,10 @@ class WebSocketService:
                 return
             
             camera_key = f"{camera_id}_{checkpoint_id}"
-            self.connected_cameras[sid] = camera_key
+            self.connected_cameras[sid] = (camera_id, checkpoint_id)
             join_room(camera_key)
             
-            # Update camera status in database
+            # Update camera status (written at once when it changes)
             self._update_camera_status(camera_id, checkpoint_id, 'active', timestamp)
             
             logger.info(f"Camera {camera_id} at checkpoint {checkpoint_id} registered with SID {sid}")
@@ -178,41 +176,60 @@ class WebSocketService:
             # Generate detection ID
             detection_id = str(uuid.uuid4())
             
+            # Decide which images the storage policy keeps
+            image_policy = get_service('image_policy_service')
+            decision = image_policy.evaluate(camera_id, ocr_results, plate_detections)
+            
             # Save annotated image if provided
             image_path = None
             if annotated_image:
-                image_path = self._save_image(annotated_image, camera_id, checkpoint_id, f"detection_{detection_id}")
+                if decision['full_frame']:
+                    image_path = self._save_image(annotated_image, camera_id, decision['evidence'], checkpoint_id)
+                image_policy.record_image(camera_id, 'frame', image_path is not None, decoded_size(annotated_image))
             
-            # Save cropped plates if provided
+            # Save cropped plates if provided (crop i belongs to ocr_results[i])
             plate_images = []
-            for i, plate_image in enumerate(cropped_plates):
+            for plate_image in cropped_plates:
+                plate_path = None
                 if plate_image:
-                    plate_path = self._save_image(plate_image, camera_id, checkpoint_id, f"plate_{detection_id}_{i}")
-                    plate_images.append(plate_path)
-            
-            # Create database record
-            record = LPRRecord(
+                    if decision['plate_crops']:
+                        plate_path = self._save_image(plate_image, camera_id, decision['evidence'], checkpoint_id)
+                    image_policy.record_image(camera_id, 'crop', plate_path is not None, decoded_size(plate_image))
+                plate_images.append(plate_path)
+            
+            # One record per plate read, stored in a single transaction
+            plates = []
+            for i, plate_number in enumerate(ocr_results):
+                plate_detection = plate_detections[i] if i < len(plate_detections) else None
+                plate_detection = plate_detection if isinstance(plate_detection, dict) else {}
+                plates.append({
+                    'plate_number': plate_number,
+                    'confidence': plate_detection.get('confidence'),
+                    'plate_image_path': plate_images[i] if i < len(plate_images) else None,
+                    'metadata': dict(plate_detection, plate_index=i)
+                })
+            # Edge metadata (weather, lighting, model version) is filterable with meta.* on the listings
+            edge_metadata = data.get('metadata') if isinstance(data.get('metadata'), dict) else {}
+            
+            # Crops without a plate read are released by the repository
+            plates.extend({'plate_number': None, 'plate_image_path': path} for path in plate_images[len(ocr_results):])
+            
+            get_service('detection_repository').save_detection(
+                camera_id, checkpoint_id, data.get('timestamp'), plates,
                 detection_id=detection_id,
-                camera_id=camera_id,
-                checkpoint_id=checkpoint_id,
+                source='websocket',
+                image_path=image_path,
+                processing_time_ms=processing_time_ms,
                 vehicles_count=vehicles_count,
                 plates_count=plates_count,
-                ocr_results=ocr_results,
-                vehicle_detections=vehicle_detections,
-                plate_detections=plate_detections,
-                processing_time_ms=processing_time_ms,
-                image_path=image_path,
-                plate_images=plate_images,
-                timestamp=datetime.fromisoformat(data.get('timestamp'))
+                metadata={
+                    **edge_metadata,
+                    'vehicles_count': vehicles_count,
+                    'plates_count': plates_count,
+                    'vehicle_detections': vehicle_detections
+                }
             )
             
-            self.db_session.add(record)
-            self.db_session.commit()
-            
-            # Check for blacklist
-            blacklist_service = get_service('blacklist_service')
-            blacklist_service.process_lpr_detection(record)
-            
             # Emit success response
             emit('lpr_response', {
                 'success': True,
@@ -261,7 +278,7 @@ class WebSocketService:
             # Generate health ID
             health_id = str(uuid.uuid4())
             
-            # Update camera health status in database
+            # Update camera health status (written at once when it changes)
             self._update_camera_health(camera_id, checkpoint_id, status, details)
             
             # Emit success response
@@ -358,33 +375,24 @@ class WebSocketService:
                 'timestamp': datetime.now().isoformat()
             })
     
-    def _save_image(self, image_data, camera_id, checkpoint_id, filename_prefix):
+    def _save_image(self, image_data, camera_id=None, evidence=False, checkpoint_id=None):
         """
-        Save image data to storage.
+        Save image data to the content-addressed image store.
         
         Args:
             image_data: Base64 encoded image data
             camera_id: Camera identifier
-            checkpoint_id: Checkpoint identifier
-            filename_prefix: Prefix for filename
+            evidence: Keep the image at original quality and exempt from eviction (blacklist hit)
+            checkpoint_id: Checkpoint identifier (for storage quotas)
             
         Returns:
-            Path to saved image file
+            Path to saved image file (shared with identical earlier images)
         """
         try:
-            # Create image directory if not exists
-            image_dir = os.path.join(Config.IMAGE_STORAGE_PATH, camera_id, checkpoint_id)
-            os.makedirs(image_dir, exist_ok=True)
-            
-            # Generate filename
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            filename = f"{filename_prefix}_{timestamp}.jpg"
-            file_path = os.path.join(image_dir, filename)
-            
-            # Decode and save image
             image_bytes = base64.b64decode(image_data)
-            with open(file_path, 'wb') as f:
-                f.write(image_bytes)
+            file_path = get_service('image_store').put(
+                image_bytes, camera_id=camera_id, evidence=evidence, checkpoint_id=checkpoint_id
+            )
             
             logger.debug(f"Image saved: {file_path}")
             return file_path
@@ -395,7 +403,7 @@ class WebSocketService:
     
     def _update_camera_status(self, camera_id, checkpoint_id, status, timestamp=None):
         """
-        Update camera status in database.
+        Update camera status in the camera state (batched to the database).
         
         Args:
             camera_id: Camera identifier
@@ -404,36 +412,15 @@ class WebSocketService:
             timestamp: Registration timestamp
         """
         try:
-            camera = self.db_session.query(Camera).filter_by(
-                camera_id=camera_id,
-                checkpoint_id=checkpoint_id
-            ).first()
-            
-            if camera:
-                camera.status = status
-                camera.last_activity = datetime.utcnow()
-            else:
-                # Create new camera record
-                camera = Camera(
-                    camera_id=camera_id,
-                    checkpoint_id=checkpoint_id,
-                    name=f"Camera {camera_id} at Checkpoint {checkpoint_id}",
-                    status=status,
-                    registered_at=datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow(),
-                    last_activity=datetime.utcnow()
-                )
-                self.db_session.add(camera)
-            
-            self.db_session.commit()
+            get_service('camera_state_service').record_status(camera_id, checkpoint_id, status, timestamp)
             logger.debug(f"Camera {camera_id} at {checkpoint_id} status updated to {status}")
             
         except Exception as e:
             logger.error(f"Error updating camera status: {str(e)}")
-            self.db_session.rollback()
     
     def _update_camera_health(self, camera_id, checkpoint_id, status, details):
         """
-        Update camera health status in database.
+        Update camera health status in the camera state (batched to the database).
         
         Args:
             camera_id: Camera identifier
@@ -442,21 +429,11 @@ class WebSocketService:
             details: Health details
         """
         try:
-            camera = self.db_session.query(Camera).filter_by(
-                camera_id=camera_id,
-                checkpoint_id=checkpoint_id
-            ).first()
-            
-            if camera:
-                camera.health_status = status
-                camera.health_details = details
-                camera.last_activity = datetime.utcnow()
-                self.db_session.commit()
-                logger.debug(f"Camera {camera_id} at {checkpoint_id} health updated to {status}")
+            get_service('camera_state_service').record_health(camera_id, checkpoint_id, status, details)
+            logger.debug(f"Camera {camera_id} at {checkpoint_id} health updated to {status}")
             
         except Exception as e:
             logger.error(f"Error updating camera health: {str(e)}")
-            self.db_session.rollback()
 
 # Global WebSocket service instance
 websocket_service = WebSocketService()
@@ -18,6 +18,19 @@ aicamera_bp = Blueprint('aicamera', __name__, url_prefix='/aicamera')
 
 logger = logging.getLogger(__name__)
 
+def _camera_json(camera):
+    """Registry camera as returned by the camera APIs."""
+    last_activity = camera.get('last_activity')
+    result = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in camera.items()
+    }
+    result.update({
+        'ip_address': str(camera['ip_address']) if camera.get('ip_address') else None,
+        'last_detection': last_activity.strftime('%Y-%m-%d %H:%M:%S') if last_activity else None
+    })
+    return result
+
 @aicamera_bp.route('/')
 def index():
     """AI Camera Manager main page"""
@@ -27,9 +40,8 @@ def index():
 def cameras():
     """List all AI cameras"""
     try:
-        from src.services.camera_service import get_camera_service
-        camera_service = get_camera_service()
-        cameras = camera_service.get_all_cameras()
+        from core.dependency_container import get_service
+        cameras = [_camera_json(camera) for camera in get_service('camera_registry_service').get_cameras()]
         return render_template('aicamera/cameras.html', cameras=cameras)
     except Exception as e:
         logger.error(f"Error loading cameras: {str(e)}")
@@ -39,14 +51,17 @@ def cameras():
 def camera_detail(camera_id):
     """Camera detail page"""
     try:
-        from src.services.camera_service import get_camera_service
-        camera_service = get_camera_service()
-        camera = camera_service.get_camera_by_id(camera_id)
+        from core.dependency_container import get_service
+        camera = get_service('camera_registry_service').get_camera(camera_id)
         if not camera:
             return render_template('error.html', message="Camera not found"), 404
+        camera = _camera_json(camera)
         
         # Get camera statistics
-        stats = camera_service.get_camera_statistics(camera_id)
+        stats = next((
+            camera_stats for camera_stats in get_service('analytics_service').get_summary()['camera_statistics']
+            if camera_stats['camera_id'] == camera_id
+        ), {'camera_id': camera_id, 'count': 0, 'today_count': 0})
         return render_template('aicamera/camera_detail.html', camera=camera, stats=stats)
     except Exception as e:
         logger.error(f"Error loading camera detail: {str(e)}")
@@ -56,13 +71,12 @@ def camera_detail(camera_id):
 def camera_settings(camera_id):
     """Camera settings page"""
     try:
-        from src.services.camera_service import get_camera_service
-        camera_service = get_camera_service()
-        camera = camera_service.get_camera_by_id(camera_id)
+        from core.dependency_container import get_service
+        camera = get_service('camera_registry_service').get_camera(camera_id)
         if not camera:
             return render_template('error.html', message="Camera not found"), 404
         
-        return render_template('aicamera/camera_settings.html', camera=camera)
+        return render_template('aicamera/camera_settings.html', camera=_camera_json(camera))
     except Exception as e:
         logger.error(f"Error loading camera settings: {str(e)}")
         return render_template('error.html', message=str(e)), 500
@@ -72,54 +86,16 @@ def camera_settings(camera_id):
 def api_get_cameras():
     """Get all cameras API"""
     try:
-        # Mock data for demonstration
-        cameras = [
-            {
-                'camera_id': 'CAM001',
-                'name': 'Main Entrance Camera',
-                'location': 'Main Gate',
-                'ip_address': '192.168.1.100',
-                'port': 8765,
-                'is_online': True,
-                'last_detection': '2024-01-15 14:30:25',
-                'total_detections': 1250,
-                'settings': {
-                    'resolution': '1920x1080',
-                    'fps': 30,
-                    'sensitivity': 0.8
-                }
-            },
-            {
-                'camera_id': 'CAM002',
-                'name': 'Parking Lot Camera',
-                'location': 'Parking Area A',
-                'ip_address': '192.168.1.101',
-                'port': 8765,
-                'is_online': True,
-                'last_detection': '2024-01-15 14:28:10',
-                'total_detections': 890,
-                'settings': {
-                    'resolution': '1920x1080',
-                    'fps': 25,
-                    'sensitivity': 0.7
-                }
-            },
-            {
-                'camera_id': 'CAM003',
-                'name': 'Exit Camera',
-                'location': 'Exit Gate',
-                'ip_address': '192.168.1.102',
-                'port': 8765,
-                'is_online': False,
-                'last_detection': '2024-01-15 12:15:30',
-                'total_detections': 567,
-                'settings': {
-                    'resolution': '1920x1080',
-                    'fps': 30,
-                    'sensitivity': 0.9
-                }
-            }
-        ]
+        from core.dependency_container import get_service
+        counts = {
+            camera['camera_id']: camera['count']
+            for camera in get_service('analytics_service').get_summary()['camera_statistics']
+        }
+        cameras = []
+        for camera in get_service('camera_registry_service').get_cameras(request.args.get('checkpoint_id')):
+            camera = _camera_json(camera)
+            camera['total_detections'] = counts.get(camera['camera_id'], 0)
+            cameras.append(camera)
         
         return jsonify({
             'success': True,
@@ -164,9 +140,8 @@ def api_create_camera():
 def api_get_camera(camera_id):
     """Get camera by ID API"""
     try:
-        from src.services.camera_service import get_camera_service
-        camera_service = get_camera_service()
-        camera = camera_service.get_camera_by_id(camera_id)
+        from core.dependency_container import get_service
+        camera = get_service('camera_registry_service').get_camera(camera_id)
         
         if not camera:
             return jsonify({
@@ -176,7 +151,7 @@ def api_get_camera(camera_id):
         
         return jsonify({
             'success': True,
-            'camera': camera
+            'camera': _camera_json(camera)
         })
     except Exception as e:
         logger.error(f"API Error getting camera: {str(e)}")
@@ -229,15 +204,16 @@ def api_delete_camera(camera_id):
 def api_get_camera_statistics():
     """Get camera statistics API"""
     try:
-        # Mock statistics data
+        from core.dependency_container import get_service
+        tallies = get_service('camera_registry_service').get_tallies()
+        summary = get_service('analytics_service').get_summary()
         stats = {
-            'total_cameras': 3,
-            'online_cameras': 2,
-            'offline_cameras': 1,
-            'total_detections': 2707,
-            'today_detections': 45,
-            'avg_confidence': 0.87,
-            'detection_rate': 0.92
+            'total_cameras': tallies['total'],
+            'online_cameras': tallies['online'],
+            'offline_cameras': tallies['offline'],
+            'checkpoints': tallies['checkpoints'],
+            'total_detections': summary['total_records'],
+            'today_detections': summary['today_records']
         }
         
         return jsonify({
@@ -255,29 +231,18 @@ def api_get_camera_statistics():
 def api_get_camera_status():
     """Get camera status API"""
     try:
-        # Mock status data
+        from core.dependency_container import get_service
         cameras = [
             {
-                'camera_id': 'CAM001',
-                'is_online': True,
-                'ip_address': '192.168.1.100',
-                'last_detection': '2024-01-15 14:30:25',
-                'status': 'online'
-            },
-            {
-                'camera_id': 'CAM002',
-                'is_online': True,
-                'ip_address': '192.168.1.101',
-                'last_detection': '2024-01-15 14:28:10',
-                'status': 'online'
-            },
-            {
-                'camera_id': 'CAM003',
-                'is_online': False,
-                'ip_address': '192.168.1.102',
-                'last_detection': '2024-01-15 12:15:30',
-                'status': 'offline'
+                'camera_id': camera['camera_id'],
+                'checkpoint_id': camera.get('checkpoint_id'),
+                'is_online': camera['is_online'],
+                'ip_address': camera['ip_address'],
+                'last_detection': camera['last_detection'],
+                'status': 'online' if camera['is_online'] else 'offline',
+                'health_status': camera.get('health_status')
             }
+            for camera in map(_camera_json, get_service('camera_registry_service').get_cameras())
         ]
         
         return jsonify({
@@ -5,7 +5,7 @@ This blueprint provides REST API endpoints for LPR data management,
 statistics, and blacklist operations.
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
 import json
 from core.import_helper import setup_absolute_imports
@@ -13,16 +13,27 @@ from core.import_helper import setup_absolute_imports
 # Setup absolute imports
 setup_absolute_imports()
 
-from core.models.lpr_record import LPRRecord
 from core.models import db
+from core.models.lpr_record import LPRRecord
+from core.time_window import parse_local_date, day_window, days_window, local_today
+from core.read_replica import read_only_route
+from core.pagination import keyset_paginate, InvalidCursorError, TOTAL_ESTIMATE, TOTAL_MODES
+from core.metadata_filter import parse_metadata_filters, metadata_filter_clause, InvalidMetadataFilterError
+from config import Config
 
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/records', methods=['GET'])
 def get_records():
-    """Get LPR records with pagination and filtering"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    """Get LPR records with cursor pagination and filtering"""
+    per_page = request.args.get('per_page', request.args.get('limit', 20, type=int), type=int)
+    per_page = max(1, min(per_page, Config.DB_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    if 'page' in request.args and not cursor:
+        return jsonify({'error': 'page is not supported; pass next_cursor or prev_cursor as cursor'}), 400
+    total_mode = request.args.get('total', TOTAL_ESTIMATE)
+    if total_mode not in TOTAL_MODES:
+        return jsonify({'error': f'total must be one of: {", ".join(TOTAL_MODES)}'}), 400
     
     # Get filter parameters
     camera_id = request.args.get('camera_id')
@@ -35,31 +46,39 @@ def get_records():
     
     if camera_id:
         query = query.filter(LPRRecord.camera_id == camera_id)
-    if plate_number:
-        query = query.filter(LPRRecord.plate_number.like(f'%{plate_number}%'))
-    if date_from:
-        try:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            query = query.filter(LPRRecord.timestamp >= date_from_obj)
-        except ValueError:
-            pass
-    if date_to:
-        try:
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(LPRRecord.timestamp < date_to_obj)
-        except ValueError:
-            pass
+    # Edge metadata: meta.lighting=night&meta.weather=rainy
+    try:
+        metadata_filters = parse_metadata_filters(request.args)
+        if metadata_filters:
+            query = query.filter(metadata_filter_clause(
+                LPRRecord.detection_metadata, metadata_filters, db.engine.dialect.name
+            ))
+    except InvalidMetadataFilterError as e:
+        return jsonify({'error': str(e)}), 400
+    # Dates are site-local calendar days; filter on the bare timestamp column
+    date_from_obj = parse_local_date(date_from)
+    if date_from_obj:
+        query = query.filter(LPRRecord.timestamp >= day_window(date_from_obj)[0])
+    date_to_obj = parse_local_date(date_to)
+    if date_to_obj:
+        query = query.filter(LPRRecord.timestamp < day_window(date_to_obj)[1])
     
-    # Order by timestamp descending
-    query = query.order_by(LPRRecord.timestamp.desc())
+    # Plate search is ranked by match quality; otherwise newest first
+    sort_keys = [LPRRecord.timestamp, LPRRecord.id]
+    if plate_number:
+        from core.dependency_container import get_service
+        criterion, rank = get_service('search_service').match_records_by_plate(plate_number)
+        query = query.filter(criterion)
+        sort_keys.insert(0, rank)
     
-    # Paginate
-    pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # Paginate by (timestamp, id) instead of OFFSET
+    try:
+        page = keyset_paginate(query, sort_keys, per_page, cursor=cursor, total=total_mode)
+    except InvalidCursorError as e:
+        return jsonify({'error': str(e)}), 400
     
     records = []
-    for record in pagination.items:
+    for record in page['items']:
         records.append({
             'id': record.id,
             'camera_id': record.camera_id,
@@ -67,62 +86,208 @@ def get_records():
             'confidence': record.confidence,
             'timestamp': record.timestamp.isoformat(),
             'image_path': record.image_path,
-            'location': record.location
+            'location': record.location,
+            'metadata': record.detection_metadata
         })
     
     return jsonify({
         'records': records,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        'total': page['total'],
+        'total_is_estimate': page['total_is_estimate'],
+        'per_page': per_page,
+        'has_next': page['has_next'],
+        'has_prev': page['has_prev'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
     })
 
 @api_bp.route('/records/<int:record_id>', methods=['GET'])
 def get_record(record_id):
     """Get specific LPR record"""
+    from core.dependency_container import get_service
+    from services.image_store import image_url
+    
     record = LPRRecord.query.get_or_404(record_id)
+    derivatives = get_service('image_store').get_derivatives([record.image_path]).get(record.image_path, {})
+    camera = get_service('camera_registry_service').get_camera(record.camera_id) or {}
     
     return jsonify({
         'id': record.id,
         'camera_id': record.camera_id,
+        'camera_name': camera.get('name'),
+        'checkpoint_id': camera.get('checkpoint_id'),
         'plate_number': record.plate_number,
         'confidence': record.confidence,
         'timestamp': record.timestamp.isoformat(),
         'image_path': record.image_path,
-        'location': record.location
+        'image_url': image_url(record.image_path),
+        'thumbnail_url': image_url(derivatives.get('thumbnail')),
+        'preview_url': image_url(derivatives.get('preview')),
+        'location': record.location or camera.get('location'),
+        'metadata': record.detection_metadata
     })
 
 @api_bp.route('/statistics', methods=['GET'])
+@read_only_route
 def get_statistics():
     """Get system statistics"""
-    # Get today's records
-    today = datetime.now().date()
-    today_records = LPRRecord.query.filter(
-        db.func.date(LPRRecord.timestamp) == today
-    ).count()
+    from core.dependency_container import get_service
+    
+    # Read the pre-aggregated rollups
+    summary = get_service('analytics_service').get_summary()
+    
+    camera_data = [{'camera_id': cam['camera_id'], 'count': cam['count']} for cam in summary['camera_statistics']]
+    
+    return jsonify({
+        'today_records': summary['today_records'],
+        'total_records': summary['total_records'],
+        'unique_cameras': summary['unique_cameras'],
+        'camera_statistics': camera_data
+    })
+
+@api_bp.route('/analytics/daily', methods=['GET'])
+@read_only_route
+def get_daily_analytics():
+    """Get pre-aggregated daily rollups for reports"""
+    from core.dependency_container import get_service
+    
+    today = local_today()
+    try:
+        date_from = datetime.strptime(request.args.get('date_from'), '%Y-%m-%d').date() \
+            if request.args.get('date_from') else today - timedelta(days=6)
+        date_to = datetime.strptime(request.args.get('date_to'), '%Y-%m-%d').date() \
+            if request.args.get('date_to') else today
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    
+    result = get_service('analytics_service').get_daily_rollups(
+        date_from, date_to,
+        camera_id=request.args.get('camera_id'),
+        checkpoint_id=request.args.get('checkpoint_id')
+    )
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
+
+@api_bp.route('/analytics/rebuild', methods=['POST'])
+def rebuild_analytics():
+    """Recompute rollups of past days from LPR records"""
+    from core.dependency_container import get_service
     
-    # Get total records
-    total_records = LPRRecord.query.count()
+    data = request.get_json() or {}
+    try:
+        date_from = datetime.strptime(data['date_from'], '%Y-%m-%d').date()
+        date_to = datetime.strptime(data.get('date_to', data['date_from']), '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'date_from (YYYY-MM-DD) is required'}), 400
     
-    # Get unique cameras
-    unique_cameras = db.session.query(LPRRecord.camera_id).distinct().count()
+    result = get_service('analytics_service').rebuild(date_from, date_to)
     
-    # Get records by camera
-    camera_stats = db.session.query(
-        LPRRecord.camera_id,
-        db.func.count(LPRRecord.id).label('count')
-    ).group_by(LPRRecord.camera_id).all()
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
+
+@api_bp.route('/records/plate/<plate_number>', methods=['GET'])
+@read_only_route
+def get_plate_history(plate_number):
+    """Get the records of a plate from both the hot table and the archive"""
+    from core.dependency_container import get_service
     
-    camera_data = [{'camera_id': cam.camera_id, 'count': cam.count} for cam in camera_stats]
+    limit = min(request.args.get('limit', 100, type=int), Config.DB_MAX_PAGE_SIZE)
+    records = get_service('archive_service').get_by_plate_number(plate_number, limit)
     
     return jsonify({
-        'today_records': today_records,
-        'total_records': total_records,
-        'unique_cameras': unique_cameras,
-        'camera_statistics': camera_data
+        'plate_number': plate_number,
+        'records': records,
+        'archived': sum(1 for record in records if record['source'] == 'archive')
     })
 
+@api_bp.route('/archive/search', methods=['GET'])
+def search_archive():
+    """Search archived records by plate, local date range and camera/checkpoint"""
+    from core.dependency_container import get_service
+    from services.archive_service import QUERY_FILTER_COLUMNS
+    
+    date_from = parse_local_date(request.args.get('date_from'))
+    date_to = parse_local_date(request.args.get('date_to'))
+    start = days_window(date_from)[0] if date_from else None
+    end = days_window(date_to)[1] if date_to else None
+    columns = [name.strip() for name in request.args.get('columns', '').split(',') if name.strip()]
+    
+    try:
+        rows = get_service('archive_service').query(
+            dataset=request.args.get('dataset', 'lpr_records'),
+            plate_number=request.args.get('plate_number'),
+            start=start,
+            end=end,
+            filters={name: request.args.get(name) for name in QUERY_FILTER_COLUMNS},
+            columns=columns or None,
+            limit=min(request.args.get('limit', 100, type=int), Config.DB_MAX_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({'records': rows, 'count': len(rows)})
+
+@api_bp.route('/archive/run', methods=['POST'])
+def run_archive():
+    """Export aged rows to the archive in the background"""
+    from core.dependency_container import get_service
+    
+    result = get_service('archive_service').start_archive()
+    return jsonify(result), 202
+
+@api_bp.route('/archive/status', methods=['GET'])
+def get_archive_status():
+    """Get archive contents per dataset and the last export run"""
+    from core.dependency_container import get_service
+    
+    return jsonify(get_service('archive_service').get_status())
+
+@api_bp.route('/images/policy', methods=['GET'])
+def get_image_policy():
+    """Get the image storage policy and per-camera decisions and bytes saved"""
+    from core.dependency_container import get_service
+    
+    return jsonify(get_service('image_policy_service').get_report())
+
+@api_bp.route('/images/downgrade', methods=['POST'])
+def run_image_downgrade():
+    """Re-encode aged images at lower quality in the background"""
+    from core.dependency_container import get_service
+    
+    result = get_service('image_policy_service').start_downgrade()
+    return jsonify(result), 202
+
+@api_bp.route('/images/thumbnails', methods=['GET'])
+def get_thumbnail_status():
+    """Get thumbnail generation counters"""
+    from core.dependency_container import get_service
+    
+    return jsonify(get_service('thumbnail_service').get_status())
+
+@api_bp.route('/images/reconcile', methods=['POST'])
+def run_image_reconcile():
+    """Reconcile the next image store shards with the database in the background"""
+    from core.dependency_container import get_service
+    
+    data = request.get_json(silent=True) or {}
+    apply = data.get('apply')
+    result = get_service('image_reconciler_service').start_reconcile(bool(apply) if apply is not None else None)
+    return jsonify(result), 202
+
+@api_bp.route('/images/reconcile', methods=['GET'])
+def get_image_reconcile_status():
+    """Get the reconcile checkpoint and the last run"""
+    from core.dependency_container import get_service
+    
+    return jsonify(get_service('image_reconciler_service').get_status())
+
 @api_bp.route('/records', methods=['POST'])
 def create_record():
     """Create new LPR record (for WebSocket data)"""
@@ -131,33 +296,33 @@ def create_record():
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
+    if not data.get('plate_number'):
+        return jsonify({'error': 'plate_number is required'}), 400
+    
     try:
-        record = LPRRecord(
-            camera_id=data.get('camera_id'),
-            plate_number=data.get('plate_number'),
-            confidence=data.get('confidence', 0.0),
+        from core.dependency_container import get_service
+        
+        result = get_service('detection_repository').save_detection(
+            data.get('camera_id'), data.get('checkpoint_id'), data.get('timestamp'),
+            [{
+                'plate_number': data.get('plate_number'),
+                'confidence': data.get('confidence', 0.0),
+                'metadata': data.get('metadata')
+            }],
+            source='rest_api',
             image_path=data.get('image_path'),
             location=data.get('location'),
             location_lat=data.get('location_lat'),
             location_lon=data.get('location_lon')
         )
         
-        db.session.add(record)
-        db.session.commit()
-        
-        # Check for blacklist
-        from core.dependency_container import get_service
-        
-        blacklist_service = get_service('blacklist_service')
-        blacklist_service.process_lpr_detection(record)
-        
         return jsonify({
-            'id': record.id,
+            'id': result['records'][0]['id'],
+            'detection_id': result['detection_id'],
             'message': 'Record created successfully'
         }), 201
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
 # Blacklist API endpoints
@@ -220,6 +385,97 @@ def remove_from_blacklist(blacklist_id):
     else:
         return jsonify(result), 400
 
+@api_bp.route('/blacklist/import', methods=['POST'])
+def import_blacklist():
+    """Start a bulk blacklist import from an uploaded CSV/Excel file"""
+    from core.dependency_container import get_service
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'A CSV or Excel file is required'}), 400
+    
+    blacklist_bulk_service = get_service('blacklist_bulk_service')
+    
+    result = blacklist_bulk_service.start_import(
+        upload,
+        added_by=request.form.get('added_by', 'system'),
+        default_reason=request.form.get('reason')
+    )
+    
+    if result['success']:
+        return jsonify(result), 202
+    else:
+        return jsonify(result), 400
+
+@api_bp.route('/blacklist/import/<job_id>', methods=['GET'])
+def get_blacklist_import(job_id):
+    """Get progress of a bulk blacklist import"""
+    from core.dependency_container import get_service
+    
+    job = get_service('blacklist_bulk_service').get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+@api_bp.route('/blacklist/export', methods=['GET'])
+def export_blacklist():
+    """Stream blacklist entries as CSV"""
+    from core.dependency_container import get_service
+    
+    active_only = request.args.get('active_only', 'true').lower() == 'true'
+    blacklist_bulk_service = get_service('blacklist_bulk_service')
+    
+    filename = f"blacklist_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        stream_with_context(blacklist_bulk_service.iter_export_csv(active_only=active_only)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@api_bp.route('/blacklist/expirations', methods=['GET'])
+def get_blacklist_expirations():
+    """Get blacklist entries that expire next"""
+    from core.dependency_container import get_service
+    
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    
+    blacklist_expiry_service = get_service('blacklist_expiry_service')
+    result = blacklist_expiry_service.get_upcoming_expirations(limit=limit)
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
+@api_bp.route('/blacklist/search', methods=['GET'])
+def search_blacklist():
+    """Search blacklist entries by plate, reason or notes"""
+    from core.dependency_container import get_service
+    
+    search_term = request.args.get('q', '').strip()
+    if not search_term:
+        return jsonify({'error': 'Search term is required'}), 400
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    
+    search_service = get_service('search_service')
+    result = search_service.search_blacklist(
+        search_term,
+        page=page,
+        per_page=per_page,
+        active_only=request.args.get('active_only', 'false').lower() == 'true'
+    )
+    
+    if result['success']:
+        return jsonify(result)
+    else:
+        return jsonify(result), 500
+
 @api_bp.route('/blacklist/statistics', methods=['GET'])
 def get_blacklist_statistics():
     """Get blacklist statistics"""
@@ -229,6 +485,17 @@ def get_blacklist_statistics():
     stats = blacklist_service.get_blacklist_statistics()
     return jsonify(stats)
 
+@api_bp.route('/blacklist/alerts/status', methods=['GET'])
+def get_blacklist_alert_status():
+    """Get blacklist alert dispatcher status"""
+    from core.dependency_container import get_service
+    
+    blacklist_alert_service = get_service('blacklist_alert_service')
+    return jsonify({
+        'success': True,
+        'data': blacklist_alert_service.get_status()
+    })
+
 @api_bp.route('/blacklist/detections', methods=['GET'])
 def get_blacklist_detections():
     """Get recent blacklist detections"""
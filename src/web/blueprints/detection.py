@@ -12,6 +12,7 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime, timedelta
 import logging
+from core.read_replica import read_only_route
 
 # Create blueprint
 detection_bp = Blueprint('detection', __name__, url_prefix='/detection')
@@ -69,6 +70,7 @@ def record_detail(record_id):
         return render_template('error.html', message=str(e)), 500
 
 @detection_bp.route('/statistics')
+@read_only_route
 def statistics():
     """Detection statistics page"""
     try:
@@ -199,6 +201,7 @@ def api_delete_record(record_id):
         }), 500
 
 @detection_bp.route('/api/statistics', methods=['GET'])
+@read_only_route
 def api_get_statistics():
     """Get detection statistics API"""
     try:
@@ -220,6 +223,7 @@ def api_get_statistics():
         }), 500
 
 @detection_bp.route('/api/statistics/daily', methods=['GET'])
+@read_only_route
 def api_get_daily_statistics():
     """Get daily detection statistics API"""
     try:
@@ -241,6 +245,7 @@ def api_get_daily_statistics():
         }), 500
 
 @detection_bp.route('/api/statistics/camera', methods=['GET'])
+@read_only_route
 def api_get_camera_statistics():
     """Get camera detection statistics API"""
     try:
@@ -12,6 +12,8 @@ from core.import_helper import setup_absolute_imports
 setup_absolute_imports()
 
 from core.dependency_container import get_service
+from core.models import db
+from core.read_replica import read_only_route, replica_router
 from constants import HEALTH_STATUS_PASS, HEALTH_STATUS_FAIL, HEALTH_STATUS_WARNING
 
 health_bp = Blueprint('health', __name__)
@@ -65,6 +67,7 @@ def perform_health_check():
         }), 500
 
 @health_bp.route('/history', methods=['GET'])
+@read_only_route
 def health_history():
     """
     Get health check history.
@@ -91,6 +94,69 @@ def health_history():
             'error': str(e)
         }), 500
 
+@health_bp.route('/storage', methods=['GET'])
+def storage_usage():
+    """
+    Get image storage usage and quotas per camera and checkpoint.
+    
+    Returns:
+        JSON response with usage, quotas and the last eviction run
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_service('storage_quota_service').get_usage()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@health_bp.route('/database/replicas', methods=['GET'])
+def database_replicas():
+    """
+    Get read replica lag and routing status.
+    
+    Returns:
+        JSON response with per-replica lag and health
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': replica_router.get_status(db)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@health_bp.route('/database/pool', methods=['GET'])
+def database_pool():
+    """
+    Get connection pool metrics of the worker that serves the request.
+    
+    Returns:
+        JSON response with checkout wait times, in-use and overflow counts
+        per engine and PostgreSQL's max_connections budget
+    """
+    try:
+        database_service = get_service('database_service')
+        
+        return jsonify({
+            'success': True,
+            'data': database_service.get_pool_metrics()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @health_bp.route('/database/stats', methods=['GET'])
 def database_stats():
     """
@@ -117,24 +183,54 @@ def database_stats():
 @health_bp.route('/database/cleanup', methods=['POST'])
 def cleanup_database():
     """
-    Clean up old database records.
+    Start a background job that cleans up old database records.
     
     JSON Body:
         days: Number of days to keep data (default: 30)
         
     Returns:
-        JSON response with cleanup results
+        JSON response with the retention job
     """
     try:
         data = request.get_json() or {}
         days = data.get('days', 30)
         
         database_service = get_service('database_service')
-        results = database_service.cleanup_old_data(days)
+        result = database_service.cleanup_old_data(days)
+        
+        return jsonify({
+            'success': result['success'],
+            'message': result['message'],
+            'data': result['job']
+        }), 202
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@health_bp.route('/database/cleanup', methods=['GET'])
+def cleanup_status():
+    """
+    Get progress of the current or last cleanup job.
+    
+    Returns:
+        JSON response with job progress
+    """
+    try:
+        database_service = get_service('database_service')
+        job = database_service.get_cleanup_status()
+        
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'No cleanup job has run'
+            }), 404
         
         return jsonify({
             'success': True,
-            'data': results
+            'data': job
         })
         
     except Exception as e:
@@ -143,6 +239,29 @@ def cleanup_database():
             'error': str(e)
         }), 500
 
+@health_bp.route('/database/partitions', methods=['GET'])
+def database_partitions():
+    """
+    Get partitions of the time-partitioned tables.
+    
+    Returns:
+        JSON response with partition status
+    """
+    try:
+        partition_service = get_service('partition_service')
+        result = partition_service.get_status()
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 500
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @health_bp.route('/database/optimize', methods=['POST'])
 def optimize_database():
     """
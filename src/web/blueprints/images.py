@@ -0,0 +1,120 @@
+"""
+Image Delivery Blueprint
+
+This blueprint serves stored images under immutable content-hash URLs.
+The application only checks access and looks up the path; behind nginx
+the bytes are sent by nginx itself through X-Accel-Redirect (sendfile,
+range requests), otherwise Werkzeug streams the file with conditional
+and range support. Strong ETags are derived from the content hash, so
+browsers revalidate without any file access and, with
+Cache-Control: immutable, usually do not ask at all.
+"""
+
+import os
+import re
+import mimetypes
+from flask import Blueprint, jsonify, request, session, send_file, make_response, abort, redirect
+from core.import_helper import setup_absolute_imports
+
+# Setup absolute imports
+setup_absolute_imports()
+
+from core.dependency_container import get_service
+from core.models.lpr_record import LPRRecord
+from services.image_store import image_url
+from config import Config
+from constants import IMAGE_DERIVATIVES
+
+images_bp = Blueprint('images', __name__)
+
+CONTENT_HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+@images_bp.before_request
+def require_login():
+    """With IMAGE_ACCESS_REQUIRES_LOGIN, images are only served to signed-in users."""
+    if Config.IMAGE_ACCESS_REQUIRES_LOGIN and 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+
+@images_bp.route('/images/<content_hash>', methods=['GET', 'HEAD'])
+def get_image(content_hash):
+    """Serve an original image by content hash"""
+    stored = _get_stored(content_hash)
+    return _deliver(stored['path'], _etag(stored))
+
+@images_bp.route('/images/<content_hash>/<kind>', methods=['GET', 'HEAD'])
+def get_image_derivative(content_hash, kind):
+    """Serve the thumbnail or preview of an image, or the original until it exists"""
+    if kind not in IMAGE_DERIVATIVES:
+        abort(404)
+    stored = _get_stored(content_hash)
+    if not stored[f'{kind}_path']:
+        # Not generated yet: serve the original without long-term caching
+        return _deliver(stored['path'], None)
+    return _deliver(stored[f'{kind}_path'], _etag(stored, kind))
+
+@images_bp.route('/images/file/<path:relative_path>', methods=['GET', 'HEAD'])
+def get_image_file(relative_path):
+    """Serve an image written before the content-addressed store, by path"""
+    root = os.path.realpath(Config.IMAGE_STORAGE_PATH)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        abort(404)
+    return _deliver(path, None)
+
+@images_bp.route('/api/records/<int:record_id>/image', methods=['GET'])
+def get_record_image(record_id):
+    """Redirect to the cacheable URL of a record's image"""
+    record = LPRRecord.query.get_or_404(record_id)
+    if not record.image_path:
+        abort(404)
+    return redirect(image_url(record.image_path))
+
+def _get_stored(content_hash):
+    """Look up a stored image or abort with 404 (410 once evicted for quota)."""
+    stored = get_service('image_store').get(content_hash) if CONTENT_HASH_PATTERN.fullmatch(content_hash) else None
+    if not stored:
+        abort(404)
+    if stored['evicted_at']:
+        abort(410)
+    return stored
+
+def _etag(stored, kind=None):
+    """Strong ETag from the content hash; changes when the file was re-encoded."""
+    etag = stored['content_hash']
+    if kind:
+        etag += f'.{kind}'
+    if stored['downgraded_at']:
+        # Digits of the re-encode time (datetime or SQLite text)
+        etag += '.d' + ''.join(ch for ch in str(stored['downgraded_at']) if ch.isdigit())[:14]
+    return etag
+
+def _deliver(path, etag):
+    """
+    Send a file through nginx (X-Accel-Redirect) or Werkzeug.
+    
+    Args:
+        path: File path below IMAGE_STORAGE_PATH
+        etag: Strong ETag (without quotes), or None for short-lived responses
+    
+    Returns:
+        Flask response
+    """
+    if etag and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    elif Config.IMAGE_X_ACCEL_PREFIX:
+        relative_path = os.path.relpath(path, Config.IMAGE_STORAGE_PATH).replace(os.sep, '/')
+        response = make_response('', 200)
+        # nginx serves the file (sendfile, Range) from its internal location
+        response.headers['X-Accel-Redirect'] = Config.IMAGE_X_ACCEL_PREFIX.rstrip('/') + '/' + relative_path
+        response.headers['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    else:
+        if not os.path.isfile(path):
+            abort(404)
+        response = send_file(path, conditional=True, etag=etag or False, max_age=None)
+    
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'private, max-age={Config.IMAGE_CACHE_MAX_AGE_SECONDS}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
@@ -14,6 +14,11 @@ setup_absolute_imports()
 
 from core.models.lpr_record import LPRRecord
 from core.models import db
+from core.time_window import parse_local_date, day_window
+from core.read_replica import read_only_route
+from core.pagination import keyset_paginate, InvalidCursorError
+from core.metadata_filter import META_PREFIX, parse_metadata_filters, metadata_filter_clause, InvalidMetadataFilterError
+from config import Config
 
 main_bp = Blueprint('main', __name__)
 
@@ -25,8 +30,9 @@ def index():
 @main_bp.route('/records')
 def records():
     """Records table view"""
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    per_page = max(1, min(per_page, Config.DB_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
     
     # Get filter parameters
     camera_id = request.args.get('camera_id')
@@ -39,53 +45,63 @@ def records():
     
     if camera_id:
         query = query.filter(LPRRecord.camera_id == camera_id)
+    # Edge metadata (meta.lighting=night); malformed filters are ignored like bad dates
+    meta_args = {}
+    try:
+        metadata_filters = parse_metadata_filters(request.args)
+        if metadata_filters:
+            query = query.filter(metadata_filter_clause(
+                LPRRecord.detection_metadata, metadata_filters, db.engine.dialect.name
+            ))
+            meta_args = {name: request.args.getlist(name) for name in request.args if name.startswith(META_PREFIX)}
+    except InvalidMetadataFilterError:
+        pass
+    # Dates are site-local calendar days; filter on the bare timestamp column
+    date_from_obj = parse_local_date(date_from)
+    if date_from_obj:
+        query = query.filter(LPRRecord.timestamp >= day_window(date_from_obj)[0])
+    date_to_obj = parse_local_date(date_to)
+    if date_to_obj:
+        query = query.filter(LPRRecord.timestamp < day_window(date_to_obj)[1])
+    
+    # Plate search is ranked by match quality; otherwise newest first
+    sort_keys = [LPRRecord.timestamp, LPRRecord.id]
     if plate_number:
-        query = query.filter(LPRRecord.plate_number.like(f'%{plate_number}%'))
-    if date_from:
-        try:
-            date_from_obj = datetime.strptime(date_from, '%Y-%m-%d')
-            query = query.filter(LPRRecord.timestamp >= date_from_obj)
-        except ValueError:
-            pass
-    if date_to:
-        try:
-            date_to_obj = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(LPRRecord.timestamp < date_to_obj)
-        except ValueError:
-            pass
+        from core.dependency_container import get_service
+        criterion, rank = get_service('search_service').match_records_by_plate(plate_number)
+        query = query.filter(criterion)
+        sort_keys.insert(0, rank)
     
-    # Order by timestamp descending
-    query = query.order_by(LPRRecord.timestamp.desc())
+    # Paginate by (timestamp, id) instead of OFFSET; a stale or edited cursor restarts at the first page
+    try:
+        pagination = keyset_paginate(query, sort_keys, per_page, cursor=cursor)
+    except InvalidCursorError:
+        pagination = keyset_paginate(query, sort_keys, per_page)
     
-    # Paginate
-    pagination = query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    records = pagination['items']
     
-    records = pagination.items
+    # Thumbnails for the list; originals are loaded only when opened
+    from core.dependency_container import get_service
+    derivatives = get_service('image_store').get_derivatives([record.image_path for record in records])
     
     return render_template('records.html', 
                          records=records, 
+                         derivatives=derivatives,
                          pagination=pagination,
                          camera_id=camera_id,
                          plate_number=plate_number,
                          date_from=date_from,
-                         date_to=date_to)
+                         date_to=date_to,
+                         meta_args=meta_args)
 
 @main_bp.route('/dashboard')
+@read_only_route
 def dashboard():
     """Dashboard with statistics"""
-    # Get today's records
-    today = datetime.now().date()
-    today_records = LPRRecord.query.filter(
-        db.func.date(LPRRecord.timestamp) == today
-    ).count()
-    
-    # Get total records
-    total_records = LPRRecord.query.count()
+    from core.dependency_container import get_service
     
-    # Get unique cameras
-    unique_cameras = db.session.query(LPRRecord.camera_id).distinct().count()
+    # Read the pre-aggregated rollups
+    summary = get_service('analytics_service').get_summary()
     
     # Get recent records for table
     recent_records = LPRRecord.query.order_by(
@@ -93,9 +109,9 @@ def dashboard():
     ).limit(10).all()
     
     return render_template('dashboard.html',
-                         today_records=today_records,
-                         total_records=total_records,
-                         unique_cameras=unique_cameras,
+                         today_records=summary['today_records'],
+                         total_records=summary['total_records'],
+                         unique_cameras=summary['unique_cameras'],
                          recent_records=recent_records)
 
 @main_bp.route('/blacklist')
@@ -12,10 +12,14 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime, timedelta
 import logging
+from core.read_replica import route_reads_to_replica
 
 # Create blueprint
 map_bp = Blueprint('map', __name__, url_prefix='/map')
 
+# Pages and GET APIs only read; serve them from a replica when one is healthy
+map_bp.before_request(route_reads_to_replica)
+
 logger = logging.getLogger(__name__)
 
 @map_bp.route('/')
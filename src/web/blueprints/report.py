@@ -12,11 +12,15 @@ from flask import Blueprint, render_template, request, jsonify, current_app, sen
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime, timedelta
 import logging
+from core.read_replica import route_reads_to_replica
 import io
 
 # Create blueprint
 report_bp = Blueprint('report', __name__, url_prefix='/report')
 
+# Pages and GET APIs only read; serve them from a replica when one is healthy
+report_bp.before_request(route_reads_to_replica)
+
 logger = logging.getLogger(__name__)
 
 @report_bp.route('/')
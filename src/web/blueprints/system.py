@@ -12,6 +12,7 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_socketio import emit, join_room, leave_room
 from datetime import datetime, timedelta
 import logging
+from web.blueprints.user import login_required
 
 # Create blueprint
 system_bp = Blueprint('system', __name__, url_prefix='/system')
@@ -414,6 +415,102 @@ def api_schedule_task():
             'error': str(e)
         }), 500
 
+@system_bp.route('/api/maintenance/backups', methods=['GET'])
+def api_get_backups():
+    """List database backups API"""
+    try:
+        from core.dependency_container import get_service
+        backup_service = get_service('backup_service')
+        
+        return jsonify({
+            'success': True,
+            'backups': backup_service.list_backups()
+        })
+    except Exception as e:
+        logger.error(f"API Error listing backups: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@system_bp.route('/api/maintenance/backups', methods=['POST'])
+@login_required
+def api_start_backup():
+    """Start a full or incremental database backup API"""
+    try:
+        data = request.get_json() or {}
+        from core.dependency_container import get_service
+        database_service = get_service('database_service')
+        
+        result = database_service.backup_database(
+            backup_path=data.get('backup_path'),
+            incremental=data.get('type') == 'incremental'
+        )
+        
+        return jsonify({
+            'success': result['success'],
+            'message': result['message'],
+            'job': result['job']
+        }), 202 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"API Error starting backup: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@system_bp.route('/api/maintenance/restore', methods=['POST'])
+@login_required
+def api_start_restore():
+    """Restore the database from a backup API"""
+    try:
+        data = request.get_json() or {}
+        if not data.get('backup') or data.get('confirm') is not True:
+            return jsonify({
+                'success': False,
+                'error': 'backup and "confirm": true are required; restoring replaces the current data'
+            }), 400
+        
+        from core.dependency_container import get_service
+        database_service = get_service('database_service')
+        result = database_service.restore_database(data['backup'])
+        
+        return jsonify({
+            'success': result['success'],
+            'message': result['message'],
+            'job': result['job']
+        }), 202 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"API Error starting restore: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@system_bp.route('/api/maintenance/backup-job', methods=['GET'])
+def api_get_backup_job():
+    """Get progress of the current or last backup/restore job API"""
+    try:
+        from core.dependency_container import get_service
+        job = get_service('backup_service').get_job()
+        
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'No backup job has run'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        })
+    except Exception as e:
+        logger.error(f"API Error getting backup job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # WebSocket Events
 @system_bp.route('/socket/system-status', methods=['POST'])
 def socket_system_status():
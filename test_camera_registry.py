@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test Script for the camera registry
+ทดสอบการค้นหากล้องจากหน่วยความจำ และการนับกล้องออนไลน์/ออฟไลน์
+ใช้ฐานข้อมูล SQLite ชั่วคราว
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project src to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+def create_test_registry(workdir):
+    """สร้าง Flask app, CameraStateService และ CameraRegistryService บน SQLite"""
+    from flask import Flask
+    from core.models import db
+    from core.dependency_container import container
+    from services.camera_state_service import CameraStateService
+    from services.camera_registry_service import CameraRegistryService
+    
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'cameras.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False
+    )
+    db.init_app(app)
+    
+    container.register('camera_state_service', CameraStateService)
+    state = container.get('camera_state_service')
+    registry = CameraRegistryService()
+    with app.app_context():
+        db.metadata.create_all(bind=db.engine, tables=[db.metadata.tables['cameras']])
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO cameras (camera_id, name, location, status) VALUES ('CAM001', 'Main Gate', 'Gate A', 'active')"
+            )
+        state.initialize(db.session, app)
+        registry.initialize(db.session, app)
+    return app, state, registry
+
+def test_lookup(registry):
+    """ทดสอบว่าข้อมูลกล้องจากฐานข้อมูลค้นหาได้โดยไม่ต้อง query"""
+    print("=== ทดสอบการค้นหากล้อง ===")
+    camera = registry.get_camera('CAM001')
+    if camera and camera['name'] == 'Main Gate' and registry.get_camera('CAM999') is None:
+        print("✅ ค้นหากล้องจาก registry ได้")
+        return True
+    print(f"❌ กล้อง: {camera}")
+    return False
+
+def test_tallies(state, registry):
+    """ทดสอบการนับกล้องออนไลน์/ออฟไลน์เมื่อสถานะเปลี่ยน"""
+    print("\n=== ทดสอบการนับกล้อง ===")
+    state.record_status('CAM002', 'CP1', 'active')
+    online = registry.get_tallies()
+    state.record_status('CAM002', 'CP1', 'inactive')
+    offline = registry.get_tallies()
+    
+    if (online['total'] == 2 and online['online'] == 1 and online['checkpoints']['CP1']['online'] == 1
+            and offline['online'] == 0 and offline['offline'] == 2):
+        print("✅ ตัวนับอัปเดตเมื่อกล้องเชื่อมต่อและตัดการเชื่อมต่อ")
+        return True
+    print(f"❌ ออนไลน์: {online}, ออฟไลน์: {offline}")
+    return False
+
+def test_online_timeout(registry):
+    """ทดสอบว่ากล้องที่เงียบนานเกิน timeout ถือว่าออฟไลน์"""
+    print("\n=== ทดสอบ timeout ===")
+    idle = {'status': 'active', 'last_activity': datetime.utcnow() - timedelta(hours=1)}
+    recent = {'status': 'active', 'last_activity': datetime.utcnow()}
+    if not registry.is_online(idle) and registry.is_online(recent):
+        print("✅ กล้องที่ไม่มีความเคลื่อนไหวถือว่าออฟไลน์")
+        return True
+    print("❌ การตรวจ timeout ไม่ถูกต้อง")
+    return False
+
+def main():
+    """Main test function"""
+    print("LPR Server v3 - Camera Registry Test")
+    print("=" * 50)
+    
+    try:
+        import flask_sqlalchemy  # noqa: F401
+    except ImportError as e:
+        print(f"⚠️  ข้ามการทดสอบ: {e}")
+        return 0
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        app, state, registry = create_test_registry(workdir)
+        results = [
+            test_lookup(registry),
+            test_tallies(state, registry),
+            test_online_timeout(registry)
+        ]
+        registry.stop()
+    
+    print("\n" + "=" * 50)
+    print(f"ผ่าน {sum(results)}/{len(results)} การทดสอบ")
+    return 0 if all(results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
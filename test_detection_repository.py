@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test Script for the detection repository
+ทดสอบการบันทึก detection ใน transaction เดียว (หนึ่งแถวต่อป้ายทะเบียน)
+และการตั้งค่า blacklist ก่อน insert
+ใช้ฐานข้อมูล SQLite ชั่วคราว
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project src to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+def create_test_repository(workdir):
+    """สร้าง Flask app และบริการที่ DetectionRepository ใช้ บน SQLite"""
+    from flask import Flask
+    from core.models import db
+    from core.dependency_container import container
+    from config import Config
+    from services.image_store import ImageStore
+    from services.blacklist_service import BlacklistService
+    from services.blacklist_alert_service import BlacklistAlertService
+    from services.analytics_service import AnalyticsService
+    from services.camera_state_service import CameraStateService
+    from services.camera_registry_service import CameraRegistryService
+    from services.detection_repository import DetectionRepository
+    
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'detections.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False
+    )
+    db.init_app(app)
+    Config.IMAGE_STORAGE_PATH = os.path.join(workdir, 'images')
+    Config.DETECTION_AUDIT_ENABLED = False
+    Config.BLACKLIST_VERSION_PATH = os.path.join(workdir, 'blacklist.version')
+    
+    for name, service in [('image_store', ImageStore), ('blacklist_service', BlacklistService),
+                          ('blacklist_alert_service', BlacklistAlertService),
+                          ('analytics_service', AnalyticsService), ('camera_state_service', CameraStateService),
+                          ('camera_registry_service', CameraRegistryService),
+                          ('detection_repository', DetectionRepository)]:
+        container.register(name, service)
+    
+    repository = container.get('detection_repository')
+    with app.app_context():
+        db.metadata.create_all(bind=db.engine, tables=[
+            db.metadata.tables[name] for name in
+            ('lpr_records', 'stored_images', 'image_storage_usage', 'blacklist_plates')
+        ])
+        container.get('image_store').initialize(db.session)
+        container.get('blacklist_service').initialize(db.session)
+        repository.initialize(db.session, app)
+    return app, repository
+
+def test_one_row_per_plate(app, repository):
+    """ทดสอบว่า detection ที่มีสองป้ายได้สองแถว และภาพ frame มี reference ครบ"""
+    print("=== ทดสอบหนึ่งแถวต่อป้ายทะเบียน ===")
+    from sqlalchemy import text
+    from core.models import db
+    from core.models.lpr_record import LPRRecord
+    from core.dependency_container import get_service
+    
+    frame = get_service('image_store').put(b'frame', camera_id='CAM001')
+    with app.app_context():
+        result = repository.save_detection(
+            'CAM001', 'CP1', '2024-12-19T10:00:00Z',
+            [{'plate_number': 'AB1234', 'confidence': 0.9}, {'plate_number': 'CD5678', 'confidence': 0.8}],
+            source='websocket', image_path=frame, metadata={'vehicles_count': 2}
+        )
+        rows = LPRRecord.query.filter_by(detection_id=result['detection_id']).all()
+        ref_count = db.session.execute(
+            text("SELECT ref_count FROM stored_images WHERE path = :path"), {'path': frame}
+        ).scalar()
+    
+    if len(rows) == 2 and ref_count == 2 and rows[0].detection_metadata == {'vehicles_count': 2}:
+        print("✅ บันทึกสองแถวใน transaction เดียว และ frame มีสอง reference")
+        return True
+    print(f"❌ แถว: {len(rows)}, ref_count: {ref_count}")
+    return False
+
+def test_blacklist_in_insert(app, repository):
+    """ทดสอบว่าป้ายใน blacklist ถูกตั้งค่าตั้งแต่ insert"""
+    print("\n=== ทดสอบ blacklist ===")
+    from core.dependency_container import get_service
+    
+    with app.app_context():
+        # Through the service, so the plate cache filled by the previous test is invalidated
+        get_service('blacklist_service').add_to_blacklist('XY9999', 'stolen', 'test')
+        result = repository.save_detection('CAM001', 'CP1', None, [{'plate_number': 'XY9999'}], source='mqtt')
+    
+    record = result['records'][0]
+    if result['blacklist_hits'] == 1 and record['is_blacklisted'] and record['blacklist_reason'] == 'stolen':
+        print("✅ record ถูกตั้งค่า blacklist ก่อน commit")
+        return True
+    print(f"❌ ผลลัพธ์: {result}")
+    return False
+
+def main():
+    """Main test function"""
+    print("LPR Server v3 - Detection Repository Test")
+    print("=" * 50)
+    
+    try:
+        import flask_sqlalchemy  # noqa: F401
+    except ImportError as e:
+        print(f"⚠️  ข้ามการทดสอบ: {e}")
+        return 0
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        app, repository = create_test_repository(workdir)
+        results = [
+            test_one_row_per_plate(app, repository),
+            test_blacklist_in_insert(app, repository)
+        ]
+    
+    print("\n" + "=" * 50)
+    print(f"ผ่าน {sum(results)}/{len(results)} การทดสอบ")
+    return 0 if all(results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
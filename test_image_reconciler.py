@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test Script for the image store reconciler
+ทดสอบการหาไฟล์ที่ไม่มีใครอ้างอิง และ reference ที่ค้างจาก commit ที่ล้มเหลว
+ใช้ฐานข้อมูล SQLite ชั่วคราว
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project src to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+SHARD_TIME = datetime(2024, 5, 6, 7, 30)
+
+def create_test_reconciler(workdir):
+    """สร้าง Flask app, ImageStore และ ImageReconcilerService ที่เก็บไฟล์ใน workdir"""
+    from flask import Flask
+    from core.models import db
+    from core.dependency_container import container
+    from config import Config
+    from services.image_store import ImageStore
+    from services.image_reconciler_service import ImageReconcilerService
+    
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'images.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False
+    )
+    db.init_app(app)
+    Config.IMAGE_STORAGE_PATH = os.path.join(workdir, 'images')
+    Config.RECONCILE_CHECKPOINT_PATH = os.path.join(workdir, 'reconcile_checkpoint.json')
+    Config.RECONCILE_ENABLED = False
+    
+    container.register('image_store', ImageStore)
+    store = container.get('image_store')
+    reconciler = ImageReconcilerService()
+    with app.app_context():
+        db.metadata.create_all(bind=db.engine, tables=[
+            db.metadata.tables['stored_images'], db.metadata.tables['lpr_records']
+        ])
+        store.initialize(db.session)
+        reconciler.initialize(db.session, app)
+    return app, store, reconciler
+
+def age(path):
+    """ทำให้ไฟล์เก่ากว่า grace period"""
+    old = time.time() - 24 * 3600
+    os.utime(path, (old, old))
+
+def test_orphan_file(app, store, reconciler):
+    """ทดสอบว่าไฟล์ที่ไม่มีแถวใน stored_images ถูกลบเมื่อ apply"""
+    print("=== ทดสอบไฟล์กำพร้า ===")
+    path = store.put(b'orphan', timestamp=SHARD_TIME)
+    from core.models import db
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("DELETE FROM stored_images WHERE path = ?", (path,))
+    age(path)
+    
+    with app.app_context():
+        report = reconciler.reconcile_shard('2024/05/06', apply=False)
+        still_there = os.path.exists(path)
+        fixed = reconciler.reconcile_shard('2024/05/06', apply=True)
+    
+    if report['orphan_files'] == 1 and still_there and fixed['fixed'] >= 1 and not os.path.exists(path):
+        print("✅ รายงานไฟล์กำพร้าโดยไม่ลบ และลบเมื่อ apply")
+        return True
+    print(f"❌ รายงาน: {report}, แก้ไข: {fixed}")
+    return False
+
+def test_leaked_reference(app, store, reconciler):
+    """ทดสอบว่าภาพที่ไม่มี record อ้างอิงถูกลบ และภาพที่มี record ยังอยู่"""
+    print("\n=== ทดสอบ reference ที่ค้าง ===")
+    from core.models import db
+    kept = store.put(b'kept', timestamp=SHARD_TIME)
+    leaked = store.put(b'leaked', timestamp=SHARD_TIME)
+    old = datetime.utcnow() - timedelta(days=1)
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO lpr_records (camera_id, plate_number, image_path) VALUES ('cam-1', 'AB1234', ?)", (kept,)
+            )
+            connection.exec_driver_sql("UPDATE stored_images SET last_acquired_at = ?", (old,))
+        fixed = reconciler.reconcile_shard('2024/05/06', apply=True)
+    
+    if fixed['unreferenced_images'] == 1 and os.path.exists(kept) and not os.path.exists(leaked):
+        print("✅ ภาพที่ไม่มี record ถูกลบ ภาพที่มี record ยังอยู่")
+        return True
+    print(f"❌ ผลลัพธ์: {fixed}")
+    return False
+
+def main():
+    """Main test function"""
+    print("LPR Server v3 - Image Reconciler Test")
+    print("=" * 50)
+    
+    try:
+        import flask_sqlalchemy  # noqa: F401
+    except ImportError as e:
+        print(f"⚠️  ข้ามการทดสอบ: {e}")
+        return 0
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        app, store, reconciler = create_test_reconciler(workdir)
+        results = [
+            test_orphan_file(app, store, reconciler),
+            test_leaked_reference(app, store, reconciler)
+        ]
+        store.engine.dispose()
+    
+    print("\n" + "=" * 50)
+    print(f"ผ่าน {sum(results)}/{len(results)} การทดสอบ")
+    return 0 if all(results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test Script for sargable time-window filtering
+ทดสอบ helper ช่วงเวลา [start, end) และตรวจสอบว่า query สถิติใช้ index scan
+"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+# Add project src to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.time_window import day_window, days_window, within
+
+INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+def test_day_window_site_timezone():
+    """ทดสอบช่วงเวลาของหนึ่งวันใน Asia/Bangkok (UTC+7)"""
+    print("=== ทดสอบ day_window (Asia/Bangkok) ===")
+    
+    start, end = day_window(date(2025, 3, 10), ZoneInfo('Asia/Bangkok'))
+    expected = (datetime(2025, 3, 9, 17, 0), datetime(2025, 3, 10, 17, 0))
+    if (start, end) == expected:
+        print(f"✅ {start} -> {end}")
+        return True
+    print(f"❌ ได้ {start} -> {end} แต่ควรเป็น {expected[0]} -> {expected[1]}")
+    return False
+
+def test_day_window_dst():
+    """ทดสอบวันที่เปลี่ยนเวลา DST (วันมี 23 ชั่วโมง)"""
+    print("\n=== ทดสอบ day_window ในวันเปลี่ยน DST ===")
+    
+    start, end = day_window(date(2025, 3, 9), ZoneInfo('America/New_York'))
+    if end - start == timedelta(hours=23):
+        print(f"✅ {start} -> {end} (23 ชั่วโมง)")
+        return True
+    print(f"❌ ความยาวช่วงเวลา {end - start}")
+    return False
+
+def test_days_window_inclusive():
+    """ทดสอบช่วงหลายวัน: date_to ต้องรวมทั้งวัน"""
+    print("\n=== ทดสอบ days_window ===")
+    
+    start, end = days_window(date(2025, 1, 1), date(2025, 1, 31), ZoneInfo('UTC'))
+    if (start, end) == (datetime(2025, 1, 1), datetime(2025, 2, 1)):
+        print(f"✅ {start} -> {end}")
+        return True
+    print(f"❌ ได้ {start} -> {end}")
+    return False
+
+def _plan_nodes(cursor, sql, params):
+    """EXPLAIN query และคืนรายการ (node type, relation)"""
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    nodes = []
+    def walk(node):
+        nodes.append((node['Node Type'], node.get('Relation Name') or node.get('Index Name') or ''))
+        for child in node.get('Plans', []):
+            walk(child)
+    walk(cursor.fetchone()[0][0]['Plan'])
+    return nodes
+
+def test_statistics_plans_use_index():
+    """ทดสอบว่า query สถิติที่ใช้ time window ใช้ index scan บน lpr_records"""
+    print("\n=== ทดสอบ query plans ของ query สถิติ ===")
+    
+    try:
+        import psycopg2
+        from sqlalchemy import select, func
+        from sqlalchemy.dialects import postgresql
+        from core.models.lpr_record import LPRRecord
+    except ImportError as e:
+        print(f"⚠️  ข้ามการทดสอบ: {e}")
+        return True
+    
+    db_config = {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'port': os.environ.get('DB_PORT', '5432'),
+        'user': os.environ.get('DB_USER', 'lpruser'),
+        'password': os.environ.get('DB_PASSWORD', ''),
+        'database': os.environ.get('DB_NAME', 'lprserver_v3')
+    }
+    try:
+        connection = psycopg2.connect(**db_config)
+    except psycopg2.Error as e:
+        print(f"⚠️  ข้ามการทดสอบ: ไม่สามารถเชื่อมต่อฐานข้อมูลได้ ({e})")
+        return True
+    
+    table = LPRRecord.__table__
+    window = day_window()
+    queries = {
+        'today_records': select(func.count(table.c.id)).where(within(table.c.timestamp, window)),
+        'today_blacklist_detections': select(func.count(table.c.id))
+            .where(table.c.is_blacklisted == True, within(table.c.timestamp, window)),
+        'camera_today_records': select(func.count(table.c.id))
+            .where(table.c.camera_id == 'cam-1', within(table.c.timestamp, window)),
+        'records_from_date': select(table.c.id)
+            .where(table.c.timestamp >= window[0])
+            .order_by(table.c.timestamp.desc(), table.c.id.desc())
+            .limit(20)
+    }
+    # Control: the old DATE(timestamp) filter must not be able to use the index
+    control = select(func.count(table.c.id)).where(func.date(table.c.timestamp) == date.today())
+    
+    passed = True
+    try:
+        cursor = connection.cursor()
+        # Make any index-capable predicate use the index, even on a small table
+        cursor.execute("SET enable_seqscan = off")
+        
+        for name, statement in queries.items():
+            compiled = statement.compile(dialect=postgresql.dialect())
+            nodes = _plan_nodes(cursor, str(compiled), compiled.params)
+            scans = [(node, relation) for node, relation in nodes if 'Scan' in node]
+            seq_scans = [relation for node, relation in scans if node == 'Seq Scan' and relation.startswith('lpr_records')]
+            if seq_scans or not any(node in INDEX_NODES for node, _ in scans):
+                print(f"❌ {name}: {scans}")
+                passed = False
+            else:
+                print(f"✅ {name}: {sorted({node for node, _ in scans})}")
+        
+        compiled = control.compile(dialect=postgresql.dialect())
+        nodes = _plan_nodes(cursor, str(compiled), compiled.params)
+        if any(node in INDEX_NODES for node, _ in nodes):
+            print(f"⚠️  DATE(timestamp) ใช้ index ได้ (มี expression index?): {nodes}")
+        else:
+            print("✅ DATE(timestamp) = today ยังคงเป็น Seq Scan (ตามที่คาดไว้)")
+    finally:
+        connection.close()
+    
+    return passed
+
+def main():
+    """Main test function"""
+    print("LPR Server v3 - Time Window Test")
+    print("=" * 50)
+    
+    results = [
+        test_day_window_site_timezone(),
+        test_day_window_dst(),
+        test_days_window_inclusive(),
+        test_statistics_plans_use_index()
+    ]
+    
+    print("\n" + "=" * 50)
+    print(f"ผ่าน {sum(results)}/{len(results)} การทดสอบ")
+    return 0 if all(results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())